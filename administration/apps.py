@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AdministrationConfig(AppConfig):
@@ -9,3 +10,8 @@ class AdministrationConfig(AppConfig):
     def ready(self):
         import administration.signals
         import administration.audit_signals  # corbeille mémoire des modifications
+        from django.core.signals import request_finished
+        from administration.audit import ecrire_apres_reponse
+        from ecole_moderne.cache_partage import creer_table_cache
+        request_finished.connect(ecrire_apres_reponse, dispatch_uid='journal_apres_reponse')
+        post_migrate.connect(creer_table_cache, sender=self, dispatch_uid='creer_table_cache')
@@ -8,19 +8,30 @@ Deux mécanismes complémentaires :
   et ses données à partir de cet instantané.
 * ``enregistrer_modification`` : journalise le détail (avant / après) d'un
   changement sur n'importe quel objet du système.
+
+Pendant une requête, les lignes de journal ne sont pas insérées une à une :
+elles attendent dans un tampon (ouvert par ``AuditContextMiddleware``) et
+partent en un seul ``bulk_create`` en fin de requête. Une ligne produite dans
+une transaction n'entre dans le tampon qu'au commit : un rollback l'emporte
+avec les données qu'elle décrivait.
 """
 
+import logging
 import threading
 from contextlib import contextmanager
 from datetime import date, datetime
 from decimal import Decimal
+from functools import partial
 from uuid import UUID
 
-from django.db import models, transaction
+from django.conf import settings
+from django.db import connection, models, transaction
 from django.utils import timezone
 
 from .models import CorbeilleElement, CorbeilleEleve, JournalModification
 
+logger = logging.getLogger(__name__)
+
 
 # ── Neutralisation ponctuelle du journal ─────────────────────────────────────
 _etat_journal = threading.local()
@@ -46,6 +57,103 @@ def suspendre_journal():
         _etat_journal.suspendu = precedent
 
 
+# ── Tampon d'écriture du journal ─────────────────────────────────────────────
+_tampon = threading.local()
+
+
+def ouvrir_tampon():
+    """Démarre la mise en attente des lignes de journal du thread courant."""
+    _tampon.lignes = []
+    _tampon.apres_reponse = getattr(_tampon, 'apres_reponse', None) or []
+
+
+def _inserer(lignes):
+    """Insère des lignes de journal (éventuellement de modèles différents)."""
+    par_modele = {}
+    for ligne in lignes:
+        par_modele.setdefault(type(ligne), []).append(ligne)
+    for modele, groupe in par_modele.items():
+        try:
+            modele.objects.bulk_create(groupe, batch_size=500)
+        except Exception:
+            logger.exception("Écriture du journal impossible (%s lignes)", len(groupe))
+
+
+def vider_tampon():
+    """Ferme le tampon et insère ce qu'il contient (fin de requête)."""
+    lignes = getattr(_tampon, 'lignes', None)
+    _tampon.lignes = None
+    if lignes:
+        _inserer(lignes)
+
+
+def _deposer(lignes, apres_reponse=False):
+    if apres_reponse:
+        en_attente = getattr(_tampon, 'apres_reponse', None)
+    else:
+        en_attente = getattr(_tampon, 'lignes', None)
+    if en_attente is None:
+        _inserer(lignes)
+    else:
+        en_attente.extend(lignes)
+
+
+def differer_ecriture(lignes, apres_reponse=False):
+    """Confie des lignes de journal (non enregistrées) au tampon.
+
+    Hors requête, elles sont insérées tout de suite, dans la transaction en
+    cours s'il y en a une. ``apres_reponse`` réserve l'écriture à l'après
+    envoi de la réponse : réservé aux journaux de consultation, qu'aucune
+    transaction ne protège.
+    """
+    if not lignes:
+        return
+    if apres_reponse:
+        _deposer(lignes, apres_reponse=True)
+    elif getattr(_tampon, 'lignes', None) is None:
+        _inserer(lignes)
+    elif connection.in_atomic_block:
+        transaction.on_commit(partial(_deposer, lignes))
+    else:
+        _tampon.lignes.extend(lignes)
+
+
+def ecrire_apres_reponse(**kwargs):
+    """Récepteur de ``request_finished`` : insère les journaux de consultation."""
+    lignes = getattr(_tampon, 'apres_reponse', None)
+    _tampon.apres_reponse = None
+    if lignes:
+        _inserer(lignes)
+        # close_old_connections est déjà passé : ne pas garder la connexion
+        # rouverte pour l'insertion (sauf dans un atomic, cas des tests).
+        if not connection.in_atomic_block:
+            connection.close_if_unusable_or_obsolete()
+
+
+def journaliser_consultation(request, type_objet, description, objet_id=None):
+    """Trace une consultation (JournalActivite) sans retarder la page.
+
+    La ligne est écrite après l'envoi de la réponse, sauf si
+    ``JOURNAL_CONSULTATION_DIFFERE`` vaut False.
+    """
+    from utilisateurs.models import JournalActivite
+
+    ligne = JournalActivite(
+        user=request.user,
+        action='CONSULTATION',
+        type_objet=type_objet,
+        objet_id=objet_id,
+        description=description,
+        adresse_ip=request.META.get('REMOTE_ADDR', ''),
+        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+    )
+    if getattr(settings, 'JOURNAL_CONSULTATION_DIFFERE', True):
+        differer_ecriture([ligne], apres_reponse=True)
+    else:
+        ligne.save()
+    return ligne
+
+
 # ── Sérialisation ────────────────────────────────────────────────────────────
 
 def valeur_json(valeur):
@@ -137,7 +245,7 @@ def enregistrer_modification(instance, changements, utilisateur=None, request=No
             utilisateur = getattr(request, 'user', None)
         if utilisateur is not None and not getattr(utilisateur, 'is_authenticated', False):
             utilisateur = None
-        return JournalModification.objects.create(
+        ligne = JournalModification(
             app_label=instance._meta.app_label,
             model_name=instance._meta.object_name,
             objet_id=getattr(instance, 'pk', None),
@@ -148,10 +256,46 @@ def enregistrer_modification(instance, changements, utilisateur=None, request=No
             utilisateur=utilisateur,
             ip_address=(request.META.get('REMOTE_ADDR') if request else None) or None,
         )
+        differer_ecriture([ligne])
+        return ligne
     except Exception:
         return None
 
 
+def enregistrer_modifications_en_lot(entrees, utilisateur=None, request=None):
+    """Journalise un lot de changements en une insertion groupée.
+
+    ``entrees`` : itérable de (instance, changements, action). Même filtrage
+    que ``enregistrer_modification`` ; ne lève jamais d'exception.
+    """
+    if journal_est_suspendu():
+        return 0
+    try:
+        if utilisateur is None and request is not None:
+            utilisateur = getattr(request, 'user', None)
+        if utilisateur is not None and not getattr(utilisateur, 'is_authenticated', False):
+            utilisateur = None
+        ip_address = (request.META.get('REMOTE_ADDR') if request else None) or None
+        lignes = [
+            JournalModification(
+                app_label=instance._meta.app_label,
+                model_name=instance._meta.object_name,
+                objet_id=getattr(instance, 'pk', None),
+                objet_repr=str(instance)[:255],
+                action=action,
+                changements=changements or {},
+                utilisateur=utilisateur,
+                ip_address=ip_address,
+            )
+            for instance, changements, action in entrees
+            if changements or action != JournalModification.ACTION_MODIFICATION
+        ]
+        differer_ecriture(lignes)
+        return len(lignes)
+    except Exception:
+        return 0
+
+
 class SuiviModification:
     """Context manager qui journalise automatiquement les champs modifiés.
 
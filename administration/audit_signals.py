@@ -1,16 +1,22 @@
 """Alimente automatiquement la corbeille mémoire des modifications.
 
 Les modèles listés dans ``MODELES_SUIVIS`` sont surveillés : à chaque
-enregistrement, l'état précédent est relu en base puis comparé au nouvel état,
-et seuls les champs réellement modifiés sont journalisés.
+enregistrement, l'état précédent est comparé au nouvel état et seuls les
+champs réellement modifiés sont journalisés. L'état précédent est celui lu
+en base au chargement de l'instance (``SyncTrackedModel.valeurs_chargees``) ;
+la ligne n'est relue que pour une instance construite à la main ou chargée
+partiellement (``only``/``defer``).
 """
 
 import logging
+from types import SimpleNamespace
 
 from django.apps import apps as django_apps
 from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
+from synchronisation.bulk import post_bulk_save, pre_bulk_update
+
 logger = logging.getLogger(__name__)
 
 
@@ -58,7 +64,13 @@ def memoriser_etat_avant(sender, instance, **kwargs):
     from .audit import capturer_etat
 
     try:
-        precedent = sender.objects.filter(pk=instance.pk).first()
+        valeurs = None
+        if not instance._state.adding and hasattr(instance, 'valeurs_chargees'):
+            valeurs = instance.valeurs_chargees()
+        if valeurs is not None and valeurs.get(sender._meta.pk.attname) == instance.pk:
+            precedent = SimpleNamespace(_meta=sender._meta, **valeurs)
+        else:
+            precedent = sender.objects.filter(pk=instance.pk).first()
         setattr(instance, _ATTRIBUT_ETAT, capturer_etat(precedent) if precedent else None)
     except Exception:
         setattr(instance, _ATTRIBUT_ETAT, None)
@@ -97,6 +109,8 @@ def journaliser_enregistrement(sender, instance, created, **kwargs):
     finally:
         if hasattr(instance, _ATTRIBUT_ETAT):
             delattr(instance, _ATTRIBUT_ETAT)
+        # L'état chargé n'est plus celui de la base : un nouvel enregistrement relira la ligne.
+        instance.__dict__.pop('_valeurs_chargees', None)
 
 
 @receiver(post_delete)
@@ -117,3 +131,63 @@ def journaliser_suppression(sender, instance, **kwargs):
         )
     except Exception:
         logger.exception("Journalisation de la suppression impossible")
+
+
+# ── Écritures en lot (synchronisation.bulk) ──────────────────────────────────
+
+@receiver(pre_bulk_update)
+def memoriser_etats_avant_lot(sender, instances, fields, **kwargs):
+    if not _est_suivi(sender):
+        return
+    from .audit import capturer_etat
+
+    try:
+        pks = [instance.pk for instance in instances if instance.pk]
+        precedents = sender.objects.using(kwargs.get('using') or 'default').in_bulk(pks)
+        for instance in instances:
+            precedent = precedents.get(instance.pk)
+            setattr(instance, _ATTRIBUT_ETAT, capturer_etat(precedent, fields) if precedent else None)
+    except Exception:
+        logger.exception("Lecture de l'état précédent du lot impossible")
+
+
+@receiver(post_bulk_save)
+def journaliser_lot(sender, instances, created, fields, **kwargs):
+    if not _est_suivi(sender):
+        return
+    from .audit import capturer_etat, comparer_etats, enregistrer_modifications_en_lot
+    from .middleware.audit import get_current_request
+    from .models import JournalModification
+
+    try:
+        if created:
+            # Relire les lignes réellement insérées (ignore_conflicts, pk absents sous MySQL)
+            inseres = dict(
+                sender.objects.using(kwargs.get('using') or 'default')
+                .filter(sync_uuid__in=[instance.sync_uuid for instance in instances])
+                .values_list('sync_uuid', 'pk')
+            )
+            entrees = []
+            for instance in instances:
+                if instance.sync_uuid not in inseres:
+                    continue
+                instance.pk = inseres[instance.sync_uuid]
+                entrees.append((instance, {}, JournalModification.ACTION_CREATION))
+        else:
+            entrees = []
+            for instance in instances:
+                avant = getattr(instance, _ATTRIBUT_ETAT, None)
+                if avant is None:
+                    continue
+                changements = comparer_etats(avant, capturer_etat(instance, fields))
+                for champ in list(changements):
+                    if champ in CHAMPS_IGNORES:
+                        del changements[champ]
+                entrees.append((instance, changements, JournalModification.ACTION_MODIFICATION))
+        enregistrer_modifications_en_lot(entrees, request=get_current_request())
+    except Exception:
+        logger.exception("Journalisation du lot impossible")
+    finally:
+        for instance in instances:
+            if hasattr(instance, _ATTRIBUT_ETAT):
+                delattr(instance, _ATTRIBUT_ETAT)
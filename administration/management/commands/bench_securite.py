@@ -0,0 +1,78 @@
+"""
+Micro-benchmark de l'analyse SQLi/XSS de ecole_moderne.security_middleware.
+
+Usage: python manage.py bench_securite [--tailles 50 500 2000] [--repetitions 20]
+
+Rejoue des POST de saisie de notes en masse (un champ par élève, comme le
+formulaire de saisie) et compare l'ancienne analyse (un re.search par motif
+et par valeur, en deux passes SQL puis XSS) au scanner compilé en un passage.
+Les corps JSON (ajax_sauvegarder_notes_masse) ne remplissent pas request.POST
+et ne sont donc analysés par aucune des deux versions.
+"""
+import re
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from ecole_moderne.security_middleware import SecurityMiddleware
+
+
+def _analyse_ancienne(middleware, request):
+    """Reproduction de l'analyse d'avant le scanner combiné (référence)."""
+    query = (request.META.get('QUERY_STRING') or '').lower()
+    for pattern in middleware.SQL_INJECTION_PATTERNS:
+        if re.search(pattern, query, re.IGNORECASE):
+            return 'sql'
+    for key, value in request.POST.items():
+        if not middleware._champ_sensible(key):
+            for pattern in middleware.SQL_INJECTION_PATTERNS:
+                if re.search(pattern, value.lower(), re.IGNORECASE):
+                    return 'sql'
+    full_path = request.get_full_path().lower()
+    for pattern in middleware.XSS_PATTERNS:
+        if re.search(pattern, full_path, re.IGNORECASE):
+            return 'xss'
+    for key, value in request.POST.items():
+        if not middleware._champ_sensible(key):
+            for pattern in middleware.XSS_PATTERNS:
+                if re.search(pattern, value.lower(), re.IGNORECASE):
+                    return 'xss'
+    return None
+
+
+class Command(BaseCommand):
+    help = "Compare l'ancienne et la nouvelle analyse SQLi/XSS sur des POST de notes en masse"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tailles', type=int, nargs='+', default=[50, 500, 2000],
+                            help='Nombres de champs du POST')
+        parser.add_argument('--repetitions', type=int, default=20)
+
+    def handle(self, *args, **options):
+        middleware = SecurityMiddleware(lambda request: None)
+        factory = RequestFactory()
+        for taille in options['tailles']:
+            donnees = {f'note_{i}': f'{i % 20},5' for i in range(taille)}
+            donnees.update({f'appreciation_{i}': "Bon trimestre, l'élève doit persévérer" for i in range(taille // 10)})
+            request = factory.post('/notes/saisie/?classe=12&periode=TRIMESTRE_1', donnees)
+            request.POST  # corps décodé une fois, hors mesure
+
+            mesures = {}
+            for libelle, analyse in (
+                ('avant', lambda: _analyse_ancienne(middleware, request)),
+                ('après', lambda: middleware.scanner_requete(request)),
+            ):
+                durees = []
+                for _ in range(options['repetitions']):
+                    debut = time.perf_counter()
+                    verdict = analyse()
+                    durees.append(time.perf_counter() - debut)
+                mesures[libelle] = (statistics.median(durees), verdict)
+
+            (avant, verdict_avant), (apres, verdict_apres) = mesures['avant'], mesures['après']
+            self.stdout.write(
+                f"{len(donnees):>5} champs : avant {avant * 1000:.2f} ms, après {apres * 1000:.2f} ms "
+                f"(x{avant / apres if apres else 0:.1f}), verdicts {verdict_avant} / {verdict_apres}"
+            )
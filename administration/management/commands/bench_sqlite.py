@@ -0,0 +1,145 @@
+"""
+Mesure l'effet du profil SQLite desktop (settings.SQLITE_OPTIONS_DESKTOP).
+
+Usage: python manage.py bench_sqlite [--ecritures 30] [--lecteurs 3]
+
+La base courante est copiée deux fois (API de sauvegarde SQLite, la base
+réelle n'est jamais modifiée) : « avant » en journal DELETE sans options,
+« après » avec le profil desktop. Sur chaque copie, une saisie de notes en
+masse (notes:sauvegarder_notes) est rejouée pendant que d'autres threads
+affichent la liste des paiements, comme plusieurs secrétaires du même poste.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+
+def _p95(durees):
+    durees = sorted(durees)
+    return durees[min(len(durees) - 1, int(len(durees) * 0.95))] if durees else 0.0
+
+
+class Command(BaseCommand):
+    help = 'Compare les temps de réponse avant/après le profil SQLite desktop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ecritures', type=int, default=30, help='Nombre de saisies de notes rejouées')
+        parser.add_argument('--lecteurs', type=int, default=3, help='Threads qui affichent la liste des paiements')
+
+    def handle(self, *args, **options):
+        reglages = connections['default'].settings_dict
+        if not reglages['ENGINE'].endswith('sqlite3'):
+            raise CommandError('bench_sqlite ne concerne que les installations SQLite.')
+        source = str(reglages['NAME'])
+        connections['default'].close()
+
+        dossier = tempfile.mkdtemp(prefix='bench_sqlite_')
+        profils = [
+            ('avant', {}, 'DELETE'),
+            ('après', settings.SQLITE_OPTIONS_DESKTOP, None),
+        ]
+        nom_origine, options_origine = reglages['NAME'], reglages.get('OPTIONS', {})
+        try:
+            for libelle, options_db, journal in profils:
+                copie = os.path.join(dossier, f'{libelle}.sqlite3')
+                self._copier(source, copie, journal)
+                self._activer(copie, options_db)
+                ecritures, lectures = self._mesurer(options['ecritures'], options['lecteurs'])
+                self.stdout.write(
+                    f"{libelle:>6} : saisie notes médiane {statistics.median(ecritures) * 1000:.1f} ms, "
+                    f"p95 {_p95(ecritures) * 1000:.1f} ms | liste paiements médiane "
+                    f"{statistics.median(lectures) * 1000 if lectures else 0:.1f} ms, "
+                    f"p95 {_p95(lectures) * 1000:.1f} ms ({len(lectures)} lectures)"
+                )
+        finally:
+            self._activer(nom_origine, options_origine)
+            shutil.rmtree(dossier, ignore_errors=True)
+
+    def _copier(self, source, cible, journal):
+        origine = sqlite3.connect(source)
+        copie = sqlite3.connect(cible)
+        try:
+            origine.backup(copie)
+            if journal:
+                copie.execute(f'PRAGMA journal_mode={journal}')
+        finally:
+            copie.close()
+            origine.close()
+
+    def _activer(self, nom, options_db):
+        # Les connexions par thread sont recréées à partir de connections.settings.
+        connections.close_all()
+        for cible in (connections.settings['default'], connections['default'].settings_dict):
+            cible['NAME'] = nom
+            cible['OPTIONS'] = dict(options_db)
+
+    def _utilisateur(self):
+        from django.contrib.auth.models import User
+
+        utilisateur = User.objects.filter(is_superuser=True, is_active=True).first()
+        if utilisateur is None:
+            utilisateur = User.objects.create_superuser('bench_sqlite', password=None)
+        return utilisateur
+
+    def _client(self, utilisateur):
+        client = Client(HTTP_HOST='127.0.0.1')
+        client.force_login(utilisateur)
+        return client
+
+    def _charge_notes(self):
+        from eleves.models import Eleve
+        from notes.models import MatiereNote
+
+        matiere = MatiereNote.objects.select_related('classe').filter(actif=True).first()
+        if matiere is None:
+            raise CommandError('Aucune matière de notes dans la base : rien à mesurer.')
+        eleves = list(Eleve.objects.values_list('pk', flat=True)[:40])
+        note_max = 10 if matiere.classe.niveau_enseignement == 'PRIMAIRE' else 20
+        return matiere, eleves, note_max
+
+    def _mesurer(self, nb_ecritures, nb_lecteurs):
+        matiere, eleves, note_max = self._charge_notes()
+        utilisateur = self._utilisateur()
+        url_notes = reverse('notes:sauvegarder_notes')
+        url_paiements = reverse('paiements:liste_paiements')
+        lectures, arret = [], threading.Event()
+
+        def lecteur():
+            client = self._client(utilisateur)
+            while not arret.is_set():
+                debut = time.perf_counter()
+                client.get(url_paiements)
+                lectures.append(time.perf_counter() - debut)
+            connections.close_all()
+
+        threads = [threading.Thread(target=lecteur, daemon=True) for _ in range(nb_lecteurs)]
+        for thread in threads:
+            thread.start()
+
+        client, ecritures = self._client(utilisateur), []
+        try:
+            for i in range(nb_ecritures):
+                corps = {
+                    'matiere_id': matiere.pk,
+                    'periode': 'TRIMESTRE_1',
+                    'notes': [{'eleve_id': pk, 'note': (i + n) % note_max} for n, pk in enumerate(eleves)],
+                }
+                debut = time.perf_counter()
+                client.post(url_notes, json.dumps(corps), content_type='application/json')
+                ecritures.append(time.perf_counter() - debut)
+        finally:
+            arret.set()
+            for thread in threads:
+                thread.join()
+        return ecritures, lectures
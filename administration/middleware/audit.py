@@ -2,7 +2,9 @@
 
 Les signaux qui alimentent la corbeille mémoire n'ont pas accès à la requête ;
 ce middleware la place dans une variable locale au thread pour que l'auteur et
-l'adresse IP d'une modification puissent être enregistrés.
+l'adresse IP d'une modification puissent être enregistrés. Il ouvre aussi le
+tampon du journal : les lignes produites pendant la requête sont insérées en
+un seul lot avant de rendre la réponse.
 """
 
 import threading
@@ -30,8 +32,12 @@ class AuditContextMiddleware:
         self.get_response = get_response
 
     def __call__(self, request):
+        from administration.audit import ouvrir_tampon, vider_tampon
+
         _state.request = request
+        ouvrir_tampon()
         try:
             return self.get_response(request)
         finally:
             _state.request = None
+            vider_tampon()
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0004_corbeilleelement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=150, unique=True)),
+                ('valeur', models.PositiveBigIntegerField(default=0)),
+                ('date_modification', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Compteur de numérotation',
+                'verbose_name_plural': 'Compteurs de numérotation',
+            },
+        ),
+    ]
@@ -246,3 +246,22 @@ class MaintenanceMode(models.Model):
         if self.is_active and not self.activated_at:
             self.activated_at = timezone.now()
         super().save(*args, **kwargs)
+
+
+class CompteurSequence(models.Model):
+    """Dernière valeur attribuée d'une numérotation (matricules, reçus, codes).
+
+    Une ligne par portée (``cle``), incrémentée par un UPDATE atomique : voir
+    administration.sequences.
+    """
+
+    cle = models.CharField(max_length=150, unique=True)
+    valeur = models.PositiveBigIntegerField(default=0)
+    date_modification = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Compteur de numérotation'
+        verbose_name_plural = 'Compteurs de numérotation'
+
+    def __str__(self):
+        return f"{self.cle} = {self.valeur}"
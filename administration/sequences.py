@@ -0,0 +1,85 @@
+"""Numérotations séquentielles : matricules, numéros de reçu, codes de documents.
+
+Chaque portée (``cle``) a une ligne ``CompteurSequence`` qui porte la
+dernière valeur attribuée. L'attribution est un ``UPDATE ... SET valeur =
+valeur + n`` suivi d'une lecture dans la même transaction : le verrou de
+ligne (MySQL) ou d'écriture (SQLite) sérialise les guichets concurrents, et
+le coût ne dépend plus du nombre de lignes déjà numérotées.
+
+La première attribution d'une portée l'amorce à partir des données
+existantes (dernière valeur déjà utilisée), une seule fois.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from .models import CompteurSequence
+
+
+def allouer(cle, amorce=0, nombre=1):
+    """Réserve ``nombre`` valeurs consécutives de la séquence ``cle``.
+
+    Retourne la première. ``amorce`` est la dernière valeur déjà utilisée
+    (ou un callable qui la calcule) ; elle n'est consultée que si la
+    séquence n'existe pas encore. Appelée dans une transaction, la
+    réservation est annulée avec elle : pas de trou dans la numérotation.
+    """
+    with transaction.atomic():
+        compteur = CompteurSequence.objects.filter(cle=cle)
+        if not compteur.update(valeur=F('valeur') + nombre, date_modification=timezone.now()):
+            depart = (amorce() if callable(amorce) else amorce) or 0
+            try:
+                with transaction.atomic():
+                    CompteurSequence.objects.create(cle=cle, valeur=depart + nombre)
+                return depart + 1
+            except IntegrityError:
+                # Créée entre-temps par une autre requête
+                compteur.update(valeur=F('valeur') + nombre, date_modification=timezone.now())
+        valeur = compteur.values_list('valeur', flat=True).get()
+    return valeur - nombre + 1
+
+
+def dernier_suffixe(queryset, champ, prefixe):
+    """Plus grand entier suivant ``prefixe`` dans ``champ`` (0 si aucun).
+
+    Tri par longueur puis par valeur : ``REC202510000`` passe bien après
+    ``REC20259999``.
+    """
+    dernier = (
+        queryset.filter(**{f'{champ}__startswith': prefixe})
+        .order_by(Length(champ).desc(), f'-{champ}')
+        .values_list(champ, flat=True)
+        .first()
+    )
+    try:
+        return int(dernier[len(prefixe):].lstrip('-'))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _cle_numero(modele, champ, prefixe):
+    return f'{modele._meta.label_lower}.{champ}:{prefixe}'
+
+
+def numero_suivant(modele, champ, prefixe, largeur=4):
+    """Prochain ``{prefixe}{n:0largeur}`` pour ``modele.champ``.
+
+    La séquence est propre au préfixe (qui porte l'année ou la date) et
+    amorcée sur les numéros déjà en base.
+    """
+    numero = allouer(
+        _cle_numero(modele, champ, prefixe),
+        amorce=lambda: dernier_suffixe(modele._base_manager.all(), champ, prefixe),
+    )
+    return f'{prefixe}{numero:0{largeur}d}'
+
+
+def recaler_numero(modele, champ, prefixe):
+    """Remonte la séquence au-delà des numéros écrits hors séquence
+    (saisie manuelle, lignes reçues par synchronisation)."""
+    dernier = dernier_suffixe(modele._base_manager.all(), champ, prefixe)
+    CompteurSequence.objects.filter(
+        cle=_cle_numero(modele, champ, prefixe), valeur__lt=dernier,
+    ).update(valeur=dernier, date_modification=timezone.now())
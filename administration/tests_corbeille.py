@@ -6,6 +6,7 @@ Couvre les cas signalés en production :
 * suppression d'un élève (admin et interface) → corbeille puis restauration ;
 * suppression d'un paiement / échéancier depuis l'admin → corbeille ;
 * modification d'un paiement journalisée avant / après ;
+* journal écrit en un lot par requête, sans relire l'état précédent ;
 * export global des élèves au format du modèle d'importation ;
 * planches de cartes imprimées à 8 cartes par feuille A4.
 """
@@ -16,7 +17,7 @@ from decimal import Decimal
 from django.conf import settings
 from django.contrib.admin.sites import AdminSite
 from django.contrib.auth.models import User
-from django.test import RequestFactory, TestCase, override_settings
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
 
 # La vérification de licence renvoie 403 hors installation activée : elle n'a
 # pas sa place dans les tests fonctionnels.
@@ -285,6 +286,74 @@ class JournalModificationTest(TestCase):
             ).exists()
         )
 
+    def test_etat_charge_sans_relecture(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        eleve = Eleve.objects.get(pk=self.eleve.pk)
+        JournalModification.objects.all().delete()
+
+        eleve.lieu_naissance = "Mamou"
+        with CaptureQueriesContext(connection) as requetes:
+            eleve.save()
+
+        table = Eleve._meta.db_table
+        relectures = [
+            q['sql'] for q in requetes.captured_queries
+            if q['sql'].startswith('SELECT') and f'FROM "{table}"' in q['sql']
+        ]
+        self.assertEqual(relectures, [])
+        entree = JournalModification.objects.get(model_name='Eleve')
+        self.assertEqual(entree.changements['lieu_naissance'], {'avant': 'KINDIA', 'apres': 'MAMOU'})
+
+    @override_settings(MIDDLEWARE=MIDDLEWARE_SANS_LICENCE)
+    def test_consultation_journalisee_apres_reponse(self):
+        from django.urls import reverse
+
+        from utilisateurs.models import JournalActivite
+
+        self.client.force_login(self.user)
+        reponse = self.client.get(reverse('eleves:detail_eleve', args=[self.eleve.pk]))
+        self.assertEqual(reponse.status_code, 200)
+        self.assertTrue(
+            JournalActivite.objects.filter(
+                user=self.user, action='CONSULTATION', objet_id=self.eleve.pk,
+            ).exists()
+        )
+
+
+class JournalGroupeParRequeteTest(TransactionTestCase):
+    """Hors transaction (cas réel d'une requête), le journal part en un lot."""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin_lot', 'l@l.gn', 'x')
+        self.ecole, self.classe, self.eleve = _creer_jeu_de_donnees('lot')
+
+    def test_un_seul_insert_par_requete(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .middleware.audit import AuditContextMiddleware
+
+        JournalModification.objects.all().delete()
+
+        def vue(request):
+            for lieu in ("Labé", "Boké", "Faranah"):
+                self.eleve.lieu_naissance = lieu
+                self.eleve.save()
+            # Rien n'est écrit avant la fin de la requête
+            self.assertFalse(JournalModification.objects.exists())
+
+        request = RequestFactory().post('/eleves/')
+        request.user = self.user
+        with CaptureQueriesContext(connection) as requetes:
+            AuditContextMiddleware(vue)(request)
+
+        table = JournalModification._meta.db_table
+        inserts = [q for q in requetes.captured_queries if q['sql'].startswith(f'INSERT INTO "{table}"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(JournalModification.objects.filter(model_name='Eleve', utilisateur=self.user).count(), 3)
+
 
 class ExportElevesTest(TestCase):
     """L'export global doit respecter le format du modèle d'importation."""
@@ -465,15 +534,16 @@ class ModificationPaiementViewTest(TestCase):
         self.assertEqual(self.client.get(url).status_code, 200)
 
         JournalModification.objects.all().delete()
-        reponse = self.client.post(url, {
-            'type_paiement': self.type_p.pk,
-            'mode_paiement': self.mode_p.pk,
-            'montant': '175000',
-            'date_paiement': '2025-10-21',
-            'reference_externe': '',
-            'observations': 'Tranche oubliée lors de la saisie',
-            'motif_modification': 'Montant saisi incomplet le jour même',
-        }, follow=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            reponse = self.client.post(url, {
+                'type_paiement': self.type_p.pk,
+                'mode_paiement': self.mode_p.pk,
+                'montant': '175000',
+                'date_paiement': '2025-10-21',
+                'reference_externe': '',
+                'observations': 'Tranche oubliée lors de la saisie',
+                'motif_modification': 'Montant saisi incomplet le jour même',
+            }, follow=True)
         self.assertEqual(reponse.status_code, 200)
 
         self.paiement.refresh_from_db()
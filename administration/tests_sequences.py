@@ -0,0 +1,91 @@
+"""Tests des compteurs de numérotation (administration.sequences)."""
+
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from eleves.models import Classe, Ecole, Eleve
+from paiements.models import ModePaiement, Paiement, TypePaiement
+
+from .models import CompteurSequence
+from .sequences import allouer, numero_suivant
+
+
+class AllouerTest(TestCase):
+
+    def test_amorce_consultee_une_seule_fois(self):
+        appels = []
+
+        def amorce():
+            appels.append(1)
+            return 41
+
+        self.assertEqual(allouer('test:a', amorce=amorce), 42)
+        self.assertEqual(allouer('test:a', amorce=amorce), 43)
+        self.assertEqual(len(appels), 1)
+
+    def test_numero_suivant_par_prefixe(self):
+        self.assertEqual(numero_suivant(Paiement, 'numero_recu', 'TST-20251010-'), 'TST-20251010-0001')
+        self.assertEqual(numero_suivant(Paiement, 'numero_recu', 'TST-20251010-'), 'TST-20251010-0002')
+        self.assertEqual(numero_suivant(Paiement, 'numero_recu', 'TST-20251011-'), 'TST-20251011-0001')
+
+    def test_reservation_d_un_bloc(self):
+        self.assertEqual(allouer('test:b', nombre=5), 1)
+        self.assertEqual(allouer('test:b'), 6)
+        self.assertEqual(CompteurSequence.objects.get(cle='test:b').valeur, 6)
+
+
+class NumerotationMetierTest(TestCase):
+
+    def setUp(self):
+        self.ecole = Ecole.objects.create(
+            nom="École Séquences", adresse="Conakry",
+            telephone="+224622000000", directeur="Directeur",
+        )
+        self.classe = Classe.objects.create(
+            ecole=self.ecole, nom="6ème A", niveau="PRIMAIRE_6", annee_scolaire="2025-2026",
+        )
+        self.type_p = TypePaiement.objects.create(nom="Scolarité SQ")
+        self.mode_p = ModePaiement.objects.create(nom="Espèces SQ")
+
+    def _eleve(self, matricule=''):
+        return Eleve.objects.create(
+            matricule=matricule, prenom="Aissatou", nom="Camara", sexe="F",
+            date_naissance=date(2014, 5, 12), lieu_naissance="Kindia",
+            classe=self.classe, date_inscription=date(2025, 9, 15), statut="ACTIF",
+        )
+
+    def _paiement(self, eleve, **extra):
+        return Paiement.objects.create(
+            eleve=eleve, type_paiement=self.type_p, mode_paiement=self.mode_p,
+            montant=Decimal('1000'), date_paiement=date(2025, 10, 10), **extra,
+        )
+
+    def test_matricules_consecutifs_et_saisie_manuelle_evitee(self):
+        premier = self._eleve()
+        code, numero = premier.matricule.rsplit('-', 1)
+        # Le numéro suivant a déjà été saisi à la main : il est sauté
+        self._eleve(matricule=f"{code}-{int(numero) + 1:03d}")
+        troisieme = self._eleve()
+        self.assertEqual(troisieme.matricule, f"{code}-{int(numero) + 2:03d}")
+
+    def test_recu_amorce_sur_l_existant_au_dela_de_9999(self):
+        from django.utils import timezone
+
+        eleve = self._eleve()
+        prefixe = f"REC{timezone.now().year}"
+        self._paiement(eleve, numero_recu=f"{prefixe}9999")
+        self._paiement(eleve, numero_recu=f"{prefixe}10000")
+        self.assertEqual(self._paiement(eleve).numero_recu, f"{prefixe}10001")
+
+    def test_recu_deja_pris_hors_sequence(self):
+        from django.utils import timezone
+
+        eleve = self._eleve()
+        prefixe = f"REC{timezone.now().year}"
+        self.assertEqual(self._paiement(eleve).numero_recu, f"{prefixe}0001")
+        # Numéros arrivés par synchronisation : la collision recale le compteur
+        self._paiement(eleve, numero_recu=f"{prefixe}0002")
+        self._paiement(eleve, numero_recu=f"{prefixe}0050")
+        self.assertEqual(self._paiement(eleve).numero_recu, f"{prefixe}0051")
@@ -20,6 +20,7 @@ from typing import Optional
 
 from .models import SystemLog, MaintenanceMode
 from eleves.models import Eleve, Classe, Ecole, GrilleTarifaire
+from eleves.utils_annee import invalider_annees
 from paiements.models import Paiement
 from utilisateurs.models import Profil
 
@@ -78,6 +79,7 @@ def _bootstrap_ecole_structure(ecole: 'Ecole', created_by: Optional['User'] = No
                 continue
         if classes_to_create:
             Classe.objects.bulk_create(classes_to_create, ignore_conflicts=True)
+            invalider_annees(ecole.id)
 
         # Créer grilles tarifaires à 0 par niveau si non existantes
         for code, _label in niveaux:
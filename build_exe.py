@@ -60,7 +60,9 @@ def collect_static():
     """Collecte les fichiers statiques Django."""
     step("Collecte des fichiers statiques")
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecole_moderne.settings')
-    os.environ['DJANGO_DEBUG'] = 'true'
+    # Mêmes réglages que l'exe (run_server.py) : manifeste whitenoise livré
+    os.environ['DJANGO_DEBUG'] = 'false'
+    os.environ['OFFLINE_MODE'] = '1'
     os.environ['DJANGO_SECRET_KEY'] = 'build-key-temp'
 
     try:
@@ -508,7 +508,10 @@ def envoyer_relances_bus(request):
 
             # Envoi
             try:
-                send_message_async(to_number=numero, body=msg, channel=channel)
+                send_message_async(
+                    to_number=numero, body=msg, channel=channel,
+                    dedup_key=f"relance-bus:{abo.pk}:{timezone.localdate().isoformat()}",
+                )
                 envoyes += 1
                 abo.derniere_relance = timezone.now()
                 abo.save(update_fields=['derniere_relance'])
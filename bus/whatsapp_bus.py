@@ -172,6 +172,27 @@ Cordialement,
 
         return message
 
+    def _mettre_en_file(self, eleve, message, cle_dedup):
+        """Met le message WhatsApp en file d'envoi ; None si aucun numéro."""
+        from paiements.twilio_utils import send_message_async
+
+        numero = self._formater_numero_whatsapp(self._get_telephone_parent(eleve))
+        if not numero:
+            return None
+        return send_message_async(to_number=numero, body=message, channel='whatsapp', dedup_key=cle_dedup)
+
+    def envoyer_abonnement(self, abonnement, pdf_url=None):
+        """Envoie la confirmation d'abonnement au parent (une fois par période)"""
+        message = self._generer_message_abonnement(abonnement, pdf_url)
+        cle = f"abonnement-bus:{abonnement.pk}:{abonnement.date_expiration.isoformat()}"
+        return self._mettre_en_file(abonnement.eleve, message, cle)
+
+    def envoyer_expiration(self, abonnement, pdf_url=None):
+        """Envoie l'alerte d'expiration au parent (au plus une par jour)"""
+        message = self._generer_message_expiration(abonnement, pdf_url)
+        cle = f"expiration-bus:{abonnement.pk}:{timezone.localdate().isoformat()}"
+        return self._mettre_en_file(abonnement.eleve, message, cle)
+
 
 # Instance globale
 whatsapp_bus_sender = WhatsAppBusSender()
@@ -13,6 +13,7 @@ from .models_bibliotheque import (
     HistoriqueLivre, ParametreBibliotheque
 )
 from .forms import ReservationForm
+from administration.sequences import numero_suivant
 from eleves.models import Eleve
 
 
@@ -51,17 +52,7 @@ def _duree_reservation():
 
 
 def _prochain_numero(modele, champ, prefixe):
-    base = f"{prefixe}-{date.today().strftime('%Y%m%d')}"
-    dernier = modele.objects.filter(
-        **{f'{champ}__startswith': base}
-    ).order_by(f'-{champ}').first()
-    numero = 1
-    if dernier:
-        try:
-            numero = int(getattr(dernier, champ).split('-')[-1]) + 1
-        except (ValueError, IndexError):
-            pass
-    return f'{base}-{numero:04d}'
+    return numero_suivant(modele, champ, f"{prefixe}-{date.today().strftime('%Y%m%d')}-")
 
 
 def _synchroniser_statut_livre(livre):
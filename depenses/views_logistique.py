@@ -21,6 +21,7 @@ from .forms import (
     VenteFournitureForm,
     InventaireForm, LigneInventaireForm, ContributionPapierRameForm
 )
+from administration.sequences import numero_suivant
 
 
 def _biens_pour_utilisateur(user):
@@ -743,19 +744,7 @@ def creer_mouvement_ancien(request):
 
 def _generer_code(modele, champ, prefixe):
     """Génère un code séquentiel du type PREFIXE-YYYYMMDD-0001."""
-    today = date.today()
-    base = f"{prefixe}-{today.strftime('%Y%m%d')}"
-    dernier = modele.objects.filter(
-        **{f"{champ}__startswith": base}
-    ).order_by(f"-{champ}").first()
-    if dernier:
-        try:
-            num = int(getattr(dernier, champ).split('-')[-1]) + 1
-        except (ValueError, IndexError):
-            num = 1
-    else:
-        num = 1
-    return f"{base}-{num:04d}"
+    return numero_suivant(modele, champ, f"{prefixe}-{date.today().strftime('%Y%m%d')}-")
 
 
 # ===== CRUD ARTICLES =====
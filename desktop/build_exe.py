@@ -152,6 +152,8 @@ def build():
         'reportlab.platypus', 'reportlab.lib.pagesizes',
         'openpyxl', 'PIL', 'PIL.Image',
         'dateutil', 'python_dateutil',
+        'waitress', 'whitenoise', 'whitenoise.storage',
+        'ecole_moderne.serveur_embarque', 'ecole_moderne.statiques',
     ]
     hidden_imports.extend(libs)
 
@@ -36,6 +36,10 @@ def setup_environment():
     """Configure l'environnement pour le mode desktop."""
     os.environ['DJANGO_SETTINGS_MODULE'] = 'desktop.settings_desktop'
     os.environ['MYSCHOOL_DESKTOP'] = '1'
+    os.environ['OFFLINE_MODE'] = '1'
+    # Les settings de base choisissent le profil du serveur embarqué
+    # (middlewares de sécurité compris) d'après DJANGO_DEBUG
+    os.environ['DJANGO_DEBUG'] = 'false'
 
     # Pour PyInstaller : ajouter le répertoire de l'app au sys.path
     if getattr(sys, 'frozen', False):
@@ -61,10 +65,10 @@ def run_migrations():
 
 
 def collect_static():
-    """Collecte les fichiers statiques si necessaire."""
+    """Collecte les fichiers statiques si necessaire (manifeste whitenoise absent)."""
     from django.conf import settings
     static_root = str(settings.STATIC_ROOT)
-    if not os.path.exists(static_root) or not os.listdir(static_root):
+    if not os.path.exists(os.path.join(static_root, 'staticfiles.json')):
         from django.core.management import call_command
         print("[MySchool] Collecte des fichiers statiques...")
         call_command('collectstatic', '--noinput', verbosity=0)
@@ -190,9 +194,9 @@ def main():
     print("[MySchool] Fermez cette fenetre pour arreter le serveur.")
     print()
 
-    # Démarrer le serveur Django
-    from django.core.management import call_command
-    call_command('runserver', f'127.0.0.1:{port}', '--noreload')
+    # Démarrer le serveur WSGI embarqué
+    from ecole_moderne.serveur_embarque import servir
+    servir(port)
 
 
 if __name__ == '__main__':
@@ -26,14 +26,31 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': DATA_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS_DESKTOP,  # noqa: F405
     }
 }
 
-# ── Mode debug activé pour le serveur de dev ──
-DEBUG = True
+# ── Cache : un seul processus sur le poste, la mémoire suffit ──
+# (évite d'écrire le cache dans la base SQLite partagée avec l'application)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'myschool-desktop',
+        'KEY_PREFIX': 'myschool',
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 2000, 'CULL_FREQUENCY': 4},
+    }
+}
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
 
-# ── Hôtes autorisés (localhost uniquement) ──
-ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+# ── Serveur WSGI embarqué (waitress), DEBUG désactivé ──
+DEBUG = False
+SERVEUR_EMBARQUE = True
+
+# ── Hôtes autorisés (localhost, plus les adresses du poste si MYSCHOOL_HOTE ouvre le réseau local) ──
+from ecole_moderne.serveur_embarque import hotes_autorises  # noqa: E402
+ALLOWED_HOSTS = hotes_autorises()
 CSRF_TRUSTED_ORIGINS = [
     'http://127.0.0.1:8080',
     'http://localhost:8080',
@@ -48,12 +65,19 @@ SECURE_HSTS_SECONDS = 0
 # ── Fichiers statiques ──
 STATIC_ROOT = APP_DIR / 'staticfiles'
 STATICFILES_DIRS = [APP_DIR / 'static']
-STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'ecole_moderne.statiques.StockageStatiquesDesktop'},
+}
 
 # ── Fichiers média (dans le dossier data pour préservation) ──
 MEDIA_ROOT = DATA_DIR / 'media'
 (DATA_DIR / 'media').mkdir(exist_ok=True)
 
+# ── Exports en arrière-plan (thread intégré au serveur local) ──
+TACHES_EXPORT_DIR = DATA_DIR / 'exports'
+TACHES_EXPORT_WORKER_INTEGRE = True
+
 # ── Logs dans data/ ──
 LOGS_DIR = DATA_DIR / 'logs'
 os.makedirs(LOGS_DIR, exist_ok=True)
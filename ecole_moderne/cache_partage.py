@@ -0,0 +1,108 @@
+"""
+Invalidation par étiquettes (tags) au-dessus du cache Django partagé.
+
+Les backends Django (base, fichiers, Redis) ne savent pas supprimer « toutes
+les clés d'une classe ». On associe donc à chaque étiquette un numéro de
+version stocké dans le cache : les clés étiquetées incluent ce numéro, et
+invalider l'étiquette revient à l'incrémenter. Les anciennes entrées ne sont
+plus jamais lues et expirent d'elles-mêmes.
+
+Exemple:
+    cle = cle_etiquetee(f"rangs_{classe.id}_{periode}", tag_classe(classe.id))
+    rangs = cache.get(cle)
+    ...
+    invalider_tags(tag_classe(classe.id))   # tout ce qui concerne la classe
+"""
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+PREFIXE_VERSION = 'tagv'
+
+
+def tag_classe(classe_id):
+    """Étiquette regroupant les calculs (moyennes, rangs, classements) d'une ClasseNote."""
+    return f'classe:{classe_id}'
+
+
+def tag_ecole(ecole_id):
+    """Étiquette de la structure d'une école (années scolaires de ses classes)."""
+    return f'ecole:{ecole_id}'
+
+
+def _cle_version(tag):
+    return f'{PREFIXE_VERSION}:{tag}'
+
+
+def _version_initiale():
+    # Une version perdue (éviction, redémarrage de Redis) repart d'une valeur
+    # jamais utilisée : d'anciennes entrées ne peuvent pas redevenir valides.
+    return time.time_ns() // 1000
+
+
+def versions_tags(*tags):
+    """Retourne {tag: version} en une seule lecture du cache."""
+    cles = {_cle_version(tag): tag for tag in tags}
+    trouvees = cache.get_many(list(cles))
+    versions = {}
+    for cle, tag in cles.items():
+        version = trouvees.get(cle)
+        if version is None:
+            version = _version_initiale()
+            if not cache.add(cle, version, None):
+                version = cache.get(cle, version)
+        versions[tag] = version
+    return versions
+
+
+def cle_etiquetee(cle, *tags):
+    """Construit la clé de cache réellement utilisée pour ``cle`` et ses étiquettes."""
+    if not tags:
+        return cle
+    versions = versions_tags(*tags)
+    return f"{cle}|{'.'.join(str(versions[tag]) for tag in tags)}"
+
+
+def _incrementer_versions(tags):
+    for tag in tags:
+        cle = _cle_version(tag)
+        try:
+            try:
+                cache.incr(cle)
+            except ValueError:
+                # Version absente : la créer suffit à rendre les clés orphelines
+                cache.set(cle, _version_initiale(), None)
+        except Exception as e:
+            logger.warning(f"Invalidation du cache impossible pour {tag}: {e}")
+
+
+def invalider_tags(*tags):
+    """Invalide toutes les entrées portant l'une des étiquettes données.
+
+    Dans une transaction, l'invalidation est refaite au commit : un autre
+    worker a pu remettre en cache l'ancien état entre-temps (Redis n'est pas
+    transactionnel). Un échec du cache (table absente, Redis injoignable) est
+    journalisé sans être propagé : l'écriture en base doit aboutir.
+    """
+    tags = list(tags)
+    _incrementer_versions(tags)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _incrementer_versions(tags))
+
+
+def creer_table_cache(sender, using='default', **kwargs):
+    """Récepteur post_migrate : crée la table du cache en base si nécessaire.
+
+    Évite d'ajouter ``createcachetable`` à chaque script de déploiement
+    (Render, PythonAnywhere, poste desktop) : ``migrate`` suffit.
+    """
+    from django.conf import settings
+    from django.core.management import call_command
+
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend.endswith('DatabaseCache'):
+        call_command('createcachetable', database=using, verbosity=0)
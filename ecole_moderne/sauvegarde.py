@@ -16,15 +16,20 @@ Regle 3-2-1 appliquee ici :
 Ce que contient une sauvegarde, sur chaque destination :
 
     <destination>/MySchoolGN_Sauvegardes/<ecole>/
-        archives/    MySchoolGN_<ecole>_20260812_1430.zip   (base + manifeste)
-        medias/      miroir des photos/logos (copie incrementale)
+        archives/    MySchoolGN_<ecole>_20260812_143000.zip      (complete : base entiere)
+                     MySchoolGN_<ecole>_inc_20260812_203000.zip  (incrementale : pages modifiees)
+        medias_objets/  photos/logos ranges par empreinte SHA-256
         DERNIERE_SAUVEGARDE.txt
         COMMENT_RESTAURER.txt
 
-La base de donnees est petite : elle est archivee entierement a chaque passage.
-Les medias (photos d'eleves, logos) sont volumineux : ils sont copies en miroir,
-donc seuls les fichiers nouveaux ou modifies transitent — indispensable pour une
-cle USB ou un dossier cloud.
+La base est archivee entierement au plus une fois tous les
+`jours_entre_completes` jours. Entre deux, une sauvegarde incrementale ne
+contient que les pages SQLite qui different de la derniere complete : une
+complete + une incrementale suffisent toujours a restaurer (pas de longue
+chaine a rejouer). Les medias (photos d'eleves, logos) sont stockes par
+contenu : une photo deja presente sur la destination n'est jamais recopiee,
+et chaque archive emporte la liste `medias.json` (chemin -> empreinte) qui
+permet de les remettre en place.
 
 Aucune dependance externe : uniquement la bibliotheque standard. Django n'est
 importe QUE dans les fonctions qui en ont besoin, afin que la restauration au
@@ -38,6 +43,7 @@ import json
 import os
 import shutil
 import sqlite3
+import struct
 import threading
 import time
 import unicodedata
@@ -48,7 +54,12 @@ from datetime import datetime, timedelta
 NOM_CONFIG = 'backup_config.json'
 NOM_MARQUEUR_RESTAURATION = '.restauration_en_attente.json'
 DOSSIER_RACINE_DESTINATION = 'MySchoolGN_Sauvegardes'
-FORMAT_ARCHIVE = 1
+DOSSIER_OBJETS_MEDIAS = 'medias_objets'
+MARQUEUR_INCREMENTALE = '_inc_'
+FORMAT_ARCHIVE = 2
+TAILLE_EMPREINTE_PAGE = 16
+# Au-dela de cette part de pages modifiees, une complete coute a peine plus.
+RATIO_MAX_INCREMENTALE = 0.5
 
 CONFIG_DEFAUT = {
     'actif': True,
@@ -59,11 +70,19 @@ CONFIG_DEFAUT = {
     'conserver_quotidiennes': 7,
     'conserver_hebdomadaires': 4,
     'conserver_mensuelles': 12,
+    'incrementale': True,         # pages modifiees seulement entre deux completes
+    'jours_entre_completes': 7,
     'derniere_sauvegarde': None,  # ISO
 }
 
 _lock_sauvegarde = threading.Lock()
 _worker_demarre = False
+_dernier_entretien = None
+INTERVALLE_ENTRETIEN_S = 24 * 3600
+PAGES_VACUUM_PAR_PASSAGE = 2000
+# En auto_vacuum=NONE, un VACUUM complet (une seule fois) n'est fait que si
+# au moins cette part de la base est de l'espace libre.
+RATIO_LIBRE_CONVERSION = 0.2
 _lock_worker = threading.Lock()
 
 
@@ -112,6 +131,13 @@ def chemin_journal():
     return os.path.join(base_dir(), 'backups', 'journal_sauvegarde.json')
 
 
+def dossier_index():
+    """Empreintes de la derniere complete et des medias (cache local, reconstructible)."""
+    chemin = os.path.join(base_dir(), 'backups', '.index')
+    os.makedirs(chemin, exist_ok=True)
+    return chemin
+
+
 # ─── Configuration ────────────────────────────────────────────────────────────
 def charger_config():
     """Configuration de la machine, completee par les valeurs par defaut."""
@@ -447,6 +473,143 @@ def _instantane_sqlite(source, destination):
     return destination
 
 
+def _taille_page(chemin):
+    """Taille de page lue dans l'en-tete SQLite (1 signifie 65536)."""
+    with open(chemin, 'rb') as fichier:
+        entete = fichier.read(100)
+    if len(entete) < 100 or not entete.startswith(b'SQLite format 3\x00'):
+        raise RuntimeError('en-tete SQLite illisible')
+    taille = int.from_bytes(entete[16:18], 'big')
+    return 65536 if taille == 1 else taille
+
+
+def _analyser_pages(chemin, taille_page, reference=b'', sortie=None):
+    """Parcourt la base une seule fois : SHA-256 global, empreinte de chaque page.
+
+    Avec `reference` (empreintes de la derniere complete) et `sortie` (fichier
+    ouvert), les pages differentes y sont ecrites a la suite. Renvoie
+    (sha256, empreintes, numeros des pages modifiees).
+    """
+    globale = hashlib.sha256()
+    empreintes = bytearray()
+    modifiees = []
+    numero = 0
+    with open(chemin, 'rb') as fichier:
+        while True:
+            page = fichier.read(taille_page)
+            if not page:
+                break
+            globale.update(page)
+            empreinte = hashlib.blake2b(page, digest_size=TAILLE_EMPREINTE_PAGE).digest()
+            empreintes += empreinte
+            debut = numero * TAILLE_EMPREINTE_PAGE
+            if sortie is not None and reference[debut:debut + TAILLE_EMPREINTE_PAGE] != empreinte:
+                sortie.write(page)
+                modifiees.append(numero)
+            numero += 1
+    return globale.hexdigest(), bytes(empreintes), modifiees
+
+
+def _chemins_reference():
+    dossier = dossier_index()
+    return (os.path.join(dossier, 'derniere_complete.json'),
+            os.path.join(dossier, 'derniere_complete.pages'))
+
+
+def _charger_reference(config, dossier_sortie, taille_page):
+    """Derniere complete utilisable comme base d'une incrementale, sinon None."""
+    if not config.get('incrementale', True):
+        return None
+    chemin_infos, chemin_pages = _chemins_reference()
+    try:
+        with open(chemin_infos, 'r', encoding='utf-8') as fichier:
+            reference = json.load(fichier)
+        with open(chemin_pages, 'rb') as fichier:
+            reference['empreintes'] = fichier.read()
+        age = datetime.now() - datetime.fromisoformat(reference['date'])
+    except Exception:
+        return None
+    jours = max(1, int(config.get('jours_entre_completes', 7) or 7))
+    if (
+        age >= timedelta(days=jours)
+        or reference.get('taille_page') != taille_page
+        or not os.path.isfile(reference.get('chemin') or '')
+        or os.path.normcase(os.path.dirname(reference['chemin'])) != os.path.normcase(dossier_sortie)
+    ):
+        return None
+    return reference
+
+
+def _enregistrer_reference(archive_info, empreintes):
+    chemin_infos, chemin_pages = _chemins_reference()
+    manifeste = archive_info['manifeste']
+    with open(chemin_pages + '.tmp', 'wb') as fichier:
+        fichier.write(empreintes)
+    os.replace(chemin_pages + '.tmp', chemin_pages)
+    with open(chemin_infos + '.tmp', 'w', encoding='utf-8') as fichier:
+        json.dump({
+            'nom': archive_info['nom'],
+            'chemin': archive_info['chemin'],
+            'date': manifeste['date'],
+            'db_sha256': manifeste['db_sha256'],
+            'taille_page': manifeste['taille_page'],
+        }, fichier, indent=2, ensure_ascii=False)
+    os.replace(chemin_infos + '.tmp', chemin_infos)
+
+
+def _index_medias():
+    """Empreinte de chaque media : {chemin relatif: sha256}, {sha256: chemin absolu}.
+
+    Seuls les fichiers nouveaux ou modifies (taille/date) sont relus ; les
+    autres reprennent l'empreinte memorisee au passage precedent.
+    """
+    source = chemin_media()
+    chemin_cache = os.path.join(dossier_index(), 'medias.json')
+    try:
+        with open(chemin_cache, 'r', encoding='utf-8') as fichier:
+            cache = json.load(fichier)
+    except Exception:
+        cache = {}
+
+    index, sources, nouveau_cache = {}, {}, {}
+    if os.path.isdir(source):
+        for racine, _dossiers, fichiers in os.walk(source):
+            for nom in fichiers:
+                origine = os.path.join(racine, nom)
+                relatif = os.path.relpath(origine, source).replace(os.sep, '/')
+                try:
+                    stat_origine = os.stat(origine)
+                    connu = cache.get(relatif)
+                    if connu and connu[0] == stat_origine.st_size and connu[1] == stat_origine.st_mtime_ns:
+                        empreinte = connu[2]
+                    else:
+                        empreinte = _sha256(origine)
+                except Exception:
+                    # Un media illisible ne doit jamais faire echouer la sauvegarde.
+                    continue
+                index[relatif] = empreinte
+                sources.setdefault(empreinte, origine)
+                nouveau_cache[relatif] = [stat_origine.st_size, stat_origine.st_mtime_ns, empreinte]
+    try:
+        with open(chemin_cache + '.tmp', 'w', encoding='utf-8') as fichier:
+            json.dump(nouveau_cache, fichier)
+        os.replace(chemin_cache + '.tmp', chemin_cache)
+    except Exception:
+        pass
+    return index, sources
+
+
+def _replier_wal(chemin):
+    """Reporte le journal WAL dans le fichier principal avant de le deplacer."""
+    if not os.path.exists(chemin + '-wal'):
+        return
+    connexion = sqlite3.connect(chemin, timeout=30)
+    try:
+        connexion.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+    finally:
+        connexion.close()
+
+
 def taille_lisible(octets):
     valeur = float(octets or 0)
     for unite in ('o', 'Ko', 'Mo', 'Go', 'To'):
@@ -472,8 +635,13 @@ En cas de panne, de vol ou de reinstallation de l'ordinateur :
      choisissez la sauvegarde la plus recente, puis confirmez.
   5. MySchoolGN se ferme ; relancez-le : les donnees sont revenues.
 
-Les photos d'eleves et logos se trouvent dans le dossier "medias" situe a cote
-du dossier "archives" : ils sont restaures automatiquement avec la base.
+Les photos d'eleves et logos se trouvent dans le dossier "medias_objets"
+situe a cote du dossier "archives" : ils sont restaures automatiquement avec
+la base.
+
+Les sauvegardes dont le nom contient "_inc_" sont incrementales : elles ne
+contiennent que les changements depuis la derniere sauvegarde complete et
+doivent rester dans le meme dossier que celle-ci.
 
 IMPORTANT : ne modifiez jamais le contenu de ces fichiers a la main.
 La licence est liee a la machine : apres un changement d'ordinateur, demandez
@@ -481,59 +649,107 @@ une nouvelle licence a GS Hadja Kanfing Dian (les donnees, elles, sont intactes)
 """
 
 
-def creer_archive(dossier_sortie=None):
-    """Cree une archive .zip (base + manifeste) et renvoie ses informations."""
+def creer_archive(dossier_sortie=None, complete=None):
+    """Cree une archive .zip (base + manifeste) et renvoie ses informations.
+
+    Par defaut (`complete=None`), l'archive est incrementale si une complete
+    recente existe dans le meme dossier, et complete sinon.
+    """
     dossier_sortie = dossier_sortie or dossier_local_sauvegardes()
     os.makedirs(dossier_sortie, exist_ok=True)
+    config = charger_config()
 
     nom_ecole, slug = infos_ecole()
     horodatage = datetime.now().strftime('%Y%m%d_%H%M%S')
-    nom_archive = f'MySchoolGN_{slug}_{horodatage}.zip'
-    chemin_archive = os.path.join(dossier_sortie, nom_archive)
-    temporaire = chemin_archive + '.part'
 
     dossier_travail = os.path.join(base_dir(), 'backups', '.travail')
     os.makedirs(dossier_travail, exist_ok=True)
     instantane = os.path.join(dossier_travail, 'db.sqlite3')
+    pages_modifiees = os.path.join(dossier_travail, 'pages.bin')
+    temporaire = None
 
     try:
         _instantane_sqlite(chemin_db(), instantane)
+        taille_page = _taille_page(instantane)
+        reference = None if complete else _charger_reference(config, dossier_sortie, taille_page)
+        if reference:
+            with open(pages_modifiees, 'wb') as sortie:
+                db_sha256, empreintes, modifiees = _analyser_pages(
+                    instantane, taille_page, reference['empreintes'], sortie,
+                )
+            if len(modifiees) > RATIO_MAX_INCREMENTALE * (len(empreintes) // TAILLE_EMPREINTE_PAGE):
+                reference = None
+        else:
+            db_sha256, empreintes, modifiees = _analyser_pages(instantane, taille_page)
+        medias, sources_medias = _index_medias()
+
+        if reference:
+            nom_archive = f'MySchoolGN_{slug}{MARQUEUR_INCREMENTALE}{horodatage}.zip'
+        else:
+            nom_archive = f'MySchoolGN_{slug}_{horodatage}.zip'
+        chemin_archive = os.path.join(dossier_sortie, nom_archive)
+        temporaire = chemin_archive + '.part'
+
         manifeste = {
             'application': 'MySchoolGN',
             'format': FORMAT_ARCHIVE,
+            'type': 'incrementale' if reference else 'complete',
             'date': datetime.now().isoformat(timespec='seconds'),
             'machine': os.environ.get('COMPUTERNAME') or '',
             'ecole': nom_ecole,
-            'db_sha256': _sha256(instantane),
+            'db_sha256': db_sha256,
             'db_octets': os.path.getsize(instantane),
+            'taille_page': taille_page,
+            'nb_pages': len(empreintes) // TAILLE_EMPREINTE_PAGE,
+            'medias': len(medias),
             'statistiques': _statistiques_base(),
         }
+        if reference:
+            manifeste.update({
+                'base': reference['nom'],
+                'base_db_sha256': reference['db_sha256'],
+                'pages_modifiees': len(modifiees),
+            })
         with zipfile.ZipFile(temporaire, 'w', zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
-            archive.write(instantane, 'db.sqlite3')
+            if reference:
+                archive.write(pages_modifiees, 'pages.bin')
+                archive.writestr('pages.idx', struct.pack(f'<{len(modifiees)}I', *modifiees))
+            else:
+                archive.write(instantane, 'db.sqlite3')
             archive.writestr('manifest.json', json.dumps(manifeste, indent=2, ensure_ascii=False))
+            archive.writestr('medias.json', json.dumps(medias, separators=(',', ':')))
             archive.writestr('COMMENT_RESTAURER.txt', TEXTE_RESTAURATION)
-            reference = os.path.join(base_dir(), 'sync_config.json')
-            if os.path.isfile(reference):
+            fichier_reference = os.path.join(base_dir(), 'sync_config.json')
+            if os.path.isfile(fichier_reference):
                 # Copie de reference uniquement : jamais reappliquee telle quelle
                 # (l'identifiant d'appareil doit rester unique par poste).
-                archive.write(reference, 'reference/sync_config.json')
+                archive.write(fichier_reference, 'reference/sync_config.json')
         os.replace(temporaire, chemin_archive)
     finally:
-        for reste in (temporaire, instantane):
+        for reste in (temporaire, instantane, pages_modifiees):
             try:
-                if os.path.exists(reste):
+                if reste and os.path.exists(reste):
                     os.remove(reste)
             except Exception:
                 pass
 
-    return {
+    archive_info = {
         'chemin': chemin_archive,
         'nom': nom_archive,
+        'type': manifeste['type'],
         'octets': os.path.getsize(chemin_archive),
         'sha256': _sha256(chemin_archive),
         'manifeste': manifeste,
         'slug': slug,
+        'medias': sources_medias,
+        'base': {'nom': reference['nom'], 'chemin': reference['chemin']} if reference else None,
     }
+    if not reference:
+        try:
+            _enregistrer_reference(archive_info, empreintes)
+        except Exception:
+            pass  # la prochaine sauvegarde sera simplement complete
+    return archive_info
 
 
 # ─── Copie vers une destination ───────────────────────────────────────────────
@@ -541,49 +757,63 @@ def dossier_ecole_destination(racine_destination, slug):
     return os.path.join(racine_destination, slug)
 
 
-def _copier_verifie(source, destination):
+def _copier_verifie(source, destination, empreinte_source=None):
     """Copie atomique + verification d'empreinte cote destination."""
     os.makedirs(os.path.dirname(destination), exist_ok=True)
     temporaire = destination + '.part'
     shutil.copy2(source, temporaire)
-    if _sha256(temporaire) != _sha256(source):
+    if _sha256(temporaire) != (empreinte_source or _sha256(source)):
         os.remove(temporaire)
         raise RuntimeError('copie corrompue (empreinte differente)')
     os.replace(temporaire, destination)
     return destination
 
 
-def _miroir_medias(destination_medias):
-    """Copie incrementale des medias : seuls les fichiers nouveaux/modifies."""
-    source = chemin_media()
+def _chemin_objet_media(dossier_objets, empreinte):
+    return os.path.join(dossier_objets, empreinte[:2], empreinte)
+
+
+def _deposer_medias(dossier_objets, sources):
+    """Copie les medias absents du stockage par contenu de la destination."""
     copies = 0
     octets = 0
-    if not os.path.isdir(source):
-        return copies, octets
-    for racine, _dossiers, fichiers in os.walk(source):
-        relatif = os.path.relpath(racine, source)
-        cible_dossier = destination_medias if relatif == '.' else os.path.join(destination_medias, relatif)
-        os.makedirs(cible_dossier, exist_ok=True)
+    for empreinte, origine in sources.items():
+        cible = _chemin_objet_media(dossier_objets, empreinte)
+        if os.path.exists(cible):
+            continue
+        try:
+            _copier_verifie(origine, cible, empreinte)
+            copies += 1
+            octets += os.path.getsize(cible)
+        except Exception:
+            # Un media illisible ne doit jamais faire echouer la sauvegarde.
+            continue
+    return copies, octets
+
+
+def _purger_objets_medias(dossier_archives, dossier_objets):
+    """Supprime les medias qu'aucune archive conservee ne reference plus."""
+    references = set()
+    try:
+        for nom in os.listdir(dossier_archives):
+            if not (nom.startswith('MySchoolGN_') and nom.endswith('.zip')):
+                continue
+            with zipfile.ZipFile(os.path.join(dossier_archives, nom)) as archive:
+                if 'medias.json' in archive.namelist():
+                    references.update(json.loads(archive.read('medias.json').decode('utf-8')).values())
+    except Exception:
+        return 0  # une archive illisible : on ne prend aucun risque
+    supprimes = 0
+    for racine, _dossiers, fichiers in os.walk(dossier_objets):
         for nom in fichiers:
-            origine = os.path.join(racine, nom)
-            cible = os.path.join(cible_dossier, nom)
+            if nom in references:
+                continue
             try:
-                stat_origine = os.stat(origine)
-                if os.path.exists(cible):
-                    stat_cible = os.stat(cible)
-                    identique = (
-                        stat_cible.st_size == stat_origine.st_size
-                        and int(stat_cible.st_mtime) >= int(stat_origine.st_mtime)
-                    )
-                    if identique:
-                        continue
-                shutil.copy2(origine, cible)
-                copies += 1
-                octets += stat_origine.st_size
+                os.remove(os.path.join(racine, nom))
+                supprimes += 1
             except Exception:
-                # Un media illisible ne doit jamais faire echouer la sauvegarde.
-                continue
-    return copies, octets
+                pass
+    return supprimes
 
 
 def _ecrire_etat_destination(dossier, archive_info, medias):
@@ -592,7 +822,7 @@ def _ecrire_etat_destination(dossier, archive_info, medias):
         "===============================================\n\n"
         f"Ecole            : {archive_info['manifeste'].get('ecole', '')}\n"
         f"Derniere reussie : {datetime.now().strftime('%d/%m/%Y a %H:%M')}\n"
-        f"Archive          : archives/{archive_info['nom']}\n"
+        f"Archive          : archives/{archive_info['nom']} ({archive_info['type']})\n"
         f"Taille archive   : {taille_lisible(archive_info['octets'])}\n"
         f"Eleves           : {archive_info['manifeste'].get('statistiques', {}).get('eleves', '-')}\n"
         f"Paiements        : {archive_info['manifeste'].get('statistiques', {}).get('paiements', '-')}\n"
@@ -634,13 +864,22 @@ def _deposer_sur_destination(destination, archive_info, config):
     try:
         dossier_ecole = dossier_ecole_destination(racine, archive_info['slug'])
         dossier_archives = os.path.join(dossier_ecole, 'archives')
-        dossier_medias = os.path.join(dossier_ecole, 'medias')
+        dossier_objets = os.path.join(dossier_ecole, DOSSIER_OBJETS_MEDIAS)
         os.makedirs(dossier_archives, exist_ok=True)
-        os.makedirs(dossier_medias, exist_ok=True)
-
-        _copier_verifie(archive_info['chemin'], os.path.join(dossier_archives, archive_info['nom']))
-        medias = _miroir_medias(dossier_medias)
+        os.makedirs(dossier_objets, exist_ok=True)
+
+        base = archive_info.get('base')
+        if base and not os.path.isfile(os.path.join(dossier_archives, base['nom'])):
+            # Support absent lors de la derniere complete : l'incrementale
+            # seule ne servirait a rien.
+            _copier_verifie(base['chemin'], os.path.join(dossier_archives, base['nom']))
+        _copier_verifie(
+            archive_info['chemin'], os.path.join(dossier_archives, archive_info['nom']),
+            archive_info['sha256'],
+        )
+        medias = _deposer_medias(dossier_objets, archive_info['medias'])
         appliquer_rotation(dossier_archives, config)
+        _purger_objets_medias(dossier_archives, dossier_objets)
         _ecrire_etat_destination(dossier_ecole, archive_info, medias)
 
         resultat['ok'] = True
@@ -675,6 +914,8 @@ def appliquer_rotation(dossier_archives, config=None):
 
     Les N dernieres sont gardees quoi qu'il arrive : si une donnee est abimee a
     10 h et sauvegardee a 12 h, la version de 6 h du meme jour existe encore.
+    Une incrementale conservee garde sa complete ; une incrementale dont la
+    complete a disparu est supprimee (elle n'est plus restaurable).
     """
     config = config or charger_config()
     try:
@@ -707,6 +948,17 @@ def appliquer_rotation(dossier_archives, config=None):
     retenir(lambda d: '%s-%s' % d.isocalendar()[:2], int(config.get('conserver_hebdomadaires', 4)))
     retenir(lambda d: d.strftime('%Y%m'), int(config.get('conserver_mensuelles', 12)))
 
+    presentes = {os.path.basename(chemin) for _date, chemin in entrees}
+    for chemin in list(a_garder):
+        # Le type vient du manifeste : le nom de l'ecole peut contenir "_inc_"
+        manifeste = _lire_manifeste(chemin)
+        if manifeste.get('type') != 'incrementale':
+            continue
+        if manifeste.get('base') in presentes:
+            a_garder.add(os.path.join(dossier_archives, manifeste['base']))
+        elif manifeste:
+            a_garder.discard(chemin)
+
     supprimees = 0
     for _date, chemin in entrees:
         if chemin in a_garder:
@@ -764,6 +1016,7 @@ def executer_sauvegarde(declencheur='manuel', destinations=None):
         archive_info = creer_archive()
         rapport['archive'] = archive_info['nom']
         rapport['octets'] = archive_info['octets']
+        rapport['type'] = archive_info['type']
         appliquer_rotation(dossier_local_sauvegardes(), config)
 
         for destination in cibles:
@@ -899,6 +1152,10 @@ def lister_archives_disponibles(limite_par_source=15):
                     continue
                 vus.add(cle)
                 manifeste = _lire_manifeste(chemin)
+                valide = bool(manifeste.get('db_sha256'))
+                if manifeste.get('type') == 'incrementale':
+                    valide = valide and os.path.isfile(os.path.join(dossier, manifeste.get('base') or ''))
+                dossier_ecole = os.path.dirname(dossier)
                 resultats.append({
                     'chemin': chemin,
                     'nom': nom,
@@ -909,8 +1166,13 @@ def lister_archives_disponibles(limite_par_source=15):
                     'eleves': (manifeste.get('statistiques') or {}).get('eleves'),
                     'paiements': (manifeste.get('statistiques') or {}).get('paiements'),
                     'octets': os.path.getsize(chemin),
-                    'valide': bool(manifeste.get('db_sha256')),
-                    'medias': os.path.isdir(os.path.join(os.path.dirname(dossier), 'medias')),
+                    'valide': valide,
+                    'incrementale': manifeste.get('type') == 'incrementale',
+                    'base': manifeste.get('base') or '',
+                    'medias': (
+                        os.path.isdir(os.path.join(dossier_ecole, DOSSIER_OBJETS_MEDIAS))
+                        or os.path.isdir(os.path.join(dossier_ecole, 'medias'))
+                    ),
                 })
     resultats.sort(key=lambda item: item['date'] or item['nom'], reverse=True)
     return resultats
@@ -928,11 +1190,20 @@ def verifier_archive(chemin_archive):
     try:
         with zipfile.ZipFile(chemin_archive) as archive:
             noms = archive.namelist()
-            if 'db.sqlite3' not in noms:
-                return False, "Cette archive ne contient pas de base de donnees.", {}
             manifeste = {}
             if 'manifest.json' in noms:
                 manifeste = json.loads(archive.read('manifest.json').decode('utf-8'))
+            incrementale = manifeste.get('type') == 'incrementale' and 'pages.bin' in noms
+            if 'db.sqlite3' not in noms and not incrementale:
+                return False, "Cette archive ne contient pas de base de donnees.", {}
+        if incrementale:
+            chemin_base = os.path.join(os.path.dirname(chemin_archive), manifeste.get('base') or '')
+            ok, _message, manifeste_base = verifier_archive(chemin_base)
+            if not ok or manifeste_base.get('db_sha256') != manifeste.get('base_db_sha256'):
+                return False, (
+                    f"Sauvegarde incrementale : la sauvegarde complete "
+                    f"{manifeste.get('base')} est introuvable ou differente."
+                ), {}
     except zipfile.BadZipFile:
         return False, "Archive illisible ou incomplete.", {}
     except Exception as erreur:
@@ -949,10 +1220,13 @@ def demander_restauration(chemin_archive, demandee_par=''):
     ok, message, manifeste = verifier_archive(chemin_archive)
     if not ok:
         raise RuntimeError(message)
-    dossier_medias = os.path.join(os.path.dirname(os.path.dirname(chemin_archive)), 'medias')
+    dossier_ecole = os.path.dirname(os.path.dirname(chemin_archive))
+    dossier_medias = os.path.join(dossier_ecole, 'medias')
+    dossier_objets = os.path.join(dossier_ecole, DOSSIER_OBJETS_MEDIAS)
     marqueur = {
         'archive': os.path.abspath(chemin_archive),
         'medias': dossier_medias if os.path.isdir(dossier_medias) else None,
+        'medias_objets': dossier_objets if os.path.isdir(dossier_objets) else None,
         'demande_le': datetime.now().isoformat(timespec='seconds'),
         'demandee_par': demandee_par,
         'manifeste': manifeste,
@@ -1001,6 +1275,55 @@ def _restaurer_medias(source, destination):
     return copies
 
 
+def _restaurer_medias_objets(chemin_archive, dossier_objets, destination):
+    """Remet en place les medias listes dans medias.json depuis le stockage par contenu."""
+    with zipfile.ZipFile(chemin_archive) as archive:
+        if 'medias.json' not in archive.namelist():
+            return None
+        index = json.loads(archive.read('medias.json').decode('utf-8'))
+    copies = 0
+    for relatif, empreinte in index.items():
+        origine = _chemin_objet_media(dossier_objets, empreinte)
+        cible = os.path.join(destination, *relatif.split('/'))
+        try:
+            if os.path.exists(cible) and os.path.getsize(cible) == os.path.getsize(origine):
+                continue
+            os.makedirs(os.path.dirname(cible), exist_ok=True)
+            shutil.copy2(origine, cible)
+            copies += 1
+        except Exception:
+            continue
+    return copies
+
+
+def _extraire_base(chemin_archive, dossier_travail):
+    """Extrait db.sqlite3 de l'archive ; pour une incrementale, le reconstitue
+    a partir de sa complete et des pages modifiees."""
+    with zipfile.ZipFile(chemin_archive) as archive:
+        if 'db.sqlite3' in archive.namelist():
+            archive.extract('db.sqlite3', dossier_travail)
+            return os.path.join(dossier_travail, 'db.sqlite3')
+
+        manifeste = json.loads(archive.read('manifest.json').decode('utf-8'))
+        chemin_base = os.path.join(os.path.dirname(chemin_archive), manifeste['base'])
+        with zipfile.ZipFile(chemin_base) as complete:
+            complete.extract('db.sqlite3', dossier_travail)
+        db_extraite = os.path.join(dossier_travail, 'db.sqlite3')
+
+        taille_page = int(manifeste['taille_page'])
+        index = archive.read('pages.idx')
+        numeros = struct.unpack(f'<{len(index) // 4}I', index)
+        with archive.open('pages.bin') as pages, open(db_extraite, 'r+b') as fichier:
+            for numero in numeros:
+                fichier.seek(numero * taille_page)
+                fichier.write(pages.read(taille_page))
+            fichier.truncate(int(manifeste['nb_pages']) * taille_page)
+
+    if _sha256(db_extraite) != manifeste['db_sha256']:
+        raise RuntimeError('base reconstituee differente de la sauvegarde')
+    return db_extraite
+
+
 def appliquer_restauration_si_demandee(racine=None):
     """A appeler au demarrage, AVANT que Django n'ouvre la base.
 
@@ -1027,9 +1350,7 @@ def appliquer_restauration_si_demandee(racine=None):
         shutil.rmtree(dossier_travail, ignore_errors=True)
         os.makedirs(dossier_travail, exist_ok=True)
 
-        with zipfile.ZipFile(chemin_archive) as archive:
-            archive.extract('db.sqlite3', dossier_travail)
-        db_extraite = os.path.join(dossier_travail, 'db.sqlite3')
+        db_extraite = _extraire_base(chemin_archive, dossier_travail)
 
         # La base restauree doit etre saine AVANT de toucher a l'existante.
         connexion = sqlite3.connect(db_extraite, timeout=30)
@@ -1042,6 +1363,7 @@ def appliquer_restauration_si_demandee(racine=None):
 
         # Mettre l'ancienne base de cote (jamais de suppression seche).
         if os.path.exists(db_cible):
+            _replier_wal(db_cible)
             dossier_avant = os.path.join(racine, 'backups')
             os.makedirs(dossier_avant, exist_ok=True)
             horodatage = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -1056,9 +1378,15 @@ def appliquer_restauration_si_demandee(racine=None):
 
         shutil.move(db_extraite, db_cible)
 
-        medias_restaures = 0
-        if marqueur.get('medias'):
+        medias_restaures = None
+        if marqueur.get('medias_objets'):
+            medias_restaures = _restaurer_medias_objets(
+                chemin_archive, marqueur['medias_objets'], os.path.join(racine, 'media'),
+            )
+        if medias_restaures is None and marqueur.get('medias'):
+            # Archives anterieures au stockage par contenu : miroir simple.
             medias_restaures = _restaurer_medias(marqueur['medias'], os.path.join(racine, 'media'))
+        medias_restaures = medias_restaures or 0
 
         shutil.rmtree(dossier_travail, ignore_errors=True)
         rapport['ok'] = True
@@ -1087,11 +1415,54 @@ def appliquer_restauration_si_demandee(racine=None):
     return rapport
 
 
+# ─── Entretien de la base ─────────────────────────────────────────────────────
+def entretien_sqlite(chemin=None):
+    """Statistiques du planificateur a jour et espace libre rendu au disque.
+
+    `PRAGMA optimize` ne relance ANALYZE que sur les tables qui en ont besoin ;
+    `incremental_vacuum` libere un nombre borne de pages par passage. Une base
+    ancienne (auto_vacuum=NONE) n'est convertie par un VACUUM complet que si
+    l'espace libre le justifie. Renvoie un petit rapport.
+    """
+    chemin = chemin or chemin_db()
+    if not os.path.isfile(chemin):
+        return {}
+    connexion = sqlite3.connect(chemin, timeout=30, isolation_level=None)
+    try:
+        connexion.execute('PRAGMA optimize').fetchall()
+        mode = connexion.execute('PRAGMA auto_vacuum').fetchone()[0]
+        libres = connexion.execute('PRAGMA freelist_count').fetchone()[0]
+        pages = connexion.execute('PRAGMA page_count').fetchone()[0]
+        rapport = {'pages': pages, 'pages_libres': libres, 'vacuum': ''}
+        if mode == 2 and libres:
+            connexion.execute(f'PRAGMA incremental_vacuum({PAGES_VACUUM_PAR_PASSAGE})').fetchall()
+            rapport['vacuum'] = 'incremental'
+        elif mode == 0 and pages and libres > RATIO_LIBRE_CONVERSION * pages:
+            connexion.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            connexion.execute('VACUUM')
+            rapport['vacuum'] = 'complet'
+        connexion.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchall()
+        return rapport
+    finally:
+        connexion.close()
+
+
+def _entretien_du(maintenant):
+    return _dernier_entretien is None or maintenant - _dernier_entretien >= INTERVALLE_ENTRETIEN_S
+
+
 # ─── Worker automatique ───────────────────────────────────────────────────────
 def _boucle(delai_demarrage):
+    global _dernier_entretien
     time.sleep(max(0, delai_demarrage))
     while True:
         attente = 900  # 15 min : on reverifie souvent (USB rebranchee, etc.)
+        try:
+            if _entretien_du(time.monotonic()):
+                _dernier_entretien = time.monotonic()
+                entretien_sqlite()
+        except Exception:
+            pass
         try:
             config = charger_config()
             if not config.get('actif', True):
@@ -12,6 +12,7 @@ from django.contrib.auth import logout
 from django.shortcuts import redirect
 from django.core.exceptions import TooManyFieldsSent
 from django.core.mail import mail_admins
+import itertools
 import re
 from urllib.parse import unquote
 
@@ -48,6 +49,25 @@ class SecurityMiddleware(MiddlewareMixin):
         r"<embed[^>]*>.*?</embed>",
     ]
     
+    # Une seule expression par famille, puis une alternance combinée : chaque
+    # valeur est parcourue une fois, ``lastgroup`` indique la famille trouvée.
+    MOTIF_SQL = re.compile('|'.join(f'(?:{p})' for p in SQL_INJECTION_PATTERNS), re.IGNORECASE)
+    MOTIF_XSS = re.compile('|'.join(f'(?:{p})' for p in XSS_PATTERNS), re.IGNORECASE)
+    # Premiers caractères possibles d'une correspondance (SQL : - ; / * % u e i
+    # d et les quotes ; XSS : < j o). Tester ce seul caractère avant
+    # l'alternance évite d'essayer chaque motif à chaque position : à
+    # compléter si un motif ajouté commence autrement.
+    DEBUTS_ATTAQUE = r"""[-;/*%uedijo'"<]"""
+    MOTIF_ATTAQUE = re.compile(
+        f'(?={DEBUTS_ATTAQUE})(?:(?P<sql>{MOTIF_SQL.pattern})|(?P<xss>{MOTIF_XSS.pattern}))',
+        re.IGNORECASE,
+    )
+
+    # Fenêtre glissante du rate limiting : compteur de la minute courante
+    # (incrément atomique) + part restante de la minute précédente.
+    LIMITE_REQUETES_MINUTE = 100
+    FENETRE_RATE_LIMIT = 60
+
     # Segment parent réel, délimité par un chemin ou un paramètre.
     # Les anciennes expressions ``..%2f`` et ``..%5c`` utilisaient des
     # points non échappés : elles correspondaient à n'importe quels deux
@@ -73,6 +93,7 @@ class SecurityMiddleware(MiddlewareMixin):
     
     def __init__(self, get_response):
         self.get_response = get_response
+        self._fenetres_closes = {}
         super().__init__(get_response)
 
     def _wants_json(self, request):
@@ -154,8 +175,8 @@ class SecurityMiddleware(MiddlewareMixin):
             # En cas d'erreur inattendue, ne pas bloquer l'admin
             pass
 
-        # 1. Vérifier le rate limiting
-        if self.is_rate_limited(client_ip):
+        # 1. Compter la requête et vérifier le rate limiting
+        if self.increment_request_count(client_ip) > self.LIMITE_REQUETES_MINUTE:
             logger.warning(f"Rate limit dépassé pour IP: {client_ip}")
             return self._forbidden(request, "Trop de requêtes. Veuillez patienter.")
 
@@ -165,14 +186,13 @@ class SecurityMiddleware(MiddlewareMixin):
             self.block_ip(client_ip, "User Agent suspect")
             return self._forbidden(request, "Accès refusé.")
 
-        # 3. Vérifier les tentatives d'injection SQL
-        if self.detect_sql_injection(request):
+        # 3-4. Injection SQL et XSS : un seul passage sur l'URL et le POST
+        attaque = self.scanner_requete(request)
+        if attaque == 'sql':
             logger.critical(f"Tentative d'injection SQL détectée depuis IP: {client_ip}")
             self.block_ip(client_ip, "Injection SQL")
             return self._forbidden(request, "Tentative d'attaque détectée.")
-
-        # 4. Vérifier les tentatives XSS
-        if self.detect_xss(request):
+        if attaque == 'xss':
             logger.warning(f"Tentative XSS détectée depuis IP: {client_ip}")
             self.block_ip(client_ip, "Tentative XSS")
             return self._forbidden(request, "Tentative d'attaque détectée.")
@@ -188,9 +208,6 @@ class SecurityMiddleware(MiddlewareMixin):
             logger.info(f"Accès refusé pour IP bloquée: {client_ip}")
             return self._forbidden(request, "Votre adresse IP a été bloquée.")
 
-        # 7. Incrémenter le compteur de requêtes
-        self.increment_request_count(client_ip)
-        
         return None
     
     def get_client_ip(self, request):
@@ -202,46 +219,100 @@ class SecurityMiddleware(MiddlewareMixin):
             ip = request.META.get('REMOTE_ADDR')
         return ip
     
-    def is_rate_limited(self, ip):
-        """Vérifie si l'IP dépasse la limite de requêtes"""
-        cache_key = f"rate_limit_{ip}"
-        requests = cache.get(cache_key, 0)
-        return requests > 100  # Max 100 requêtes par minute
-    
+    def _cles_rate_limit(self, ip, maintenant):
+        fenetre = int(maintenant // self.FENETRE_RATE_LIMIT)
+        return f"rate_limit_{ip}_{fenetre}", f"rate_limit_{ip}_{fenetre - 1}"
+
+    def _compte_fenetre_precedente(self, cle):
+        # Une fenêtre terminée ne bouge plus : lue une fois par processus.
+        compte = self._fenetres_closes.get(cle)
+        if compte is None:
+            compte = cache.get(cle, 0)
+            if len(self._fenetres_closes) > 10000:
+                self._fenetres_closes.clear()
+            self._fenetres_closes[cle] = compte
+        return compte
+
+    def _estimation(self, courant, precedent, maintenant):
+        ecoule = (maintenant % self.FENETRE_RATE_LIMIT) / self.FENETRE_RATE_LIMIT
+        return courant + precedent * (1 - ecoule)
+
     def increment_request_count(self, ip):
-        """Incrémente le compteur de requêtes pour une IP"""
-        cache_key = f"rate_limit_{ip}"
-        requests = cache.get(cache_key, 0)
-        cache.set(cache_key, requests + 1, 60)  # Expire après 1 minute
+        """Compte la requête et renvoie l'estimation sur la dernière minute glissante.
+
+        Un seul aller-retour au cache par requête : ``incr`` sur la minute
+        courante (atomique avec Redis et locmem, là où l'ancien get puis set
+        perdait des requêtes entre workers), la minute précédente étant figée.
+        """
+        maintenant = time.time()
+        cle, cle_precedente = self._cles_rate_limit(ip, maintenant)
+        try:
+            try:
+                courant = cache.incr(cle)
+            except ValueError:
+                # Première requête de la fenêtre (ou clé évincée)
+                if cache.add(cle, 1, 2 * self.FENETRE_RATE_LIMIT):
+                    courant = 1
+                else:
+                    courant = cache.incr(cle)
+            precedent = self._compte_fenetre_precedente(cle_precedente)
+        except Exception as e:
+            # Cache indisponible : ne pas bloquer le site pour autant
+            logger.warning(f"Rate limiting indisponible: {e}")
+            return 0
+        return self._estimation(courant, precedent, maintenant)
     
     def is_suspicious_user_agent(self, user_agent):
         """Vérifie si le User Agent est suspect"""
         return any(suspicious in user_agent for suspicious in self.SUSPICIOUS_USER_AGENTS)
     
+    def _valeurs_post(self, request):
+        """Valeurs texte du POST à analyser (hors mots de passe / secrets)."""
+        if request.method != 'POST':
+            return []
+        try:
+            champs = request.POST.lists()
+            cles = list(request.POST)
+        except TooManyFieldsSent:
+            logger.warning("[SECURITY] POST ignoré pour scan SQLi/XSS: trop de champs (TooManyFieldsSent)")
+            return []
+        # Cas courant (saisie en masse) : aucun nom de champ sensible, on
+        # évite alors le test champ par champ.
+        if self._champ_sensible('\x00'.join(cles)):
+            champs = [(cle, valeurs) for cle, valeurs in champs if not self._champ_sensible(cle)]
+        return [valeur for _, valeurs in champs for valeur in valeurs if valeur and isinstance(valeur, str)]
+
+    # Séparateur des valeurs concaténées : ni ``\s`` ni ``.`` ne le franchissent,
+    # et ``\b`` y voit une frontière ; un motif ne peut donc pas réunir la fin
+    # d'un champ et le début du suivant.
+    SEPARATEUR_VALEURS = '\n\x00'
+
+    def scanner_requete(self, request):
+        """Parcourt la requête une seule fois : renvoie 'sql', 'xss' ou None.
+
+        L'injection SQL est cherchée dans la query string et le POST, le XSS
+        dans l'URL complète et le POST (mêmes cibles que detect_sql_injection
+        et detect_xss). Les valeurs sont concaténées pour qu'une saisie en
+        masse coûte un seul appel à l'expression combinée, quel que soit le
+        nombre de champs. Une injection SQL l'emporte sur un XSS.
+        """
+        query = request.META.get('QUERY_STRING') or ''
+        texte = self.SEPARATEUR_VALEURS.join(itertools.chain((query,), self._valeurs_post(request)))
+        correspondance = self.MOTIF_ATTAQUE.search(texte)
+        if correspondance is not None and correspondance.lastgroup == 'sql':
+            return 'sql'
+        chemin = request.get_full_path().partition('?')[0]
+        if correspondance is None and not self.MOTIF_XSS.search(chemin):
+            return None
+        # Un XSS a été vu : une injection SQL plus loin reste prioritaire.
+        return 'sql' if self.MOTIF_SQL.search(texte) else 'xss'
+
     def detect_sql_injection(self, request):
         """Détecte les tentatives d'injection SQL (requêtes et POST), sans pénaliser les apostrophes normales)"""
-        # Vérifier dans la query string uniquement (pas tout le chemin)
-        query = (request.META.get('QUERY_STRING') or '').lower()
-        for pattern in self.SQL_INJECTION_PATTERNS:
-            if re.search(pattern, query, re.IGNORECASE):
-                return True
-        
-        # Vérifier dans les paramètres POST (valeurs texte)
-        if request.method == 'POST':
-            try:
-                for key, value in request.POST.items():
-                    if self._champ_sensible(key):
-                        continue  # ne pas scanner mots de passe / secrets
-                    if isinstance(value, str):
-                        val = value.lower()
-                        for pattern in self.SQL_INJECTION_PATTERNS:
-                            if re.search(pattern, val, re.IGNORECASE):
-                                return True
-            except TooManyFieldsSent:
-                logger.warning("[SECURITY] POST ignoré pour scan SQLi: trop de champs (TooManyFieldsSent)")
-                return False
-
-        return False
+        query = request.META.get('QUERY_STRING') or ''
+        if self.MOTIF_SQL.search(query):
+            return True
+        return any(self.MOTIF_SQL.search(valeur) for valeur in self._valeurs_post(request))
 
     # Champs à ne jamais scanner (contenu opaque légitime: mots de passe, jetons)
     CHAMPS_SENSIBLES = ('password', 'mot_de_passe', 'motdepasse', 'mdp',
@@ -253,28 +324,9 @@ class SecurityMiddleware(MiddlewareMixin):
     
     def detect_xss(self, request):
         """Détecte les tentatives XSS"""
-        # Vérifier dans l'URL
-        full_path = request.get_full_path().lower()
-        for pattern in self.XSS_PATTERNS:
-            if re.search(pattern, full_path, re.IGNORECASE):
-                return True
-        
-        # Vérifier dans les paramètres POST
-        if request.method == 'POST':
-            try:
-                for key, value in request.POST.items():
-                    if self._champ_sensible(key):
-                        continue  # ne pas scanner mots de passe / secrets
-                    if isinstance(value, str):
-                        for pattern in self.XSS_PATTERNS:
-                            if re.search(pattern, value.lower(), re.IGNORECASE):
-                                return True
-            except TooManyFieldsSent:
-                # Si le formulaire contient trop de champs, ignorer l'analyse POST
-                logger.warning("[SECURITY] POST ignoré pour scan XSS: trop de champs (TooManyFieldsSent)")
-                return False
-
-        return False
+        if self.MOTIF_XSS.search(request.get_full_path()):
+            return True
+        return any(self.MOTIF_XSS.search(valeur) for valeur in self._valeurs_post(request))
     
     def detect_path_traversal(self, request):
         """Détecte les tentatives de Path Traversal"""
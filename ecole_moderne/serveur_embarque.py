@@ -0,0 +1,91 @@
+"""
+Serveur WSGI embarqué de l'application desktop.
+
+Remplace ``runserver`` (serveur de développement, DEBUG obligatoire) par
+waitress : pool de threads borné, connexions keep-alive HTTP/1.1, aucune
+dépendance native, fonctionne sous Windows. Plusieurs secrétaires du réseau
+local peuvent ainsi travailler sur le même poste sans s'attendre les unes
+les autres.
+
+Réglages (variables d'environnement) :
+    MYSCHOOL_HOTE        adresse d'écoute (défaut 127.0.0.1 ; 0.0.0.0 pour le réseau local)
+    MYSCHOOL_THREADS     taille du pool de threads (défaut 8)
+    DJANGO_ALLOWED_HOSTS noms ou adresses supplémentaires acceptés (séparés par des virgules)
+"""
+import os
+import socket
+
+THREADS_DEFAUT = 8
+CONNEXIONS_MAX = 100
+# Une connexion keep-alive inactive est fermée au-delà de ce délai (secondes).
+DELAI_INACTIVITE = 120
+
+
+def hote_ecoute():
+    return os.environ.get('MYSCHOOL_HOTE', '').strip() or '127.0.0.1'
+
+
+def adresses_locales():
+    """Nom du poste et ses adresses IPv4 sur le réseau local."""
+    adresses = []
+    try:
+        nom = socket.gethostname()
+        adresses += [nom, nom.lower()] + socket.gethostbyname_ex(nom)[2]
+    except OSError:
+        pass
+    try:
+        # Aucun paquet n'est envoyé : connect() choisit seulement l'interface
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sonde:
+            sonde.connect(('10.255.255.255', 1))
+            adresses.append(sonde.getsockname()[0])
+    except OSError:
+        pass
+    return list(dict.fromkeys(adresses))
+
+
+def hotes_autorises():
+    """ALLOWED_HOSTS du serveur embarqué : le poste lui-même, ses adresses
+    sur le réseau local quand il l'écoute, plus DJANGO_ALLOWED_HOSTS (adresse
+    changée par le DHCP, nom DNS de l'école...)."""
+    hotes = ['127.0.0.1', 'localhost', '[::1]']
+    if hote_ecoute() not in ('127.0.0.1', 'localhost'):
+        hotes += adresses_locales()
+    hotes += [hote.strip() for hote in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if hote.strip()]
+    return list(dict.fromkeys(hotes))
+
+
+def nombre_threads():
+    try:
+        return max(2, int(os.environ.get('MYSCHOOL_THREADS') or THREADS_DEFAUT))
+    except ValueError:
+        return THREADS_DEFAUT
+
+
+def servir(port, hote=None):
+    """Sert l'application Django jusqu'à l'arrêt du processus (bloquant).
+
+    Sans waitress (installation incomplète), repli sur ``runserver`` pour que
+    l'école puisse quand même travailler.
+    """
+    hote = hote or hote_ecoute()
+    try:
+        from waitress import serve
+    except ImportError:
+        print("[MySchoolGN] waitress absent : repli sur le serveur de développement.")
+        from django.core.management import call_command
+        call_command('runserver', f'{hote}:{port}', '--noreload')
+        return
+
+    from django.core.wsgi import get_wsgi_application
+
+    threads = nombre_threads()
+    print(f"[MySchoolGN] Serveur embarqué : http://{hote}:{port} ({threads} threads)")
+    serve(
+        get_wsgi_application(),
+        host=hote,
+        port=port,
+        threads=threads,
+        connection_limit=CONNEXIONS_MAX,
+        channel_timeout=DELAI_INACTIVITE,
+        ident='MySchoolGN',
+    )
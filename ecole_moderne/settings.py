@@ -47,6 +47,11 @@ ADMIN_URL = os.environ.get('DJANGO_ADMIN_URL', 'gestion-secrete-2026').strip('/'
 DEBUG_DEFAULT = 'false' if RENDER_EXTERNAL_HOSTNAME else 'true'
 DEBUG = os.environ.get('DJANGO_DEBUG', DEBUG_DEFAULT).lower() == 'true'
 
+# Application desktop (run_server.py) : servie par le serveur WSGI embarqué,
+# en HTTP sur le poste ou le réseau local de l'école.
+OFFLINE_MODE = os.environ.get('OFFLINE_MODE', '0') == '1'
+SERVEUR_EMBARQUE = OFFLINE_MODE
+
 # =================== Hôtes et CSRF ===================
 if DEBUG:
     ALLOWED_HOSTS = ['*']  # Accepter tous les hôtes en développement
@@ -128,6 +133,22 @@ else:
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
     USE_X_FORWARDED_HOST = True
 
+if SERVEUR_EMBARQUE and not DEBUG:
+    # Poste desktop : pas de HTTPS ni de nom de domaine, les secrétaires s'y
+    # connectent par son adresse IP sur le réseau local. Seuls les réglages
+    # propres à HTTPS sont assouplis ; les middlewares de sécurité restent.
+    from ecole_moderne.serveur_embarque import hotes_autorises
+    ALLOWED_HOSTS = hotes_autorises()
+    CSRF_COOKIE_SECURE = False
+    SESSION_COOKIE_SECURE = False
+    SECURE_SSL_REDIRECT = False
+    SECURE_HSTS_SECONDS = 0
+    SECURE_HSTS_INCLUDE_SUBDOMAINS = False
+    SECURE_HSTS_PRELOAD = False
+    # Pas de proxy devant waitress : les en-têtes X-Forwarded-* viendraient du client
+    SECURE_PROXY_SSL_HEADER = None
+    USE_X_FORWARDED_HOST = False
+
 # =================== Applications ===================
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -164,6 +185,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # École, année active et permissions calculées une fois par requête
+    'utilisateurs.middleware.ContexteUtilisateurMiddleware',
     'utilisateurs.middleware.MenuPermissionMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -178,13 +201,15 @@ MIDDLEWARE = [
 ]
 
 # Ajouter middlewares d'optimisation images
-if DEBUG:
+if DEBUG or SERVEUR_EMBARQUE:
     MIDDLEWARE += [
         'ecole_moderne.image_cache_middleware.ImageCacheMiddleware',
         'ecole_moderne.image_optimization_middleware.ImageOptimizationMiddleware',
     ]
 else:
     MIDDLEWARE.append('ecole_moderne.image_optimization_middleware.ImageOptimizationMiddleware')
+if not DEBUG:
+    # Serveur embarqué compris : il écoute le réseau local de l'école
     MIDDLEWARE.insert(1, 'ecole_moderne.security_middleware.SecurityMiddleware')
     MIDDLEWARE.insert(3, 'ecole_moderne.security_middleware.SessionSecurityMiddleware')
     MIDDLEWARE.insert(5, 'ecole_moderne.security_middleware.CSRFSecurityMiddleware')
@@ -222,6 +247,11 @@ ROOT_URLCONF = 'ecole_moderne.urls'
 ANNEE_SCOLAIRE_FIN_MOIS = int(os.environ.get('ANNEE_SCOLAIRE_FIN_MOIS', '6'))
 ANNEE_SCOLAIRE_FIN_JOUR = int(os.environ.get('ANNEE_SCOLAIRE_FIN_JOUR', '30'))
 
+# =================== Calcul des moyennes ===================
+# Moteur NumPy (notes.moteur_vectoriel), mêmes résultats que le moteur Decimal ;
+# à désactiver pour revenir au calcul historique case par case.
+NOTES_MOTEUR_VECTORIEL = os.environ.get('NOTES_MOTEUR_VECTORIEL', 'true').lower() in {'1', 'true', 'yes'}
+
 # =================== Templates ===================
 TEMPLATES = [
     {
@@ -273,22 +303,74 @@ else:
         }
     }
 
-# =================== Cache (vitesse maximale) ===================
-CACHES = {
-    "default": {
+# Profil SQLite du poste desktop : plusieurs secrétaires, le worker de
+# sauvegarde et les signaux de synchronisation écrivent en même temps.
+# Comparaison avant/après : python manage.py bench_sqlite
+SQLITE_OPTIONS_DESKTOP = {
+    "init_command": (
+        "PRAGMA journal_mode=WAL;"          # les lectures ne bloquent plus sur une écriture
+        "PRAGMA synchronous=NORMAL;"        # sûr en WAL : fsync au checkpoint seulement
+        "PRAGMA cache_size=-32768;"         # 32 Mo de cache de pages par connexion
+        "PRAGMA mmap_size=268435456;"       # 256 Mo lus par mmap plutôt que read()
+        "PRAGMA temp_store=MEMORY;"         # tris et index temporaires en mémoire
+        "PRAGMA auto_vacuum=INCREMENTAL;"   # base neuve ; sinon converti par l'entretien
+    ),
+    # Le verrou d'écriture est pris dès BEGIN : pas d'échec « database is
+    # locked » quand deux transactions veulent passer de lecture à écriture.
+    "transaction_mode": "IMMEDIATE",
+    "timeout": 20,
+}
+if SERVEUR_EMBARQUE and DATABASES["default"]["ENGINE"].endswith("sqlite3"):
+    DATABASES["default"]["OPTIONS"] = SQLITE_OPTIONS_DESKTOP
+
+# =================== Cache partagé ===================
+# Le cache doit être commun à tous les workers gunicorn : une invalidation
+# (ex: rangs d'une classe après une saisie de notes), les compteurs de
+# rate-limit et la liste des IP bloquées valent alors pour tout le serveur.
+#   DJANGO_CACHE_BACKEND = redis | db | file | locmem
+#   REDIS_URL            = redis://hote:6379/0 (active Redis par défaut)
+REDIS_URL = os.environ.get('REDIS_URL', '').strip()
+CACHE_BACKEND = os.environ.get('DJANGO_CACHE_BACKEND', 'redis' if REDIS_URL else 'db').strip().lower()
+
+_CACHE_COMMUN = {
+    "KEY_PREFIX": "myschool",
+    "TIMEOUT": 600,                     # 10 minutes par défaut
+}
+if CACHE_BACKEND == 'redis':
+    _CACHE_DEFAULT = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL or "redis://127.0.0.1:6379/1",
+    }
+elif CACHE_BACKEND == 'file':
+    _CACHE_DEFAULT = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get('DJANGO_CACHE_DIR', str(BASE_DIR / "cache")),
+        "OPTIONS": {"MAX_ENTRIES": 5000, "CULL_FREQUENCY": 4},
+    }
+elif CACHE_BACKEND == 'locmem':
+    # Un seul processus (poste desktop, runserver) : rien à partager
+    _CACHE_DEFAULT = {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "myschool-cache-v1",
-        "OPTIONS": {
-            "MAX_ENTRIES": 2000,        # Nombre max d'entrées en mémoire
-            "CULL_FREQUENCY": 4,        # Supprime 1/4 du cache quand MAX_ENTRIES atteint
-        },
-        "TIMEOUT": 600,                 # 10 minutes par défaut
+        "OPTIONS": {"MAX_ENTRIES": 2000, "CULL_FREQUENCY": 4},
     }
-}
+else:
+    # Table de la base principale (SQLite ou MySQL), créée après chaque
+    # migrate par administration.apps (createcachetable)
+    _CACHE_DEFAULT = {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "myschool_cache",
+        "OPTIONS": {"MAX_ENTRIES": 5000, "CULL_FREQUENCY": 4},
+    }
+CACHES = {"default": {**_CACHE_COMMUN, **_CACHE_DEFAULT}}
 
-# Sessions stockées en DB + cache (1 requête DB au lieu de 2 par session)
-SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
-SESSION_CACHE_ALIAS = "default"
+# Sessions : cached_db n'a d'intérêt que si le cache est plus rapide que la
+# base (Redis, mémoire) ; avec le cache en base on lit directement la session.
+if CACHE_BACKEND == 'db':
+    SESSION_ENGINE = "django.contrib.sessions.backends.db"
+else:
+    SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+    SESSION_CACHE_ALIAS = "default"
 SESSION_COOKIE_AGE = 86400 * 7   # 7 jours (évite reconnexions fréquentes)
 
 # =================== Auth & mots de passe ===================
@@ -323,11 +405,31 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# =================== Exports en arrière-plan ===================
+# Fichiers générés par rapports.taches_export (privés : hors MEDIA_ROOT)
+TACHES_EXPORT_DIR = BASE_DIR / 'exports_temp'
+# Thread worker dans le processus web ; à désactiver quand
+# « manage.py executer_exports » tourne en tâche permanente
+TACHES_EXPORT_WORKER_INTEGRE = os.environ.get('TACHES_EXPORT_WORKER_INTEGRE', 'true').lower() in {'1', 'true', 'yes'}
+
+# =================== Journal d'audit ===================
+# Journaux de consultation (listes, fiches) écrits après l'envoi de la réponse
+# plutôt que pendant la vue (administration.audit.journaliser_consultation)
+JOURNAL_CONSULTATION_DIFFERE = os.environ.get('JOURNAL_CONSULTATION_DIFFERE', 'true').lower() in {'1', 'true', 'yes'}
+
 if DEBUG:
     STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
 else:
     STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
 
+if SERVEUR_EMBARQUE and not DEBUG:
+    # Noms hachés + versions compressées : whitenoise les sert avec un cache
+    # navigateur d'un an, les pages suivantes ne redemandent plus rien.
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'ecole_moderne.statiques.StockageStatiquesDesktop'},
+    }
+
 # =================== Logging ===================
 LOGS_DIR = BASE_DIR / 'logs'
 os.makedirs(LOGS_DIR, exist_ok=True)
@@ -356,6 +458,20 @@ TWILIO_ENABLED = os.getenv("TWILIO_ENABLED", "false").lower() in {"1", "true", "
 TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN', '')
 PHONE_VERIFY_TTL_SECONDS = int(os.environ.get('PHONE_VERIFY_TTL_SECONDS', 4 * 3600))
 
+# File d'envoi SMS/WhatsApp (paiements.file_messages)
+NOTIFICATIONS_TRANSPORT = os.environ.get('NOTIFICATIONS_TRANSPORT', 'paiements.file_messages.TransportTwilio')
+# Pool d'envoi dans le processus web ; à désactiver quand
+# « manage.py envoyer_messages » tourne en tâche permanente
+NOTIFICATIONS_WORKER_INTEGRE = os.environ.get('NOTIFICATIONS_WORKER_INTEGRE', 'true').lower() in {'1', 'true', 'yes'}
+NOTIFICATIONS_TAILLE_POOL = int(os.environ.get('NOTIFICATIONS_TAILLE_POOL', 4))
+# Messages par seconde et par canal, dans chaque processus qui envoie : avec
+# plusieurs workers web et le pool intégré, diviser la limite du compte Twilio
+# par le nombre de workers (ou n'envoyer que depuis « envoyer_messages »)
+NOTIFICATIONS_DEBIT = {
+    'sms': float(os.environ.get('NOTIFICATIONS_DEBIT_SMS', 1)),
+    'whatsapp': float(os.environ.get('NOTIFICATIONS_DEBIT_WHATSAPP', 10)),
+}
+
 # =================== Synchronisation offline/online ===================
 MYSCHOOL_SYNC_SERVER_URL = os.environ.get('MYSCHOOL_SYNC_SERVER_URL', '').rstrip('/')
 MYSCHOOL_SYNC_DEVICE_ID = os.environ.get('MYSCHOOL_SYNC_DEVICE_ID', '')
@@ -0,0 +1,25 @@
+"""
+Stockage des fichiers statiques de l'application desktop.
+
+Même principe que la production derrière un CDN : chaque fichier collecté
+reçoit un nom haché (``app.3f2a9c.js``) et une version compressée ; whitenoise
+les sert alors avec ``Cache-Control: max-age=31536000, immutable``.
+"""
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StockageStatiquesDesktop(CompressedManifestStaticFilesStorage):
+    """Manifeste whitenoise tolérant aux références absentes.
+
+    Les bibliothèques copiées dans static/vendor citent des ``.map`` non
+    livrés : au lieu de faire échouer collectstatic (et donc le démarrage),
+    une référence introuvable est laissée telle quelle.
+    """
+
+    manifest_strict = False
+
+    def hashed_name(self, name, content=None, filename=None):
+        try:
+            return super().hashed_name(name, content, filename)
+        except ValueError:
+            return name
@@ -0,0 +1,25 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from .cache_partage import cle_etiquetee, invalider_tags, tag_classe
+
+
+class CacheEtiqueteTests(TestCase):
+    def test_la_cle_est_stable_tant_que_l_etiquette_n_est_pas_invalidee(self):
+        cle = cle_etiquetee("rangs_42_OCTOBRE", tag_classe(42))
+
+        self.assertEqual(cle_etiquetee("rangs_42_OCTOBRE", tag_classe(42)), cle)
+
+    def test_invalider_une_classe_rend_ses_entrees_inaccessibles(self):
+        cache.set(cle_etiquetee("rangs_42_OCTOBRE", tag_classe(42)), "ancien")
+        cache.set(cle_etiquetee("rangs_43_OCTOBRE", tag_classe(43)), "autre classe")
+
+        invalider_tags(tag_classe(42))
+
+        self.assertIsNone(cache.get(cle_etiquetee("rangs_42_OCTOBRE", tag_classe(42))))
+        self.assertEqual(cache.get(cle_etiquetee("rangs_43_OCTOBRE", tag_classe(43))), "autre classe")
+
+    def test_invalider_une_etiquette_jamais_lue_ne_leve_pas(self):
+        invalider_tags(tag_classe(999))
+
+        self.assertIsNotNone(cle_etiquetee("x", tag_classe(999)))
@@ -0,0 +1,161 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from . import sauvegarde
+
+
+class SauvegardeIncrementaleTests(SimpleTestCase):
+    """Complete + incrementale (pages modifiees), medias par contenu, rotation."""
+
+    def setUp(self):
+        self.racine = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.racine, ignore_errors=True)
+        environ = mock.patch.dict(os.environ, {'MYSCHOOL_BASE_DIR': self.racine})
+        environ.start()
+        self.addCleanup(environ.stop)
+        for cible, valeur in (
+            ('chemin_db', os.path.join(self.racine, 'db.sqlite3')),
+            ('infos_ecole', ('Ecole Test', 'Ecole_Test')),
+            ('_statistiques_base', {}),
+        ):
+            patch = mock.patch.object(sauvegarde, cible, return_value=valeur)
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.media = os.path.join(self.racine, 'media')
+        reglages = override_settings(MEDIA_ROOT=self.media)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+
+        connexion = sqlite3.connect(sauvegarde.chemin_db())
+        connexion.execute('CREATE TABLE eleve (id INTEGER PRIMARY KEY, nom TEXT)')
+        connexion.executemany('INSERT INTO eleve (nom) VALUES (?)', [(f'eleve {i:05d}' * 4,) for i in range(5000)])
+        connexion.commit()
+        connexion.close()
+
+    def _modifier(self, nom):
+        connexion = sqlite3.connect(sauvegarde.chemin_db())
+        connexion.execute('UPDATE eleve SET nom = ? WHERE id = 1', (nom,))
+        connexion.commit()
+        connexion.close()
+
+    def _nom_eleve_1(self):
+        connexion = sqlite3.connect(sauvegarde.chemin_db())
+        try:
+            return connexion.execute('SELECT nom FROM eleve WHERE id = 1').fetchone()[0]
+        finally:
+            connexion.close()
+
+    def test_incrementale_restauree_avec_sa_complete(self):
+        complete = sauvegarde.creer_archive()
+        self._modifier('Modifie')
+        incrementale = sauvegarde.creer_archive()
+
+        self.assertEqual(complete['type'], 'complete')
+        self.assertEqual(incrementale['type'], 'incrementale')
+        self.assertEqual(incrementale['base']['nom'], complete['nom'])
+        self.assertLess(incrementale['manifeste']['pages_modifiees'], 5)
+        self.assertLess(incrementale['octets'], complete['octets'] / 5)
+
+        self._modifier('Apres la sauvegarde')
+        sauvegarde.demander_restauration(incrementale['chemin'])
+        rapport = sauvegarde.appliquer_restauration_si_demandee(self.racine)
+
+        self.assertTrue(rapport['ok'], rapport['message'])
+        self.assertEqual(self._nom_eleve_1(), 'Modifie')
+
+    def test_medias_stockes_une_fois_par_contenu(self):
+        os.makedirs(os.path.join(self.media, 'photos'))
+        for nom in ('a.jpg', 'copie_de_a.jpg'):
+            with open(os.path.join(self.media, 'photos', nom), 'wb') as fichier:
+                fichier.write(b'photo' * 1000)
+        destination = {'chemin': os.path.join(self.racine, 'usb'), 'libelle': 'USB', 'type': 'amovible'}
+
+        premier = sauvegarde.executer_sauvegarde(destinations=[destination])
+        second = sauvegarde.executer_sauvegarde(destinations=[destination])
+
+        self.assertEqual(premier['destinations'][0]['medias_copies'], 1)
+        self.assertEqual(second['destinations'][0]['medias_copies'], 0)
+
+        shutil.rmtree(self.media)
+        dossier_usb = os.path.join(destination['chemin'], 'Ecole_Test', 'archives')
+        sauvegarde.demander_restauration(os.path.join(dossier_usb, second['archive']))
+        rapport = sauvegarde.appliquer_restauration_si_demandee(self.racine)
+        self.assertEqual(rapport['medias_restaures'], 2)
+        self.assertTrue(os.path.isfile(os.path.join(self.media, 'photos', 'copie_de_a.jpg')))
+
+    def test_rotation_garde_la_complete_d_une_incrementale(self):
+        dossier = os.path.join(self.racine, 'rotation')
+        os.makedirs(dossier)
+
+        def archive(nom, **manifeste):
+            with zipfile.ZipFile(os.path.join(dossier, nom), 'w') as zip_:
+                zip_.writestr('manifest.json', json.dumps(manifeste))
+
+        archive('MySchoolGN_E_20260101_080000.zip', type='complete')
+        archive('MySchoolGN_E_inc_20260102_080000.zip', type='incrementale', base='MySchoolGN_E_20260101_080000.zip')
+        archive('MySchoolGN_E_inc_20260103_080000.zip', type='incrementale', base='MySchoolGN_E_20251201_080000.zip')
+
+        config = dict(sauvegarde.CONFIG_DEFAUT, conserver_recentes=1, conserver_quotidiennes=2,
+                      conserver_hebdomadaires=1, conserver_mensuelles=1)
+        sauvegarde.appliquer_rotation(dossier, config)
+
+        self.assertEqual(sorted(os.listdir(dossier)), [
+            'MySchoolGN_E_20260101_080000.zip',
+            'MySchoolGN_E_inc_20260102_080000.zip',
+        ])
+
+
+    def test_rotation_nom_d_ecole_contenant_inc(self):
+        dossier = os.path.join(self.racine, 'rotation_inc')
+        os.makedirs(dossier)
+
+        def archive(nom, **manifeste):
+            with zipfile.ZipFile(os.path.join(dossier, nom), 'w') as zip_:
+                zip_.writestr('manifest.json', json.dumps(manifeste))
+
+        # Ecole « GS inc Conakry » : son slug contient deja "_inc_"
+        archive('MySchoolGN_GS_inc_Conakry_20260101_080000.zip', type='complete')
+        archive('MySchoolGN_GS_inc_Conakry_inc_20260102_080000.zip', type='incrementale',
+                base='MySchoolGN_GS_inc_Conakry_20260101_080000.zip')
+        archive('MySchoolGN_GS_inc_Conakry_20260103_080000.zip', type='complete')
+
+        config = dict(sauvegarde.CONFIG_DEFAUT, conserver_recentes=2, conserver_quotidiennes=0,
+                      conserver_hebdomadaires=0, conserver_mensuelles=0)
+        sauvegarde.appliquer_rotation(dossier, config)
+
+        # La complete recente n'est pas prise pour une incrementale orpheline
+        self.assertEqual(sorted(os.listdir(dossier)), [
+            'MySchoolGN_GS_inc_Conakry_20260101_080000.zip',
+            'MySchoolGN_GS_inc_Conakry_20260103_080000.zip',
+            'MySchoolGN_GS_inc_Conakry_inc_20260102_080000.zip',
+        ])
+
+class EntretienSqliteTests(SimpleTestCase):
+    def test_base_ancienne_convertie_puis_vacuum_incremental(self):
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier, ignore_errors=True)
+        chemin = os.path.join(dossier, 'db.sqlite3')
+        connexion = sqlite3.connect(chemin)
+        connexion.execute('CREATE TABLE t (x TEXT)')
+        connexion.executemany('INSERT INTO t VALUES (?)', [('x' * 500,) for _ in range(2000)])
+        connexion.commit()
+        connexion.execute('DELETE FROM t')
+        connexion.commit()
+        connexion.close()
+
+        rapport = sauvegarde.entretien_sqlite(chemin)
+
+        self.assertEqual(rapport['vacuum'], 'complet')
+        connexion = sqlite3.connect(chemin)
+        try:
+            self.assertEqual(connexion.execute('PRAGMA auto_vacuum').fetchone()[0], 2)
+            self.assertEqual(connexion.execute('PRAGMA freelist_count').fetchone()[0], 0)
+        finally:
+            connexion.close()
@@ -1,4 +1,4 @@
-from django.test import RequestFactory, SimpleTestCase
+from django.test import RequestFactory, SimpleTestCase, override_settings
 
 from .security_middleware import SecurityMiddleware
 
@@ -36,3 +36,67 @@ class PathTraversalDetectionTests(SimpleTestCase):
         request = self.factory.get("/media/?fichier=..%5Csecret.txt")
 
         self.assertTrue(self.middleware.detect_path_traversal(request))
+
+
+class ScannerRequeteTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = SecurityMiddleware(lambda request: None)
+
+    def test_saisie_de_notes_en_masse_legitime_acceptee(self):
+        donnees = {f'note_{i}': '12,5' for i in range(300)}
+        donnees['appreciation_1'] = "Bon travail, l'élève progresse"
+        request = self.factory.post('/notes/saisie/', donnees)
+
+        self.assertIsNone(self.middleware.scanner_requete(request))
+
+    def test_injection_sql_prioritaire_sur_un_xss_plus_tot(self):
+        request = self.factory.post('/eleves/?onload=1', {'nom': "x' OR 1=1"})
+
+        self.assertEqual(self.middleware.scanner_requete(request), 'sql')
+
+    def test_xss_dans_le_post_detecte(self):
+        request = self.factory.post('/eleves/', {'nom': '<SCRIPT>alert(1)</SCRIPT>'})
+
+        self.assertEqual(self.middleware.scanner_requete(request), 'xss')
+        self.assertTrue(self.middleware.detect_xss(request))
+        self.assertFalse(self.middleware.detect_sql_injection(request))
+
+    def test_chaque_motif_reste_detecte_par_l_expression_combinee(self):
+        import re
+
+        exemples = [
+            "1 -- commentaire", "a;b", "/* x */", "%2D%2D", "UNION  SELECT nom", "exec xp_cmdshell",
+            "INSERT INTO t", "delete from t", "Drop Table t", "\" or 1=1",
+            "<script>alert(1)</script>", "JavaScript:alert(1)", "img onerror =x",
+            "<iframe src=x></iframe>", "<object></object>", "<embed></embed>",
+        ]
+        motifs = self.middleware.SQL_INJECTION_PATTERNS + self.middleware.XSS_PATTERNS
+        for exemple in exemples:
+            with self.subTest(exemple=exemple):
+                attendu = any(re.search(motif, exemple, re.IGNORECASE) for motif in motifs)
+                self.assertTrue(attendu)
+                self.assertIsNotNone(self.middleware.MOTIF_ATTAQUE.search(exemple))
+
+    def test_mot_de_passe_jamais_analyse(self):
+        request = self.factory.post('/utilisateurs/login/', {'password': "a'; DROP TABLE x--"})
+
+        self.assertIsNone(self.middleware.scanner_requete(request))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class RateLimitGlissantTests(SimpleTestCase):
+    def setUp(self):
+        self.middleware = SecurityMiddleware(lambda request: None)
+
+    def test_la_minute_precedente_compte_au_prorata(self):
+        from unittest import mock
+
+        debut = 600 * SecurityMiddleware.FENETRE_RATE_LIMIT
+        with mock.patch('ecole_moderne.security_middleware.time.time', return_value=debut + 59):
+            for _ in range(80):
+                self.middleware.increment_request_count('10.0.0.1')
+        with mock.patch('ecole_moderne.security_middleware.time.time', return_value=debut + 60 + 15):
+            estimation = self.middleware.increment_request_count('10.0.0.1')
+
+        self.assertAlmostEqual(estimation, 1 + 80 * 0.75)
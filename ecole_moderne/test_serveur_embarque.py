@@ -0,0 +1,21 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from . import serveur_embarque
+
+
+class HotesAutorisesTests(SimpleTestCase):
+    """ALLOWED_HOSTS du serveur embarqué : jamais '*'."""
+
+    def test_poste_seul(self):
+        with mock.patch.dict('os.environ', {'MYSCHOOL_HOTE': '', 'DJANGO_ALLOWED_HOSTS': ''}):
+            self.assertEqual(serveur_embarque.hotes_autorises(), ['127.0.0.1', 'localhost', '[::1]'])
+
+    def test_reseau_local_et_surcharge(self):
+        environ = {'MYSCHOOL_HOTE': '0.0.0.0', 'DJANGO_ALLOWED_HOSTS': 'ecole.lan, 10.0.0.9'}
+        with mock.patch.dict('os.environ', environ), \
+                mock.patch.object(serveur_embarque, 'adresses_locales', return_value=['SECRETARIAT', '192.168.1.20']):
+            hotes = serveur_embarque.hotes_autorises()
+        self.assertEqual(hotes[3:], ['SECRETARIAT', '192.168.1.20', 'ecole.lan', '10.0.0.9'])
+        self.assertNotIn('*', hotes)
@@ -20,6 +20,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.http import HttpResponse
 from django.views.generic import TemplateView, RedirectView
+from django.views.static import serve as serve_media
 from .static_views import serve_static_no_cache
 from .activation_views import activer_licence
 from .desktop_views import arreter_application
@@ -134,3 +135,10 @@ if settings.DEBUG:
     # Routes normales pour les autres fichiers statiques
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+elif getattr(settings, 'SERVEUR_EMBARQUE', False):
+    # Application desktop sans DEBUG : les statiques passent par whitenoise,
+    # les photos et logos (qui changent) par Django.
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), serve_media,
+                {'document_root': settings.MEDIA_ROOT}),
+    ]
@@ -366,7 +366,7 @@ class ImportElevesProcessor:
             
             # ⚡ BULK CREATE responsables d'abord
             if responsables_a_creer:
-                Responsable.objects.bulk_create(responsables_a_creer, ignore_conflicts=True)
+                Responsable.objects.bulk_create_tracked(responsables_a_creer, ignore_conflicts=True)
                 # Recharger pour avoir les IDs
                 responsables_dict = {r.telephone: r for r in Responsable.objects.all()}
             
@@ -379,12 +379,12 @@ class ImportElevesProcessor:
             
             # ⚡ BULK CREATE élèves
             if eleves_a_creer:
-                Eleve.objects.bulk_create(eleves_a_creer, batch_size=500)
+                Eleve.objects.bulk_create_tracked(eleves_a_creer, batch_size=500)
                 self.stats['crees'] += len(eleves_a_creer)
             
             # ⚡ BULK UPDATE élèves
             if eleves_a_modifier:
-                Eleve.objects.bulk_update(
+                Eleve.objects.bulk_update_tracked(
                     eleves_a_modifier,
                     ['prenom', 'nom', 'sexe', 'date_naissance', 'lieu_naissance', 
                      'responsable_principal', 'responsable_secondaire', 'statut'],
@@ -508,7 +508,10 @@ class Eleve(SyncTrackedModel):
         changement_classe_info = None
         reaffecter_ancienne_classe = False
         
-        if self.pk:  # Si l'élève existe déjà
+        charge = self.valeurs_chargees() if self.pk else None
+        if charge is not None and charge.get('classe_id') == self.classe_id:
+            pass  # Classe inchangée depuis le chargement : inutile de relire l'élève
+        elif self.pk:  # Si l'élève existe déjà
             try:
                 old_instance = Eleve.objects.get(pk=self.pk)
                 if old_instance.classe_id != self.classe_id:
@@ -575,31 +578,28 @@ class Eleve(SyncTrackedModel):
                         if m_ec:
                             prefix_ecole = m_ec.group(1)
 
-                # 2) Calculer le prochain numéro en cherchant GLOBALEMENT tous les matricules avec ce code
-                #    pour éviter les conflits UNIQUE (le matricule est unique dans toute la base)
-                motif = rf"^(?:.*/)?{re.escape(code)}-(\d+)$"
-                next_num = 1
-                # Chercher dans TOUS les élèves (pas seulement la classe) pour éviter les conflits
-                all_with_code = Eleve.objects.filter(matricule__contains=f"{code}-")
-                for e in all_with_code.order_by('-id'):
-                    m = re.match(motif, e.matricule)
-                    if m:
-                        try:
-                            num_found = int(m.group(1))
-                            if num_found >= next_num:
-                                next_num = num_found + 1
-                        except Exception:
-                            continue
-
-                # 3) Générer un candidat avec ou sans préfixe école détecté, en évitant les collisions
-                #    Augmenter le nombre de tentatives et utiliser une approche plus robuste
+                # 2) Prochain numéro tiré du compteur du code : le matricule est unique
+                #    dans toute la base, la séquence est donc globale (pas par classe).
+                #    Amorcée une seule fois sur les matricules existants.
+                from administration.sequences import allouer
+
+                def _dernier_numero():
+                    motif = rf"^(?:.*/)?{re.escape(code)}-(\d+)$"
+                    dernier = 0
+                    for matricule in Eleve.objects.filter(matricule__contains=f"{code}-").values_list('matricule', flat=True):
+                        m = re.match(motif, matricule)
+                        if m:
+                            dernier = max(dernier, int(m.group(1)))
+                    return dernier
+
+                # 3) Un matricule saisi à la main peut occuper un numéro : on passe au suivant
                 max_attempts = 1000
                 for _ in range(max_attempts):
+                    next_num = allouer(f"eleves.matricule:{code}", amorce=_dernier_numero)
                     candidat = f"{prefix_ecole}{code}-{next_num:03d}"
                     if not Eleve.objects.filter(matricule=candidat).exists():
                         self.matricule = candidat
                         break
-                    next_num += 1
                 else:
                     # Si toutes les tentatives échouent, utiliser un UUID pour garantir l'unicité
                     import uuid
@@ -2,7 +2,7 @@
 Signals Django pour convertir automatiquement les champs texte en majuscules
 avant l'enregistrement en base de données.
 """
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from .models import Eleve, Responsable, Classe, Ecole
 
@@ -34,6 +34,14 @@ def convertir_classe_majuscules(sender, instance, **kwargs):
     convertir_majuscules_model(instance, ['nom'])
 
 
+@receiver(post_save, sender=Classe)
+@receiver(post_delete, sender=Classe)
+def invalider_annees_classe(sender, instance, **kwargs):
+    """Les années scolaires de l'école (gardées en session) peuvent avoir changé."""
+    from .utils_annee import invalider_annees
+    invalider_annees(instance.ecole_id)
+
+
 @receiver(pre_save, sender=Ecole)
 def convertir_ecole_majuscules(sender, instance, **kwargs):
     """Convertit les champs texte de l'école en majuscules avant sauvegarde"""
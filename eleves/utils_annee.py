@@ -9,24 +9,53 @@ from django.conf import settings
 from .models import Classe
 
 SESSION_ANNEE_ACTIVE = 'annee_scolaire_active'
+# Années de l'école gardées en session : {'ecole': id, 'version': v, 'annees': [...]}
+SESSION_ANNEES_ECOLE = '_annees_ecole'
 
 
-def get_annee_active(request, ecole):
-    """Retourne l'année scolaire active (session ou la plus récente).
-
-    L'année est déterminée par :
-    1. La valeur stockée en session (si elle correspond à une année existante)
-    2. L'année la plus récente pour l'école donnée
-    """
-    if not ecole:
-        return None
-    annees = list(
+def _annees_en_base(ecole):
+    return list(
         Classe.objects
         .filter(ecole=ecole)
         .values_list('annee_scolaire', flat=True)
         .distinct()
         .order_by('-annee_scolaire')
     )
+
+
+def annees_scolaires(ecole, request=None):
+    """Années scolaires des classes de l'école, de la plus récente à la plus ancienne.
+
+    Avec une requête, la liste est gardée dans la session et reste valable tant
+    que l'étiquette de l'école n'a pas été invalidée (voir invalider_annees).
+    """
+    if not ecole:
+        return []
+    session = getattr(request, 'session', None)
+    if session is None:
+        return _annees_en_base(ecole)
+
+    from ecole_moderne.cache_partage import tag_ecole, versions_tags
+
+    tag = tag_ecole(ecole.pk)
+    version = versions_tags(tag)[tag]
+    memo = session.get(SESSION_ANNEES_ECOLE)
+    if memo and memo.get('ecole') == ecole.pk and memo.get('version') == version:
+        return list(memo['annees'])
+    annees = _annees_en_base(ecole)
+    session[SESSION_ANNEES_ECOLE] = {'ecole': ecole.pk, 'version': version, 'annees': annees}
+    return annees
+
+
+def invalider_annees(*ecole_ids):
+    """À appeler quand les classes d'une école changent (création, suppression, année)."""
+    from ecole_moderne.cache_partage import invalider_tags, tag_ecole
+
+    invalider_tags(*(tag_ecole(ecole_id) for ecole_id in set(ecole_ids) if ecole_id))
+
+
+def choisir_annee_active(request, annees):
+    """L'année choisie en session si elle existe encore, sinon la plus récente."""
     if not annees:
         return None
     annee_session = request.session.get(SESSION_ANNEE_ACTIVE)
@@ -35,6 +64,24 @@ def get_annee_active(request, ecole):
     return annees[0]
 
 
+def get_annee_active(request, ecole):
+    """Retourne l'année scolaire active (session ou la plus récente).
+
+    L'année est déterminée par :
+    1. La valeur stockée en session (si elle correspond à une année existante)
+    2. L'année la plus récente pour l'école donnée
+
+    Pour l'école de l'utilisateur, la valeur vient du contexte de la requête
+    (utilisateurs.contexte) : calculée une seule fois par requête.
+    """
+    if not ecole:
+        return None
+    contexte = getattr(request, 'contexte', None)
+    if contexte is not None and contexte.ecole_id == ecole.pk:
+        return contexte.annee_active
+    return choisir_annee_active(request, annees_scolaires(ecole, request))
+
+
 def annee_suivante(annee: str) -> str:
     """Calcule l'annee scolaire suivante. Ex: 2025-2026 -> 2026-2027."""
     try:
@@ -56,21 +103,19 @@ def date_fin_annee_scolaire(annee: str):
         return None
 
 
-def get_statut_creation_nouvelle_annee(ecole, today=None):
-    """Indique si la nouvelle annee doit etre preparee pour l'ecole."""
+def get_statut_creation_nouvelle_annee(ecole, today=None, annees=None):
+    """Indique si la nouvelle annee doit etre preparee pour l'ecole.
+
+    ``annees`` : liste deja connue (annees_scolaires), pour eviter de la relire.
+    """
     if not ecole:
         return {'due': False}
 
-    annee_courante = (
-        Classe.objects
-        .filter(ecole=ecole)
-        .values_list('annee_scolaire', flat=True)
-        .distinct()
-        .order_by('-annee_scolaire')
-        .first()
-    )
-    if not annee_courante:
+    if annees is None:
+        annees = _annees_en_base(ecole)
+    if not annees:
         return {'due': False}
+    annee_courante = annees[0]
 
     fin = date_fin_annee_scolaire(annee_courante)
     if not fin:
@@ -78,10 +123,7 @@ def get_statut_creation_nouvelle_annee(ecole, today=None):
 
     today = today or date.today()
     prochaine = annee_suivante(annee_courante)
-    prochaine_existe = Classe.objects.filter(
-        ecole=ecole,
-        annee_scolaire=prochaine,
-    ).exists()
+    prochaine_existe = prochaine in annees
 
     return {
         'due': today > fin and not prochaine_existe,
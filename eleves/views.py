@@ -29,6 +29,8 @@ from .forms import (
     EcoleForm,
     GrilleTarifaireForm,
 )
+from administration.audit import journaliser_consultation
+from utilisateurs.contexte import contexte_de
 from utilisateurs.forms import SignupInlineForm
 from utilisateurs.models import JournalActivite
 from utilisateurs.utils import (
@@ -71,24 +73,21 @@ def liste_eleves(request):
     
     form_recherche = RechercheEleveForm(request.GET or None)
     
-    # Cache de l'école utilisateur
-    user_school_cache_key = f'user_school_{request.user.id}'
-    user_school_obj = cache.get(user_school_cache_key)
-    if user_school_obj is None and not user_is_admin(request.user):
-        user_school_obj = user_school(request.user)
-        if user_school_obj:
-            cache.set(user_school_cache_key, user_school_obj, 300)
+    # École, rôle et année active : contexte de la requête (calculé une fois)
+    contexte = contexte_de(request)
+    est_admin = contexte.is_admin
+    user_school_obj = None if est_admin else contexte.ecole
     
     # Queryset optimisé avec relations pré-chargées
     eleves = QueryOptimizer.get_optimized_eleves(
-        school=user_school_obj if not user_is_admin(request.user) else None,
+        school=user_school_obj,
         with_payments=True,
         with_classes=True
     )
 
     # Filtrer par année scolaire active
-    if not user_is_admin(request.user) and user_school_obj:
-        annee_active = get_annee_active(request, user_school_obj)
+    if not est_admin and user_school_obj:
+        annee_active = contexte.annee_active
         if annee_active:
             eleves = eleves.filter(classe__annee_scolaire=annee_active)
 
@@ -137,13 +136,9 @@ def liste_eleves(request):
     )
     
     # Log de l'activité
-    JournalActivite.objects.create(
-        user=request.user,
-        action='CONSULTATION',
-        type_objet='ELEVE',
-        description=f"Consultation de la liste des élèves (page {page_number or 1})",
-        adresse_ip=request.META.get('REMOTE_ADDR', ''),
-        user_agent=request.META.get('HTTP_USER_AGENT', '')
+    journaliser_consultation(
+        request, 'ELEVE',
+        f"Consultation de la liste des élèves (page {page_number or 1})",
     )
     
     # Liste des classes pour export (restreinte si besoin)
@@ -156,11 +151,11 @@ def liste_eleves(request):
         )
     else:
         # Tous les autres utilisateurs (y compris ADMIN d'école) ne voient que leur école
-        user_ecole = user_school(request.user)
+        user_ecole = contexte.ecole
         if user_ecole is None:
             classes = Classe.objects.none()
         else:
-            annee_active = get_annee_active(request, user_ecole)
+            annee_active = contexte.annee_active
             qs_filter = {'ecole': user_ecole, 'ecole__etat': 'VALIDE'}
             if annee_active:
                 qs_filter['annee_scolaire'] = annee_active
@@ -672,14 +667,9 @@ def detail_eleve(request, eleve_id):
     historique_recent = eleve.historique.all()[:10]
     
     # Log de l'activité
-    JournalActivite.objects.create(
-        user=request.user,
-        action='CONSULTATION',
-        type_objet='ELEVE',
+    journaliser_consultation(
+        request, 'ELEVE', f"Consultation du profil de {eleve.nom_complet}",
         objet_id=eleve.id,
-        description=f"Consultation du profil de {eleve.nom_complet}",
-        adresse_ip=request.META.get('REMOTE_ADDR', ''),
-        user_agent=request.META.get('HTTP_USER_AGENT', '')
     )
     
     context = {
@@ -695,14 +685,9 @@ def detail_eleve(request, eleve_id):
 @never_cache
 def ajouter_eleve(request):
     """Vue optimisée pour ajouter un nouvel élève avec enregistrement ultra-rapide"""
-    # Cache de l'école utilisateur pour éviter les requêtes répétées
-    user_school_cache_key = f'user_school_{request.user.id}'
-    user_school_obj = cache.get(user_school_cache_key)
-    
-    if user_school_obj is None and not user_is_admin(request.user):
-        user_school_obj = user_school(request.user)
-        if user_school_obj:
-            cache.set(user_school_cache_key, user_school_obj, 300)  # Cache 5 minutes
+    # École de l'utilisateur : contexte de la requête
+    contexte = contexte_de(request)
+    user_school_obj = None if contexte.is_admin else contexte.ecole
     
     # Vérification d'accès rapide
     if not user_is_admin(request.user) and user_school_obj is None:
@@ -2691,14 +2676,9 @@ def ajax_rechercher_responsable_telephone(request):
         return JsonResponse({'success': False, 'error': 'Numéro de téléphone requis (min. 3 caractères)'})
     
     try:
-        # Cache de l'école utilisateur
-        user_school_cache_key = f'user_school_{request.user.id}'
-        user_school_obj = cache.get(user_school_cache_key)
-        
-        if user_school_obj is None and not user_is_admin(request.user):
-            user_school_obj = user_school(request.user)
-            if user_school_obj:
-                cache.set(user_school_cache_key, user_school_obj, 300)
+        # École de l'utilisateur : contexte de la requête
+        contexte = contexte_de(request)
+        user_school_obj = None if contexte.is_admin else contexte.ecole
         
         # Cache de la recherche
         search_cache_key = f'search_resp_{request.user.id}_{telephone}'
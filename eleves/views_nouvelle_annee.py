@@ -31,7 +31,23 @@ logger = logging.getLogger(__name__)
 #  UTILITAIRE : MOYENNE ANNUELLE POUR PASSAGE
 # ══════════════════════════════════════════════════════════════════════════════
 
-def _get_moyenne_annuelle(eleve, annee_scolaire):
+def _classements_par_eleve(eleves, annee_scolaire):
+    """Classements de l'année de plusieurs élèves en une requête.
+
+    Retourne {eleve_id: [Classement, ...]} du plus récent au plus ancien,
+    à passer à _get_moyenne_annuelle.
+    """
+    from notes.models import Classement
+
+    par_eleve = {}
+    for c in Classement.objects.filter(
+        eleve__in=eleves, annee_scolaire=annee_scolaire,
+    ).order_by('-date_calcul'):
+        par_eleve.setdefault(c.eleve_id, []).append(c)
+    return par_eleve
+
+
+def _get_moyenne_annuelle(eleve, annee_scolaire, classements=None):
     """Retourne la meilleure estimation de la moyenne annuelle d'un élève.
 
     Ordre de priorité :
@@ -40,9 +56,12 @@ def _get_moyenne_annuelle(eleve, annee_scolaire):
     3. Dernier classement disponible (TRIMESTRE_3, SEMESTRE_2, etc.)
     4. None si aucune donnée
 
+    ``classements`` : résultat de _classements_par_eleve pour traiter une
+    classe entière sans une requête par élève.
+
     Retourne (moyenne: float|None, sur: int) — sur=10 pour primaire, 20 sinon.
     """
-    from notes.models import Classement, ClasseNote
+    from notes.models import Classement
     from notes.calculs_moyennes import detecter_niveau_scolaire
 
     # Détecter le niveau
@@ -59,12 +78,15 @@ def _get_moyenne_annuelle(eleve, annee_scolaire):
     sur = 10 if niveau_scolaire == 'PRIMAIRE' else 20
 
     # Chercher les classements de cet élève pour l'année
-    classements = Classement.objects.filter(
-        eleve=eleve,
-        annee_scolaire=annee_scolaire,
-    ).order_by('-date_calcul')
-
-    if not classements.exists():
+    if classements is None:
+        classements = list(Classement.objects.filter(
+            eleve=eleve,
+            annee_scolaire=annee_scolaire,
+        ).order_by('-date_calcul'))
+    else:
+        classements = classements.get(eleve.pk, [])
+
+    if not classements:
         return None, sur
 
     # 1) Classement annuel
@@ -511,8 +533,10 @@ def nouvelle_annee_apercu(request):
         niveau_scol = detecter_niveau_scolaire(cls.nom)
         if base in CLASSES_TERMINALES or niveau_scol == 'MATERNELLE':
             continue
-        for eleve in cls.eleves.filter(statut='ACTIF').order_by('nom', 'prenom'):
-            moyenne, sur = _get_moyenne_annuelle(eleve, annee_courante)
+        eleves_classe = list(cls.eleves.filter(statut='ACTIF').select_related('classe').order_by('nom', 'prenom'))
+        classements = _classements_par_eleve(eleves_classe, annee_courante)
+        for eleve in eleves_classe:
+            moyenne, sur = _get_moyenne_annuelle(eleve, annee_courante, classements)
             if not _est_admis(moyenne, sur):
                 eleves_non_admis.append({
                     'eleve': eleve,
@@ -705,6 +729,8 @@ def nouvelle_annee_creer(request):
                     ecole=ecole, annee_scolaire=annee_nouvelle
                 ))
                 index_nouvelles = _construire_index_classes(classes_nouvelles)
+                eleves_actifs = list(eleves_actifs)
+                classements = _classements_par_eleve(eleves_actifs, annee_courante)
 
                 for eleve in eleves_actifs:
                     ancienne_classe = eleve.classe
@@ -751,7 +777,7 @@ def nouvelle_annee_creer(request):
                     eleve_id_str = str(eleve.pk)
 
                     if _niveau_scol != 'MATERNELLE':
-                        moyenne, sur = _get_moyenne_annuelle(eleve, annee_courante)
+                        moyenne, sur = _get_moyenne_annuelle(eleve, annee_courante, classements)
                         admis = _est_admis(moyenne, sur)
                         par_convention = eleve_id_str in eleves_convention_ids
                     else:
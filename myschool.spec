@@ -58,6 +58,13 @@ try:
 except Exception:
     pass
 
+# waitress (serveur WSGI embarque, importe a l'execution par
+# ecole_moderne.serveur_embarque)
+try:
+    hiddenimports += collect_submodules('waitress')
+except Exception:
+    pass
+
 # Pandas (import/export eleves)
 try:
     # Les suites ``pandas.tests`` et ``numpy.*.tests`` ne sont jamais utilisees
@@ -110,6 +117,8 @@ hiddenimports += [
     'django.core.management.commands.migrate',
     'django.core.management.commands.collectstatic',
     'django.core.management.commands.runserver',
+    'ecole_moderne.serveur_embarque',
+    'ecole_moderne.statiques',
     'django.db.backends.sqlite3.base',
     'django.db.backends.sqlite3.introspection',
     'django.contrib.admin.apps',
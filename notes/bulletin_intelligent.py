@@ -6,10 +6,11 @@ Conforme au système guinéen (40% cours + 60% composition)
 
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, render
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse
 from django.db.models import Avg, Count
 from decimal import Decimal
 import io
+import tempfile
 from datetime import datetime
 
 # ReportLab pour PDF
@@ -30,7 +31,7 @@ try:
 except ImportError:
     EXCEL_AVAILABLE = False
 
-from eleves.models import Eleve, Classe
+from eleves.models import Eleve
 from .models import ClasseNote, MatiereNote, Evaluation, NoteEleve
 # Import du module centralisé pour garantir la cohérence
 from .calculs_moyennes import (
@@ -1573,17 +1574,13 @@ def bulletin_intelligent_pdf(request, eleve_id, classe_note_id, periode):
     # IMPORTANT: Utiliser UNE SEULE SOURCE pour garantir la cohérence moyenne/rang
     if system_type in ['annuel_trimestriel', 'annuel_semestriel']:
         from notes.calculs_moyennes import calculer_classement_classe, detecter_niveau_scolaire
-        from eleves.models import Classe as ClasseEleve
         
         # Récupérer les matières de la classe
         matieres = MatiereNote.objects.filter(classe=classe_note)
         
         # Récupérer tous les élèves de la classe
-        classe_eleve = ClasseEleve.objects.filter(
-            nom=classe_note.nom,
-            annee_scolaire=classe_note.annee_scolaire,
-            ecole=classe_note.ecole
-        ).first()
+        from notes.utils_rangs import classe_eleve_correspondante
+        classe_eleve = classe_eleve_correspondante(classe_note)
         
         if classe_eleve:
             eleves_classe = list(Eleve.objects.filter(classe=classe_eleve, statut='ACTIF'))
@@ -1687,11 +1684,8 @@ def bulletins_classe_pdf(request, classe_note_id, periode):
     classe_note = get_object_or_404(ClasseNote, pk=classe_note_id)
     
     # Récupérer tous les élèves de la classe
-    classe_eleve = Classe.objects.filter(
-        nom=classe_note.nom,
-        annee_scolaire=classe_note.annee_scolaire,
-        ecole=classe_note.ecole
-    ).first()
+    from notes.utils_rangs import classe_eleve_correspondante
+    classe_eleve = classe_eleve_correspondante(classe_note)
     
     if not classe_eleve:
         return HttpResponse("Classe non trouvée", status=404)
@@ -1728,7 +1722,7 @@ def bulletins_classe_pdf(request, classe_note_id, periode):
     from notes.utils_rangs import calculer_rangs_classe_periode
     
     # Récupérer les matières de la classe (MatiereNote.classe est une FK vers ClasseNote)
-    matieres = MatiereNote.objects.filter(classe=classe_note)
+    matieres = list(MatiereNote.objects.filter(classe=classe_note).select_related('classe'))
     
     # Détecter si la classe a des notes mensuelles ou seulement des compositions
     detection_notes = detecter_notes_mensuelles_classe(classe_note, periode)
@@ -1762,16 +1756,24 @@ def bulletins_classe_pdf(request, classe_note_id, periode):
             pass
     
     # ===== Générer un seul PDF multi-pages =====
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
+    # Écrit dans un fichier temporaire puis envoyé par blocs (FileResponse) :
+    # le worker ne garde pas une copie complète du PDF en mémoire.
+    fichier_pdf = tempfile.TemporaryFile()
+    c = canvas.Canvas(fichier_pdf, pagesize=A4)
     
     # Import pour les détails mensuels et la fonction centralisée
-    from notes.calculs_moyennes import detecter_niveau_scolaire, calculer_bulletin_intelligent
+    from notes.calculs_moyennes import detecter_niveau_scolaire, calculer_bulletins_classe
     
     # Détecter le niveau scolaire
     niveau_scolaire = detecter_niveau_scolaire(classe_note.nom)
     est_maternelle = (niveau_scolaire == 'MATERNELLE')
     
+    # Détails par matière (mois, composition) de toute la classe en quelques
+    # requêtes, au lieu d'un calcul par élève et par matière
+    details_bulletins = {}
+    if matieres and not est_maternelle:
+        details_bulletins = calculer_bulletins_classe(eleves, matieres, periode, system_type)
+    
     for idx, eleve in enumerate(eleves):
         try:
             # Pour la maternelle, toujours utiliser le calculateur spécifique
@@ -1791,17 +1793,13 @@ def bulletins_classe_pdf(request, classe_note_id, periode):
                     matieres_enrichies = []
                     for mat_data in matieres_data:
                         mat_obj = mat_data.get('matiere')
-                        if mat_obj:
-                            # Utiliser la fonction centralisée intelligente
-                            try:
-                                result = calculer_bulletin_intelligent(eleve, mat_obj, periode, system_type)
-                                mat_data['moyennes_mensuelles'] = result.get('moyennes_mensuelles', [])
-                                mat_data['note_composition'] = result.get('note_composition')
-                                mat_data['moyenne_continue'] = result.get('moyenne_continue')
-                                mat_data['moyenne'] = result.get('moyenne')
-                                mat_data['points'] = result.get('points')
-                            except:
-                                pass
+                        result = details_bulletins.get((eleve.id, mat_obj.id)) if mat_obj else None
+                        if result:
+                            mat_data['moyennes_mensuelles'] = result.get('moyennes_mensuelles', [])
+                            mat_data['note_composition'] = result.get('note_composition')
+                            mat_data['moyenne_continue'] = result.get('moyenne_continue')
+                            mat_data['moyenne'] = result.get('moyenne')
+                            mat_data['points'] = result.get('points')
                         matieres_enrichies.append(mat_data)
                     matieres_data = matieres_enrichies
                 
@@ -1876,16 +1874,14 @@ def bulletins_classe_pdf(request, classe_note_id, periode):
             continue
     
     c.save()
-    buffer.seek(0)
+    fichier_pdf.seek(0)
     
     # Nettoyer le nom de fichier
     nom_classe_clean = re.sub(r'[^\w\s-]', '', classe_note.nom).replace(' ', '_')
     filename = f"bulletins_{nom_classe_clean}_{periode}.pdf"
     
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    return response
+    # Le fichier temporaire est fermé (donc supprimé) en fin de réponse
+    return FileResponse(fichier_pdf, as_attachment=True, filename=filename, content_type='application/pdf')
 
 
 def _formater_periode_libelle(periode):
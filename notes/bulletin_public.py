@@ -185,17 +185,13 @@ def bulletin_public_pdf(request, eleve_id, classe_note_id, periode):
             )
             from notes.models import MatiereNote
             from notes.bulletin_intelligent import formater_rang_intelligent
-            from eleves.models import Classe as ClasseEleve
             
             # Récupérer les matières de la classe
             matieres = MatiereNote.objects.filter(classe=classe_note)
             
             # Récupérer tous les élèves de la classe
-            classe_eleve = ClasseEleve.objects.filter(
-                nom=classe_note.nom,
-                annee_scolaire=classe_note.annee_scolaire,
-                ecole=classe_note.ecole
-            ).first()
+            from .utils_rangs import classe_eleve_correspondante
+            classe_eleve = classe_eleve_correspondante(classe_note)
             
             if classe_eleve:
                 from eleves.models import Eleve as EleveModel
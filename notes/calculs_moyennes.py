@@ -11,7 +11,11 @@ OPTIMISATIONS v3.0 - ULTRA PERFORMANCE:
 """
 from decimal import Decimal, ROUND_HALF_UP
 from typing import Dict, List, Tuple, Optional
+from django.conf import settings
 from django.core.cache import cache
+
+from ecole_moderne.cache_partage import cle_etiquetee, tag_classe
+
 from .models import Evaluation, NoteEleve, MatiereNote, NoteMensuelle, CompositionNote
 import logging
 import time
@@ -246,14 +250,11 @@ def detecter_notes_mensuelles_classe(classe_note, periode=None):
             - mode_saisie: str - 'mensuel', 'composition_seule', 'mixte'
     """
     from .models import NoteMensuelle, CompositionNote, MatiereNote
-    from eleves.models import Eleve, Classe as ClasseEleve
+    from .utils_rangs import classe_eleve_correspondante
+    from eleves.models import Eleve
     
     # Récupérer les élèves de la classe
-    classe_eleve = ClasseEleve.objects.filter(
-        nom__iexact=classe_note.nom,
-        annee_scolaire=classe_note.annee_scolaire,
-        ecole=classe_note.ecole
-    ).first()
+    classe_eleve = classe_eleve_correspondante(classe_note)
     
     if not classe_eleve:
         return {'has_notes_mensuelles': False, 'has_compositions': False, 'mode_saisie': 'aucun'}
@@ -597,7 +598,27 @@ def calculer_moyenne_generale_eleve(eleve, matieres, periode, system_type='mensu
     }
 
 
+def _moteur_vectoriel():
+    """Module du moteur NumPy, ou None (désactivé ou numpy absent)."""
+    if not getattr(settings, 'NOTES_MOTEUR_VECTORIEL', True):
+        return None
+    from . import moteur_vectoriel
+    return moteur_vectoriel if moteur_vectoriel.disponible else None
+
+
 def calculer_moyennes_classe_optimise(eleves, matieres, periode, system_type='mensuel', use_cache=True):
+    """Moyennes de tous les élèves d'une classe (format de calculer_moyennes_classe_decimal).
+
+    Passe par le moteur NumPy (notes.moteur_vectoriel), identique au bit près,
+    sauf si ``NOTES_MOTEUR_VECTORIEL`` est désactivé.
+    """
+    moteur = _moteur_vectoriel()
+    if moteur is not None:
+        return moteur.calculer_moyennes_classe_vectorise(eleves, matieres, periode, system_type, use_cache)
+    return calculer_moyennes_classe_decimal(eleves, matieres, periode, system_type, use_cache)
+
+
+def calculer_moyennes_classe_decimal(eleves, matieres, periode, system_type='mensuel', use_cache=True):
     """
     OPTIMISATION: Calcule les moyennes de tous les élèves d'une classe en une seule passe.
     
@@ -641,10 +662,13 @@ def calculer_moyennes_classe_optimise(eleves, matieres, periode, system_type='me
         return {}
 
     # ── Cache: évite de recalculer si déjà fait dans les 10 dernières minutes ──
-    # La version est incrémentée à chaque sauvegarde de note pour invalider le cache
-    _version = cache.get(f"moy_version_classe_{classe.id}", 0)
-    _cache_key = f"moy_classe_s{CALCUL_CACHE_SCHEMA_VERSION}_{classe.id}_{periode}_{system_type}_v{_version}"
+    # La clé porte l'étiquette de la classe, invalidée à chaque sauvegarde de note
+    _cache_key = None
     if use_cache:
+        _cache_key = cle_etiquetee(
+            f"moy_classe_s{CALCUL_CACHE_SCHEMA_VERSION}_{classe.id}_{periode}_{system_type}",
+            tag_classe(classe.id),
+        )
         _cached = cache.get(_cache_key)
         if _cached is not None:
             return _cached
@@ -859,6 +883,14 @@ def calculer_moyennes_classe_optimise(eleves, matieres, periode, system_type='me
 
 
 def calculer_moyennes_classe_annuelle_optimise(eleves, matieres, system_type, use_cache=True):
+    """Moyennes annuelles d'une classe (moteur NumPy si actif, sinon Decimal)."""
+    moteur = _moteur_vectoriel()
+    if moteur is not None:
+        return moteur.calculer_moyennes_annuelles_classe_vectorise(eleves, matieres, system_type, use_cache)
+    return calculer_moyennes_classe_annuelle_decimal(eleves, matieres, system_type, use_cache)
+
+
+def calculer_moyennes_classe_annuelle_decimal(eleves, matieres, system_type, use_cache=True):
     """Version OPTIMISÉE (batch) du calcul annuel pour toute une classe.
 
     Au lieu de N*M*P requêtes (lent: 40-80s/classe), on réutilise
@@ -902,7 +934,7 @@ def calculer_moyennes_classe_annuelle_optimise(eleves, matieres, system_type, us
     nb_p = len(periodes)
     par_periode = {}
     for p in periodes:
-        res = calculer_moyennes_classe_optimise(eleves_list, matieres_list, p, st, use_cache=use_cache)
+        res = calculer_moyennes_classe_decimal(eleves_list, matieres_list, p, st, use_cache=use_cache)
         mp = {}
         for eid, data in res.items():
             dd = {}
@@ -948,6 +980,108 @@ def calculer_moyennes_classe_annuelle_optimise(eleves, matieres, system_type, us
     return resultats
 
 
+def _classement_depuis_moyennes(eleves, resultats):
+    """Classement d'une classe (format de calculer_classement_classe) à partir
+    de ses moyennes {eleve_id: résultat}."""
+    moyennes_par_eleve = {}
+    details_par_eleve = {}
+    
+    # Collecter tous les IDs des élèves pour garantir que chacun ait un rang
+    all_eleve_ids = set(eleve.id for eleve in eleves)
+    
+    for eleve_id, result in resultats.items():
+        if result['moyenne_generale'] is not None:
+            moyennes_par_eleve[eleve_id] = result['moyenne_generale']
+            details_par_eleve[eleve_id] = result
+    
+    # Élèves sans notes = moyenne 0 par défaut (évite de favoriser les absents)
+    for eleve_id in all_eleve_ids:
+        if eleve_id not in moyennes_par_eleve:
+            moyennes_par_eleve[eleve_id] = 0.0
+            details_par_eleve[eleve_id] = {
+                'moyenne_generale': 0.0,
+                'total_points': 0,
+                'total_coefficients': 0,
+                'details_matieres': [],
+                'niveau': 'INCONNU',
+                'appreciations_only': False,
+                'sans_notes': True,
+            }
+    
+    # Créer le classement trié (tri par moyenne puis par matricule pour stabiliser les ex-æquo)
+    # Récupérer les matricules pour le tri secondaire
+    matricules_map = {eleve.id: eleve.matricule for eleve in eleves}
+    classement = sorted(
+        moyennes_par_eleve.items(), 
+        key=lambda x: (-float(x[1]), matricules_map.get(x[0], ""))
+    )
+    
+    # Créer le mapping des rangs (gestion des ex-aequo)
+    rang_map = {}
+    prev_moyenne = None
+    prev_rang = 0
+    
+    for idx, (eleve_id, moyenne) in enumerate(classement, start=1):
+        if moyenne == prev_moyenne:
+            # Ex-aequo: même rang que le précédent
+            rang_map[eleve_id] = prev_rang
+        else:
+            rang_map[eleve_id] = idx
+            prev_rang = idx
+        prev_moyenne = moyenne
+    
+    return {
+        'moyennes_par_eleve': moyennes_par_eleve,
+        'classement': classement,
+        'rang_map': rang_map,
+        'details_par_eleve': details_par_eleve,
+        'total_eleves': len(all_eleve_ids),
+    }
+
+
+def calculer_classements_classes(groupes, periode, system_type='mensuel'):
+    """
+    Classements de plusieurs classes en un nombre fixe de requêtes.
+    
+    Args:
+        groupes: dict {cle: (eleves, matieres)}, par exemple une entrée par
+            ClasseNote d'une école (voir utils_rangs.groupes_classes_notes)
+        periode: Période
+        system_type: Type de système (comme calculer_classement_classe)
+    
+    Returns:
+        dict {cle: classement au format de calculer_classement_classe}
+    
+    Sans cache : les notes de toutes les classes sont lues en une passe par
+    le moteur NumPy ; s'il est désactivé, chaque classe est calculée par le
+    moteur Decimal.
+    """
+    start_time = time.time()
+    annuel = system_type in ['annuel_trimestriel', 'annuel_semestriel']
+    moteur = _moteur_vectoriel()
+    if moteur is None:
+        resultats = {
+            cle: (
+                calculer_moyennes_classe_annuelle_decimal(eleves, matieres, system_type, use_cache=False)
+                if annuel else
+                calculer_moyennes_classe_decimal(eleves, matieres, periode, system_type, use_cache=False)
+            )
+            for cle, (eleves, matieres) in groupes.items()
+        }
+    elif annuel:
+        resultats = moteur.calculer_moyennes_annuelles_classes_vectorise(groupes, system_type)
+    else:
+        resultats = moteur.calculer_moyennes_classes_vectorise(groupes, periode, system_type)
+    
+    classements = {
+        cle: _classement_depuis_moyennes(eleves, resultats.get(cle, {}))
+        for cle, (eleves, _matieres) in groupes.items()
+    }
+    elapsed_time = (time.time() - start_time) * 1000
+    logger.info(f"Classements calculés pour {len(classements)} classes en {elapsed_time:.1f}ms")
+    return classements
+
+
 def calculer_classement_classe(eleves, matieres, periode, system_type='mensuel', use_cache=True):
     """
     Calcule le classement complet d'une classe
@@ -972,16 +1106,18 @@ def calculer_classement_classe(eleves, matieres, periode, system_type='mensuel',
     if isinstance(matieres, list):
         if matieres:
             classe_id = matieres[0].classe_id
-            cache_key = f"classement_classe_s{CALCUL_CACHE_SCHEMA_VERSION}_{classe_id}_periode_{periode}_type_{system_type}"
         else:
-            cache_key = None
+            classe_id = None
     else:
         # Générer une clé de cache basée sur les paramètres
-        if matieres.exists():
-            classe_id = matieres.first().classe_id
-            cache_key = f"classement_classe_s{CALCUL_CACHE_SCHEMA_VERSION}_{classe_id}_periode_{periode}_type_{system_type}"
-        else:
-            cache_key = None
+        premiere = matieres.first()
+        classe_id = premiere.classe_id if premiere else None
+    cache_key = None
+    if classe_id and use_cache:
+        cache_key = cle_etiquetee(
+            f"classement_classe_s{CALCUL_CACHE_SCHEMA_VERSION}_{classe_id}_periode_{periode}_type_{system_type}",
+            tag_classe(classe_id),
+        )
     
     # Vérifier le cache
     if cache_key and use_cache:
@@ -992,80 +1128,23 @@ def calculer_classement_classe(eleves, matieres, periode, system_type='mensuel',
     
     start_time = time.time()
     
-    moyennes_par_eleve = {}
-    details_par_eleve = {}
-    
-    # Collecter tous les IDs des élèves pour garantir que chacun ait un rang
-    all_eleve_ids = set(eleve.id for eleve in eleves)
-    
     # OPTIMISATION: Utiliser la fonction optimisée pour les systèmes non-annuels
     if system_type not in ['annuel_trimestriel', 'annuel_semestriel']:
         # Calcul en lot (2-3 requêtes au lieu de N*M)
-        resultats_optimises = calculer_moyennes_classe_optimise(
+        resultats = calculer_moyennes_classe_optimise(
             eleves,
             matieres,
             periode,
             system_type,
             use_cache=use_cache,
         )
-        
-        for eleve_id, result in resultats_optimises.items():
-            if result['moyenne_generale'] is not None:
-                moyennes_par_eleve[eleve_id] = result['moyenne_generale']
-                details_par_eleve[eleve_id] = result
     else:
         # OPTIMISATION: calcul annuel batché (réutilise le batch par période)
-        resultats_annuels = calculer_moyennes_classe_annuelle_optimise(
+        resultats = calculer_moyennes_classe_annuelle_optimise(
             eleves, matieres, system_type, use_cache=use_cache,
         )
-        for eleve_id, result in resultats_annuels.items():
-            if result['moyenne_generale'] is not None:
-                moyennes_par_eleve[eleve_id] = result['moyenne_generale']
-                details_par_eleve[eleve_id] = result
-    
-    # Élèves sans notes = moyenne 0 par défaut (évite de favoriser les absents)
-    for eleve_id in all_eleve_ids:
-        if eleve_id not in moyennes_par_eleve:
-            moyennes_par_eleve[eleve_id] = 0.0
-            details_par_eleve[eleve_id] = {
-                'moyenne_generale': 0.0,
-                'total_points': 0,
-                'total_coefficients': 0,
-                'details_matieres': [],
-                'niveau': 'INCONNU',
-                'appreciations_only': False,
-                'sans_notes': True,
-            }
-    
-    # Créer le classement trié (tri par moyenne puis par matricule pour stabiliser les ex-æquo)
-    # Récupérer les matricules pour le tri secondaire
-    matricules_map = {eleve.id: eleve.matricule for eleve in eleves}
-    classement = sorted(
-        moyennes_par_eleve.items(), 
-        key=lambda x: (-float(x[1]), matricules_map.get(x[0], ""))
-    )
-    
-    # Créer le mapping des rangs (gestion des ex-aequo)
-    rang_map = {}
-    prev_moyenne = None
-    prev_rang = 0
-    
-    for idx, (eleve_id, moyenne) in enumerate(classement, start=1):
-        if moyenne == prev_moyenne:
-            # Ex-aequo: même rang que le précédent
-            rang_map[eleve_id] = prev_rang
-        else:
-            rang_map[eleve_id] = idx
-            prev_rang = idx
-        prev_moyenne = moyenne
-    
-    result = {
-        'moyennes_par_eleve': moyennes_par_eleve,
-        'classement': classement,
-        'rang_map': rang_map,
-        'details_par_eleve': details_par_eleve,
-        'total_eleves': len(all_eleve_ids),
-    }
+    result = _classement_depuis_moyennes(eleves, resultats)
+    classement = result['classement']
     
     # Mesurer et logger le temps
     elapsed_time = (time.time() - start_time) * 1000
@@ -1400,262 +1479,300 @@ def calculer_bulletin_intelligent(eleve, matiere, periode, system_type):
     Returns:
         dict avec toutes les données nécessaires pour l'affichage du bulletin
     """
-    # Détecter le niveau scolaire pour les coefficients
-    niveau = detecter_niveau_scolaire(matiere.classe.nom if hasattr(matiere.classe, 'nom') else '')
-    est_primaire = (niveau == 'PRIMAIRE')
-    
-    # Déterminer le coefficient effectif
-    if est_primaire:
-        coefficient_effectif = Decimal('1')
-    else:
-        coefficient_effectif = matiere.coefficient if matiere.coefficient and matiere.coefficient > 0 else Decimal('1')
-    
-    # Initialiser les résultats
-    result = {
-        'matiere': matiere,
-        'moyenne_continue': None,
-        'note_composition': None,
-        'moyenne': None,
-        'moyennes_mensuelles': [],  # Pour affichage détaillé
-        'coefficient': float(coefficient_effectif),
-        'points': None,
-        'niveau': niveau,
-        'est_primaire': est_primaire,
-    }
-    
-    # ============================================================
-    # SYSTÈME MENSUEL: Note du mois uniquement
-    # ============================================================
-    if system_type == 'mensuel':
-        note_mensuelle = NoteMensuelle.objects.filter(
-            eleve=eleve,
-            matiere=matiere,
-            mois=periode,
-            annee_scolaire=matiere.classe.annee_scolaire
-        ).first()
-        if note_mensuelle and not note_mensuelle.absent and note_mensuelle.note is not None:
-            _b = bonus_suivi(eleve.id, matiere.id, periode, matiere.classe.annee_scolaire)
-            _val = _appliquer_bonus(float(note_mensuelle.note), _b)
-            result['moyenne_continue'] = _val
-            result['moyenne'] = _val
-    
-    # ============================================================
-    # SYSTÈME TRIMESTRIEL: Moyenne des mois + Composition
-    # ============================================================
-    elif system_type in ['trimestre', 'trimestriel']:
-        # Déterminer les mois du trimestre
-        mois_mapping = {
-            'TRIMESTRE_1': ['OCTOBRE', 'NOVEMBRE'],  # Décembre = Composition
-            'TRIMESTRE_2': ['JANVIER', 'FEVRIER'],   # Mars = Composition
-            'TRIMESTRE_3': ['AVRIL', 'MAI'],         # Juin = Composition
+    lot = NotesBulletinLot([eleve.id], [matiere], periode, system_type)
+    return lot.bulletin_matiere(eleve.id, matiere, periode, system_type)
+
+
+def _mois_continus_periode(periode, system_type):
+    """Mois de cours continus d'une période, tels que lus par calculer_moyenne_matiere."""
+    if system_type in ['trimestriel', 'trimestre']:
+        if 'TRIMESTRE_1' in periode or periode == '1er Trimestre':
+            return ['OCTOBRE', 'NOVEMBRE']
+        if 'TRIMESTRE_2' in periode or periode == '2ème Trimestre':
+            return ['JANVIER', 'FEVRIER']
+        if 'TRIMESTRE_3' in periode or periode == '3ème Trimestre':
+            return ['AVRIL', 'MAI']
+    elif system_type in ['semestriel', 'semestre']:
+        if 'SEMESTRE_1' in periode or periode == '1er Semestre':
+            return ['OCTOBRE', 'NOVEMBRE', 'DECEMBRE', 'JANVIER']
+        if 'SEMESTRE_2' in periode or periode == '2ème Semestre':
+            return ['MARS', 'AVRIL', 'MAI']
+    return []
+
+
+# Mois affichés sur le bulletin (la composition tient lieu du dernier mois)
+_MOIS_BULLETIN = {
+    'TRIMESTRE_1': ['OCTOBRE', 'NOVEMBRE'],
+    'TRIMESTRE_2': ['JANVIER', 'FEVRIER'],
+    'TRIMESTRE_3': ['AVRIL', 'MAI'],
+    'SEMESTRE_1': ['OCTOBRE', 'NOVEMBRE', 'DECEMBRE', 'JANVIER'],
+    'SEMESTRE_2': ['MARS', 'AVRIL', 'MAI'],
+}
+
+# Sous-périodes d'un bulletin annuel: (période, type de système, libellé)
+_SOUS_PERIODES_ANNUELLES = {
+    'annuel_trimestriel': [
+        ('TRIMESTRE_1', 'trimestre', '1er Trim.'),
+        ('TRIMESTRE_2', 'trimestre', '2ème Trim.'),
+        ('TRIMESTRE_3', 'trimestre', '3ème Trim.'),
+    ],
+    'annuel_semestriel': [
+        ('SEMESTRE_1', 'semestre', '1er Sem.'),
+        ('SEMESTRE_2', 'semestre', '2ème Sem.'),
+    ],
+}
+
+
+class NotesBulletinLot:
+    """
+    Notes d'un lot d'élèves pour une période, chargées en 3 ou 4 requêtes.
+
+    Produit pour chaque (élève, matière) exactement le résultat de
+    calculer_bulletin_intelligent, qui faisait jusqu'à une dizaine de
+    requêtes par matière et par élève (N×M pour un bulletin de classe).
+
+    Usage:
+        lot = NotesBulletinLot([e.id for e in eleves], matieres, periode, system_type)
+        for eleve in eleves:
+            for matiere in matieres:
+                detail = lot.bulletin_matiere(eleve.id, matiere, periode, system_type)
+    """
+
+    def __init__(self, eleves_ids, matieres, periode, system_type):
+        self.eleves_ids = set(eleves_ids)
+        self._classes = {}
+        for matiere in matieres:
+            if matiere.classe_id not in self._classes:
+                self._classes[matiere.classe_id] = matiere.classe
+        self._niveaux = {
+            cid: detecter_niveau_scolaire(classe.nom if hasattr(classe, 'nom') else '')
+            for cid, classe in self._classes.items()
         }
-        mois_periode = mois_mapping.get(periode, [])
-        
-        # Calculer la moyenne continue des mois
-        if mois_periode:
-            total_notes = Decimal('0')
-            count_notes = 0
-            moyennes_detail = []
-            
-            for mois in mois_periode:
-                note_mensuelle = NoteMensuelle.objects.filter(
-                    eleve=eleve,
-                    matiere=matiere,
-                    mois=mois,
-                    annee_scolaire=matiere.classe.annee_scolaire
-                ).first()
-                if note_mensuelle and not note_mensuelle.absent and note_mensuelle.note is not None:
-                    _b = bonus_suivi(eleve.id, matiere.id, mois, matiere.classe.annee_scolaire)
-                    _val = _appliquer_bonus(float(note_mensuelle.note), _b)
-                    total_notes += Decimal(str(_val))
-                    count_notes += 1
-                    moyennes_detail.append({
-                        'libelle': mois[:3] + '.',
-                        'moyenne': _val,
-                        'absent': False
-                    })
-                else:
-                    moyennes_detail.append({
-                        'libelle': mois[:3] + '.',
-                        'moyenne': None,
-                        'absent': note_mensuelle.absent if note_mensuelle else True
-                    })
-            
-            result['moyennes_mensuelles'] = moyennes_detail
-            
-            if count_notes > 0:
-                result['moyenne_continue'] = float(total_notes / count_notes)
-        
-        # Récupérer la note de composition
-        compo = CompositionNote.objects.filter(
-            eleve=eleve,
-            matiere=matiere,
-            periode=periode,
-            annee_scolaire=matiere.classe.annee_scolaire
-        ).first()
-        if compo and not compo.absent and compo.note is not None:
-            result['note_composition'] = float(compo.note)
+        self.notes = {}
+        self.compositions = {}
+        self.matieres_composees = set()
+        self.bonus = {}
+        if not matieres or not self.eleves_ids:
+            return
+
+        if system_type in _SOUS_PERIODES_ANNUELLES:
+            sous_periodes = [(p, st) for p, st, _ in _SOUS_PERIODES_ANNUELLES[system_type]]
+        else:
+            sous_periodes = [(periode, system_type)]
+        mois, periodes_compo = set(), set()
+        for p, st in sous_periodes:
+            if st == 'mensuel':
+                mois.add(p)
+                continue
+            mois.update(_MOIS_BULLETIN.get(p, []))
+            mois.update(_mois_continus_periode(p, st))
+            periodes_compo.update(_periodes_composition_equivalentes(p, st))
 
-        # RÈGLE STRICTE: la classe a composé mais pas cet élève -> 0
-        if result['note_composition'] is None and _matiere_a_compositions(matiere, periode, 'trimestre'):
-            result['note_composition'] = 0.0
+        matieres_ids = [m.id for m in matieres]
+        annees = {m.id: self._classes[m.classe_id].annee_scolaire for m in matieres}
 
-        # Calculer la moyenne finale - LOGIQUE ADAPTATIVE
-        # CAS 1: Les deux existent -> formule guineenne par niveau
-        # CAS 2: Seulement composition (école sans notes mensuelles) → Utiliser directement
-        # CAS 3: Seulement notes mensuelles → Utiliser directement
-        moyenne_calculee = calculer_moyenne_periode_guineenne(
-            result['moyenne_continue'],
-            result['note_composition'],
-            'PRIMAIRE' if est_primaire else 'SECONDAIRE'
+        for row in NoteMensuelle.objects.filter(
+            eleve_id__in=self.eleves_ids,
+            matiere_id__in=matieres_ids,
+            annee_scolaire__in=set(annees.values()),
+            mois__in=mois,
+        ).values('eleve_id', 'matiere_id', 'mois', 'note', 'absent', 'annee_scolaire'):
+            if row['annee_scolaire'] == annees[row['matiere_id']]:
+                self.notes[(row['eleve_id'], row['matiere_id'], row['mois'])] = row
+
+        if periodes_compo:
+            # Toute la classe est lue : la règle stricte dépend des autres élèves
+            for row in CompositionNote.objects.filter(
+                matiere_id__in=matieres_ids,
+                annee_scolaire__in=set(annees.values()),
+                periode__in=periodes_compo,
+            ).values('eleve_id', 'matiere_id', 'periode', 'note', 'absent', 'annee_scolaire'):
+                if row['annee_scolaire'] != annees[row['matiere_id']]:
+                    continue
+                self.matieres_composees.add((row['matiere_id'], row['periode']))
+                if row['eleve_id'] in self.eleves_ids:
+                    self.compositions[(row['eleve_id'], row['matiere_id'], row['periode'])] = row
+
+        # Bonus de suivi: les matières d'une même classe partagent l'année
+        for annee in set(annees.values()):
+            ids = [mid for mid, a in annees.items() if a == annee]
+            self.bonus.update(bonus_suivi_batch(list(self.eleves_ids), ids, list(mois), annee))
+
+    def niveau(self, matiere):
+        return self._niveaux[matiere.classe_id]
+
+    def _note_mensuelle(self, eleve_id, matiere_id, mois):
+        """(ligne brute, note bonifiée ou None si absent / non saisie)."""
+        row = self.notes.get((eleve_id, matiere_id, mois))
+        if row and not row['absent'] and row['note'] is not None:
+            _b = self.bonus.get((eleve_id, matiere_id, mois), 0.0)
+            return row, _appliquer_bonus(float(row['note']), _b)
+        return row, None
+
+    def _composition(self, eleve_id, matiere_id, periode):
+        row = self.compositions.get((eleve_id, matiere_id, periode))
+        if row and not row['absent'] and row['note'] is not None:
+            return float(row['note'])
+        return None
+
+    def _composition_semestre_repli(self, eleve_id, matiere_id, periode):
+        """Équivalent de _compositions_semestre_depuis_trimestres pour une case."""
+        p = periode or ''
+        if 'SEMESTRE_1' in p or p == '1er Semestre':
+            code = 'SEMESTRE_1'
+        elif 'SEMESTRE_2' in p or p == '2ème Semestre':
+            code = 'SEMESTRE_2'
+        else:
+            return None
+        notes = [
+            n for n in (
+                self._composition(eleve_id, matiere_id, t)
+                for t in _SEMESTRE_FALLBACK_TRIMESTRES[code]
+            )
+            if n is not None
+        ]
+        return sum(notes) / len(notes) if notes else None
+
+    def _matiere_a_compositions(self, matiere_id, periode, system_type):
+        return any(
+            (matiere_id, p) in self.matieres_composees
+            for p in _periodes_composition_equivalentes(periode, system_type)
         )
-        if moyenne_calculee is not None:
-            result['moyenne'] = round(moyenne_calculee, 2)
-    
-    # ============================================================
-    # SYSTÈME SEMESTRIEL: Moyenne des mois + Composition
-    # ============================================================
-    elif system_type in ['semestre', 'semestriel']:
-        # Déterminer les mois du semestre
-        mois_mapping = {
-            'SEMESTRE_1': ['OCTOBRE', 'NOVEMBRE', 'DECEMBRE', 'JANVIER'],  # Février = Composition
-            'SEMESTRE_2': ['MARS', 'AVRIL', 'MAI'],                        # Juin = Composition
-        }
-        mois_periode = mois_mapping.get(periode, [])
-        
-        # Calculer la moyenne continue des mois
+
+    def moyenne_periode_matiere(self, eleve_id, matiere, periode, system_type):
+        """Moyenne d'une matière sur un trimestre ou un semestre (calculer_moyenne_matiere)."""
+        moyenne_continue = None
+        mois_periode = _mois_continus_periode(periode, system_type)
         if mois_periode:
             total_notes = Decimal('0')
             count_notes = 0
-            moyennes_detail = []
-            
             for mois in mois_periode:
-                note_mensuelle = NoteMensuelle.objects.filter(
-                    eleve=eleve,
-                    matiere=matiere,
-                    mois=mois,
-                    annee_scolaire=matiere.classe.annee_scolaire
-                ).first()
-                if note_mensuelle and not note_mensuelle.absent and note_mensuelle.note is not None:
-                    _b = bonus_suivi(eleve.id, matiere.id, mois, matiere.classe.annee_scolaire)
-                    _val = _appliquer_bonus(float(note_mensuelle.note), _b)
+                _row, _val = self._note_mensuelle(eleve_id, matiere.id, mois)
+                if _val is not None:
                     total_notes += Decimal(str(_val))
                     count_notes += 1
-                    moyennes_detail.append({
-                        'libelle': mois[:3] + '.',
-                        'moyenne': _val,
-                        'absent': False
-                    })
-                else:
-                    moyennes_detail.append({
-                        'libelle': mois[:3] + '.',
-                        'moyenne': None,
-                        'absent': note_mensuelle.absent if note_mensuelle else True
-                    })
-            
-            result['moyennes_mensuelles'] = moyennes_detail
-            
             if count_notes > 0:
-                result['moyenne_continue'] = float(total_notes / count_notes)
-        
-        # Récupérer la note de composition
-        compo = CompositionNote.objects.filter(
-            eleve=eleve,
-            matiere=matiere,
-            periode=periode,
-            annee_scolaire=matiere.classe.annee_scolaire
-        ).first()
-        if compo and not compo.absent and compo.note is not None:
-            result['note_composition'] = float(compo.note)
+                moyenne_continue = float(total_notes / count_notes)
 
-        # Repli: compositions saisies en trimestres mais consultation semestrielle
-        if result['note_composition'] is None:
-            fb = _compositions_semestre_depuis_trimestres(
-                [eleve.id], [matiere.id], periode, matiere.classe.annee_scolaire
+        note_composition = self._composition(eleve_id, matiere.id, periode)
+        if note_composition is None and system_type in ['semestriel', 'semestre']:
+            note_composition = self._composition_semestre_repli(eleve_id, matiere.id, periode)
+        if note_composition is None and self._matiere_a_compositions(matiere.id, periode, system_type):
+            note_composition = 0.0
+
+        if moyenne_continue is not None and note_composition is not None:
+            return calculer_moyenne_periode_guineenne(
+                moyenne_continue,
+                note_composition,
+                'PRIMAIRE' if self.niveau(matiere) == 'PRIMAIRE' else 'SECONDAIRE'
             )
-            val_fb = fb.get((eleve.id, matiere.id))
-            if val_fb is not None:
-                result['note_composition'] = val_fb
+        if note_composition is not None:
+            return note_composition
+        return moyenne_continue
 
-        # RÈGLE STRICTE: la classe a composé mais pas cet élève -> 0
-        if result['note_composition'] is None and _matiere_a_compositions(matiere, periode, 'semestre'):
-            result['note_composition'] = 0.0
+    def bulletin_matiere(self, eleve_id, matiere, periode, system_type):
+        """Données d'une matière pour le bulletin (même format que calculer_bulletin_intelligent)."""
+        niveau = self.niveau(matiere)
+        est_primaire = (niveau == 'PRIMAIRE')
+        if est_primaire:
+            coefficient_effectif = Decimal('1')
+        else:
+            coefficient_effectif = matiere.coefficient if matiere.coefficient and matiere.coefficient > 0 else Decimal('1')
 
-        # Calculer la moyenne finale - LOGIQUE ADAPTATIVE
-        # CAS 1: Les deux existent -> formule guineenne par niveau
-        # CAS 2: Seulement composition (école sans notes mensuelles) → Utiliser directement
-        # CAS 3: Seulement notes mensuelles → Utiliser directement
-        moyenne_calculee = calculer_moyenne_periode_guineenne(
-            result['moyenne_continue'],
-            result['note_composition'],
-            'PRIMAIRE' if est_primaire else 'SECONDAIRE'
-        )
-        if moyenne_calculee is not None:
-            result['moyenne'] = round(moyenne_calculee, 2)
-
-    # ============================================================
-    # SYSTÈME ANNUEL TRIMESTRIEL: (T1 + T2 + T3) / 3
-    # ============================================================
-    elif system_type == 'annuel_trimestriel':
-        periodes_trim = ['TRIMESTRE_1', 'TRIMESTRE_2', 'TRIMESTRE_3']
-        labels_trim = ['1er Trim.', '2ème Trim.', '3ème Trim.']
-        moyennes_periodes = []
-        
-        for i, periode_code in enumerate(periodes_trim):
-            # Utiliser la fonction existante pour calculer la moyenne du trimestre
-            result_trim = calculer_moyenne_matiere(eleve, matiere, periode_code, 'trimestre')
-            moy_trim = result_trim['moyenne_matiere']
-            
-            moyennes_periodes.append({
-                'libelle': labels_trim[i],
-                'moyenne': moy_trim,
-                'absent': moy_trim is None
-            })
-        
-        result['moyennes_mensuelles'] = moyennes_periodes
-        
-        # Calculer la moyenne annuelle: (T1 + T2 + T3) / 3
-        moyennes_valides = [m['moyenne'] for m in moyennes_periodes if m['moyenne'] is not None]
-        if moyennes_valides:
-            moyennes_avec_absents = [m['moyenne'] if m['moyenne'] is not None else 0 for m in moyennes_periodes]
-            result['moyenne'] = round(sum(moyennes_avec_absents) / len(moyennes_avec_absents), 2)
-            result['moyenne_continue'] = result['moyenne']  # Pour compatibilité
-    
-    # ============================================================
-    # SYSTÈME ANNUEL SEMESTRIEL: (S1 + S2) / 2
-    # ============================================================
-    elif system_type == 'annuel_semestriel':
-        periodes_sem = ['SEMESTRE_1', 'SEMESTRE_2']
-        labels_sem = ['1er Sem.', '2ème Sem.']
-        moyennes_periodes = []
-        
-        for i, periode_code in enumerate(periodes_sem):
-            # Utiliser la fonction existante pour calculer la moyenne du semestre
-            result_sem = calculer_moyenne_matiere(eleve, matiere, periode_code, 'semestre')
-            moy_sem = result_sem['moyenne_matiere']
-            
-            moyennes_periodes.append({
-                'libelle': labels_sem[i],
-                'moyenne': moy_sem,
-                'absent': moy_sem is None
-            })
-        
-        result['moyennes_mensuelles'] = moyennes_periodes
-        
-        # Calculer la moyenne annuelle: (S1 + S2) / 2
-        moyennes_valides = [m['moyenne'] for m in moyennes_periodes if m['moyenne'] is not None]
-        if moyennes_valides:
-            moyennes_avec_absents = [m['moyenne'] if m['moyenne'] is not None else 0 for m in moyennes_periodes]
-            result['moyenne'] = round(sum(moyennes_avec_absents) / len(moyennes_avec_absents), 2)
-            result['moyenne_continue'] = result['moyenne']  # Pour compatibilité
-    
-    # ============================================================
-    # CALCULER LES POINTS
-    # ============================================================
-    # Élève non évalué dans cette matière = note 0 par défaut
-    if result['moyenne'] is None:
-        result['moyenne'] = 0.0
-    
-    result['points'] = round(result['moyenne'] * float(coefficient_effectif), 2)
-    
-    return result
+        result = {
+            'matiere': matiere,
+            'moyenne_continue': None,
+            'note_composition': None,
+            'moyenne': None,
+            'moyennes_mensuelles': [],  # Pour affichage détaillé
+            'coefficient': float(coefficient_effectif),
+            'points': None,
+            'niveau': niveau,
+            'est_primaire': est_primaire,
+        }
+
+        if system_type == 'mensuel':
+            # Note du mois uniquement
+            _row, _val = self._note_mensuelle(eleve_id, matiere.id, periode)
+            if _val is not None:
+                result['moyenne_continue'] = _val
+                result['moyenne'] = _val
+
+        elif system_type in ['trimestre', 'trimestriel', 'semestre', 'semestriel']:
+            # Moyenne des mois + composition
+            type_compo = 'semestre' if system_type in ['semestre', 'semestriel'] else 'trimestre'
+            mois_periode = _MOIS_BULLETIN.get(periode, [])
+            if type_compo == 'trimestre' and 'SEMESTRE' in periode:
+                mois_periode = []
+            if type_compo == 'semestre' and 'TRIMESTRE' in periode:
+                mois_periode = []
+            if mois_periode:
+                total_notes = Decimal('0')
+                count_notes = 0
+                moyennes_detail = []
+                for mois in mois_periode:
+                    row, _val = self._note_mensuelle(eleve_id, matiere.id, mois)
+                    if _val is not None:
+                        total_notes += Decimal(str(_val))
+                        count_notes += 1
+                        moyennes_detail.append({'libelle': mois[:3] + '.', 'moyenne': _val, 'absent': False})
+                    else:
+                        moyennes_detail.append({
+                            'libelle': mois[:3] + '.',
+                            'moyenne': None,
+                            'absent': row['absent'] if row else True,
+                        })
+                result['moyennes_mensuelles'] = moyennes_detail
+                if count_notes > 0:
+                    result['moyenne_continue'] = float(total_notes / count_notes)
+
+            result['note_composition'] = self._composition(eleve_id, matiere.id, periode)
+            # Repli: compositions saisies en trimestres mais consultation semestrielle
+            if result['note_composition'] is None and type_compo == 'semestre':
+                result['note_composition'] = self._composition_semestre_repli(eleve_id, matiere.id, periode)
+            # RÈGLE STRICTE: la classe a composé mais pas cet élève -> 0
+            if result['note_composition'] is None and self._matiere_a_compositions(matiere.id, periode, type_compo):
+                result['note_composition'] = 0.0
+
+            moyenne_calculee = calculer_moyenne_periode_guineenne(
+                result['moyenne_continue'],
+                result['note_composition'],
+                'PRIMAIRE' if est_primaire else 'SECONDAIRE'
+            )
+            if moyenne_calculee is not None:
+                result['moyenne'] = round(moyenne_calculee, 2)
+
+        elif system_type in _SOUS_PERIODES_ANNUELLES:
+            # Annuel: moyenne des trimestres (T1+T2+T3)/3 ou des semestres (S1+S2)/2
+            moyennes_periodes = []
+            for periode_code, st, libelle in _SOUS_PERIODES_ANNUELLES[system_type]:
+                moy = self.moyenne_periode_matiere(eleve_id, matiere, periode_code, st)
+                moyennes_periodes.append({'libelle': libelle, 'moyenne': moy, 'absent': moy is None})
+            result['moyennes_mensuelles'] = moyennes_periodes
+            if any(m['moyenne'] is not None for m in moyennes_periodes):
+                moyennes_avec_absents = [m['moyenne'] if m['moyenne'] is not None else 0 for m in moyennes_periodes]
+                result['moyenne'] = round(sum(moyennes_avec_absents) / len(moyennes_avec_absents), 2)
+                result['moyenne_continue'] = result['moyenne']  # Pour compatibilité
+
+        # Élève non évalué dans cette matière = note 0 par défaut
+        if result['moyenne'] is None:
+            result['moyenne'] = 0.0
+        result['points'] = round(result['moyenne'] * float(coefficient_effectif), 2)
+        return result
+
+
+def calculer_bulletins_classe(eleves, matieres, periode, system_type):
+    """
+    Détails de bulletin de tous les élèves d'une classe en quelques requêtes.
+
+    Returns:
+        dict {(eleve_id, matiere_id): résultat de calculer_bulletin_intelligent}
+    """
+    matieres = list(matieres)
+    eleves_ids = [e.id for e in eleves]
+    lot = NotesBulletinLot(eleves_ids, matieres, periode, system_type)
+    return {
+        (eleve_id, matiere.id): lot.bulletin_matiere(eleve_id, matiere, periode, system_type)
+        for eleve_id in eleves_ids
+        for matiere in matieres
+    }
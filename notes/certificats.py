@@ -11,7 +11,7 @@ import os
 import logging
 
 from .models import ClasseNote, MatiereNote
-from eleves.models import Eleve, Classe as ClasseEleve
+from eleves.models import Eleve
 
 logger = logging.getLogger(__name__)
 
@@ -39,11 +39,8 @@ def certificats_appreciation_pdf(request):
         ecole = classe_note.ecole
         
         # Récupérer la classe élève correspondante
-        classe_eleve = ClasseEleve.objects.filter(
-            nom__iexact=classe_note.nom,
-            annee_scolaire=classe_note.annee_scolaire,
-            ecole=ecole
-        ).first()
+        from .utils_rangs import classe_eleve_correspondante
+        classe_eleve = classe_eleve_correspondante(classe_note)
         
         if not classe_eleve:
             return HttpResponse(f"Classe élèves non trouvée pour {classe_note.nom}", status=404)
@@ -79,3 +79,70 @@ def trouver_classe_eleve(classe_note):
         return meme_niveau_actif[0]
 
     return None
+
+
+def est_lien_exact(classe_note, classe_eleve):
+    """Même école, même année et même nom normalisé.
+
+    Seul un tel lien est enregistré : relier_classes_notes le tient à jour
+    quand la classe élèves change. Les rapprochements de trouver_classe_eleve
+    (autre année, même niveau) ne servent qu'à l'assistance de saisie.
+    """
+    return (
+        classe_eleve is not None
+        and classe_eleve.ecole_id == classe_note.ecole_id
+        and classe_eleve.annee_scolaire == classe_note.annee_scolaire
+        and normaliser_nom_classe(classe_eleve.nom) == normaliser_nom_classe(classe_note.nom)
+    )
+
+
+def classe_eleve_exacte(classe_note):
+    """Classe élèves de même nom normalisé, même école et même année, ou None."""
+    nom_recherche = normaliser_nom_classe(classe_note.nom)
+    for classe in ClasseEleve.objects.filter(
+        ecole_id=classe_note.ecole_id, annee_scolaire=classe_note.annee_scolaire,
+    ).order_by('id'):
+        if normaliser_nom_classe(classe.nom) == nom_recherche:
+            return classe
+    return None
+
+
+def lier_classe_eleve(classe_note):
+    """Enregistre le lien ClasseNote -> Classe (élèves) exact et retourne la
+    classe, ou None.
+
+    Écrit par update() : ni horodatage ni journal de synchronisation, chaque
+    poste retrouve la même classe.
+    """
+    classe_eleve = classe_eleve_exacte(classe_note)
+    if classe_eleve is not None:
+        type(classe_note).objects.filter(pk=classe_note.pk).update(classe_eleve=classe_eleve)
+        classe_note.classe_eleve = classe_eleve
+    return classe_eleve
+
+
+def relier_classes_notes(classe):
+    """Après création ou renommage d'une classe élèves : les classes Notes
+    de même nom (même école, même année) y sont rattachées, celles qui y
+    étaient rattachées sous l'ancien nom sont détachées (re-liées à la
+    prochaine lecture)."""
+    from .models import ClasseNote
+
+    nom = normaliser_nom_classe(classe.nom)
+    a_lier, a_detacher = [], []
+    for classe_note in ClasseNote.objects.filter(
+        Q(classe_eleve=classe) | Q(ecole_id=classe.ecole_id, annee_scolaire=classe.annee_scolaire)
+    ).only('id', 'nom', 'annee_scolaire', 'ecole_id', 'classe_eleve_id'):
+        meme_classe = (
+            classe_note.ecole_id == classe.ecole_id
+            and classe_note.annee_scolaire == classe.annee_scolaire
+            and normaliser_nom_classe(classe_note.nom) == nom
+        )
+        if meme_classe and classe_note.classe_eleve_id != classe.pk:
+            a_lier.append(classe_note.pk)
+        elif not meme_classe and classe_note.classe_eleve_id == classe.pk:
+            a_detacher.append(classe_note.pk)
+    if a_lier:
+        ClasseNote.objects.filter(pk__in=a_lier).update(classe_eleve=classe)
+    if a_detacher:
+        ClasseNote.objects.filter(pk__in=a_detacher).update(classe_eleve=None)
@@ -63,14 +63,10 @@ def _calculer_statistiques_classe(classe_note, periode):
     Utilise la même source de calcul que le bulletin de notes (calculs_moyennes.py)
     pour garantir l'identité des moyennes sur tous les documents."""
     from .calculs_moyennes import detecter_niveau_scolaire, calculer_moyennes_classe_optimise
-    from .utils_rangs import calculer_rangs_classe_periode
+    from .utils_rangs import calculer_rangs_classe_periode, classe_eleve_correspondante
 
     # Récupérer la classe élève correspondante
-    classe_eleve = ClasseEleve.objects.filter(
-        nom__iexact=classe_note.nom,
-        annee_scolaire=classe_note.annee_scolaire,
-        ecole=classe_note.ecole
-    ).first()
+    classe_eleve = classe_eleve_correspondante(classe_note)
 
     if not classe_eleve:
         classe_eleve = ClasseEleve.objects.filter(
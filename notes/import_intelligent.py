@@ -147,17 +147,12 @@ def generer_template_intelligent(classe_id, periode, system_type='trimestre'):
 
 def _trouver_classe_eleve(classe_note):
     """Trouve la ClasseEleve correspondant à une ClasseNote"""
-    ecole = classe_note.ecole
-    
-    # Méthode 1: Correspondance exacte avec année scolaire ET école
-    if ecole:
-        classe_eleve = ClasseEleve.objects.filter(
-            nom__iexact=classe_note.nom,
-            annee_scolaire=classe_note.annee_scolaire,
-            ecole=ecole
-        ).first()
-        if classe_eleve:
-            return classe_eleve
+    from .utils_rangs import classe_eleve_correspondante
+
+    # Méthode 1: Lien enregistré (même école, même année)
+    classe_eleve = classe_eleve_correspondante(classe_note)
+    if classe_eleve:
+        return classe_eleve
     
     # Méthode 2: Correspondance exacte avec année scolaire
     classe_eleve = ClasseEleve.objects.filter(
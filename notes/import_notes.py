@@ -250,11 +250,11 @@ class ImportNotesProcessor:
             
             # ⚡ BULK OPERATIONS (1 seule requête pour toutes les créations)
             if notes_a_creer:
-                NoteMensuelle.objects.bulk_create(notes_a_creer, batch_size=500)
+                NoteMensuelle.objects.bulk_create_tracked(notes_a_creer, batch_size=500)
             
             # ⚡ BULK UPDATE (1 seule requête pour toutes les modifications)
             if notes_a_modifier:
-                NoteMensuelle.objects.bulk_update(
+                NoteMensuelle.objects.bulk_update_tracked(
                     notes_a_modifier, 
                     ['note', 'absent', 'cree_par'],
                     batch_size=500
@@ -331,11 +331,11 @@ class ImportNotesProcessor:
             
             # ⚡ BULK OPERATIONS (1 seule requête pour toutes les créations)
             if notes_a_creer:
-                CompositionNote.objects.bulk_create(notes_a_creer, batch_size=500)
+                CompositionNote.objects.bulk_create_tracked(notes_a_creer, batch_size=500)
             
             # ⚡ BULK UPDATE (1 seule requête pour toutes les modifications)
             if notes_a_modifier:
-                CompositionNote.objects.bulk_update(
+                CompositionNote.objects.bulk_update_tracked(
                     notes_a_modifier, 
                     ['note', 'absent', 'cree_par'],
                     batch_size=500
@@ -413,11 +413,11 @@ class ImportNotesProcessor:
             
             # ⚡ BULK OPERATIONS (1 seule requête pour toutes les créations)
             if notes_a_creer:
-                NoteEleve.objects.bulk_create(notes_a_creer, batch_size=500)
+                NoteEleve.objects.bulk_create_tracked(notes_a_creer, batch_size=500)
             
             # ⚡ BULK UPDATE (1 seule requête pour toutes les modifications)
             if notes_a_modifier:
-                NoteEleve.objects.bulk_update(
+                NoteEleve.objects.bulk_update_tracked(
                     notes_a_modifier, 
                     ['note', 'absent', 'cree_par'],
                     batch_size=500
@@ -483,10 +483,10 @@ class ImportNotesProcessor:
         
         # Bulk operations
         if notes_mensuelle_a_creer:
-            NoteMensuelle.objects.bulk_create(notes_mensuelle_a_creer, batch_size=500)
+            NoteMensuelle.objects.bulk_create_tracked(notes_mensuelle_a_creer, batch_size=500)
         
         if notes_mensuelle_existantes:
-            NoteMensuelle.objects.bulk_update(
+            NoteMensuelle.objects.bulk_update_tracked(
                 list(notes_mensuelle_existantes.values()),
                 ['note', 'absent', 'cree_par'],
                 batch_size=500
@@ -0,0 +1,110 @@
+"""
+Compare le moteur Decimal et le moteur NumPy du calcul des moyennes.
+
+Génère une école fictive (classes × élèves × matières, notes d'octobre à
+juin et compositions) dans une transaction annulée à la fin : la base n'est
+pas modifiée.
+
+Usage:
+    python manage.py bench_moyennes
+    python manage.py bench_moyennes --classes 20 --eleves 60 --matieres 12
+"""
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from eleves.models import Classe, Ecole, Eleve
+from notes.calculs_moyennes import calculer_moyennes_classe_decimal
+from notes.models import ClasseNote, CompositionNote, MatiereNote, NoteMensuelle
+from notes.moteur_vectoriel import calculer_moyennes_classe_vectorise, calculer_moyennes_classes_vectorise
+
+MOIS = ['OCTOBRE', 'NOVEMBRE', 'DECEMBRE', 'JANVIER', 'FEVRIER', 'MARS', 'AVRIL', 'MAI']
+
+
+class _Annulation(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Mesure le calcul des moyennes (Decimal vs NumPy) sur une école générée'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classes', type=int, default=10)
+        parser.add_argument('--eleves', type=int, default=50)
+        parser.add_argument('--matieres', type=int, default=10)
+        parser.add_argument('--periode', default='SEMESTRE_1')
+        parser.add_argument('--systeme', default='semestre')
+        parser.add_argument('--repetitions', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                groupes = self._generer(options)
+                self._mesurer(groupes, options['periode'], options['systeme'], options['repetitions'])
+                raise _Annulation
+        except _Annulation:
+            pass
+
+    def _generer(self, options):
+        hasard = random.Random(1)
+        ecole = Ecole.objects.create(nom='École bench moyennes', adresse='Conakry',
+                                     telephone='+224620999999', directeur='Bench')
+        groupes = {}
+        for c in range(options['classes']):
+            nom = f'{7 + c % 4}ÈME ANNÉE {c}'
+            classe = Classe.objects.create(ecole=ecole, nom=nom, niveau='COLLEGE_7', annee_scolaire='2025-2026')
+            classe_note = ClasseNote.objects.create(ecole=ecole, nom=nom, niveau='COLLEGE_7', annee_scolaire='2025-2026')
+            matieres = [
+                MatiereNote.objects.create(classe=classe_note, nom=f'M{j}', code=f'M{j}',
+                                           coefficient=Decimal(1 + j % 4))
+                for j in range(options['matieres'])
+            ]
+            eleves = Eleve.objects.bulk_create([
+                Eleve(matricule=f'BENCH-{c}-{i}', prenom='Bench', nom=f'{i}', sexe='F',
+                      classe=classe, statut='ACTIF')
+                for i in range(options['eleves'])
+            ])
+            eleves = list(Eleve.objects.filter(classe=classe))
+            NoteMensuelle.objects.bulk_create([
+                NoteMensuelle(eleve=e, matiere=m, mois=mois, annee_scolaire='2025-2026',
+                              note=Decimal(hasard.randint(0, 2000)) / 100)
+                for e in eleves for m in matieres for mois in MOIS
+            ], batch_size=2000)
+            CompositionNote.objects.bulk_create([
+                CompositionNote(eleve=e, matiere=m, periode=periode, annee_scolaire='2025-2026',
+                                note=Decimal(hasard.randint(0, 2000)) / 100)
+                for e in eleves for m in matieres for periode in ('TRIMESTRE_1', 'SEMESTRE_1')
+            ], batch_size=2000)
+            groupes[classe_note.id] = (eleves, matieres)
+        return groupes
+
+    def _mesurer(self, groupes, periode, systeme, repetitions):
+        def chrono(fonction):
+            durees = []
+            for _ in range(repetitions):
+                debut = time.perf_counter()
+                resultat = fonction()
+                durees.append(time.perf_counter() - debut)
+            return statistics.median(durees), resultat
+
+        duree_decimal, reference = chrono(lambda: {
+            cle: calculer_moyennes_classe_decimal(e, m, periode, systeme, use_cache=False)
+            for cle, (e, m) in groupes.items()
+        })
+        duree_classe, par_classe = chrono(lambda: {
+            cle: calculer_moyennes_classe_vectorise(e, m, periode, systeme, use_cache=False)
+            for cle, (e, m) in groupes.items()
+        })
+        duree_ecole, ecole = chrono(lambda: calculer_moyennes_classes_vectorise(groupes, periode, systeme))
+
+        cases = sum(len(e) * len(m) for e, m in groupes.values())
+        self.stdout.write(f"{len(groupes)} classes, {cases} cases élève × matière ({periode}, {systeme})")
+        self.stdout.write(f"  Decimal, classe par classe : {duree_decimal * 1000:8.1f} ms")
+        self.stdout.write(f"  NumPy, classe par classe   : {duree_classe * 1000:8.1f} ms")
+        self.stdout.write(f"  NumPy, école en une passe  : {duree_ecole * 1000:8.1f} ms")
+        identiques = reference == par_classe == ecole
+        self.stdout.write(f"  Résultats identiques : {'oui' if identiques else 'NON'}")
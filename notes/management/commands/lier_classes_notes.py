@@ -0,0 +1,63 @@
+"""
+Commande de gestion pour renseigner le lien ClasseNote -> Classe (élèves).
+
+Les ClasseNote créées avant l'ajout du lien sont liées à la première lecture ;
+cette commande le fait d'avance pour toutes, et signale celles dont la classe
+élèves reste introuvable. Seuls les liens exacts (même nom, même année) sont
+enregistrés ; les autres classes sont rapprochées à chaque lecture.
+
+Usage:
+    python manage.py lier_classes_notes
+    python manage.py lier_classes_notes --annee 2025-2026
+    python manage.py lier_classes_notes --recalculer   # refaire aussi les liens existants
+"""
+
+from django.core.management.base import BaseCommand
+
+from notes.classes_utils import est_lien_exact, trouver_classe_eleve
+from notes.models import ClasseNote
+
+
+class Command(BaseCommand):
+    help = 'Lie chaque ClasseNote à sa classe élèves (eleves.Classe)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--annee', type=str, help='Année scolaire (ex: 2025-2026)')
+        parser.add_argument(
+            '--recalculer',
+            action='store_true',
+            help='Recalculer aussi les ClasseNote déjà liées',
+        )
+
+    def handle(self, *args, **options):
+        classes = ClasseNote.objects.all()
+        if options.get('annee'):
+            classes = classes.filter(annee_scolaire=options['annee'])
+        if not options.get('recalculer'):
+            classes = classes.filter(classe_eleve__isnull=True)
+
+        a_enregistrer = []
+        introuvables = rapprochees = 0
+        for classe_note in classes:
+            classe_eleve = trouver_classe_eleve(classe_note)
+            if classe_eleve is None:
+                introuvables += 1
+                self.stdout.write(self.style.WARNING(
+                    f'  {classe_note.nom} ({classe_note.annee_scolaire}) : classe élèves introuvable'
+                ))
+            elif not est_lien_exact(classe_note, classe_eleve):
+                rapprochees += 1
+                classe_eleve = None
+            if classe_note.classe_eleve_id != (classe_eleve.id if classe_eleve else None):
+                classe_note.classe_eleve = classe_eleve
+                a_enregistrer.append(classe_note)
+
+        ClasseNote.objects.bulk_update(a_enregistrer, ['classe_eleve'], batch_size=500)
+        liees = sum(1 for classe_note in a_enregistrer if classe_note.classe_eleve_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'{liees} classe(s) liée(s), {introuvables} sans classe élèves.'
+        ))
+        if rapprochees:
+            self.stdout.write(
+                f'{rapprochees} classe(s) rapprochée(s) à la lecture (autre nom ou autre année).'
+            )
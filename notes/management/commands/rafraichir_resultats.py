@@ -0,0 +1,56 @@
+"""
+Commande de gestion pour (re)construire les résultats matérialisés des classes.
+
+Utile avant une période de bulletins (préchauffage) ou après une correction
+des notes faite directement en base (hors signaux Django).
+
+Usage:
+    python manage.py rafraichir_resultats
+    python manage.py rafraichir_resultats --annee 2025-2026
+    python manage.py rafraichir_resultats --classe 12 --periode TRIMESTRE_1
+    python manage.py rafraichir_resultats --complet   # tout marquer périmé d'abord
+"""
+
+from django.core.management.base import BaseCommand
+
+from notes.models import ClasseNote
+from notes.resultats import PERIODES_MATERIALISEES, marquer_resultats_perimes
+from notes.utils_rangs import calculer_rangs_classe_periode
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les résultats matérialisés (moyennes par matière et rangs) des classes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--annee', type=str, help='Année scolaire (ex: 2025-2026)')
+        parser.add_argument('--classe', type=int, help='ID de la ClasseNote')
+        parser.add_argument(
+            '--periode',
+            action='append',
+            choices=sorted(PERIODES_MATERIALISEES),
+            help='Période à recalculer (répétable). Par défaut: toutes',
+        )
+        parser.add_argument(
+            '--complet',
+            action='store_true',
+            help='Marquer tous les résultats périmés avant le recalcul',
+        )
+
+    def handle(self, *args, **options):
+        classes = ClasseNote.objects.filter(actif=True).select_related('ecole')
+        if options.get('classe'):
+            classes = classes.filter(id=options['classe'])
+        if options.get('annee'):
+            classes = classes.filter(annee_scolaire=options['annee'])
+        periodes = options.get('periode') or sorted(PERIODES_MATERIALISEES)
+
+        total = 0
+        for classe_note in classes:
+            if options.get('complet'):
+                marquer_resultats_perimes(classe_note, periodes)
+            for periode in periodes:
+                rangs = calculer_rangs_classe_periode(classe_note, periode, use_cache=False)
+                total += len(rangs)
+            self.stdout.write(f'  {classe_note.nom} ({classe_note.annee_scolaire}) : OK')
+
+        self.stdout.write(self.style.SUCCESS(f'Résultats matérialisés à jour ({total} rangs).'))
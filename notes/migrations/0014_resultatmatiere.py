@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eleves', '0017_alter_classe_niveau_alter_grilletarifaire_niveau'),
+        ('notes', '0013_creneauemploidutemps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultatMatiere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periode', models.CharField(max_length=50, verbose_name='Période')),
+                ('annee_scolaire', models.CharField(max_length=9, verbose_name='Année scolaire')),
+                ('moyenne_continue', models.FloatField(blank=True, null=True, verbose_name='Moyenne des cours')),
+                ('note_composition', models.FloatField(blank=True, null=True, verbose_name='Note de composition')),
+                ('moyenne', models.FloatField(default=0, verbose_name='Moyenne de la matière')),
+                ('coefficient', models.DecimalField(decimal_places=2, default=1, max_digits=4, verbose_name='Coefficient')),
+                ('perime', models.BooleanField(default=False, verbose_name='À recalculer')),
+                ('date_calcul', models.DateTimeField(auto_now=True, verbose_name='Date du calcul')),
+                ('classe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resultats_matieres', to='notes.classenote')),
+                ('eleve', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resultats_matieres', to='eleves.eleve')),
+                ('matiere', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resultats', to='notes.matierenote')),
+            ],
+            options={
+                'verbose_name': 'Résultat par matière',
+                'verbose_name_plural': 'Résultats par matière',
+                'indexes': [models.Index(fields=['classe', 'periode', 'annee_scolaire', 'matiere'], name='resmat_colonne_idx'), models.Index(fields=['eleve', 'periode'], name='resmat_eleve_periode_idx')],
+                'unique_together': {('classe', 'periode', 'annee_scolaire', 'eleve', 'matiere')},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eleves', '0017_alter_classe_niveau_alter_grilletarifaire_niveau'),
+        ('notes', '0014_resultatmatiere'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classenote',
+            name='classe_eleve',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='classes_notes', to='eleves.classe', verbose_name='Classe (élèves)'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def detacher_liens_approches(apps, schema_editor):
+    """Les liens trouvés par rapprochement (autre année, même niveau) sont
+    désormais refaits à chaque lecture : seuls les liens exacts restent."""
+    from notes.classes_utils import normaliser_nom_classe
+
+    ClasseNote = apps.get_model('notes', 'ClasseNote')
+    a_detacher = [
+        classe_note.pk
+        for classe_note in ClasseNote.objects.filter(classe_eleve__isnull=False)
+        .select_related('classe_eleve').only(
+            'id', 'nom', 'ecole_id', 'annee_scolaire',
+            'classe_eleve__nom', 'classe_eleve__ecole_id', 'classe_eleve__annee_scolaire',
+        )
+        if not (
+            classe_note.classe_eleve.ecole_id == classe_note.ecole_id
+            and classe_note.classe_eleve.annee_scolaire == classe_note.annee_scolaire
+            and normaliser_nom_classe(classe_note.classe_eleve.nom) == normaliser_nom_classe(classe_note.nom)
+        )
+    ]
+    for debut in range(0, len(a_detacher), 500):
+        ClasseNote.objects.filter(pk__in=a_detacher[debut:debut + 500]).update(classe_eleve=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0015_classenote_classe_eleve'),
+    ]
+
+    operations = [
+        migrations.RunPython(detacher_liens_approches, migrations.RunPython.noop),
+    ]
@@ -38,6 +38,12 @@ class ClasseNote(SyncTrackedModel):
     effectif = models.PositiveIntegerField(default=0, verbose_name="Effectif")
     description = models.TextField(blank=True, null=True, verbose_name="Description")
     actif = models.BooleanField(default=True, verbose_name="Active")
+    # Classe des élèves de même nom et même année, tenue à jour par
+    # notes.signals (voir utils_rangs.classe_eleve_correspondante)
+    classe_eleve = models.ForeignKey(
+        'eleves.Classe', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='classes_notes', verbose_name="Classe (élèves)",
+    )
     
     cree_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='classes_notes_creees')
     date_creation = models.DateTimeField(auto_now_add=True)
@@ -495,7 +501,7 @@ from .utils_rangs import invalider_cache_rangs
 def invalider_cache_note_mensuelle(sender, instance, **kwargs):
     """Invalide le cache des rangs quand une note mensuelle est modifiée"""
     try:
-        invalider_cache_rangs(instance.matiere.classe, instance.mois)
+        invalider_cache_rangs(instance.matiere.classe, instance.mois, matiere_id=instance.matiere_id)
         print(f"Cache invalidé pour {instance.matiere.classe.nom} - {instance.mois}")
     except Exception as e:
         print(f"Erreur invalidation cache: {e}")
@@ -505,7 +511,7 @@ def invalider_cache_note_mensuelle(sender, instance, **kwargs):
 def invalider_cache_composition(sender, instance, **kwargs):
     """Invalide le cache des rangs et moyennes quand une composition change"""
     try:
-        invalider_cache_rangs(instance.matiere.classe, instance.periode)
+        invalider_cache_rangs(instance.matiere.classe, instance.periode, matiere_id=instance.matiere_id)
         print(f"Cache invalidé pour {instance.matiere.classe.nom} - {instance.periode}")
     except Exception as e:
         print(f"Erreur invalidation cache: {e}")
@@ -515,11 +521,21 @@ def invalider_cache_composition(sender, instance, **kwargs):
 def invalider_cache_note_eleve(sender, instance, **kwargs):
     """Invalide le cache des rangs quand une note d'évaluation est modifiée"""
     try:
-        invalider_cache_rangs(instance.evaluation.matiere.classe, instance.evaluation.periode)
+        invalider_cache_rangs(instance.evaluation.matiere.classe, instance.evaluation.periode,
+                              matiere_id=instance.evaluation.matiere_id)
         print(f"Cache invalidé pour {instance.evaluation.matiere.classe.nom} - {instance.evaluation.periode}")
     except Exception as e:
         print(f"Erreur invalidation cache: {e}")
 
+@receiver(post_save, sender=MatiereNote)
+@receiver(post_delete, sender=MatiereNote)
+def invalider_cache_matiere(sender, instance, **kwargs):
+    """Coefficient, activation ou suppression d'une matière : toutes les périodes changent"""
+    try:
+        invalider_cache_rangs(instance.classe)
+    except Exception as e:
+        print(f"Erreur invalidation cache: {e}")
+
 
 # ============================================================================
 # MODÈLES POUR L'ÉVALUATION MATERNELLE
@@ -791,6 +807,43 @@ class Classement(SyncTrackedModel):
         return f"{self.eleve} - {self.periode} - {self.rang_formate}"
 
 
+class ResultatMatiere(models.Model):
+    """Moyenne matérialisée d'un élève dans une matière pour une période.
+
+    Table dérivée des notes (NoteMensuelle / CompositionNote), entretenue par
+    notes.resultats : une colonne (classe, période, matière) est marquée
+    ``perime`` quand une note change, puis recalculée à la lecture suivante.
+    Classement sert de côté lecture pour les rangs.
+    """
+    classe = models.ForeignKey(ClasseNote, on_delete=models.CASCADE, related_name='resultats_matieres')
+    eleve = models.ForeignKey('eleves.Eleve', on_delete=models.CASCADE, related_name='resultats_matieres')
+    matiere = models.ForeignKey(MatiereNote, on_delete=models.CASCADE, related_name='resultats')
+    periode = models.CharField(max_length=50, verbose_name="Période")
+    annee_scolaire = models.CharField(max_length=9, verbose_name="Année scolaire")
+
+    # Valeurs en pleine précision (float) : l'arrondi reste fait à l'affichage,
+    # exactement comme dans calculer_moyennes_classe_optimise.
+    moyenne_continue = models.FloatField(null=True, blank=True, verbose_name="Moyenne des cours")
+    note_composition = models.FloatField(null=True, blank=True, verbose_name="Note de composition")
+    moyenne = models.FloatField(default=0, verbose_name="Moyenne de la matière")
+    coefficient = models.DecimalField(max_digits=4, decimal_places=2, default=1, verbose_name="Coefficient")
+
+    perime = models.BooleanField(default=False, verbose_name="À recalculer")
+    date_calcul = models.DateTimeField(auto_now=True, verbose_name="Date du calcul")
+
+    class Meta:
+        verbose_name = "Résultat par matière"
+        verbose_name_plural = "Résultats par matière"
+        unique_together = ['classe', 'periode', 'annee_scolaire', 'eleve', 'matiere']
+        indexes = [
+            models.Index(fields=['classe', 'periode', 'annee_scolaire', 'matiere'], name='resmat_colonne_idx'),
+            models.Index(fields=['eleve', 'periode'], name='resmat_eleve_periode_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.eleve} - {self.matiere.nom} - {self.periode} - {self.moyenne:.2f}"
+
+
 # ============================================================================
 # ACTIVITÉS JOURNALIÈRES
 # ============================================================================
@@ -0,0 +1,531 @@
+"""
+Moteur de calcul des moyennes par tableaux NumPy (élèves × matières × mois).
+
+Même contrat et mêmes résultats, au bit près, que le moteur Decimal de
+calculs_moyennes (``calculer_moyennes_classe_decimal``) : les opérations en
+virgule flottante du moteur de référence (ajout du bonus, 40/60, points)
+sont rejouées telles quelles, et ses conversions ``Decimal(str(x))`` sont
+remplacées par de l'arithmétique entière exacte.
+
+Principe de l'équivalence : une valeur ``x`` telle que ``x == V / 10**6``
+pour un entier ``V`` a pour ``str(x)`` exactement la décimale ``V / 10**6``.
+Sommes, pondérations et arrondis ROUND_HALF_UP se calculent alors sur les
+entiers ``V``. Les rares cases qui sortent de ce cadre (moyenne sur 3 mois
+non ronde, bonus de suivi) sont calculées case par case avec les fonctions
+du moteur de référence.
+
+Plusieurs classes se calculent en une passe (``calculer_moyennes_classes_vectorise``) :
+les notes de toutes les classes sont lues en une requête par table.
+"""
+import logging
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import F, IntegerField
+from django.db.models.functions import Cast, Round
+
+from ecole_moderne.cache_partage import cle_etiquetee, tag_classe
+
+from .calculs_moyennes import (
+    CACHE_TIMEOUT_MOYENNES,
+    CALCUL_CACHE_SCHEMA_VERSION,
+    _SEMESTRE_FALLBACK_TRIMESTRES,
+    _appliquer_bonus,
+    _arrondir_deux_decimales,
+    bonus_suivi_batch,
+    calculer_moyenne_periode_guineenne,
+    detecter_niveau_scolaire,
+)
+from .models import CompositionNote, NoteMensuelle
+
+try:
+    import numpy as np
+except ImportError:  # installation sans numpy : calculs_moyennes garde le moteur Decimal
+    np = None
+
+logger = logging.getLogger(__name__)
+
+disponible = np is not None
+
+ECHELLE = 10 ** 6
+# Notes lues directement en centièmes entiers : évite la conversion Decimal
+# de chaque ligne par l'ORM, qui coûtait plus que le calcul lui-même.
+CENTIEMES = Cast(Round(F('note') * 100), IntegerField())
+# Au-delà, str(x) peut dépasser les chiffres significatifs garantis par le float
+_BORNE_EXACTE = 1000 * ECHELLE
+
+
+def mois_de_la_periode(periode, system_type):
+    """Mois de cours continu d'une période, comme le moteur de référence."""
+    if system_type in ['trimestriel', 'trimestre']:
+        if 'TRIMESTRE_1' in periode or periode == '1er Trimestre':
+            return ['OCTOBRE', 'NOVEMBRE']
+        if 'TRIMESTRE_2' in periode or periode == '2ème Trimestre':
+            return ['JANVIER', 'FEVRIER']
+        if 'TRIMESTRE_3' in periode or periode == '3ème Trimestre':
+            return ['AVRIL', 'MAI']
+    elif system_type in ['semestriel', 'semestre']:
+        if 'SEMESTRE_1' in periode or periode == '1er Semestre':
+            return ['OCTOBRE', 'NOVEMBRE', 'DECEMBRE', 'JANVIER']
+        if 'SEMESTRE_2' in periode or periode == '2ème Semestre':
+            return ['MARS', 'AVRIL', 'MAI']
+    return []
+
+
+def _entiers_exacts(valeurs):
+    """(V, exact) : V entier à l'échelle 10**6, exact si ``valeurs == V / 10**6``."""
+    v = np.rint(np.nan_to_num(valeurs) * ECHELLE)
+    exact = (v / ECHELLE == valeurs) & (np.abs(v) < _BORNE_EXACTE)
+    return v.astype(np.int64), exact
+
+
+def _arrondi_entier(numerateur, denominateur):
+    """ROUND_HALF_UP de numerateur / denominateur à l'entier (denominateur > 0)."""
+    signe = np.sign(numerateur)
+    return signe * ((2 * np.abs(numerateur) + denominateur) // (2 * denominateur))
+
+
+def _coefficient(matiere, est_primaire):
+    if est_primaire:
+        return Decimal('1')
+    return Decimal(str(matiere.coefficient)) if matiere.coefficient else Decimal('1')
+
+
+class _Groupe:
+    """Une classe à calculer : élèves, matières et tableaux de notes."""
+
+    def __init__(self, eleves, matieres, nb_mois):
+        self.eleves = eleves
+        self.matieres = matieres
+        self.classe = matieres[0].classe
+        self.niveau = detecter_niveau_scolaire(self.classe.nom if hasattr(self.classe, 'nom') else '')
+        self.est_primaire = self.niveau == 'PRIMAIRE'
+        self.index_eleve = {e.id: i for i, e in enumerate(eleves)}
+        self.index_matiere = {m.id: j for j, m in enumerate(matieres)}
+        forme = (len(eleves), len(matieres))
+        # Notes mensuelles en centièmes (comme saisies) et présence par mois
+        self.notes = np.zeros(forme + (nb_mois,), dtype=np.int64)
+        self.notes_ok = np.zeros(forme + (nb_mois,), dtype=bool)
+        # Compositions : clé présente (même absent), note exploitable, valeur
+        self.compo_vue = np.zeros(forme, dtype=bool)
+        self.compo_ok = np.zeros(forme, dtype=bool)
+        self.compo = np.zeros(forme, dtype=np.float64)
+        # Cases avec bonus de suivi : calculées avec le moteur de référence
+        self.bonus = {}
+
+
+def _charger(groupes, periode, system_type, mois):
+    """Remplit les tableaux de tous les groupes en une requête par table."""
+    par_annee = {}
+    for groupe in groupes:
+        par_annee.setdefault(groupe.classe.annee_scolaire, []).append(groupe)
+
+    position_mois = {m: k for k, m in enumerate(mois)} if system_type != 'mensuel' else {periode: 0}
+    notes_filter = {'mois': periode} if system_type == 'mensuel' or not mois else {'mois__in': mois}
+    mois_bonus = [periode] if system_type == 'mensuel' else mois
+
+    for annee, du_groupe in par_annee.items():
+        par_matiere = {}
+        for groupe in du_groupe:
+            for matiere_id, j in groupe.index_matiere.items():
+                par_matiere.setdefault(matiere_id, []).append((groupe, j))
+        eleves_ids = list({e for g in du_groupe for e in g.index_eleve})
+        matieres_ids = list(par_matiere)
+
+        def cases(eleve_id, matiere_id):
+            for groupe, j in par_matiere.get(matiere_id, ()):
+                i = groupe.index_eleve.get(eleve_id)
+                if i is not None:
+                    yield groupe, i, j
+
+        lignes = NoteMensuelle.objects.filter(
+            eleve_id__in=eleves_ids, matiere_id__in=matieres_ids,
+            annee_scolaire=annee, **notes_filter,
+        ).order_by().values_list('eleve_id', 'matiere_id', 'mois', CENTIEMES, 'absent')
+        for eleve_id, matiere_id, mois_note, note, absent in lignes:
+            k = position_mois.get(mois_note)
+            if k is None:
+                continue
+            ok = not absent and note is not None
+            for groupe, i, j in cases(eleve_id, matiere_id):
+                groupe.notes_ok[i, j, k] = ok
+                groupe.notes[i, j, k] = note if ok else 0
+
+        # Bonus de suivi : activé (ou non) école par école
+        par_ecole = {}
+        for groupe in du_groupe:
+            par_ecole.setdefault(groupe.classe.ecole_id, []).append(groupe)
+        for du_lot in par_ecole.values():
+            bonus = bonus_suivi_batch(
+                list({e for g in du_lot for e in g.index_eleve}),
+                list({m for g in du_lot for m in g.index_matiere}),
+                mois_bonus, annee,
+            )
+            for (eleve_id, matiere_id, mois_bonus_cle), valeur in bonus.items():
+                for groupe, i, j in cases(eleve_id, matiere_id):
+                    if groupe in du_lot:
+                        groupe.bonus.setdefault((i, j), {})[mois_bonus_cle] = valeur
+
+        if system_type == 'mensuel':
+            continue
+
+        # Compositions de la période et, en semestriel, celles des trimestres
+        # qui servent de repli quand le semestre n'a pas été saisi
+        repli = []
+        if system_type in ['semestriel', 'semestre']:
+            if 'SEMESTRE_1' in periode or periode == '1er Semestre':
+                repli = _SEMESTRE_FALLBACK_TRIMESTRES['SEMESTRE_1']
+            elif 'SEMESTRE_2' in periode or periode == '2ème Semestre':
+                repli = _SEMESTRE_FALLBACK_TRIMESTRES['SEMESTRE_2']
+        compositions = CompositionNote.objects.filter(
+            eleve_id__in=eleves_ids, matiere_id__in=matieres_ids,
+            periode__in=[periode] + repli, annee_scolaire=annee,
+        ).order_by().values_list('eleve_id', 'matiere_id', 'periode', CENTIEMES, 'absent')
+        notes_repli = {}
+        for eleve_id, matiere_id, periode_compo, note, absent in compositions:
+            ok = not absent and note is not None
+            if periode_compo != periode:
+                if ok:
+                    notes_repli.setdefault((eleve_id, matiere_id), []).append(note / 100)
+                continue
+            for groupe, i, j in cases(eleve_id, matiere_id):
+                groupe.compo_vue[i, j] = True
+                groupe.compo_ok[i, j] = ok
+                groupe.compo[i, j] = note / 100 if ok else 0.0
+
+        # Moyenne des trimestres, en float comme _compositions_semestre_depuis_trimestres
+        for (eleve_id, matiere_id), notes in notes_repli.items():
+            for groupe, i, j in cases(eleve_id, matiere_id):
+                if not groupe.compo_vue[i, j]:
+                    groupe.compo_vue[i, j] = True
+                    groupe.compo_ok[i, j] = True
+                    groupe.compo[i, j] = sum(notes) / len(notes)
+
+
+def _moyenne_continue_bonus(groupe, i, j, mois, system_type):
+    """Moyenne continue d'une case avec bonus (opérations du moteur de référence)."""
+    bonus = groupe.bonus[(i, j)]
+    if system_type == 'mensuel':
+        if not groupe.notes_ok[i, j, 0]:
+            return None
+        return _appliquer_bonus(float(groupe.notes[i, j, 0]) / 100, bonus.get(mois[0], 0.0))
+    total, nombre = Decimal('0'), 0
+    for k, libelle in enumerate(mois):
+        if groupe.notes_ok[i, j, k]:
+            valeur = _appliquer_bonus(float(groupe.notes[i, j, k]) / 100, bonus.get(libelle, 0.0))
+            total += Decimal(str(valeur))
+            nombre += 1
+    return float(total / nombre) if nombre else None
+
+
+def _calculer(groupe, periode, system_type, mois):
+    """Moyennes d'un groupe : tableaux (E × M) puis dictionnaires de résultats."""
+    mensuel = system_type == 'mensuel'
+    mois_cases = [periode] if mensuel else mois
+
+    # Moyenne continue = Decimal(somme) / nombre, qui vaut exactement
+    # l'arrondi float de S / (100 k) : une seule division IEEE.
+    if mois_cases:
+        centiemes = np.where(groupe.notes_ok, np.minimum(groupe.notes, 2000), 0)
+        somme = centiemes.sum(axis=2)
+        nombre = groupe.notes_ok.sum(axis=2)
+    else:
+        somme = np.zeros(groupe.compo.shape, dtype=np.int64)
+        nombre = np.zeros(groupe.compo.shape, dtype=np.int64)
+    a_continue = nombre > 0
+    continue_ = np.where(a_continue, somme / (100.0 * np.maximum(nombre, 1)), 0.0)
+
+    for (i, j) in groupe.bonus:
+        valeur = _moyenne_continue_bonus(groupe, i, j, mois_cases, system_type)
+        a_continue[i, j] = valeur is not None
+        continue_[i, j] = valeur if valeur is not None else 0.0
+
+    if mensuel:
+        a_compo = np.zeros(groupe.compo.shape, dtype=bool)
+        compo = np.zeros(groupe.compo.shape, dtype=np.float64)
+        moyenne = np.where(a_continue, continue_, 0.0)
+    else:
+        # RÈGLE STRICTE : la classe a composé dans la matière -> 0 pour l'élève sans note
+        a_compo = groupe.compo_ok | groupe.compo_vue.any(axis=0)[None, :]
+        compo = np.where(groupe.compo_ok, groupe.compo, 0.0)
+        moyenne = np.where(a_compo, compo, np.where(a_continue, continue_, 0.0))
+        if not groupe.est_primaire:
+            deux = a_continue & a_compo
+            v_continue, exact_continue = _entiers_exacts(continue_)
+            v_compo, exact_compo = _entiers_exacts(compo)
+            # Decimal(str(mc)) * 0,4 + Decimal(str(nc)) * 0,6, exact à l'échelle 10**7
+            ponderee = (4 * v_continue + 6 * v_compo) / (10 * ECHELLE)
+            moyenne = np.where(deux, ponderee, moyenne)
+            for i, j in zip(*np.nonzero(deux & ~(exact_continue & exact_compo))):
+                moyenne[i, j] = calculer_moyenne_periode_guineenne(
+                    float(continue_[i, j]), float(compo[i, j]), 'SECONDAIRE',
+                )
+
+    return _resultats(groupe, moyenne, a_continue, continue_, a_compo, compo)
+
+
+def _resultats(groupe, moyenne, a_continue, continue_, a_compo, compo):
+    coefficients = [_coefficient(m, groupe.est_primaire) for m in groupe.matieres]
+    coef_centiemes = np.array([int(c * 100) for c in coefficients], dtype=np.int64)
+    coef_float = np.array([float(c) for c in coefficients])
+    total_coefficients = sum(coefficients, Decimal('0'))
+
+    points = moyenne * coef_float[None, :]
+    v_moyenne, exact = _entiers_exacts(moyenne)
+    eleve_exact = exact.all(axis=1) & (coef_centiemes > 0).all()
+    # total_points = somme(V * C) à l'échelle 10**8 ; moyenne = total / somme(C)
+    total = (v_moyenne * coef_centiemes[None, :]).sum(axis=1)
+    diviseur = int(coef_centiemes.sum()) * ECHELLE
+    centiemes = _arrondi_entier(total * 100, diviseur) if diviseur > 0 else total * 0
+
+    moyennes_l = moyenne.tolist()
+    points_l = points.tolist()
+    continue_l = np.where(a_continue, continue_, np.nan).tolist()
+    compo_l = np.where(a_compo, compo, np.nan).tolist()
+    details_coef = [1 if groupe.est_primaire else c for c in coefficients]
+
+    resultats = {}
+    for i, eleve in enumerate(groupe.eleves):
+        details = []
+        for j, matiere in enumerate(groupe.matieres):
+            mc, nc = continue_l[i][j], compo_l[i][j]
+            details.append({
+                'matiere': matiere,
+                'moyenne_continue': None if mc != mc else mc,
+                'note_composition': None if nc != nc else nc,
+                'moyenne': moyennes_l[i][j],
+                'moyenne_calculee': moyennes_l[i][j],
+                'coefficient': details_coef[j],
+                'points': points_l[i][j],
+            })
+        if eleve_exact[i]:
+            points_total = float(total[i]) / (100 * ECHELLE)
+            moyenne_generale = int(centiemes[i]) / 100
+        else:
+            total_decimal = sum(
+                (Decimal(str(m)) * c for m, c in zip(moyennes_l[i], coefficients)), Decimal('0'),
+            )
+            points_total = float(total_decimal)
+            moyenne_generale = (
+                _arrondir_deux_decimales(total_decimal / total_coefficients)
+                if total_coefficients > 0 else None
+            )
+        resultats[eleve.id] = {
+            'moyenne_generale': moyenne_generale,
+            'total_points': round(points_total, 2) if points_total > 0 else 0,
+            'total_coefficients': float(total_coefficients),
+            'details_matieres': details,
+            'niveau': groupe.niveau,
+            'appreciations_only': False,
+        }
+    return resultats
+
+
+def _resultat_maternelle(eleves, niveau, annuel=False):
+    resultat = {
+        'moyenne_generale': None,
+        'total_points': 0,
+        'total_coefficients': 0,
+        'details_matieres': [],
+        'niveau': niveau,
+        'appreciations_only': True,
+    }
+    if annuel:
+        resultat['moyennes_periodes'] = {}
+    return {eleve.id: dict(resultat) for eleve in eleves}
+
+
+def calculer_moyennes_classes_vectorise(groupes, periode, system_type='mensuel'):
+    """Moyennes de plusieurs classes en une passe.
+
+    ``groupes`` : {clé: (eleves, matieres)}. Retourne {clé: résultats}, chaque
+    résultat au format de ``calculer_moyennes_classe_optimise``. Les notes de
+    toutes les classes sont lues ensemble (une requête par table et par
+    année scolaire), sans cache.
+    """
+    mois = mois_de_la_periode(periode, system_type)
+    nb_mois = 1 if system_type == 'mensuel' else len(mois)
+    resultats = {}
+    a_calculer = {}
+    for cle, (eleves, matieres) in groupes.items():
+        eleves, matieres = list(eleves), list(matieres)
+        if not eleves or not matieres:
+            resultats[cle] = {}
+            continue
+        groupe = _Groupe(eleves, matieres, nb_mois)
+        if groupe.niveau == 'MATERNELLE':
+            resultats[cle] = _resultat_maternelle(eleves, groupe.niveau)
+            continue
+        a_calculer[cle] = groupe
+
+    if a_calculer:
+        _charger(list(a_calculer.values()), periode, system_type, mois)
+        for cle, groupe in a_calculer.items():
+            resultats[cle] = _calculer(groupe, periode, system_type, mois)
+    return resultats
+
+
+def calculer_moyennes_classe_vectorise(eleves, matieres, periode, system_type='mensuel', use_cache=True):
+    """Remplaçant direct de ``calculer_moyennes_classe_optimise`` (même cache)."""
+    eleves, matieres = list(eleves), list(matieres)
+    if not eleves or not matieres:
+        return {}
+    classe = matieres[0].classe
+    if not classe:
+        return {}
+
+    cle_cache = None
+    if use_cache:
+        cle_cache = cle_etiquetee(
+            f"moy_classe_s{CALCUL_CACHE_SCHEMA_VERSION}_{classe.id}_{periode}_{system_type}",
+            tag_classe(classe.id),
+        )
+        en_cache = cache.get(cle_cache)
+        if en_cache is not None:
+            return en_cache
+
+    niveau = detecter_niveau_scolaire(classe.nom if hasattr(classe, 'nom') else '')
+    if niveau == 'MATERNELLE':
+        return _resultat_maternelle(eleves, niveau)
+
+    resultats = calculer_moyennes_classes_vectorise({classe.id: (eleves, matieres)}, periode, system_type)[classe.id]
+    if use_cache:
+        cache.set(cle_cache, resultats, CACHE_TIMEOUT_MOYENNES)
+    return resultats
+
+
+def _periodes_annuelles(system_type):
+    if system_type == 'annuel_trimestriel':
+        return ['TRIMESTRE_1', 'TRIMESTRE_2', 'TRIMESTRE_3'], 'trimestre'
+    if system_type == 'annuel_semestriel':
+        return ['SEMESTRE_1', 'SEMESTRE_2'], 'semestre'
+    return None, None
+
+
+def _annuel(eleves, matieres, par_periode, nb_periodes):
+    """Combine les moyennes de période d'une classe (tableaux E × M par période)."""
+    classe = matieres[0].classe
+    niveau = detecter_niveau_scolaire(classe.nom if hasattr(classe, 'nom') else '')
+    est_primaire = niveau == 'PRIMAIRE'
+    coefficients = [_coefficient(m, est_primaire) for m in matieres]
+    coef_centiemes = np.array([int(c * 100) for c in coefficients], dtype=np.int64)
+    coef_float = np.array([float(c) for c in coefficients])
+    total_coefficients = sum(coefficients, Decimal('0'))
+
+    # Somme des périodes dans l'ordre, en float, comme la référence
+    somme = np.zeros((len(eleves), len(matieres)))
+    for moyennes in par_periode:
+        somme = somme + moyennes
+    v_somme, exact = _entiers_exacts(somme)
+    centiemes = _arrondi_entier(v_somme * 100, ECHELLE * nb_periodes)
+    moyenne = centiemes / 100
+    for i, j in zip(*np.nonzero(~exact)):
+        moyenne[i, j] = _arrondir_deux_decimales(Decimal(str(float(somme[i, j]))) / Decimal(nb_periodes))
+        centiemes[i, j] = int(round(moyenne[i, j] * 100))
+
+    points = (moyenne * coef_float[None, :]).tolist()
+    moyennes_l = moyenne.tolist()
+    # Decimal(str(moyenne annuelle)) vaut exactement centiemes / 100
+    total = (centiemes * coef_centiemes[None, :]).sum(axis=1)
+    diviseur = int(coef_centiemes.sum())
+    generale = _arrondi_entier(total, diviseur) if diviseur > 0 else None
+    details_coef = [1 if est_primaire else c for c in coefficients]
+
+    resultats = {}
+    for i, eleve in enumerate(eleves):
+        if diviseur > 0:
+            points_total = float(total[i]) / 10 ** 4
+            moyenne_generale = int(generale[i]) / 100
+        else:
+            total_decimal = sum(
+                (Decimal(str(m)) * c for m, c in zip(moyennes_l[i], coefficients)), Decimal('0'),
+            )
+            points_total = float(total_decimal)
+            moyenne_generale = (
+                _arrondir_deux_decimales(total_decimal / total_coefficients)
+                if total_coefficients > 0 else None
+            )
+        resultats[eleve.id] = {
+            'moyenne_generale': moyenne_generale,
+            'total_points': round(points_total, 2) if points_total > 0 else 0,
+            'total_coefficients': float(total_coefficients),
+            'details_matieres': [
+                {
+                    'matiere': matiere,
+                    'moyenne_annuelle': moyennes_l[i][j],
+                    'moyenne': moyennes_l[i][j],
+                    'coefficient': details_coef[j],
+                    'points': points[i][j],
+                }
+                for j, matiere in enumerate(matieres)
+            ],
+            'niveau': niveau,
+            'appreciations_only': False,
+        }
+    return resultats
+
+
+def _moyennes_periode(resultats, eleves, matieres):
+    """Résultats d'une période -> tableau E × M des moyennes de matière."""
+    tableau = np.zeros((len(eleves), len(matieres)))
+    index = {m.id: j for j, m in enumerate(matieres)}
+    for i, eleve in enumerate(eleves):
+        for detail in resultats.get(eleve.id, {}).get('details_matieres', []):
+            valeur = detail.get('moyenne')
+            tableau[i, index[detail['matiere'].id]] = float(valeur) if valeur is not None else 0.0
+    return tableau
+
+
+def calculer_moyennes_annuelles_classes_vectorise(groupes, system_type):
+    """Moyennes annuelles de plusieurs classes : une passe par période."""
+    periodes, st = _periodes_annuelles(system_type)
+    if not periodes:
+        return {cle: {} for cle in groupes}
+    groupes = {cle: (list(e), list(m)) for cle, (e, m) in groupes.items()}
+    resultats = {}
+    a_calculer = {}
+    for cle, (eleves, matieres) in groupes.items():
+        if not eleves or not matieres:
+            resultats[cle] = {}
+            continue
+        classe = matieres[0].classe
+        niveau = detecter_niveau_scolaire(classe.nom if hasattr(classe, 'nom') else '')
+        if niveau == 'MATERNELLE':
+            resultats[cle] = _resultat_maternelle(eleves, niveau, annuel=True)
+            continue
+        a_calculer[cle] = (eleves, matieres)
+
+    par_periode = {cle: [] for cle in a_calculer}
+    for periode in periodes:
+        calculs = calculer_moyennes_classes_vectorise(a_calculer, periode, st)
+        for cle, (eleves, matieres) in a_calculer.items():
+            par_periode[cle].append(_moyennes_periode(calculs[cle], eleves, matieres))
+    for cle, (eleves, matieres) in a_calculer.items():
+        resultats[cle] = _annuel(eleves, matieres, par_periode[cle], len(periodes))
+    return resultats
+
+
+def calculer_moyennes_annuelles_classe_vectorise(eleves, matieres, system_type, use_cache=True):
+    """Remplaçant direct de ``calculer_moyennes_classe_annuelle_optimise``.
+
+    Les moyennes de période passent par le cache partagé avec le moteur de
+    référence (mêmes clés), puis sont combinées sur tableaux.
+    """
+    periodes, st = _periodes_annuelles(system_type)
+    if not periodes:
+        return {}
+    eleves, matieres = list(eleves), list(matieres)
+    if not eleves or not matieres:
+        return {}
+    classe = matieres[0].classe
+    niveau = detecter_niveau_scolaire(classe.nom if hasattr(classe, 'nom') else '')
+    if niveau == 'MATERNELLE':
+        return _resultat_maternelle(eleves, niveau, annuel=True)
+    par_periode = [
+        _moyennes_periode(
+            calculer_moyennes_classe_vectorise(eleves, matieres, periode, st, use_cache=use_cache),
+            eleves, matieres,
+        )
+        for periode in periodes
+    ]
+    return _annuel(eleves, matieres, par_periode, len(periodes))
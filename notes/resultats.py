@@ -0,0 +1,291 @@
+"""
+Résultats de classe matérialisés (moyennes par matière et rangs).
+
+Les rangs étaient recalculés depuis NoteMensuelle / CompositionNote à chaque
+bulletin, classement ou export. Ce module entretient la table dérivée
+ResultatMatiere (classe, période, élève, matière) et se sert de Classement
+comme côté lecture :
+
+- une note modifiée marque sa colonne (classe, période, matière) ``perime``
+  via invalider_cache_rangs (une requête UPDATE indexée) ;
+- à la lecture suivante, seules les colonnes périmées ou incomplètes sont
+  recalculées avec le moteur existant (calculs_moyennes), puis les rangs de
+  la classe sont réécrits dans Classement ;
+- sinon les rangs se lisent directement dans Classement.
+
+Les moyennes par matière sont stockées en pleine précision (float) et la
+moyenne générale est reconstituée avec les mêmes règles Decimal que
+calculer_rangs_classe_periode : les rangs obtenus sont identiques.
+"""
+from decimal import Decimal
+import logging
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, Q
+
+from synchronisation.context import mute_sync
+
+from .calculs_intelligent import calculer_rang_intelligent
+from .calculs_moyennes import (
+    MOIS_PAR_PERIODE,
+    _arrondir_deux_decimales,
+    calculer_moyennes_classe_annuelle_optimise,
+    calculer_moyennes_classe_optimise,
+    detecter_niveau_scolaire,
+)
+from .models import Classement, ResultatMatiere
+from .utils_rangs import PERIODES_MENSUELLES
+
+logger = logging.getLogger(__name__)
+
+# Seules les périodes canoniques sont matérialisées : ce sont celles que
+# invalider_cache_rangs sait marquer périmées.
+PERIODES_MATERIALISEES = set(PERIODES_MENSUELLES) | set(MOIS_PAR_PERIODE) | {'ANNUEL_TRIM', 'ANNUEL_SEM'}
+
+CHAMPS_UNIQUES_RESULTAT = ['classe', 'periode', 'annee_scolaire', 'eleve', 'matiere']
+CHAMPS_UNIQUES_CLASSEMENT = ['eleve', 'classe', 'periode', 'annee_scolaire']
+
+
+def type_systeme_periode(periode):
+    """Type de système de calcul attendu par calculs_moyennes pour une période."""
+    if periode in PERIODES_MENSUELLES:
+        return 'mensuel'
+    if periode == 'ANNUEL_TRIM':
+        return 'annuel_trimestriel'
+    if periode == 'ANNUEL_SEM':
+        return 'annuel_semestriel'
+    if 'TRIMESTRE' in periode:
+        return 'trimestre'
+    return 'semestre'
+
+
+def marquer_resultats_perimes(classe_note, periodes, matiere_id=None):
+    """Marque à recalculer les résultats d'une classe pour les périodes données.
+
+    Args:
+        classe_note: Instance de ClasseNote
+        periodes: Liste des périodes concernées
+        matiere_id: Restreint le marquage à une matière (None = toutes)
+    """
+    resultats = ResultatMatiere.objects.filter(
+        classe=classe_note, periode__in=list(periodes), perime=False,
+    )
+    if matiere_id:
+        resultats = resultats.filter(matiere_id=matiere_id)
+    resultats.update(perime=True)
+
+
+def _coefficient(matiere, est_primaire):
+    if est_primaire:
+        return Decimal('1')
+    return Decimal(str(matiere.coefficient)) if matiere.coefficient else Decimal('1')
+
+
+def _upsert(model, objets, unique_fields, update_fields):
+    """bulk_create en mode « upsert » (INSERT ... ON CONFLICT / ON DUPLICATE KEY)."""
+    options = {'update_conflicts': True, 'update_fields': update_fields}
+    # MySQL ne permet pas de désigner la contrainte visée
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = unique_fields
+    model.objects.bulk_create(objets, batch_size=500, **options)
+
+
+def _recalculer_colonnes(classe_note, periode, eleves, matieres):
+    """Recalcule et enregistre les résultats des matières données pour toute la classe.
+
+    La colonne entière est recalculée (et non une seule cellule) car la règle
+    stricte des compositions dépend des autres élèves de la classe.
+    """
+    system_type = type_systeme_periode(periode)
+    if system_type.startswith('annuel'):
+        resultats = calculer_moyennes_classe_annuelle_optimise(eleves, matieres, system_type, use_cache=False)
+    else:
+        resultats = calculer_moyennes_classe_optimise(eleves, matieres, periode, system_type, use_cache=False)
+
+    est_primaire = detecter_niveau_scolaire(classe_note.nom) == 'PRIMAIRE'
+    objets = []
+    for eleve in eleves:
+        details = {
+            d['matiere'].id: d
+            for d in resultats.get(eleve.id, {}).get('details_matieres', [])
+        }
+        for matiere in matieres:
+            detail = details.get(matiere.id, {})
+            objets.append(ResultatMatiere(
+                classe=classe_note,
+                eleve_id=eleve.id,
+                matiere=matiere,
+                periode=periode,
+                annee_scolaire=classe_note.annee_scolaire,
+                moyenne_continue=detail.get('moyenne_continue'),
+                note_composition=detail.get('note_composition'),
+                moyenne=float(detail.get('moyenne') or 0.0),
+                coefficient=_coefficient(matiere, est_primaire),
+                perime=False,
+            ))
+    _upsert(
+        ResultatMatiere, objets, CHAMPS_UNIQUES_RESULTAT,
+        ['moyenne_continue', 'note_composition', 'moyenne', 'coefficient', 'perime', 'date_calcul'],
+    )
+
+
+def _reclasser(classe_note, periode, eleves, resultats):
+    """Recalcule moyennes générales et rangs depuis ResultatMatiere et réécrit Classement."""
+    totaux = {}
+    for r in resultats.values('eleve_id', 'moyenne', 'coefficient'):
+        points, coefficients = totaux.get(r['eleve_id'], (Decimal('0'), Decimal('0')))
+        coefficient = Decimal(str(r['coefficient']))
+        totaux[r['eleve_id']] = (
+            points + Decimal(str(r['moyenne'])) * coefficient,
+            coefficients + coefficient,
+        )
+
+    moyennes_pour_rang = []
+    for eleve in eleves:
+        total_points, total_coefficients = totaux.get(eleve.id, (Decimal('0'), Decimal('0')))
+        moyenne_generale = 0
+        if total_coefficients > 0:
+            moyenne_generale = _arrondir_deux_decimales(total_points / total_coefficients)
+        moyennes_pour_rang.append({
+            'eleve_id': eleve.id,
+            'prenom': eleve.prenom,
+            'nom': eleve.nom,
+            'sexe': getattr(eleve, 'sexe', None) or 'M',
+            'moyenne': Decimal(str(moyenne_generale)),
+        })
+
+    resultats_rangs = calculer_rang_intelligent(moyennes_pour_rang)
+    rangs_dict = {}
+    classements = []
+    for r in resultats_rangs:
+        total_eleves = r.get('total_eleves', len(resultats_rangs))
+        rangs_dict[r['eleve_id']] = {
+            'rang': r['rang'],
+            'rang_num': r['rang_num'],
+            'moyenne': r['moyenne'],
+            'total_eleves': total_eleves,
+        }
+        total_points, total_coefficients = totaux.get(r['eleve_id'], (Decimal('0'), Decimal('0')))
+        classements.append(Classement(
+            eleve_id=r['eleve_id'],
+            classe=classe_note,
+            periode=periode,
+            annee_scolaire=classe_note.annee_scolaire,
+            moyenne_generale=r['moyenne'],
+            total_points=total_points.quantize(Decimal('0.01')),
+            total_coefficients=total_coefficients,
+            rang=r['rang_num'] or 0,
+            rang_formate=f"{r['rang']}/{total_eleves}",
+            effectif=total_eleves,
+            mention=(r.get('mention') or '')[:50],
+            appreciation=r.get('appreciation') or '',
+        ))
+
+    # Classement est une donnée dérivée : chaque poste la recalcule,
+    # inutile de la répliquer par la synchronisation.
+    with mute_sync():
+        Classement.objects.filter(
+            classe=classe_note, periode=periode, annee_scolaire=classe_note.annee_scolaire,
+        ).exclude(eleve_id__in=[e.id for e in eleves]).delete()
+    _upsert(
+        Classement, classements, CHAMPS_UNIQUES_CLASSEMENT,
+        ['moyenne_generale', 'total_points', 'total_coefficients', 'rang',
+         'rang_formate', 'effectif', 'mention', 'appreciation', 'date_calcul'],
+    )
+    return rangs_dict
+
+
+def _lire_rangs(classements, eleves):
+    """Reconstitue le dictionnaire de rangs depuis Classement, dans l'ordre du calcul."""
+    position = {eleve.id: i for i, eleve in enumerate(eleves)}
+    rangs_dict = {}
+    for cl in sorted(classements.values(), key=lambda c: (c.rang or 0, position[c.eleve_id])):
+        rangs_dict[cl.eleve_id] = {
+            'rang': cl.rang_formate.rsplit('/', 1)[0],
+            'rang_num': cl.rang or None,
+            'moyenne': Decimal(str(float(cl.moyenne_generale))),
+            'total_eleves': cl.effectif,
+        }
+    return rangs_dict
+
+
+def rangs_materialises(classe_note, periode, eleves, matieres):
+    """Rangs d'une classe pour une période, servis depuis les résultats matérialisés.
+
+    Args:
+        classe_note: Instance de ClasseNote (niveau non maternelle)
+        periode: Période canonique (OCTOBRE, TRIMESTRE_1, ANNUEL_TRIM, ...)
+        eleves: Élèves actifs de la classe
+        matieres: Matières actives de la classe
+
+    Returns:
+        Même format que calculer_rangs_classe_periode, ou None si la période
+        n'est pas matérialisée ou si le magasin est indisponible (l'appelant
+        recalcule alors depuis les notes).
+    """
+    if periode not in PERIODES_MATERIALISEES:
+        return None
+    try:
+        return _rangs_materialises(classe_note, periode, list(eleves), list(matieres))
+    except DatabaseError as e:
+        logger.warning(f"Résultats matérialisés indisponibles pour classe {classe_note.id} ({periode}): {e}")
+        return None
+
+
+def _rangs_materialises(classe_note, periode, eleves, matieres):
+    if not eleves or not matieres:
+        return {}
+
+    eleve_ids = {e.id for e in eleves}
+    matieres_par_id = {m.id: m for m in matieres}
+    resultats = ResultatMatiere.objects.filter(
+        classe=classe_note, periode=periode, annee_scolaire=classe_note.annee_scolaire,
+    )
+    colonnes = {
+        c['matiere_id']: c
+        for c in resultats.values('matiere_id').annotate(
+            nb=Count('id'), nb_perimes=Count('id', filter=Q(perime=True)),
+        )
+    }
+    classements = {
+        cl.eleve_id: cl
+        for cl in Classement.objects.filter(
+            classe=classe_note, periode=periode, annee_scolaire=classe_note.annee_scolaire,
+        ).only('eleve_id', 'moyenne_generale', 'rang', 'rang_formate', 'effectif')
+    }
+
+    effectif_inchange = set(classements) == eleve_ids
+    if effectif_inchange:
+        a_recalculer = [
+            m for mid, m in matieres_par_id.items()
+            if mid not in colonnes
+            or colonnes[mid]['nb_perimes']
+            or colonnes[mid]['nb'] != len(eleve_ids)
+        ]
+    else:
+        # Arrivée ou départ d'élèves : toutes les colonnes changent
+        a_recalculer = list(matieres)
+    obsoletes = set(colonnes) - set(matieres_par_id)
+
+    if not a_recalculer and not obsoletes:
+        return _lire_rangs(classements, eleves)
+
+    with transaction.atomic():
+        if a_recalculer:
+            # Verrouille les cellules à recalculer : une note enregistrée
+            # pendant le recalcul remarquera la colonne après notre commit.
+            list(resultats.filter(matiere_id__in=[m.id for m in a_recalculer])
+                 .select_for_update().values_list('id', flat=True))
+        if obsoletes:
+            resultats.filter(matiere_id__in=obsoletes).delete()
+        if not effectif_inchange:
+            resultats.exclude(eleve_id__in=eleve_ids).delete()
+        if a_recalculer:
+            _recalculer_colonnes(classe_note, periode, eleves, a_recalculer)
+        rangs_dict = _reclasser(classe_note, periode, eleves, resultats)
+
+    logger.info(
+        f"Résultats matérialisés mis à jour pour classe {classe_note.id} ({periode}): "
+        f"{len(a_recalculer)} matière(s) recalculée(s)"
+    )
+    return rangs_dict
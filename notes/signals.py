@@ -13,9 +13,8 @@ SOLUTION:
 - Signal post_delete sur NoteEleve qui supprime NoteMensuelle correspondante
 """
 
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from django.core.cache import cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -232,7 +231,54 @@ def sync_all_notes_eleve_to_mensuelle(classe_note=None, annee_scolaire=None):
         except Exception as e:
             stats['erreurs'].append(f"{cn.nom}: {str(e)}")
     
-    # Vider le cache
-    cache.clear()
+    # Invalider le cache des classes traitées (le cache est partagé : un
+    # clear() effacerait aussi compteurs de sécurité et IP bloquées)
+    from ecole_moderne.cache_partage import invalider_tags, tag_classe
+    invalider_tags(*(tag_classe(cn.id) for cn in classes_qs))
     
     return stats
+
+
+# ---------------------------------------------------------------------------
+# Lien ClasseNote -> Classe (élèves)
+# ---------------------------------------------------------------------------
+
+_IDENTITE_CLASSE = ('nom', 'annee_scolaire', 'ecole_id')
+
+
+def _identite_modifiee(instance, sans_etat_lu):
+    """True si l'instance est nouvelle ou si son nom, son année ou son école
+    diffèrent de l'état lu en base ; ``sans_etat_lu`` si cet état est inconnu."""
+    if instance._state.adding:
+        return True
+    avant = instance.valeurs_chargees()
+    if avant is None:
+        return sans_etat_lu
+    return any(avant.get(champ) != getattr(instance, champ) for champ in _IDENTITE_CLASSE)
+
+
+@receiver(pre_save, sender='notes.ClasseNote')
+def lier_classe_note(sender, instance, raw=False, **kwargs):
+    """Renseigne la classe élèves d'une ClasseNote créée, renommée ou non liée
+    (lien exact seulement, voir classes_utils.est_lien_exact)."""
+    if raw:
+        return
+    if instance.classe_eleve_id is None or _identite_modifiee(instance, sans_etat_lu=False):
+        from .classes_utils import classe_eleve_exacte
+        instance.classe_eleve = classe_eleve_exacte(instance)
+
+
+@receiver(pre_save, sender='eleves.Classe')
+def reperer_classe_renommee(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._relier_classes_notes = _identite_modifiee(instance, sans_etat_lu=True)
+
+
+@receiver(post_save, sender='eleves.Classe')
+def relier_classes_notes_apres_enregistrement(sender, instance, raw=False, **kwargs):
+    """Met à jour les liens des ClasseNote quand une classe élèves est créée
+    ou renommée (passage d'année compris)."""
+    if raw or not instance.__dict__.pop('_relier_classes_notes', False):
+        return
+    from .classes_utils import relier_classes_notes
+    relier_classes_notes(instance)
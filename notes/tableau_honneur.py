@@ -12,12 +12,12 @@ from django.shortcuts import render
 from django.http import HttpResponse
 from django.template.loader import render_to_string
 
-from .models import ClasseNote, MatiereNote
-from eleves.models import Eleve, Classe as ClasseEleve
+from .models import ClasseNote
 from utilisateurs.utils import filter_by_user_school, user_school
 from eleves.utils_annee import get_annee_active
-from .calculs_moyennes import calculer_classement_classe, detecter_niveau_scolaire
+from .calculs_moyennes import calculer_classements_classes, detecter_niveau_scolaire
 from .export_classement import formater_rang
+from .utils_rangs import groupes_classes_notes
 
 logger = logging.getLogger(__name__)
 
@@ -81,27 +81,31 @@ def _get_top1_par_classe(request, periode):
     system_type = _get_system_type(periode)
     premiers = []
 
+    # Élèves et matières de toutes les classes en trois requêtes, puis les
+    # classements de toutes les classes non maternelles en une passe
+    classes_note = list(classes_note)
+    groupes = groupes_classes_notes(classes_note)
+    niveaux = {cn.id: detecter_niveau_scolaire(cn.nom) for cn in classes_note}
+    a_classer = {
+        cle: (eleves, matieres) for cle, (eleves, matieres) in groupes.items()
+        if matieres and niveaux[cle] != 'MATERNELLE'
+    }
+    try:
+        classements = calculer_classements_classes(a_classer, periode, system_type)
+    except Exception as e:
+        logger.error(f"Erreur tableau d'honneur ({periode}): {e}")
+        classements = {}
+
     for classe_note in classes_note:
+        if classe_note.id not in groupes:
+            continue
         try:
-            niveau = detecter_niveau_scolaire(classe_note.nom)
+            eleves, _matieres = groupes[classe_note.id]
+            niveau = niveaux[classe_note.id]
             est_maternelle = (niveau == 'MATERNELLE')
             est_primaire = (niveau == 'PRIMAIRE')
             note_max = 10 if est_primaire else 20
-
-            # Récupérer la classe élève correspondante
-            classe_eleve = ClasseEleve.objects.filter(
-                nom__iexact=classe_note.nom,
-                annee_scolaire=classe_note.annee_scolaire,
-                ecole=classe_note.ecole
-            ).first()
-            if not classe_eleve:
-                continue
-
-            eleves = Eleve.objects.filter(classe=classe_eleve, statut='ACTIF')
-            if not eleves.exists():
-                continue
-
-            total_eleves = eleves.count()
+            total_eleves = len(eleves)
 
             if est_maternelle:
                 # Utiliser le calcul des rangs maternelle
@@ -132,13 +136,7 @@ def _get_top1_par_classe(request, periode):
                         break
             else:
                 # Calcul standard
-                matieres = MatiereNote.objects.filter(classe=classe_note, actif=True)
-                if not matieres.exists():
-                    continue
-
-                classement_resultat = calculer_classement_classe(
-                    eleves, matieres, periode, system_type, use_cache=False
-                )
+                classement_resultat = classements.get(classe_note.id)
                 if not classement_resultat or not classement_resultat.get('classement'):
                     continue
 
@@ -147,11 +145,7 @@ def _get_top1_par_classe(request, periode):
                 if moyenne <= 0:
                     continue
 
-                try:
-                    eleve = Eleve.objects.get(pk=eleve_id)
-                except Eleve.DoesNotExist:
-                    continue
-
+                eleve = next(e for e in eleves if e.id == eleve_id)
                 photo_base64, photo_mime = _encode_photo(eleve)
                 premiers.append({
                     'eleve': eleve,
@@ -152,3 +152,474 @@ class CorrespondanceClasseElevesTests(TestCase):
 
         with self.assertRaises(Http404):
             gerer_eleves(requete)
+
+
+class LienClasseNoteTests(TestCase):
+    """Lien persistant ClasseNote -> Classe (élèves)."""
+
+    def setUp(self):
+        self.ecole = Ecole.objects.create(
+            nom='École lien', adresse='Conakry',
+            telephone='+224620100009', directeur='Direction',
+        )
+
+    def classe(self, nom, annee='2025-2026'):
+        return Classe.objects.create(ecole=self.ecole, nom=nom, niveau='COLLEGE_7', annee_scolaire=annee)
+
+    def classe_note(self, nom, annee='2025-2026'):
+        return ClasseNote.objects.create(ecole=self.ecole, nom=nom, niveau='COLLEGE_7', annee_scolaire=annee)
+
+    def test_lien_a_la_creation_et_apres_renommage(self):
+        classe = self.classe('7ÈME ANNÉE A')
+        classe_note = self.classe_note('7ème Année A')
+        self.assertEqual(classe_note.classe_eleve, classe)
+
+        classe.nom = '7ème Année B'
+        classe.save()
+        classe_note.refresh_from_db()
+        self.assertIsNone(classe_note.classe_eleve_id)
+
+        classe_note.nom = '7ème Année B'
+        classe_note.save()
+        self.assertEqual(classe_note.classe_eleve, classe)
+
+    def test_classe_eleves_creee_apres_la_classe_notes(self):
+        classe_note = self.classe_note('7ème Année A', annee='2026-2027')
+        self.assertIsNone(classe_note.classe_eleve_id)
+
+        classe = self.classe('7ème Année A', annee='2026-2027')
+        classe_note.refresh_from_db()
+        self.assertEqual(classe_note.classe_eleve, classe)
+
+    def test_lecture_par_le_lien(self):
+        from .utils_rangs import classe_eleve_correspondante
+
+        classe = self.classe('7ème Année A')
+        self.classe_note('7ème Année A')
+        classe_note = ClasseNote.objects.select_related('classe_eleve').get()
+        with self.assertNumQueries(0):
+            self.assertEqual(classe_eleve_correspondante(classe_note), classe)
+
+    def test_classe_notes_d_une_annee_passee_sans_eleves_actuels(self):
+        from .utils_rangs import classe_eleve_correspondante
+
+        # Élèves promus : la classe 2024-2025 est vide, celle de 2025-2026 porte le même nom
+        self.classe('7ème Année A', annee='2024-2025')
+        actuelle = self.classe('7ème Année A')
+        Eleve.objects.create(
+            matricule='LIEN-001', prenom='Élève', nom='Diallo', sexe='F', classe=actuelle, statut='ACTIF',
+        )
+        ClasseNote.objects.create(
+            ecole=self.ecole, nom='7ème Année A', niveau='COLLEGE_7', annee_scolaire='2024-2025',
+        )
+        ClasseNote.objects.update(classe_eleve=None)  # ligne antérieure au lien
+
+        classe_note = ClasseNote.objects.get(annee_scolaire='2024-2025')
+        self.assertEqual(classe_eleve_correspondante(classe_note).annee_scolaire, '2024-2025')
+
+        passee = self.classe_note('8ème Année A', annee='2024-2025')
+        self.classe('8ème Année A')  # seulement dans l'année en cours
+        passee = ClasseNote.objects.get(pk=passee.pk)
+        with self.assertNumQueries(1):
+            self.assertIsNone(classe_eleve_correspondante(passee))
+            self.assertIsNone(classe_eleve_correspondante(passee))
+
+    def test_pas_de_rapprochement_par_niveau_a_la_lecture(self):
+        from .utils_rangs import classe_eleve_correspondante
+
+        classe_note = self.classe_note('7ème Année A')
+        autre = self.classe('7e A')
+        Eleve.objects.create(
+            matricule='LIEN-002', prenom='Élève', nom='Diallo', sexe='F', classe=autre, statut='ACTIF',
+        )
+        classe_note = ClasseNote.objects.get(pk=classe_note.pk)
+        self.assertIsNone(classe_eleve_correspondante(classe_note))
+
+        exacte = self.classe('7ème Année A')
+        classe_note.refresh_from_db()
+        self.assertEqual(classe_note.classe_eleve, exacte)
+
+    def test_migration_detache_les_liens_approches(self):
+        import importlib
+
+        from django.apps import apps as registre
+
+        migration = importlib.import_module('notes.migrations.0016_liens_classe_eleve_exacts')
+        exacte = self.classe('7ème Année A')
+        ancienne = self.classe('7ème Année B', annee='2024-2025')
+        liee = self.classe_note('7ème Année A')
+        approchee = self.classe_note('7ème Année B')
+        ClasseNote.objects.filter(pk=approchee.pk).update(classe_eleve=ancienne)
+
+        migration.detacher_liens_approches(registre, None)
+        liee.refresh_from_db()
+        approchee.refresh_from_db()
+        self.assertEqual(liee.classe_eleve, exacte)
+        self.assertIsNone(approchee.classe_eleve_id)
+
+    def test_commande_de_rattrapage(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        classe = self.classe('7ème Année A')
+        classe_note = self.classe_note('7ème Année A')
+        ClasseNote.objects.filter(pk=classe_note.pk).update(classe_eleve=None)
+        self.classe_note('Classe sans élèves')
+
+        sortie = StringIO()
+        call_command('lier_classes_notes', stdout=sortie)
+        classe_note.refresh_from_db()
+        self.assertEqual(classe_note.classe_eleve, classe)
+        self.assertIn('1 classe(s) liée(s), 1 sans classe élèves', sortie.getvalue())
+
+
+class ClasseAvecNotesMixin:
+    """Classe de 7ème (2 matières, 5 élèves) avec notes d'octobre, novembre et T1."""
+
+    def setUp(self):
+        from decimal import Decimal
+
+        from .models import CompositionNote, MatiereNote, NoteMensuelle
+
+        self.ecole = Ecole.objects.create(
+            nom='École résultats',
+            adresse='Conakry',
+            telephone='+224620100003',
+            directeur='Direction',
+        )
+        self.classe = Classe.objects.create(
+            ecole=self.ecole,
+            nom='7ème Année',
+            niveau='COLLEGE_7',
+            annee_scolaire='2025-2026',
+        )
+        self.classe_note = ClasseNote.objects.create(
+            ecole=self.ecole,
+            nom='7ÈME ANNÉE',
+            niveau='COLLEGE_7',
+            annee_scolaire='2025-2026',
+        )
+        self.maths = MatiereNote.objects.create(
+            classe=self.classe_note, nom='Mathématiques', code='MATH', coefficient=Decimal('3'),
+        )
+        self.francais = MatiereNote.objects.create(
+            classe=self.classe_note, nom='Français', code='FR', coefficient=Decimal('2'),
+        )
+        self.eleves = [
+            Eleve.objects.create(
+                matricule=f'RES-{i:03d}', prenom=f'Élève {i}', nom='Camara',
+                sexe='F' if i % 2 else 'M', classe=self.classe, statut='ACTIF',
+            )
+            for i in range(5)
+        ]
+        notes = [
+            (Decimal('12.50'), Decimal('14'), Decimal('11')),
+            (Decimal('15'), Decimal('9.75'), Decimal('16')),
+            (Decimal('8'), Decimal('13'), None),
+            (Decimal('12.50'), Decimal('14'), Decimal('11')),
+            (Decimal('17.25'), Decimal('10'), Decimal('13.50')),
+        ]
+        for eleve, (octobre, novembre, composition) in zip(self.eleves, notes):
+            for matiere in (self.maths, self.francais):
+                NoteMensuelle.objects.create(
+                    eleve=eleve, matiere=matiere, mois='OCTOBRE',
+                    annee_scolaire='2025-2026', note=octobre,
+                )
+                NoteMensuelle.objects.create(
+                    eleve=eleve, matiere=matiere, mois='NOVEMBRE',
+                    annee_scolaire='2025-2026', note=novembre,
+                )
+            if composition is not None:
+                CompositionNote.objects.create(
+                    eleve=eleve, matiere=self.maths, periode='TRIMESTRE_1',
+                    annee_scolaire='2025-2026', note=composition,
+                )
+
+
+
+class ResultatsMaterialisesTests(ClasseAvecNotesMixin, TestCase):
+    """Les rangs servis par notes.resultats sont identiques au recalcul direct."""
+
+    def rangs_recalcules(self, periode):
+        from unittest import mock
+
+        from .utils_rangs import calculer_rangs_classe_periode
+
+        with mock.patch('notes.resultats.rangs_materialises', return_value=None):
+            return calculer_rangs_classe_periode(self.classe_note, periode, use_cache=False)
+
+    def rangs_materialises(self, periode):
+        from .utils_rangs import calculer_rangs_classe_periode
+
+        return calculer_rangs_classe_periode(self.classe_note, periode, use_cache=False)
+
+    def test_rangs_identiques_au_recalcul_direct(self):
+        for periode in ('OCTOBRE', 'NOVEMBRE', 'TRIMESTRE_1', 'ANNUEL_TRIM'):
+            with self.subTest(periode=periode):
+                attendu = self.rangs_recalcules(periode)
+                self.assertEqual(len(attendu), 5)
+                self.assertEqual(self.rangs_materialises(periode), attendu)
+                # Seconde lecture : servie depuis Classement, sans recalcul
+                self.assertEqual(self.rangs_materialises(periode), attendu)
+
+    def test_lecture_sans_recalcul_quand_rien_n_a_change(self):
+        from .resultats import rangs_materialises
+
+        self.rangs_materialises('TRIMESTRE_1')
+        eleves = list(Eleve.objects.filter(classe=self.classe, statut='ACTIF'))
+        matieres = list(self.classe_note.matieres.filter(actif=True))
+        with self.assertNumQueries(2):
+            rangs_materialises(self.classe_note, 'TRIMESTRE_1', eleves, matieres)
+
+    def test_note_modifiee_ne_recalcule_que_sa_colonne(self):
+        from .models import NoteMensuelle, ResultatMatiere
+
+        self.rangs_materialises('TRIMESTRE_1')
+        note = NoteMensuelle.objects.get(eleve=self.eleves[2], matiere=self.francais, mois='OCTOBRE')
+        note.note = 20
+        note.save()
+
+        perimes = ResultatMatiere.objects.filter(classe=self.classe_note, perime=True)
+        self.assertEqual(set(perimes.values_list('matiere_id', flat=True)), {self.francais.id})
+        self.assertEqual(set(perimes.values_list('periode', flat=True)), {'TRIMESTRE_1'})
+        self.assertEqual(self.rangs_materialises('TRIMESTRE_1'), self.rangs_recalcules('TRIMESTRE_1'))
+        self.assertFalse(perimes.exists())
+
+    def test_composition_trimestrielle_perime_le_semestre(self):
+        from .models import CompositionNote, ResultatMatiere
+
+        self.rangs_materialises('SEMESTRE_1')
+        self.assertTrue(ResultatMatiere.objects.filter(classe=self.classe_note, periode='SEMESTRE_1').exists())
+        composition = CompositionNote.objects.get(eleve=self.eleves[0], matiere=self.maths, periode='TRIMESTRE_1')
+        composition.note = 20
+        composition.save()
+
+        perimes = ResultatMatiere.objects.filter(classe=self.classe_note, perime=True)
+        self.assertIn('SEMESTRE_1', set(perimes.values_list('periode', flat=True)))
+        self.assertEqual(self.rangs_materialises('SEMESTRE_1'), self.rangs_recalcules('SEMESTRE_1'))
+
+    def test_depart_d_un_eleve_reclasse_la_classe(self):
+        from .models import Classement
+
+        self.rangs_materialises('NOVEMBRE')
+        self.eleves[4].statut = 'TRANSFERE'
+        self.eleves[4].save()
+
+        rangs = self.rangs_materialises('NOVEMBRE')
+        self.assertEqual(rangs, self.rangs_recalcules('NOVEMBRE'))
+        self.assertNotIn(self.eleves[4].id, rangs)
+        self.assertFalse(Classement.objects.filter(eleve=self.eleves[4], periode='NOVEMBRE').exists())
+
+
+class BulletinsClassePdfTests(ClasseAvecNotesMixin, TestCase):
+    """Bulletins de classe : détails calculés en lot et PDF envoyé par blocs."""
+
+    def test_detail_en_lot_identique_au_calcul_par_matiere(self):
+        from .calculs_moyennes import calculer_bulletin_intelligent, calculer_bulletins_classe
+
+        matieres = [self.maths, self.francais]
+        for periode, system_type in (
+            ('OCTOBRE', 'mensuel'), ('TRIMESTRE_1', 'trimestriel'), ('ANNUEL_TRIM', 'annuel_trimestriel'),
+        ):
+            with self.subTest(periode=periode):
+                lot = calculer_bulletins_classe(self.eleves, matieres, periode, system_type)
+                for eleve in self.eleves:
+                    for matiere in matieres:
+                        self.assertEqual(
+                            lot[(eleve.id, matiere.id)],
+                            calculer_bulletin_intelligent(eleve, matiere, periode, system_type),
+                        )
+
+    def test_nombre_de_requetes_independant_de_l_effectif(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .calculs_moyennes import calculer_bulletins_classe
+        from .models import MatiereNote
+
+        matieres = list(MatiereNote.objects.filter(classe=self.classe_note).select_related('classe'))
+        with CaptureQueriesContext(connection) as un_eleve:
+            calculer_bulletins_classe(self.eleves[:1], matieres, 'TRIMESTRE_1', 'trimestriel')
+        with CaptureQueriesContext(connection) as classe:
+            calculer_bulletins_classe(self.eleves, matieres, 'TRIMESTRE_1', 'trimestriel')
+        self.assertEqual(len(classe), len(un_eleve))
+
+    def test_pdf_de_classe_envoye_en_flux(self):
+        from django.urls import reverse
+
+        self.client.force_login(User.objects.create_user('direction_bulletins', password='x'))
+        response = self.client.get(
+            reverse('notes:bulletins_classe_pdf', args=[self.classe_note.id, 'TRIMESTRE_1'])
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        contenu = b''.join(response.streaming_content)
+        self.assertTrue(contenu.startswith(b'%PDF'))
+        self.assertEqual(contenu.count(b'/Type /Page\n'), len(self.eleves))
+
+
+class MoteurVectorielPariteTests(TestCase):
+    """Le moteur NumPy donne exactement les résultats du moteur Decimal."""
+
+    MOIS = ['OCTOBRE', 'NOVEMBRE', 'DECEMBRE', 'JANVIER', 'FEVRIER', 'MARS', 'AVRIL', 'MAI', 'JUIN']
+    PERIODES = ['TRIMESTRE_1', 'TRIMESTRE_2', 'TRIMESTRE_3', 'SEMESTRE_1', 'SEMESTRE_2']
+
+    def setUp(self):
+        import random
+        from decimal import Decimal
+
+        from .models import CompositionNote, MatiereNote, NoteMensuelle, NoteSuivi
+
+        hasard = random.Random(2025)
+        self.groupes = {}
+        for rang, (nom, niveau, bonus) in enumerate((
+            ('8ÈME ANNÉE', 'COLLEGE_8', False),
+            ('CE2', 'PRIMAIRE_3', False),
+            ('10ÈME ANNÉE', 'COLLEGE_10', True),
+        )):
+            ecole = Ecole.objects.create(
+                nom=f'École parité {rang}', adresse='Conakry',
+                telephone=f'+22462010{rang:04d}', directeur='Direction',
+                bonus_suivi_actif=bonus,
+            )
+            classe = Classe.objects.create(ecole=ecole, nom=nom, niveau=niveau, annee_scolaire='2025-2026')
+            classe_note = ClasseNote.objects.create(ecole=ecole, nom=nom, niveau=niveau, annee_scolaire='2025-2026')
+            coefficients = [Decimal('3'), Decimal('2.5'), Decimal('1.25'), None, Decimal('0'), Decimal('4')]
+            matieres = [
+                MatiereNote.objects.create(classe=classe_note, nom=f'Matière {j}', code=f'M{j}', coefficient=c)
+                for j, c in enumerate(coefficients)
+            ]
+            eleves = [
+                Eleve.objects.create(
+                    matricule=f'PAR-{rang}-{i:03d}', prenom=f'Élève {i}', nom='Diallo',
+                    sexe='F', classe=classe, statut='ACTIF',
+                )
+                for i in range(12)
+            ]
+
+            def note():
+                tirage = hasard.random()
+                if tirage < 0.05:
+                    return None
+                if tirage < 0.08:
+                    return Decimal('21.50')  # hors barème : plafonné à 20 par le calcul
+                return Decimal(hasard.randint(0, 2000)) / 100
+
+            mensuelles, compositions, suivis = [], [], []
+            for eleve in eleves:
+                for j, matiere in enumerate(matieres):
+                    for mois in self.MOIS:
+                        if hasard.random() < 0.2:
+                            continue
+                        absent = hasard.random() < 0.05
+                        mensuelles.append(NoteMensuelle(
+                            eleve=eleve, matiere=matiere, mois=mois, annee_scolaire='2025-2026',
+                            note=None if absent else note(), absent=absent,
+                        ))
+                        if bonus and hasard.random() < 0.3:
+                            suivis.append(NoteSuivi(
+                                eleve=eleve, matiere=matiere, mois=mois, annee_scolaire='2025-2026',
+                                type_note='COURS', note=Decimal(hasard.randint(0, 2000)) / 100,
+                            ))
+                    if j == 2:
+                        continue  # matière sans aucune composition : pas de règle stricte
+                    for periode in self.PERIODES:
+                        # Semestres souvent absents : repli sur les trimestres
+                        seuil = 0.6 if periode.startswith('SEMESTRE') else 0.15
+                        if hasard.random() < seuil:
+                            continue
+                        absent = hasard.random() < 0.05
+                        compositions.append(CompositionNote(
+                            eleve=eleve, matiere=matiere, periode=periode, annee_scolaire='2025-2026',
+                            note=None if absent else note(), absent=absent,
+                        ))
+            NoteMensuelle.objects.bulk_create(mensuelles)
+            CompositionNote.objects.bulk_create(compositions)
+            NoteSuivi.objects.bulk_create(suivis)
+            self.groupes[classe_note.id] = (eleves, matieres)
+
+    def cas(self):
+        for mois in self.MOIS:
+            yield mois, 'mensuel'
+        for periode in self.PERIODES[:3]:
+            yield periode, 'trimestre'
+        for periode in self.PERIODES[3:]:
+            yield periode, 'semestre'
+
+    def test_periodes_identiques_au_moteur_decimal(self):
+        from .calculs_moyennes import calculer_moyennes_classe_decimal
+        from .moteur_vectoriel import calculer_moyennes_classe_vectorise
+
+        for eleves, matieres in self.groupes.values():
+            for periode, system_type in self.cas():
+                with self.subTest(classe=matieres[0].classe.nom, periode=periode):
+                    self.assertEqual(
+                        calculer_moyennes_classe_vectorise(eleves, matieres, periode, system_type, use_cache=False),
+                        calculer_moyennes_classe_decimal(eleves, matieres, periode, system_type, use_cache=False),
+                    )
+
+    def test_annuel_identique_au_moteur_decimal(self):
+        from .calculs_moyennes import calculer_moyennes_classe_annuelle_decimal
+        from .moteur_vectoriel import calculer_moyennes_annuelles_classe_vectorise
+
+        for eleves, matieres in self.groupes.values():
+            for system_type in ('annuel_trimestriel', 'annuel_semestriel'):
+                with self.subTest(classe=matieres[0].classe.nom, system_type=system_type):
+                    self.assertEqual(
+                        calculer_moyennes_annuelles_classe_vectorise(eleves, matieres, system_type, use_cache=False),
+                        calculer_moyennes_classe_annuelle_decimal(eleves, matieres, system_type, use_cache=False),
+                    )
+
+    def test_plusieurs_classes_en_une_passe(self):
+        from .calculs_moyennes import calculer_moyennes_classe_decimal
+        from .moteur_vectoriel import calculer_moyennes_classes_vectorise
+
+        with self.assertNumQueries(7):
+            # notes + compositions (repli trimestres compris), puis bonus :
+            # 1 requête par école, 2 de plus pour l'école où il est activé
+            resultats = calculer_moyennes_classes_vectorise(self.groupes, 'SEMESTRE_2', 'semestre')
+        for cle, (eleves, matieres) in self.groupes.items():
+            self.assertEqual(
+                resultats[cle],
+                calculer_moyennes_classe_decimal(eleves, matieres, 'SEMESTRE_2', 'semestre', use_cache=False),
+            )
+
+    def test_classements_ecole_identiques_au_calcul_par_classe(self):
+        from django.test import override_settings
+
+        from .calculs_moyennes import calculer_classement_classe, calculer_classements_classes
+        from .utils_rangs import groupes_classes_notes
+
+        groupes = groupes_classes_notes(ClasseNote.objects.all())
+        self.assertEqual(
+            {cle: ({e.id for e in eleves}, {m.id for m in matieres}) for cle, (eleves, matieres) in groupes.items()},
+            {cle: ({e.id for e in eleves}, {m.id for m in matieres}) for cle, (eleves, matieres) in self.groupes.items()},
+        )
+        for vectoriel in (True, False):
+            for periode, system_type in (('NOVEMBRE', 'mensuel'), ('SEMESTRE_1', 'semestre'), ('ANNUEL_TRIM', 'annuel_trimestriel')):
+                with self.subTest(vectoriel=vectoriel, periode=periode), override_settings(NOTES_MOTEUR_VECTORIEL=vectoriel):
+                    classements = calculer_classements_classes(groupes, periode, system_type)
+                    for cle, (eleves, matieres) in groupes.items():
+                        self.assertEqual(
+                            classements[cle],
+                            calculer_classement_classe(eleves, matieres, periode, system_type, use_cache=False),
+                        )
+
+    def test_tableau_honneur_premier_de_chaque_classe(self):
+        from .calculs_moyennes import calculer_classement_classe
+        from .tableau_honneur import _get_top1_par_classe
+
+        request = RequestFactory().get('/notes/tableau-honneur/')
+        request.user = User.objects.create_superuser('direction', 'direction@example.com', 'secret')
+        premiers = _get_top1_par_classe(request, 'TRIMESTRE_2')
+
+        attendus = {}
+        for eleves, matieres in self.groupes.values():
+            eleve_id, moyenne = calculer_classement_classe(
+                eleves, matieres, 'TRIMESTRE_2', 'trimestriel', use_cache=False,
+            )['classement'][0]
+            attendus[eleve_id] = round(float(moyenne), 2)
+        self.assertEqual({p['eleve'].id: p['moyenne'] for p in premiers}, attendus)
+        self.assertEqual([p['rang_premiers'] for p in premiers], [1, 2, 3])
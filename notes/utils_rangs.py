@@ -15,6 +15,8 @@ from decimal import Decimal
 from typing import Dict, List, Optional
 from django.core.cache import cache
 from django.db.models import Prefetch, Q
+
+from ecole_moderne.cache_partage import cle_etiquetee, invalider_tags, tag_classe
 from .calculs_intelligent import calculer_rang_intelligent
 import logging
 import time
@@ -27,6 +29,89 @@ _cache_matieres = {}
 CACHE_TIMEOUT = 600  # 10 minutes
 RANGS_CACHE_SCHEMA_VERSION = 2
 
+PERIODES_MENSUELLES = ['OCTOBRE', 'NOVEMBRE', 'DECEMBRE', 'JANVIER', 'FEVRIER', 'MARS', 'AVRIL', 'MAI', 'JUIN']
+
+# Périodes dont les moyennes dépendent d'une période modifiée
+PERIODES_DEPENDANTES = {
+    'OCTOBRE': ['TRIMESTRE_1', 'SEMESTRE_1', 'ANNUEL_TRIM', 'ANNUEL_SEM'],
+    'NOVEMBRE': ['TRIMESTRE_1', 'SEMESTRE_1', 'ANNUEL_TRIM', 'ANNUEL_SEM'],
+    'DECEMBRE': ['SEMESTRE_1', 'ANNUEL_SEM'],
+    'JANVIER': ['TRIMESTRE_2', 'SEMESTRE_1', 'ANNUEL_TRIM', 'ANNUEL_SEM'],
+    'FEVRIER': ['TRIMESTRE_2', 'ANNUEL_TRIM'],
+    'MARS': ['SEMESTRE_2', 'ANNUEL_SEM'],
+    'AVRIL': ['TRIMESTRE_3', 'SEMESTRE_2', 'ANNUEL_TRIM', 'ANNUEL_SEM'],
+    'MAI': ['TRIMESTRE_3', 'SEMESTRE_2', 'ANNUEL_TRIM', 'ANNUEL_SEM'],
+    'JUIN': ['ANNUEL_TRIM', 'ANNUEL_SEM'],
+    # Les semestres reprennent les compositions trimestrielles à défaut des
+    # leurs (calculs_moyennes._SEMESTRE_FALLBACK_TRIMESTRES)
+    'TRIMESTRE_1': ['ANNUEL_TRIM', 'SEMESTRE_1', 'ANNUEL_SEM'],
+    'TRIMESTRE_2': ['ANNUEL_TRIM', 'SEMESTRE_1', 'ANNUEL_SEM'],
+    'TRIMESTRE_3': ['ANNUEL_TRIM', 'SEMESTRE_2', 'ANNUEL_SEM'],
+    'SEMESTRE_1': ['ANNUEL_SEM'],
+    'SEMESTRE_2': ['ANNUEL_SEM'],
+}
+
+
+def classe_eleve_correspondante(classe_note):
+    """Retourne la classe élève (eleves.Classe) d'une ClasseNote, ou None.
+
+    Lit le lien ClasseNote.classe_eleve ; une ClasseNote encore sans lien
+    (antérieure au lien) est liée ici à la classe de même nom, même école et
+    même année (classes_utils.lier_classe_eleve). Sans une telle classe, None :
+    une ClasseNote d'une année passée n'est jamais rapprochée des élèves
+    actuels. La recherche n'est faite qu'une fois par instance.
+    """
+    if classe_note.classe_eleve_id:
+        return classe_note.classe_eleve
+    if not hasattr(classe_note, '_classe_eleve_cherchee'):
+        from .classes_utils import lier_classe_eleve
+        classe_note._classe_eleve_cherchee = lier_classe_eleve(classe_note)
+    return classe_note._classe_eleve_cherchee
+
+
+def groupes_classes_notes(classes_note):
+    """
+    Élèves actifs et matières actives de plusieurs ClasseNote, en deux requêtes
+    (plus une par ClasseNote encore sans lien vers sa classe élèves).
+
+    Returns:
+        dict {classe_note.id: (eleves, matieres)} au format attendu par
+        calculer_classements_classes ; les classes sans classe élève ou sans
+        élève actif sont absentes.
+    """
+    from eleves.models import Eleve
+    from .models import MatiereNote
+
+    classes_note = list(classes_note)
+    if not classes_note:
+        return {}
+
+    classe_eleve_de = {}
+    for cn in classes_note:
+        if cn.classe_eleve_id:
+            classe_eleve_de[cn.id] = cn.classe_eleve_id
+            continue
+        classe_eleve = classe_eleve_correspondante(cn)
+        if classe_eleve:
+            classe_eleve_de[cn.id] = classe_eleve.id
+
+    eleves_par_classe = {}
+    for eleve in Eleve.objects.filter(classe_id__in=set(classe_eleve_de.values()), statut='ACTIF'):
+        eleves_par_classe.setdefault(eleve.classe_id, []).append(eleve)
+
+    matieres_par_classe = {}
+    for matiere in MatiereNote.objects.filter(
+        classe__in=classes_note, actif=True,
+    ).select_related('classe'):
+        matieres_par_classe.setdefault(matiere.classe_id, []).append(matiere)
+
+    groupes = {}
+    for cn in classes_note:
+        eleves = eleves_par_classe.get(classe_eleve_de.get(cn.id))
+        if eleves:
+            groupes[cn.id] = (eleves, matieres_par_classe.get(cn.id, []))
+    return groupes
+
 
 def calculer_rangs_classe_periode(classe_note, periode: str, use_cache: bool = True) -> Dict[int, dict]:
     """
@@ -46,8 +131,12 @@ def calculer_rangs_classe_periode(classe_note, periode: str, use_cache: bool = T
         Dictionnaire {eleve_id: {'rang': '10ème', 'rang_num': 10, 'moyenne': Decimal('15.5')}}
     """
     # Vérifier le cache (priorité au cache Django)
-    cache_key = f"rangs_classe_s{RANGS_CACHE_SCHEMA_VERSION}_{classe_note.id}_periode_{periode}"
+    cache_key = None
     if use_cache:
+        cache_key = cle_etiquetee(
+            f"rangs_classe_s{RANGS_CACHE_SCHEMA_VERSION}_{classe_note.id}_periode_{periode}",
+            tag_classe(classe_note.id),
+        )
         rangs_cached = cache.get(cache_key)
         if rangs_cached is not None:
             logger.debug(f"Cache HIT pour {cache_key}")
@@ -55,25 +144,10 @@ def calculer_rangs_classe_periode(classe_note, periode: str, use_cache: bool = T
     
     start_time = time.time()
     
-    from eleves.models import Eleve, Classe as ClasseEleve
+    from eleves.models import Eleve
     from .models import MatiereNote
     
-    # Récupérer la classe élève correspondante avec mapping spécial
-    mapping_classes = {
-        61: 56,  # ClasseNote '12ème Année' -> ClasseEleve '12ÈME ANNÉE'
-        59: 8,   # ClasseNote '11ème Série littéraire' -> ClasseEleve '11ème série littéraire'
-    }
-    
-    if classe_note.id in mapping_classes:
-        classe_eleve = ClasseEleve.objects.filter(
-            id=mapping_classes[classe_note.id]
-        ).first()
-    else:
-        classe_eleve = ClasseEleve.objects.filter(
-            nom=classe_note.nom,
-            annee_scolaire=classe_note.annee_scolaire,
-            ecole=classe_note.ecole
-        ).first()
+    classe_eleve = classe_eleve_correspondante(classe_note)
     
     if not classe_eleve:
         return {}
@@ -94,6 +168,16 @@ def calculer_rangs_classe_periode(classe_note, periode: str, use_cache: bool = T
     if est_maternelle:
         return calculer_rangs_maternelle(classe_note, periode, eleves)
 
+    # Lecture depuis les résultats matérialisés (Classement): une requête
+    # indexée tant qu'aucune note de la classe n'a changé, sinon recalcul
+    # des seules colonnes (matières) périmées.
+    from .resultats import rangs_materialises
+    rangs_dict = rangs_materialises(classe_note, periode, eleves, matieres)
+    if rangs_dict is not None:
+        if use_cache:
+            cache.set(cache_key, rangs_dict, timeout=CACHE_TIMEOUT)
+        return rangs_dict
+
     # Source unique pour les periodes mensuelles, trimestrielles et semestrielles:
     # on reprend les moyennes de calculs_moyennes.py au lieu de recalculer ici.
     if periode not in ['ANNUEL_TRIM', 'ANNUEL_SEM']:
@@ -391,36 +475,23 @@ def get_rangs_avec_total(rangs_dict: Dict[int, dict]) -> Dict[int, str]:
     return rangs_avec_total
 
 
-def invalider_cache_rangs(classe_note, periode: str = None):
+def invalider_cache_rangs(classe_note, periode: str = None, matiere_id: int = None):
     """
-    Invalide le cache des rangs ET des classements pour une classe et une période.
+    Invalide le cache des rangs, classements et moyennes d'une classe et
+    marque périmés les résultats matérialisés de la période.
     À appeler après modification d'une note.
     
     Args:
         classe_note: Instance de ClasseNote
         periode: Période spécifique ou None pour invalider toutes les périodes
+        matiere_id: Matière modifiée ; limite le recalcul des résultats
+            matérialisés à cette colonne (None = toutes les matières)
     """
     periodes_a_invalider = []
     
     if periode:
         periodes_a_invalider = [periode]
-        periodes_dependantes = {
-            'OCTOBRE': ['TRIMESTRE_1', 'SEMESTRE_1', 'ANNUEL_TRIM', 'ANNUEL_SEM'],
-            'NOVEMBRE': ['TRIMESTRE_1', 'SEMESTRE_1', 'ANNUEL_TRIM', 'ANNUEL_SEM'],
-            'DECEMBRE': ['SEMESTRE_1', 'ANNUEL_SEM'],
-            'JANVIER': ['TRIMESTRE_2', 'SEMESTRE_1', 'ANNUEL_TRIM', 'ANNUEL_SEM'],
-            'FEVRIER': ['TRIMESTRE_2', 'ANNUEL_TRIM'],
-            'MARS': ['SEMESTRE_2', 'ANNUEL_SEM'],
-            'AVRIL': ['TRIMESTRE_3', 'SEMESTRE_2', 'ANNUEL_TRIM', 'ANNUEL_SEM'],
-            'MAI': ['TRIMESTRE_3', 'SEMESTRE_2', 'ANNUEL_TRIM', 'ANNUEL_SEM'],
-            'JUIN': ['ANNUEL_TRIM', 'ANNUEL_SEM'],
-            'TRIMESTRE_1': ['ANNUEL_TRIM'],
-            'TRIMESTRE_2': ['ANNUEL_TRIM'],
-            'TRIMESTRE_3': ['ANNUEL_TRIM'],
-            'SEMESTRE_1': ['ANNUEL_SEM'],
-            'SEMESTRE_2': ['ANNUEL_SEM'],
-        }
-        periodes_a_invalider.extend(periodes_dependantes.get(periode, []))
+        periodes_a_invalider.extend(PERIODES_DEPENDANTES.get(periode, []))
         periodes_a_invalider = list(dict.fromkeys(periodes_a_invalider))
     else:
         # Invalider toutes les périodes possibles
@@ -433,23 +504,14 @@ def invalider_cache_rangs(classe_note, periode: str = None):
             '1er Semestre', '2ème Semestre'
         ]
     
-    system_types = ['mensuel', 'trimestre', 'trimestriel', 'semestre', 'semestriel']
-    from .calculs_moyennes import CALCUL_CACHE_SCHEMA_VERSION
-    
-    for p in periodes_a_invalider:
-        # Invalider le cache des rangs
-        cache_key_rangs = f"rangs_classe_s{RANGS_CACHE_SCHEMA_VERSION}_{classe_note.id}_periode_{p}"
-        cache.delete(cache_key_rangs)
-        
-        # Invalider le cache des classements (pour chaque type de système)
-        for st in system_types:
-            cache_key_classement = f"classement_classe_s{CALCUL_CACHE_SCHEMA_VERSION}_{classe_note.id}_periode_{p}_type_{st}"
-            cache.delete(cache_key_classement)
-
-    # Invalider aussi le cache des moyennes de classe utilise par les conseils,
-    # statistiques et decisions. La cle de cache inclut cette version.
-    version_key = f"moy_version_classe_{classe_note.id}"
-    cache.set(version_key, cache.get(version_key, 0) + 1, 86400)
+    # Rangs, classements et moyennes de la classe (toutes périodes) portent
+    # l'étiquette de la classe : une seule écriture dans le cache partagé
+    # suffit à les invalider pour tous les workers.
+    invalider_tags(tag_classe(classe_note.id))
+
+    # Résultats matérialisés: seules les colonnes touchées seront recalculées
+    from .resultats import marquer_resultats_perimes
+    marquer_resultats_perimes(classe_note, periodes_a_invalider, matiere_id)
     
     logger.debug(f"Cache invalidé pour classe {classe_note.id}, périodes: {periodes_a_invalider}")
 
@@ -16,6 +16,7 @@ import io
 from datetime import datetime
 from eleves.models import Classe as ClasseEleve, Eleve
 from utilisateurs.utils import filter_by_user_school, user_school
+from ecole_moderne.cache_partage import invalider_tags, tag_classe
 from ecole_moderne.security_decorators import admin_required, require_school_object
 from utilisateurs.permissions import any_permission_required, can_manage_notes
 from .forms import ClasseNoteForm, MatiereNoteForm, EvaluationForm, NoteEleveForm
@@ -30,6 +31,7 @@ from .calculs_intelligent import (
     formater_rang_intelligent,
 )
 from .classes_utils import trouver_classe_eleve
+from .utils_rangs import classe_eleve_correspondante
 
 # Import centralisé du filigrane - chargé une seule fois
 try:
@@ -5581,23 +5583,7 @@ def saisir_notes(request):
             
             # Récupérer les élèves
             try:
-                # Mapping spécial pour les classes avec noms différents (même que consulter_notes)
-                mapping_classes = {
-                    61: 56,  # ClasseNote '12ème Année' -> ClasseEleve '12ÈME ANNÉE'
-                    59: 8,   # ClasseNote '11ème Série littéraire' -> ClasseEleve '11ème série littéraire'
-                }
-                
-                if classe_selectionnee.id in mapping_classes:
-                    classe_eleve = ClasseEleve.objects.filter(
-                        id=mapping_classes[classe_selectionnee.id]
-                    ).first()
-                else:
-                    # Utiliser filter().first() au lieu de get() pour éviter MultipleObjectsReturned
-                    classe_eleve = ClasseEleve.objects.filter(
-                        nom=classe_selectionnee.nom,
-                        annee_scolaire=classe_selectionnee.annee_scolaire,
-                        ecole=classe_selectionnee.ecole  # Filtrer par l'école de la classe
-                    ).first()
+                classe_eleve = classe_eleve_correspondante(classe_selectionnee)
                 
                 if classe_eleve:
                     eleves = Eleve.objects.filter(
@@ -5840,22 +5826,7 @@ def liste_saisie_pdf(request):
     else:
         note_sur = 20
     
-    # Récupérer les élèves avec mapping spécial (même logique que saisir_notes et consulter_notes)
-    mapping_classes = {
-        61: 56,  # ClasseNote '12ème Année' -> ClasseEleve '12ÈME ANNÉE'
-        59: 8,   # ClasseNote '11ème Série littéraire' -> ClasseEleve '11ème série littéraire'
-    }
-    
-    if classe.id in mapping_classes:
-        classe_eleve = ClasseEleve.objects.filter(
-            id=mapping_classes[classe.id]
-        ).first()
-    else:
-        classe_eleve = ClasseEleve.objects.filter(
-            nom=classe.nom,
-            annee_scolaire=classe.annee_scolaire,
-            ecole=classe.ecole
-        ).first()
+    classe_eleve = classe_eleve_correspondante(classe)
     
     if classe_eleve:
         eleves = Eleve.objects.filter(classe=classe_eleve, statut='ACTIF').order_by('prenom', 'nom')
@@ -5977,26 +5948,14 @@ def fiche_saisie_notes_pdf(request):
         except Exception:
             pass
 
-    mapping_classes = {
-        61: 56,
-        59: 8,
-    }
+    classe_eleve = classe_eleve_correspondante(classe)
 
-    if classe.id in mapping_classes:
-        classe_eleve = ClasseEleve.objects.filter(id=mapping_classes[classe.id]).first()
-    else:
+    if not classe_eleve:
         classe_eleve = ClasseEleve.objects.filter(
-            nom=classe.nom,
-            annee_scolaire=classe.annee_scolaire,
-            ecole=classe.ecole
+            nom__iexact=classe.nom,
+            annee_scolaire=classe.annee_scolaire
         ).first()
 
-        if not classe_eleve:
-            classe_eleve = ClasseEleve.objects.filter(
-                nom__iexact=classe.nom,
-                annee_scolaire=classe.annee_scolaire
-            ).first()
-
     eleves = []
     if classe_eleve:
         eleves = list(Eleve.objects.filter(classe=classe_eleve, statut='ACTIF').order_by('prenom', 'nom'))
@@ -6084,26 +6043,14 @@ def fiche_report_notes_pdf(request):
 
     matieres = list(MatiereNote.objects.filter(classe=classe, actif=True).order_by('nom'))
 
-    mapping_classes = {
-        61: 56,
-        59: 8,
-    }
+    classe_eleve = classe_eleve_correspondante(classe)
 
-    if classe.id in mapping_classes:
-        classe_eleve = ClasseEleve.objects.filter(id=mapping_classes[classe.id]).first()
-    else:
+    if not classe_eleve:
         classe_eleve = ClasseEleve.objects.filter(
-            nom=classe.nom,
-            annee_scolaire=classe.annee_scolaire,
-            ecole=classe.ecole
+            nom__iexact=classe.nom,
+            annee_scolaire=classe.annee_scolaire
         ).first()
 
-        if not classe_eleve:
-            classe_eleve = ClasseEleve.objects.filter(
-                nom__iexact=classe.nom,
-                annee_scolaire=classe.annee_scolaire
-            ).first()
-
     eleves = []
     if classe_eleve:
         eleves = list(Eleve.objects.filter(classe=classe_eleve, statut='ACTIF').order_by('prenom', 'nom'))
@@ -6524,13 +6471,8 @@ def sauvegarder_notes(request):
         if total_notes > 0:
             try:
                 from .utils_rangs import invalider_cache_rangs
+                # (rangs, classements et moyennes : étiquette de la classe)
                 invalider_cache_rangs(matiere.classe, periode)
-                # Invalider aussi le cache calculer_moyennes_classe_optimise
-                # (pattern: moy_classe_<id>_<periode>_<system_type>_*)
-                # Django locmem cache ne supporte pas delete_pattern,
-                # on vide tout le préfixe via une clé sentinelle incrémentale
-                _version_key = f"moy_version_classe_{matiere.classe.id}"
-                cache.set(_version_key, cache.get(_version_key, 0) + 1, 86400)
                 logger.info(f"Cache invalidé pour classe {matiere.classe.id}, période {periode}")
             except Exception as e:
                 logger.warning(f"Erreur invalidation cache: {e}")
@@ -6740,23 +6682,7 @@ def consulter_notes(request):
         
         # Récupérer les élèves
         try:
-            # Mapping spécial pour les classes avec noms différents
-            mapping_classes = {
-                61: 56,  # ClasseNote '12ème Année' -> ClasseEleve '12ÈME ANNÉE'
-                59: 8,   # ClasseNote '11ème Série littéraire' -> ClasseEleve '11ème série littéraire'
-            }
-            
-            if classe_selectionnee.id in mapping_classes:
-                classe_eleve = ClasseEleve.objects.filter(
-                    id=mapping_classes[classe_selectionnee.id]
-                ).first()
-            else:
-                # Utiliser filter().first() au lieu de get() pour éviter MultipleObjectsReturned
-                classe_eleve = ClasseEleve.objects.filter(
-                    nom=classe_selectionnee.nom,
-                    annee_scolaire=classe_selectionnee.annee_scolaire,
-                    ecole=classe_selectionnee.ecole  # Filtrer par l'école de la classe
-                ).first()
+            classe_eleve = classe_eleve_correspondante(classe_selectionnee)
             
             if classe_eleve:
                 # OPTIMISATION: Pré-charger les relations pour éviter N+1
@@ -8258,18 +8184,8 @@ def sauvegarder_notes_guineen(request):
                 except (ValueError, InvalidOperation):
                     continue
         
-        # Invalider le cache des rangs
-        try:
-            # Essayer d'invalider le cache avec pattern
-            cache_key = f"rangs_classe_{matiere.classe.id}_*"
-            if hasattr(cache, 'delete_pattern'):
-                cache.delete_pattern(cache_key)
-            else:
-                # Sinon, invalider les clés connues
-                for periode in ['OCTOBRE', 'NOVEMBRE', 'DECEMBRE', 'JANVIER', 'FEVRIER', 'MARS', 'AVRIL', 'MAI', 'JUIN']:
-                    cache.delete(f"rangs_classe_{matiere.classe.id}_periode_{periode}")
-        except Exception:
-            pass
+        # Invalider le cache des rangs, classements et moyennes de la classe
+        invalider_tags(tag_classe(matiere.classe_id))
         
         return JsonResponse({
             'success': True,
@@ -8664,46 +8580,31 @@ def bulletins_classe_maternelle_v2_pdf(request):
     
     classe_note = get_object_or_404(ClasseNote, id=classe_id)
     
-    # Mapping des classes spéciales
-    mapping_classes = {
-        61: 56,
-        59: 8,
-    }
-    
     # Récupérer les élèves de la classe avec logique améliorée
     classe_eleves = None
     eleves = []
-    
     try:
-        if classe_note.id in mapping_classes:
-            classe_eleves = Classe.objects.filter(id=mapping_classes[classe_note.id]).first()
-        else:
-            # Essayer avec nom exact, année et école
+        classe_eleves = classe_eleve_correspondante(classe_note)
+
+        if not classe_eleves:
+            # Essayer sans le filtre école
             classe_eleves = Classe.objects.filter(
-                nom=classe_note.nom,
-                annee_scolaire=classe_note.annee_scolaire,
-                ecole=classe_note.ecole
+                nom__iexact=classe_note.nom,
+                annee_scolaire=classe_note.annee_scolaire
             ).first()
             
-            if not classe_eleves:
-                # Essayer sans le filtre école
-                classe_eleves = Classe.objects.filter(
-                    nom__iexact=classe_note.nom,
-                    annee_scolaire=classe_note.annee_scolaire
-                ).first()
-            
-            if not classe_eleves:
-                # Essayer avec une correspondance partielle du nom
-                classe_eleves = Classe.objects.filter(
-                    nom__icontains=classe_note.nom.split()[0] if classe_note.nom else '',
-                    annee_scolaire=classe_note.annee_scolaire
-                ).first()
+        if not classe_eleves:
+            # Essayer avec une correspondance partielle du nom
+            classe_eleves = Classe.objects.filter(
+                nom__icontains=classe_note.nom.split()[0] if classe_note.nom else '',
+                annee_scolaire=classe_note.annee_scolaire
+            ).first()
             
-            if not classe_eleves:
-                # Dernier essai: chercher par nom uniquement (toutes années)
-                classe_eleves = Classe.objects.filter(
-                    nom__iexact=classe_note.nom
-                ).order_by('-annee_scolaire').first()
+        if not classe_eleves:
+            # Dernier essai: chercher par nom uniquement (toutes années)
+            classe_eleves = Classe.objects.filter(
+                nom__iexact=classe_note.nom
+            ).order_by('-annee_scolaire').first()
         
         if classe_eleves:
             eleves = list(Eleve.objects.filter(
@@ -8888,46 +8789,31 @@ def fiches_recommandations_pdf(request):
     
     classe_note = get_object_or_404(ClasseNote, id=classe_id)
     
-    # Mapping des classes spéciales
-    mapping_classes = {
-        61: 56,
-        59: 8,
-    }
-    
     # Récupérer les élèves de la classe
     classe_eleves = None
     eleves = []
-    
     try:
-        if classe_note.id in mapping_classes:
-            classe_eleves = Classe.objects.filter(id=mapping_classes[classe_note.id]).first()
-        else:
-            # Essayer avec nom exact, année et école
+        classe_eleves = classe_eleve_correspondante(classe_note)
+
+        if not classe_eleves:
+            # Essayer sans le filtre école
             classe_eleves = Classe.objects.filter(
-                nom=classe_note.nom,
-                annee_scolaire=classe_note.annee_scolaire,
-                ecole=classe_note.ecole
+                nom__iexact=classe_note.nom,
+                annee_scolaire=classe_note.annee_scolaire
             ).first()
             
-            if not classe_eleves:
-                # Essayer sans le filtre école
-                classe_eleves = Classe.objects.filter(
-                    nom__iexact=classe_note.nom,
-                    annee_scolaire=classe_note.annee_scolaire
-                ).first()
-            
-            if not classe_eleves:
-                # Essayer avec une correspondance partielle du nom
-                classe_eleves = Classe.objects.filter(
-                    nom__icontains=classe_note.nom.split()[0] if classe_note.nom else '',
-                    annee_scolaire=classe_note.annee_scolaire
-                ).first()
+        if not classe_eleves:
+            # Essayer avec une correspondance partielle du nom
+            classe_eleves = Classe.objects.filter(
+                nom__icontains=classe_note.nom.split()[0] if classe_note.nom else '',
+                annee_scolaire=classe_note.annee_scolaire
+            ).first()
             
-            if not classe_eleves:
-                # Dernier essai: chercher par nom uniquement (toutes années)
-                classe_eleves = Classe.objects.filter(
-                    nom__iexact=classe_note.nom
-                ).order_by('-annee_scolaire').first()
+        if not classe_eleves:
+            # Dernier essai: chercher par nom uniquement (toutes années)
+            classe_eleves = Classe.objects.filter(
+                nom__iexact=classe_note.nom
+            ).order_by('-annee_scolaire').first()
         
         if classe_eleves:
             eleves = list(Eleve.objects.filter(
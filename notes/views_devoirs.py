@@ -8,16 +8,14 @@ from django.contrib.auth.decorators import login_required
 from django.db.models import Count, Q
 from django.shortcuts import render, redirect, get_object_or_404
 
-from eleves.models import Classe as ClasseEleve, Eleve
+from eleves.models import Eleve
 from .models import ClasseNote, MatiereNote, Devoir, RemiseDevoir
 from .calculs_moyennes import mois_scolaire_depuis_date
-from .utils_rangs import invalider_cache_rangs
+from .utils_rangs import classe_eleve_correspondante, invalider_cache_rangs
 
 
 def _eleves_de_classe_note(classe_note):
-    ce = ClasseEleve.objects.filter(
-        nom=classe_note.nom, annee_scolaire=classe_note.annee_scolaire, ecole=classe_note.ecole
-    ).first()
+    ce = classe_eleve_correspondante(classe_note)
     if not ce:
         return []
     return list(Eleve.objects.filter(classe=ce, statut='ACTIF').order_by('prenom', 'nom'))
@@ -15,9 +15,10 @@ from .models import (
     ClasseNote, MatiereNote, EvaluationMaternelle, NoteMaternelle,
     AnalyseTravailMaternelle, RecommandationMaternelle, AppreciationMaternelle
 )
-from eleves.models import Eleve, Classe
+from eleves.models import Eleve
 from eleves.utils_annee import get_annee_active
 from .analyse_maternelle_intelligente import AnalyseMaternelleIntelligente
+from .utils_rangs import classe_eleve_correspondante
 
 
 def get_annee_scolaire_courante():
@@ -63,20 +64,13 @@ def saisie_evaluation_maternelle(request):
         classe_selectionnee = get_object_or_404(ClasseNote, id=classe_id)
         
         # Récupérer les élèves de cette classe depuis le module eleves
-        # Utiliser l'année scolaire de la ClasseNote
-        try:
-            classe_eleves = Classe.objects.filter(
-                nom=classe_selectionnee.nom,
-                annee_scolaire=classe_selectionnee.annee_scolaire
-            ).first()
-            if classe_eleves:
-                eleves = Eleve.objects.filter(
-                    classe=classe_eleves,
-                    statut='ACTIF'
-                ).order_by('nom', 'prenom')
-            else:
-                eleves = []
-        except Classe.DoesNotExist:
+        classe_eleves = classe_eleve_correspondante(classe_selectionnee)
+        if classe_eleves:
+            eleves = Eleve.objects.filter(
+                classe=classe_eleves,
+                statut='ACTIF'
+            ).order_by('nom', 'prenom')
+        else:
             eleves = []
         
         # Récupérer les matières de la classe
@@ -565,10 +559,7 @@ def api_get_eleves_classe(request):
     
     try:
         classe_note = ClasseNote.objects.get(id=classe_id)
-        classe_eleves = Classe.objects.filter(
-            nom=classe_note.nom,
-            annee_scolaire=classe_note.annee_scolaire
-        ).first()
+        classe_eleves = classe_eleve_correspondante(classe_note)
         if classe_eleves:
             eleves = Eleve.objects.filter(
                 classe=classe_eleves,
@@ -8,19 +8,15 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
 
-from eleves.models import Classe as ClasseEleve, Eleve
+from eleves.models import Eleve
 from .models import ClasseNote, MatiereNote, NoteSuivi
 from .calculs_moyennes import bonus_suivi_batch
-from .utils_rangs import invalider_cache_rangs
+from .utils_rangs import classe_eleve_correspondante, invalider_cache_rangs
 
 
 def _eleves_de_classe_note(classe_note):
-    """Élèves actifs correspondant à une ClasseNote (mapping par nom+année+école)."""
-    classe_eleve = ClasseEleve.objects.filter(
-        nom=classe_note.nom,
-        annee_scolaire=classe_note.annee_scolaire,
-        ecole=classe_note.ecole,
-    ).first()
+    """Élèves actifs correspondant à une ClasseNote (lien ClasseNote.classe_eleve)."""
+    classe_eleve = classe_eleve_correspondante(classe_note)
     if not classe_eleve:
         return []
     return list(Eleve.objects.filter(classe=classe_eleve, statut='ACTIF')
@@ -2,7 +2,7 @@ from django.contrib import admin
 
 from administration.corbeille_admin import CorbeilleAdminMixin
 
-from .models import TypePaiement, ModePaiement, Paiement, RemiseReduction, EcheancierPaiement, TwilioInboundMessage, ConfigurationPaiement
+from .models import TypePaiement, ModePaiement, Paiement, RemiseReduction, EcheancierPaiement, TwilioInboundMessage, MessageSortant, ConfigurationPaiement
 
 
 @admin.register(TypePaiement)
@@ -53,6 +53,15 @@ class TwilioInboundMessageAdmin(admin.ModelAdmin):
     date_hierarchy = "received_at"
 
 
+@admin.register(MessageSortant)
+class MessageSortantAdmin(admin.ModelAdmin):
+    list_display = ("date_creation", "canal", "destinataire", "statut", "tentatives", "statut_livraison", "date_envoi")
+    list_filter = ("canal", "statut", "statut_livraison")
+    search_fields = ("destinataire", "message_sid", "corps")
+    date_hierarchy = "date_creation"
+    raw_id_fields = ("relance",)
+
+
 @admin.register(ConfigurationPaiement)
 class ConfigurationPaiementAdmin(admin.ModelAdmin):
     list_display = ("classe", "montant_inscription", "montant_scolarite", "nombre_tranches", "montant_total")
@@ -0,0 +1,211 @@
+"""Index des arriérés (ArriereEcheancier), une ligne par élève et année scolaire.
+
+Le montant en retard était recalculé à chaque affichage par de grandes
+expressions Case/Sum sur échéanciers, paiements et remises. Il est désormais
+stocké :
+
+- chaque écriture d'un échéancier (save ou écriture en lot suivie) recalcule
+  sa ligne (paiements.signals) ; les remises validées étant déjà portées
+  par l'échéancier, aucune autre lecture n'est nécessaire ;
+- les échéances qui arrivent à terme sans écriture sont prises en compte au
+  premier accès de la journée : ``arrieres_en_retard`` recalcule d'abord les
+  lignes calculées avant aujourd'hui et les échéanciers encore sans ligne
+  (``rafraichir_arrieres``) ; la commande ``actualiser_arrieres`` fait le même
+  travail hors requête ;
+- une relance enregistrée ou une notification de retard envoyée met à
+  jour ``derniere_relance`` (``noter_relance``).
+
+Les listes lisent la table triée par (montant_retard décroissant, id), avec
+une pagination par clé (``page_arrieres``) qui reste sur l'index.
+"""
+
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from eleves.models import Eleve
+from utilisateurs.utils import filter_by_user_school
+
+from .allocation import ALLOCATION_COMPONENTS
+from .models import ArriereEcheancier, EcheancierPaiement, Relance
+
+# derniere_relance n'est renseignée qu'à la création de la ligne, puis par noter_relance
+CHAMPS_ARRIERE = [
+    'eleve', 'ecole', 'annee_scolaire', 'montant_exigible', 'montant_couvert',
+    'montant_retard', 'jours_retard', 'date_echeance_impayee', 'date_calcul',
+]
+
+
+def _decimal(value):
+    return Decimal(str(value or 0))
+
+
+def calculer_arriere(echeancier, aujourd_hui):
+    """Montant exigible, couverture et retard de l'échéancier à ``aujourd_hui``.
+
+    Même règle que le rapport des retards : seules les échéances arrivées à
+    terme sont exigibles, et les remises validées ne couvrent que l'exigible.
+    """
+    echues = sorted(
+        (date_echeance, _decimal(getattr(echeancier, due_field, 0)))
+        for date_echeance, due_field in (
+            (getattr(echeancier, f'date_echeance_{cle}', None), due_field)
+            for cle, due_field, _ in ALLOCATION_COMPONENTS
+        )
+        if date_echeance and date_echeance <= aujourd_hui
+    )
+    exigible = sum((du for _, du in echues), Decimal('0'))
+    couvert = _decimal(echeancier.total_paye) + min(_decimal(echeancier.remises_validees), exigible)
+    retard = max(Decimal('0'), exigible - couvert)
+
+    impayee = None
+    if retard > 0:
+        cumul = Decimal('0')
+        for date_echeance, du in echues:
+            cumul += du
+            if cumul > couvert:
+                impayee = date_echeance
+                break
+    return {
+        'montant_exigible': exigible,
+        'montant_couvert': min(couvert, exigible),
+        'montant_retard': retard,
+        'jours_retard': (aujourd_hui - impayee).days if impayee else 0,
+        'date_echeance_impayee': impayee,
+    }
+
+
+def _upsert(lignes):
+    """bulk_create en mode « upsert » sur la clé echeancier."""
+    options = {'update_conflicts': True, 'update_fields': CHAMPS_ARRIERE}
+    # MySQL ne permet pas de désigner la contrainte visée
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['echeancier']
+    ArriereEcheancier.objects.bulk_create(lignes, batch_size=500, **options)
+
+
+def actualiser_arrieres(echeanciers, aujourd_hui=None):
+    """Recalcule les lignes d'arriéré des échéanciers donnés (instances à jour).
+
+    Trois requêtes quel que soit le nombre d'échéanciers : école des élèves,
+    dernières relances, puis une insertion groupée avec mise à jour.
+    """
+    aujourd_hui = aujourd_hui or timezone.localdate()
+    echeanciers = [e for e in echeanciers if e.pk]
+    if not echeanciers:
+        return 0
+    eleve_ids = {e.eleve_id for e in echeanciers}
+    ecoles = dict(Eleve.objects.filter(pk__in=eleve_ids).values_list('pk', 'classe__ecole_id'))
+    relances = dict(
+        Relance.objects.filter(eleve_id__in=eleve_ids)
+        .order_by()
+        .values('eleve_id')
+        .annotate(derniere=Max('date_creation'))
+        .values_list('eleve_id', 'derniere')
+    )
+    _upsert([
+        ArriereEcheancier(
+            echeancier_id=echeancier.pk,
+            eleve_id=echeancier.eleve_id,
+            ecole_id=ecoles.get(echeancier.eleve_id),
+            annee_scolaire=echeancier.annee_scolaire,
+            derniere_relance=relances.get(echeancier.eleve_id),
+            date_calcul=aujourd_hui,
+            **calculer_arriere(echeancier, aujourd_hui),
+        )
+        for echeancier in echeanciers
+    ])
+    return len(echeanciers)
+
+
+def reconstruire_arrieres(annee_scolaire=None, aujourd_hui=None, taille_lot=500, echeanciers=None):
+    """Recalcule tout l'index (ou une année), par lots ; retourne le nombre de lignes."""
+    if echeanciers is None:
+        echeanciers = EcheancierPaiement.objects.all()
+    if annee_scolaire:
+        echeanciers = echeanciers.filter(annee_scolaire=annee_scolaire)
+    total = 0
+    dernier_id = 0
+    while True:
+        lot = list(echeanciers.filter(pk__gt=dernier_id).order_by('pk')[:taille_lot])
+        if not lot:
+            return total
+        dernier_id = lot[-1].pk
+        total += actualiser_arrieres(lot, aujourd_hui)
+
+
+def rafraichir_arrieres(annee_scolaire=None, aujourd_hui=None):
+    """Recalcule les lignes périmées (calculées avant ``aujourd_hui``) ou absentes.
+
+    Une seule requête quand l'index est à jour ; sinon le premier appel de
+    la journée recalcule par lots les échéanciers concernés.
+    """
+    aujourd_hui = aujourd_hui or timezone.localdate()
+    perimes = EcheancierPaiement.objects.filter(
+        Q(arriere__isnull=True) | Q(arriere__date_calcul__lt=aujourd_hui)
+    )
+    return reconstruire_arrieres(annee_scolaire, aujourd_hui, echeanciers=perimes)
+
+
+def noter_relance(eleve_ids, quand=None):
+    """Reporte une relance envoyée sur les lignes des élèves donnés."""
+    quand = quand or timezone.now()
+    return (
+        ArriereEcheancier.objects
+        .filter(eleve_id__in=eleve_ids)
+        .filter(Q(derniere_relance__isnull=True) | Q(derniere_relance__lt=quand))
+        .update(derniere_relance=quand)
+    )
+
+
+def arrieres_en_retard(user=None, annee_scolaire=None, ecole_id=None, classe_id=None, min_retard=1):
+    """Lignes d'arriéré à relancer, élèves actifs, triées par retard décroissant.
+
+    Sans année explicite, seule l'année de la classe actuelle de l'élève est
+    retenue (comme les anciennes listes de retards). Les lignes périmées sont
+    recalculées avant la lecture.
+    """
+    rafraichir_arrieres(annee_scolaire)
+    qs = ArriereEcheancier.objects.select_related('eleve', 'eleve__classe', 'eleve__responsable_principal')
+    qs = qs.filter(montant_retard__gte=min_retard, eleve__statut='ACTIF')
+    if annee_scolaire:
+        qs = qs.filter(annee_scolaire=annee_scolaire)
+    else:
+        qs = qs.filter(annee_scolaire=F('eleve__classe__annee_scolaire'))
+    if user is not None:
+        qs = filter_by_user_school(qs, user, 'ecole')
+    if ecole_id:
+        qs = qs.filter(ecole_id=ecole_id)
+    if classe_id:
+        qs = qs.filter(eleve__classe_id=classe_id)
+    return qs.order_by('-montant_retard', 'id')
+
+
+def _lire_curseur(curseur):
+    try:
+        montant, pk = str(curseur).split(':', 1)
+        return Decimal(montant), int(pk)
+    except (AttributeError, ValueError, InvalidOperation):
+        return None
+
+
+def page_arrieres(queryset, curseur=None, taille=50):
+    """Page suivante par clé (montant_retard décroissant, id croissant).
+
+    ``curseur`` est la chaîne ``"montant:id"`` renvoyée pour la page
+    précédente ; retourne (lignes, curseur suivant ou None).
+    """
+    position = _lire_curseur(curseur) if curseur else None
+    if position is not None:
+        montant, pk = position
+        queryset = queryset.filter(
+            Q(montant_retard__lt=montant) | Q(montant_retard=montant, id__gt=pk)
+        )
+    lignes = list(queryset.order_by('-montant_retard', 'id')[:taille + 1])
+    suivant = None
+    if len(lignes) > taille:
+        lignes = lignes[:taille]
+        suivant = f'{lignes[-1].montant_retard}:{lignes[-1].pk}'
+    return lignes, suivant
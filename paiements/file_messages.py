@@ -0,0 +1,368 @@
+"""
+File d'envoi persistante des SMS/WhatsApp (MessageSortant).
+
+``send_message_async`` démarrait un thread par message, chacun avec son
+client Twilio : une campagne de relances lançait des centaines de threads,
+les messages en vol étaient perdus au recyclage du worker web et les échecs
+étaient ignorés. Les messages sont désormais enregistrés en base puis
+envoyés par un pool de taille fixe :
+
+- ``mettre_en_file`` enregistre le message ; une clé de déduplication évite
+  d'envoyer deux fois le même reçu ou la même relance (double clic, reprise) ;
+- le pool (NOTIFICATIONS_TAILLE_POOL threads démons, TAILLE_LOT messages
+  par réveil) est réveillé après le commit ;
+  ``python manage.py envoyer_messages`` le remplace sur le serveur quand
+  NOTIFICATIONS_WORKER_INTEGRE vaut False ;
+- le débit est limité par canal (NOTIFICATIONS_DEBIT, messages/seconde),
+  dans chaque processus : voir LimiteurDebit ;
+- un échec temporaire est retenté avec un délai exponentiel, jusqu'à
+  TENTATIVES_MAX essais ; une erreur de configuration échoue tout de suite ;
+- le statut de livraison renvoyé par Twilio (status callback) est reporté
+  sur le message (``enregistrer_statut_livraison``).
+
+Le transport est interchangeable (réglage NOTIFICATIONS_TRANSPORT) :
+TransportTwilio en production, TransportFactice pour les tests et les
+postes sans compte Twilio.
+"""
+import atexit
+from collections import deque
+from datetime import timedelta
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import MessageSortant
+
+logger = logging.getLogger(__name__)
+
+TENTATIVES_MAX = 5
+DELAI_INITIAL = timedelta(seconds=30)
+DELAI_MAX = timedelta(hours=1)
+# Au-delà, un message « en cours » est considéré abandonné (worker arrêté)
+DELAI_ABANDON = timedelta(minutes=10)
+
+DEBIT_PAR_DEFAUT = {'sms': 1.0, 'whatsapp': 10.0}
+
+
+# ─── Transports ──────────────────────────────────────────────────────────────
+
+class TransportTwilio:
+    """Envoi réel via paiements.twilio_utils.send_message."""
+
+    # Erreurs de configuration : inutile de réessayer
+    ERREURS_DEFINITIVES = {'TWILIO_DISABLED', 'TWILIO_CLIENT_UNAVAILABLE', 'TWILIO_FROM_MISSING'}
+
+    def envoyer(self, message):
+        """Retourne (ok, sid_ou_erreur)."""
+        from .twilio_utils import send_message
+
+        return send_message(
+            message.destinataire, message.corps, channel=message.canal,
+            status_callback=message.url_callback or None,
+        )
+
+    def erreur_definitive(self, erreur):
+        return erreur in self.ERREURS_DEFINITIVES
+
+
+class TransportFactice:
+    """Transport local : n'envoie rien, garde les messages en mémoire.
+
+    ``reponses`` permet de scripter les prochains résultats (ok, info) ;
+    une fois vide, tous les envois réussissent.
+    """
+
+    envoyes = []
+    reponses = deque()
+    ERREURS_DEFINITIVES = {'NUMERO_INVALIDE'}
+
+    def envoyer(self, message):
+        if self.reponses:
+            ok, info = self.reponses.popleft()
+            if not ok:
+                return False, info
+        self.envoyes.append(message)
+        return True, f'FAKE{len(self.envoyes)}'
+
+    def erreur_definitive(self, erreur):
+        return erreur in self.ERREURS_DEFINITIVES
+
+    @classmethod
+    def reinitialiser(cls):
+        cls.envoyes.clear()
+        cls.reponses.clear()
+
+
+def transport_configure():
+    chemin = getattr(settings, 'NOTIFICATIONS_TRANSPORT', 'paiements.file_messages.TransportTwilio')
+    return import_string(chemin)()
+
+
+# ─── Limitation de débit ─────────────────────────────────────────────────────
+
+class LimiteurDebit:
+    """Seau à jetons partagé par les threads du pool (un par canal).
+
+    La limite vaut pour un processus : chaque worker web (pool intégré) et
+    chaque ``envoyer_messages`` a son propre seau. Avec plusieurs processus
+    qui envoient, régler NOTIFICATIONS_DEBIT sur la limite du compte Twilio
+    divisée par leur nombre, ou confier l'envoi à un seul
+    ``envoyer_messages`` (NOTIFICATIONS_WORKER_INTEGRE=False).
+    """
+
+    def __init__(self, par_seconde):
+        self.intervalle = 1.0 / par_seconde if par_seconde > 0 else 0.0
+        self._prochain = 0.0
+        self._lock = threading.Lock()
+
+    def attendre(self):
+        """Bloque jusqu'au prochain créneau d'envoi disponible."""
+        with self._lock:
+            maintenant = time.monotonic()
+            creneau = max(self._prochain, maintenant)
+            self._prochain = creneau + self.intervalle
+        if creneau > maintenant:
+            time.sleep(creneau - maintenant)
+
+
+_limiteurs = {}
+_lock_limiteurs = threading.Lock()
+
+
+def limiteur(canal):
+    debits = {**DEBIT_PAR_DEFAUT, **getattr(settings, 'NOTIFICATIONS_DEBIT', {})}
+    cle = (canal, debits.get(canal, 1.0))
+    with _lock_limiteurs:
+        if cle not in _limiteurs:
+            _limiteurs[cle] = LimiteurDebit(cle[1])
+        return _limiteurs[cle]
+
+
+# ─── File ────────────────────────────────────────────────────────────────────
+
+def _cle(canal, destinataire, cle_dedup):
+    # Propre au canal et au numéro : un envoi au nouveau numéro d'un parent
+    # n'est pas un doublon.
+    return hashlib.sha256(f"{canal}|{destinataire}|{cle_dedup}".encode('utf-8')).hexdigest()
+
+
+def mettre_en_file(destinataire, corps, canal='sms', cle_dedup=None, relance=None, url_callback=None):
+    """Enregistre un message à envoyer, ou retourne le message identique déjà en file.
+
+    Args:
+        destinataire: Numéro au format international (+224...)
+        corps: Texte du message
+        canal: 'sms' ou 'whatsapp'
+        cle_dedup: Identifiant métier de l'envoi (ex: "recu:42:VALIDE") ;
+            un second appel avec la même clé ne crée pas de message, sauf
+            si le premier a définitivement échoué
+        relance: Relance dont le statut suit celui de l'envoi
+        url_callback: URL de status callback Twilio propre au message
+
+    Returns:
+        (message, cree)
+    """
+    canal = 'whatsapp' if canal == 'whatsapp' else 'sms'
+    cle = _cle(canal, destinataire, cle_dedup) if cle_dedup else None
+    if cle:
+        message = MessageSortant.objects.filter(cle_dedup=cle).first()
+        if message and message.statut != 'ECHEC':
+            return message, False
+        if message:
+            # Un envoi abandonné ne bloque pas une nouvelle demande : il garde
+            # son historique mais cède sa clé au nouveau message
+            MessageSortant.objects.filter(pk=message.pk, statut='ECHEC').update(cle_dedup=None)
+    try:
+        with transaction.atomic():
+            message = MessageSortant.objects.create(
+                canal=canal,
+                destinataire=destinataire,
+                corps=corps,
+                cle_dedup=cle,
+                relance=relance,
+                url_callback=url_callback or '',
+            )
+    except IntegrityError:
+        # Envoi concurrent avec la même clé : l'autre requête l'a créé
+        return MessageSortant.objects.get(cle_dedup=cle), False
+
+    if getattr(settings, 'NOTIFICATIONS_WORKER_INTEGRE', True):
+        transaction.on_commit(reveiller)
+    return message, True
+
+
+def prendre_message_suivant():
+    """Réserve le plus ancien message dû (sûr entre plusieurs workers)."""
+    candidats = MessageSortant.objects.filter(
+        statut='EN_ATTENTE', prochain_essai__lte=timezone.now(),
+    ).order_by('prochain_essai', 'id')
+    for message in candidats.only('id')[:5]:
+        reserve = MessageSortant.objects.filter(pk=message.pk, statut='EN_ATTENTE').update(
+            statut='EN_COURS', date_debut=timezone.now(), tentatives=F('tentatives') + 1,
+        )
+        if reserve:
+            return MessageSortant.objects.get(pk=message.pk)
+    return None
+
+
+def delai_avant_essai(tentatives):
+    """Délai exponentiel après le n-ième échec (30 s, 1 min, 2 min... plafonné)."""
+    return min(DELAI_INITIAL * (2 ** max(tentatives - 1, 0)), DELAI_MAX)
+
+
+def _suivre_relance(message):
+    if not message.relance_id or message.statut not in ('ENVOYE', 'ECHEC'):
+        return
+    from .rappels import gestionnaire_rappels
+
+    gestionnaire_rappels.marquer_rappel_envoye(message.relance_id, succes=message.statut == 'ENVOYE')
+
+
+def envoyer_message(message, transport=None):
+    """Envoie un message réservé et enregistre le résultat."""
+    transport = transport or transport_configure()
+    limiteur(message.canal).attendre()
+    try:
+        ok, info = transport.envoyer(message)
+    except Exception as e:
+        ok, info = False, str(e)
+
+    maintenant = timezone.now()
+    if ok:
+        message.statut = 'ENVOYE'
+        message.message_sid = (info or '')[:64]
+        message.date_envoi = maintenant
+        message.derniere_erreur = ''
+    else:
+        message.derniere_erreur = str(info or '')[:1000]
+        if transport.erreur_definitive(info) or message.tentatives >= TENTATIVES_MAX:
+            message.statut = 'ECHEC'
+            logger.warning("Message %s abandonné après %s essai(s) : %s", message.pk, message.tentatives, info)
+        else:
+            message.statut = 'EN_ATTENTE'
+            message.prochain_essai = maintenant + delai_avant_essai(message.tentatives)
+    message.save(update_fields=[
+        'statut', 'message_sid', 'date_envoi', 'derniere_erreur', 'prochain_essai',
+    ])
+    _suivre_relance(message)
+    return message
+
+
+def traiter_file(max_messages=None, transport=None):
+    """Envoie les messages dus ; retourne le nombre de messages traités."""
+    transport = transport or transport_configure()
+    traites = 0
+    while max_messages is None or traites < max_messages:
+        message = prendre_message_suivant()
+        if message is None:
+            break
+        envoyer_message(message, transport)
+        traites += 1
+    return traites
+
+
+def relancer_messages_abandonnes():
+    """Remet en file les messages restés « en cours » après l'arrêt d'un worker.
+
+    Le fournisseur a pu accepter le message avant l'arrêt : un doublon est
+    possible, préférable à un reçu perdu.
+    """
+    limite = timezone.now() - DELAI_ABANDON
+    return MessageSortant.objects.filter(statut='EN_COURS', date_debut__lt=limite).update(
+        statut='EN_ATTENTE', prochain_essai=timezone.now(),
+    )
+
+
+def enregistrer_statut_livraison(message_sid, statut, erreur=''):
+    """Reporte le statut de livraison Twilio (delivered, failed...) sur le message."""
+    if not message_sid:
+        return 0
+    champs = {'statut_livraison': (statut or '')[:32], 'date_statut': timezone.now()}
+    if erreur:
+        champs['derniere_erreur'] = erreur[:1000]
+    return MessageSortant.objects.filter(message_sid=message_sid).update(**champs)
+
+
+# ─── Pool intégré ────────────────────────────────────────────────────────────
+# Messages envoyés par un thread avant de rendre la main : une campagne de
+# relances ne monopolise pas un thread, et l'arrêt du processus n'attend
+# jamais plus d'un lot.
+TAILLE_LOT = 20
+
+_lock_pool = threading.Lock()
+_actifs = 0
+_horloge_demarree = False
+_arret = threading.Event()
+atexit.register(_arret.set)
+
+
+def _vider():
+    global _actifs
+    rearmer = False
+    try:
+        close_old_connections()
+        rearmer = traiter_file(max_messages=TAILLE_LOT) >= TAILLE_LOT
+    except Exception:
+        logger.exception("Erreur du pool d'envoi des messages")
+    finally:
+        close_old_connections()
+        with _lock_pool:
+            _actifs -= 1
+    # Lot complet : la file n'est sans doute pas vide, on se réarme
+    if rearmer and not _arret.is_set():
+        reveiller()
+
+
+def reveiller():
+    """Occupe les places libres du pool (taille fixe) avec un lot de la file.
+
+    Les threads sont des démons : un message interrompu par l'arrêt du
+    processus reste « en cours » et relancer_messages_abandonnes le remet
+    en file.
+    """
+    global _actifs
+    if _arret.is_set():
+        return
+    taille = max(1, int(getattr(settings, 'NOTIFICATIONS_TAILLE_POOL', 4)))
+    with _lock_pool:
+        libres = max(taille - _actifs, 0)
+        _actifs += libres
+    for _ in range(libres):
+        threading.Thread(target=_vider, name='messages-sortants', daemon=True).start()
+    _demarrer_horloge()
+
+
+def _horloge(intervalle):
+    # Les nouvelles tentatives programmées n'ont pas de commit pour les réveiller
+    while not _arret.wait(intervalle):
+        try:
+            close_old_connections()
+            relancer_messages_abandonnes()
+            attente = MessageSortant.objects.filter(
+                statut='EN_ATTENTE', prochain_essai__lte=timezone.now(),
+            ).exists()
+        except Exception:
+            logger.exception("Erreur de l'horloge des messages sortants")
+            attente = False
+        finally:
+            close_old_connections()
+        if attente:
+            reveiller()
+
+
+def _demarrer_horloge(intervalle=30):
+    global _horloge_demarree
+    with _lock_pool:
+        if _horloge_demarree:
+            return
+        _horloge_demarree = True
+    threading.Thread(
+        target=_horloge, args=(intervalle,), name='messages-sortants-horloge', daemon=True,
+    ).start()
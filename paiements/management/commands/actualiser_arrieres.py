@@ -0,0 +1,27 @@
+"""
+Commande de recalcul de l'index des arriérés (ArriereEcheancier).
+
+Les écritures sur les échéanciers tiennent l'index à jour, et les listes de
+retards recalculent les lignes périmées au premier accès de la journée.
+Planifiée la nuit, cette commande évite ce recalcul à la première requête ;
+sans --annee elle recalcule tout l'index.
+
+Usage:
+    python manage.py actualiser_arrieres
+    python manage.py actualiser_arrieres --annee 2025-2026
+"""
+
+from django.core.management.base import BaseCommand
+
+from paiements.arrieres import reconstruire_arrieres
+
+
+class Command(BaseCommand):
+    help = "Recalcule l'index des arriérés (montants exigibles et jours de retard à date)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--annee', type=str, help='Année scolaire (ex: 2025-2026)')
+
+    def handle(self, *args, **options):
+        total = reconstruire_arrieres(annee_scolaire=options.get('annee'))
+        self.stdout.write(self.style.SUCCESS(f'{total} échéancier(s) recalculé(s).'))
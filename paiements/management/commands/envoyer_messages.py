@@ -0,0 +1,45 @@
+"""
+Worker de la file d'envoi SMS/WhatsApp (paiements.MessageSortant).
+
+À lancer comme tâche permanente sur le serveur avec
+NOTIFICATIONS_WORKER_INTEGRE=false ; sinon le pool intégré au processus web
+envoie les messages et cette commande sert à vider la file ponctuellement.
+
+Usage:
+    python manage.py envoyer_messages
+    python manage.py envoyer_messages --une-fois     # vide la file puis s'arrête
+    python manage.py envoyer_messages --intervalle 5
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from paiements.file_messages import relancer_messages_abandonnes, traiter_file
+
+
+class Command(BaseCommand):
+    help = "Envoie les SMS/WhatsApp mis en file (paiements.MessageSortant)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true', help='Vider la file puis quitter')
+        parser.add_argument('--intervalle', type=int, default=5, help='Secondes entre deux passages (défaut: 5)')
+
+    def handle(self, *args, **options):
+        relances = relancer_messages_abandonnes()
+        if relances:
+            self.stdout.write(f'{relances} message(s) interrompu(s) remis en file')
+
+        if options['une_fois']:
+            traites = traiter_file()
+            self.stdout.write(self.style.SUCCESS(f'{traites} message(s) traité(s).'))
+            return
+
+        self.stdout.write("Worker d'envoi des messages démarré (Ctrl+C pour arrêter).")
+        while True:
+            close_old_connections()
+            traites = traiter_file()
+            if traites:
+                self.stdout.write(f'{traites} message(s) traité(s).')
+            relancer_messages_abandonnes()
+            time.sleep(options['intervalle'])
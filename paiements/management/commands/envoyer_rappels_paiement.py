@@ -40,6 +40,12 @@ class Command(BaseCommand):
             help='Force l\'envoi même si des rappels récents existent'
         )
         
+        parser.add_argument(
+            '--envoyer',
+            action='store_true',
+            help='Met aussi les rappels SMS/WhatsApp en file d\'envoi (sinon : création seule)'
+        )
+        
         parser.add_argument(
             '--ecole-id',
             type=int,
@@ -52,6 +58,7 @@ class Command(BaseCommand):
         dry_run = options['dry_run']
         force = options['force']
         ecole_id = options['ecole_id']
+        envoyer = options['envoyer']
         
         self.stdout.write(
             self.style.SUCCESS(f'🚀 Démarrage de l\'envoi des rappels de paiement')
@@ -87,6 +94,7 @@ class Command(BaseCommand):
             
             rappels_crees = 0
             rappels_ignores = 0
+            rappels_en_file = 0
             erreurs = 0
             
             # Créer un utilisateur système pour les rappels automatiques
@@ -129,6 +137,8 @@ class Command(BaseCommand):
                             self.stdout.write(
                                 f'✅ {eleve.nom_complet}: rappel créé (solde: {echeancier.solde_restant:,.0f} GNF)'
                             )
+                            if envoyer and gestionnaire_rappels.envoyer_rappel(relance):
+                                rappels_en_file += 1
                         else:
                             erreurs += 1
                             self.stdout.write(
@@ -159,6 +169,8 @@ class Command(BaseCommand):
             self.stdout.write(f'Élèves en retard détectés: {total_eleves_retard}')
             self.stdout.write(f'Rappels créés: {rappels_crees}')
             self.stdout.write(f'Rappels ignorés (récents): {rappels_ignores}')
+            if envoyer:
+                self.stdout.write(f'Rappels mis en file d\'envoi: {rappels_en_file}')
             self.stdout.write(f'Erreurs: {erreurs}')
             
             if not dry_run and rappels_crees > 0:
@@ -0,0 +1,56 @@
+"""
+Commande de contrôle des soldes stockés sur les échéanciers.
+
+Compare remises validées, total payé et solde restant enregistrés au calcul
+à partir des paiements et remises, et signale les écarts (écritures faites
+hors de l'ORM, restauration partielle, etc.).
+
+Usage:
+    python manage.py verifier_soldes_echeanciers
+    python manage.py verifier_soldes_echeanciers --annee 2025-2026
+    python manage.py verifier_soldes_echeanciers --corriger
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from paiements.models import EcheancierPaiement
+from paiements.soldes import CHAMPS_SOLDES, ecarts_soldes
+
+
+class Command(BaseCommand):
+    help = "Détecte (et corrige avec --corriger) les soldes d'échéanciers qui ont dérivé"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--annee', type=str, help='Année scolaire (ex: 2025-2026)')
+        parser.add_argument('--corriger', action='store_true', help='Réécrire les valeurs recalculées')
+
+    def handle(self, *args, **options):
+        echeanciers = EcheancierPaiement.objects.select_related('eleve')
+        if options.get('annee'):
+            echeanciers = echeanciers.filter(annee_scolaire=options['annee'])
+
+        ecarts = []
+        for echeancier, (remises, paye, solde) in ecarts_soldes(echeanciers):
+            ecarts.append(echeancier)
+            self.stdout.write(self.style.WARNING(
+                f'  {echeancier.eleve.nom_complet} ({echeancier.annee_scolaire}) : '
+                f'remises {remises:,.0f} → {echeancier.remises_validees:,.0f}, '
+                f'payé {paye:,.0f} → {echeancier.montant_paye:,.0f}, '
+                f'solde {solde:,.0f} → {echeancier.solde_du:,.0f} GNF'
+            ))
+
+        if ecarts and options.get('corriger'):
+            maintenant = timezone.now()
+            for echeancier in ecarts:
+                echeancier.sync_updated_at = maintenant
+            with transaction.atomic():
+                EcheancierPaiement.objects.bulk_update_tracked(ecarts, CHAMPS_SOLDES, batch_size=500)
+            self.stdout.write(self.style.SUCCESS(f'{len(ecarts)} échéancier(s) corrigé(s).'))
+        elif ecarts:
+            self.stdout.write(self.style.WARNING(
+                f'{len(ecarts)} échéancier(s) en écart ; relancer avec --corriger pour les réécrire.'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('Aucun écart.'))
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:01
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def renseigner_soldes(apps, schema_editor):
+    Echeancier = apps.get_model('paiements', 'EcheancierPaiement')
+    PaiementRemise = apps.get_model('paiements', 'PaiementRemise')
+
+    remises = {
+        (l['paiement__eleve_id'], l['paiement__annee_scolaire']): l['total'] or Decimal('0')
+        for l in (
+            PaiementRemise.objects.filter(paiement__statut='VALIDE')
+            .order_by()
+            .values('paiement__eleve_id', 'paiement__annee_scolaire')
+            .annotate(total=Sum('montant_remise'))
+        )
+    }
+    lot = []
+    for ech in Echeancier.objects.order_by('pk').iterator():
+        du = ech.frais_inscription_du + ech.tranche_1_due + ech.tranche_2_due + ech.tranche_3_due
+        ech.montant_paye = ech.frais_inscription_paye + ech.tranche_1_payee + ech.tranche_2_payee + ech.tranche_3_payee
+        ech.remises_validees = remises.get((ech.eleve_id, ech.annee_scolaire), Decimal('0'))
+        ech.solde_du = max(Decimal('0'), du - ech.montant_paye - ech.remises_validees)
+        lot.append(ech)
+        if len(lot) >= 500:
+            Echeancier.objects.bulk_update(lot, ['remises_validees', 'montant_paye', 'solde_du'])
+            lot = []
+    Echeancier.objects.bulk_update(lot, ['remises_validees', 'montant_paye', 'solde_du'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eleves', '0017_alter_classe_niveau_alter_grilletarifaire_niveau'),
+        ('paiements', '0012_isoler_paiements_par_annee'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='echeancierpaiement',
+            name='montant_paye',
+            field=models.DecimalField(decimal_places=0, default=Decimal('0'), max_digits=10, verbose_name='Total payé (GNF)'),
+        ),
+        migrations.AddField(
+            model_name='echeancierpaiement',
+            name='remises_validees',
+            field=models.DecimalField(decimal_places=0, default=Decimal('0'), max_digits=10, verbose_name='Remises validées (GNF)'),
+        ),
+        migrations.AddField(
+            model_name='echeancierpaiement',
+            name='solde_du',
+            field=models.DecimalField(decimal_places=0, default=Decimal('0'), max_digits=10, verbose_name='Solde restant (GNF)'),
+        ),
+        migrations.AddIndex(
+            model_name='echeancierpaiement',
+            index=models.Index(fields=['annee_scolaire', 'solde_du'], name='paiements_e_annee_s_68a3d5_idx'),
+        ),
+        migrations.RunPython(renseigner_soldes, migrations.RunPython.noop),
+    ]
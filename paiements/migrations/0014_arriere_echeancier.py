@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:11
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eleves', '0017_alter_classe_niveau_alter_grilletarifaire_niveau'),
+        ('paiements', '0013_echeancier_soldes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArriereEcheancier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('annee_scolaire', models.CharField(max_length=9, verbose_name='Année scolaire')),
+                ('montant_exigible', models.DecimalField(decimal_places=0, default=Decimal('0'), max_digits=12, verbose_name='Montant exigible à date (GNF)')),
+                ('montant_couvert', models.DecimalField(decimal_places=0, default=Decimal('0'), max_digits=12, verbose_name='Payé et remises imputables (GNF)')),
+                ('montant_retard', models.DecimalField(decimal_places=0, default=Decimal('0'), max_digits=12, verbose_name='Montant en retard (GNF)')),
+                ('jours_retard', models.PositiveIntegerField(default=0, verbose_name='Jours de retard')),
+                ('date_echeance_impayee', models.DateField(blank=True, null=True, verbose_name='Première échéance impayée')),
+                ('derniere_relance', models.DateTimeField(blank=True, null=True, verbose_name='Dernière relance')),
+                ('date_calcul', models.DateField(verbose_name='Calculé au')),
+                ('echeancier', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='arriere', to='paiements.echeancierpaiement')),
+                ('ecole', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='eleves.ecole')),
+                ('eleve', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='arrieres', to='eleves.eleve')),
+            ],
+            options={
+                'verbose_name': 'Arriéré',
+                'verbose_name_plural': 'Arriérés',
+                'indexes': [models.Index(fields=['ecole', 'annee_scolaire', '-montant_retard', 'id'], name='arriere_ecole_retard_idx'), models.Index(fields=['annee_scolaire', '-montant_retard', 'id'], name='arriere_annee_retard_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paiements', '0014_arriere_echeancier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageSortant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('canal', models.CharField(choices=[('sms', 'SMS'), ('whatsapp', 'WhatsApp')], default='sms', max_length=10, verbose_name='Canal')),
+                ('destinataire', models.CharField(max_length=50, verbose_name='Destinataire')),
+                ('corps', models.TextField(verbose_name='Message')),
+                ('cle_dedup', models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='Clé de déduplication')),
+                ('url_callback', models.CharField(blank=True, default='', max_length=500, verbose_name='URL de statut Twilio')),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('EN_COURS', "En cours d'envoi"), ('ENVOYE', 'Envoyé'), ('ECHEC', 'Échec')], default='EN_ATTENTE', max_length=20, verbose_name='Statut')),
+                ('tentatives', models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')),
+                ('prochain_essai', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Prochain essai')),
+                ('derniere_erreur', models.TextField(blank=True, default='', verbose_name='Dernière erreur')),
+                ('message_sid', models.CharField(blank=True, db_index=True, default='', max_length=64)),
+                ('statut_livraison', models.CharField(blank=True, default='', max_length=32, verbose_name='Statut de livraison')),
+                ('date_statut', models.DateTimeField(blank=True, null=True, verbose_name='Statut reçu le')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True, verbose_name='Début du dernier essai')),
+                ('date_envoi', models.DateTimeField(blank=True, null=True, verbose_name='Envoyé le')),
+                ('relance', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='messages', to='paiements.relance')),
+            ],
+            options={
+                'verbose_name': 'Message sortant',
+                'verbose_name_plural': 'Messages sortants',
+                'ordering': ['-date_creation'],
+                'indexes': [models.Index(fields=['statut', 'prochain_essai'], name='message_sortant_file_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+from django.db.models import Max
+from django.utils import timezone
+
+
+def remplir_arrieres(apps, schema_editor):
+    from paiements.arrieres import calculer_arriere
+
+    Echeancier = apps.get_model('paiements', 'EcheancierPaiement')
+    Arriere = apps.get_model('paiements', 'ArriereEcheancier')
+    Relance = apps.get_model('paiements', 'Relance')
+
+    aujourd_hui = timezone.localdate()
+    relances = dict(
+        Relance.objects.order_by().values('eleve_id')
+        .annotate(derniere=Max('date_creation'))
+        .values_list('eleve_id', 'derniere')
+    )
+    deja = set(Arriere.objects.values_list('echeancier_id', flat=True))
+    lot = []
+    for ech in Echeancier.objects.select_related('eleve__classe').order_by('pk').iterator():
+        if ech.pk in deja:
+            continue
+        # Modèle historique : pas de propriété total_paye, la colonne de 0013 la remplace
+        ech.total_paye = ech.montant_paye
+        classe = ech.eleve.classe
+        lot.append(Arriere(
+            echeancier_id=ech.pk,
+            eleve_id=ech.eleve_id,
+            ecole_id=classe.ecole_id if classe else None,
+            annee_scolaire=ech.annee_scolaire,
+            derniere_relance=relances.get(ech.eleve_id),
+            date_calcul=aujourd_hui,
+            **calculer_arriere(ech, aujourd_hui),
+        ))
+        if len(lot) >= 500:
+            Arriere.objects.bulk_create(lot)
+            lot = []
+    Arriere.objects.bulk_create(lot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paiements', '0015_message_sortant'),
+    ]
+
+    operations = [
+        migrations.RunPython(remplir_arrieres, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, RegexValidator
 from decimal import Decimal
+from django.utils import timezone
 from eleves.models import Eleve
 from synchronisation.mixins import SyncTrackedModel
 
@@ -134,36 +135,23 @@ class Paiement(SyncTrackedModel):
         if not self.numero_recu:
             from django.utils import timezone
             from django.db import transaction, IntegrityError
-            
-            annee = timezone.now().year
-            prefix = f"REC{annee}"
-            
-            # Réessayer quelques fois en cas de collision concurrente
-            for _ in range(10):
-                dernier = (
-                    Paiement.objects
-                    .filter(numero_recu__startswith=prefix)
-                    .order_by('-numero_recu')
-                    .first()
-                )
-                if dernier and isinstance(dernier.numero_recu, str) and len(dernier.numero_recu) >= 4:
+            from administration.sequences import numero_suivant, recaler_numero
+
+            prefix = f"REC{timezone.now().year}"
+
+            # Le compteur évite les collisions entre guichets ; on ne retente
+            # que si le numéro a été pris hors séquence (saisie, synchronisation).
+            with transaction.atomic():
+                for _ in range(10):
+                    self.numero_recu = numero_suivant(Paiement, 'numero_recu', prefix)
                     try:
-                        seq = int(dernier.numero_recu[-4:]) + 1
-                    except ValueError:
-                        seq = 1
-                else:
-                    seq = 1
-
-                self.numero_recu = f"{prefix}{seq:04d}"
-                try:
-                    super().save(*args, **kwargs)
-                    return
-                except IntegrityError:
-                    # Une collision est survenue, on retente avec le numéro suivant
-                    continue
-            else:
-                # Si on n'arrive pas à générer un numéro unique après 10 tentatives
-                raise ValueError("Impossible de générer un numéro de reçu unique après 10 tentatives")
+                        with transaction.atomic():
+                            super().save(*args, **kwargs)
+                        return
+                    except IntegrityError:
+                        recaler_numero(Paiement, 'numero_recu', prefix)
+            # Si on n'arrive pas à générer un numéro unique après 10 tentatives
+            raise ValueError("Impossible de générer un numéro de reçu unique après 10 tentatives")
         else:
             super().save(*args, **kwargs)
     
@@ -252,6 +240,20 @@ class EcheancierPaiement(SyncTrackedModel):
     )
     
     statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='A_PAYER', verbose_name="Statut")
+
+    # Soldes tenus à jour (cf. paiements.soldes) : listes triables sans recalcul
+    remises_validees = models.DecimalField(
+        max_digits=10, decimal_places=0, default=Decimal('0'),
+        verbose_name="Remises validées (GNF)",
+    )
+    montant_paye = models.DecimalField(
+        max_digits=10, decimal_places=0, default=Decimal('0'),
+        verbose_name="Total payé (GNF)",
+    )
+    solde_du = models.DecimalField(
+        max_digits=10, decimal_places=0, default=Decimal('0'),
+        verbose_name="Solde restant (GNF)",
+    )
     
     # Métadonnées
     date_creation = models.DateTimeField(auto_now_add=True)
@@ -265,6 +267,7 @@ class EcheancierPaiement(SyncTrackedModel):
             models.Index(fields=['annee_scolaire']),        # Filtrage par année
             models.Index(fields=['statut']),                 # Filtrage par statut
             models.Index(fields=['annee_scolaire', 'statut']),  # Combinaison fréquente
+            models.Index(fields=['annee_scolaire', 'solde_du']),  # Listes des soldes
         ]
         constraints = [
             models.UniqueConstraint(
@@ -304,8 +307,34 @@ class EcheancierPaiement(SyncTrackedModel):
 
     def save(self, *args, **kwargs):
         self.full_clean()
+        if self._state.adding:
+            # Paiements et remises peuvent précéder la création de l'échéancier
+            self.remises_validees = self.calculer_remises_validees()
+        self.actualiser_soldes()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'montant_paye', 'solde_du'}
         super().save(*args, **kwargs)
 
+    def actualiser_soldes(self):
+        """Recopie total payé et solde restant dans leurs colonnes."""
+        self.montant_paye = self.total_paye
+        self.solde_du = self.solde_restant
+
+    def calculer_remises_validees(self):
+        """Somme des remises des paiements VALIDÉS de l'élève pour l'année (lue en base)."""
+        from django.db.models import Sum
+        total = (
+            PaiementRemise.objects
+            .filter(
+                paiement__eleve_id=self.eleve_id,
+                paiement__annee_scolaire=self.annee_scolaire,
+                paiement__statut='VALIDE',
+            )
+            .aggregate(total=Sum('montant_remise'))
+            .get('total')
+        )
+        return Decimal(str(total or 0))
+
     @property
     def est_reinscription(self):
         return self.nature_frais == self.NATURE_REINSCRIPTION
@@ -328,20 +357,11 @@ class EcheancierPaiement(SyncTrackedModel):
 
         Les remises réduisent le solde dû au même titre qu'un encaissement,
         mais ne sont jamais comptabilisées dans les champs *_paye (qui ne
-        représentent que l'argent réellement encaissé).
+        représentent que l'argent réellement encaissé). Valeur tenue à jour
+        dans ``remises_validees`` à chaque validation, annulation ou
+        suppression d'un paiement ou d'une remise.
         """
-        from django.db.models import Sum
-        total = (
-            PaiementRemise.objects
-            .filter(
-                paiement__eleve_id=self.eleve_id,
-                paiement__annee_scolaire=self.annee_scolaire,
-                paiement__statut='VALIDE',
-            )
-            .aggregate(total=Sum('montant_remise'))
-            .get('total')
-        )
-        return Decimal(str(total or 0))
+        return Decimal(str(self.remises_validees or 0))
 
     @property
     def solde_restant(self):
@@ -363,6 +383,49 @@ class EcheancierPaiement(SyncTrackedModel):
             return min(pct, Decimal('100'))
         return Decimal('0')
 
+
+class ArriereEcheancier(models.Model):
+    """Arriéré d'un échéancier à la date du dernier calcul.
+
+    Table dérivée (une ligne par élève et année scolaire), entretenue par
+    paiements.arrieres : recalculée à chaque écriture de l'échéancier et
+    chaque nuit pour les échéances arrivées à terme. Les listes de retards
+    et les campagnes de relance la lisent par index, sans recalcul.
+    """
+    echeancier = models.OneToOneField(EcheancierPaiement, on_delete=models.CASCADE, related_name='arriere')
+    eleve = models.ForeignKey(Eleve, on_delete=models.CASCADE, related_name='arrieres')
+    ecole = models.ForeignKey('eleves.Ecole', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    annee_scolaire = models.CharField(max_length=9, verbose_name="Année scolaire")
+
+    montant_exigible = models.DecimalField(
+        max_digits=12, decimal_places=0, default=Decimal('0'),
+        verbose_name="Montant exigible à date (GNF)",
+    )
+    montant_couvert = models.DecimalField(
+        max_digits=12, decimal_places=0, default=Decimal('0'),
+        verbose_name="Payé et remises imputables (GNF)",
+    )
+    montant_retard = models.DecimalField(
+        max_digits=12, decimal_places=0, default=Decimal('0'),
+        verbose_name="Montant en retard (GNF)",
+    )
+    jours_retard = models.PositiveIntegerField(default=0, verbose_name="Jours de retard")
+    date_echeance_impayee = models.DateField(null=True, blank=True, verbose_name="Première échéance impayée")
+    derniere_relance = models.DateTimeField(null=True, blank=True, verbose_name="Dernière relance")
+    date_calcul = models.DateField(verbose_name="Calculé au")
+
+    class Meta:
+        verbose_name = "Arriéré"
+        verbose_name_plural = "Arriérés"
+        indexes = [
+            models.Index(fields=['ecole', 'annee_scolaire', '-montant_retard', 'id'], name='arriere_ecole_retard_idx'),
+            models.Index(fields=['annee_scolaire', '-montant_retard', 'id'], name='arriere_annee_retard_idx'),
+        ]
+
+    def __str__(self):
+        return f"Arriéré {self.eleve_id} - {self.annee_scolaire} - {self.montant_retard:,.0f} GNF"
+
+
 class RemiseReduction(SyncTrackedModel):
     """Modèle pour les remises et réductions"""
     TYPE_CHOICES = [
@@ -530,6 +593,60 @@ class TwilioInboundMessage(SyncTrackedModel):
         return f"{self.channel} {self.from_number} -> {self.to_number}: {self.body[:30] if self.body else ''}"
 
 
+class MessageSortant(models.Model):
+    """Message SMS/WhatsApp en file d'envoi (boîte d'envoi persistante).
+
+    Donnée locale, non synchronisée : chaque serveur envoie ses propres
+    messages. Alimentée et vidée par paiements.file_messages.
+    """
+    CANAL_CHOICES = [
+        ('sms', 'SMS'),
+        ('whatsapp', 'WhatsApp'),
+    ]
+    STATUT_CHOICES = [
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', "En cours d'envoi"),
+        ('ENVOYE', 'Envoyé'),
+        ('ECHEC', 'Échec'),
+    ]
+
+    canal = models.CharField(max_length=10, choices=CANAL_CHOICES, default='sms', verbose_name="Canal")
+    destinataire = models.CharField(max_length=50, verbose_name="Destinataire")
+    corps = models.TextField(verbose_name="Message")
+    cle_dedup = models.CharField(
+        max_length=64, unique=True, null=True, blank=True, verbose_name="Clé de déduplication",
+    )
+    relance = models.ForeignKey(
+        Relance, on_delete=models.SET_NULL, null=True, blank=True, related_name='messages',
+    )
+    url_callback = models.CharField(max_length=500, blank=True, default='', verbose_name="URL de statut Twilio")
+
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE', verbose_name="Statut")
+    tentatives = models.PositiveSmallIntegerField(default=0, verbose_name="Tentatives")
+    prochain_essai = models.DateTimeField(default=timezone.now, verbose_name="Prochain essai")
+    derniere_erreur = models.TextField(blank=True, default='', verbose_name="Dernière erreur")
+
+    # Retour du fournisseur : identifiant, puis statut de livraison (status callback)
+    message_sid = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    statut_livraison = models.CharField(max_length=32, blank=True, default='', verbose_name="Statut de livraison")
+    date_statut = models.DateTimeField(null=True, blank=True, verbose_name="Statut reçu le")
+
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True, verbose_name="Début du dernier essai")
+    date_envoi = models.DateTimeField(null=True, blank=True, verbose_name="Envoyé le")
+
+    class Meta:
+        verbose_name = "Message sortant"
+        verbose_name_plural = "Messages sortants"
+        ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['statut', 'prochain_essai'], name='message_sortant_file_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.canal} {self.destinataire} - {self.statut}"
+
+
 class ConfigurationPaiement(SyncTrackedModel):
     """Configuration des frais de scolarité par classe"""
     from eleves.models import Classe
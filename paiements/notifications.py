@@ -131,14 +131,17 @@ def send_payment_receipt(eleve: Eleve, paiement: Paiement) -> None:
     if not tel:
         return
     body = build_payment_receipt_message(paiement)
+    # Un reçu à l'enregistrement, un autre à la validation
+    cle = f"recu:{paiement.pk}:{paiement.statut}"
     # WhatsApp (ou canal par défaut)
-    send_payment_confirmation_async(to_number=tel, body=body)
+    send_payment_confirmation_async(to_number=tel, body=body, dedup_key=cle)
     # SMS court d'information
     sms_body = (
         f"Paiement reçu pour {eleve.nom_complet}: {_format_amount(paiement.montant)}. "
         f"Reçu {paiement.numero_recu or ''}"
     ).strip()
-    send_message_async(to_number=tel, body=sms_body, channel="sms")
+    # Clé propre : avec TWILIO_CHANNEL=sms, les deux messages partent sur le même canal
+    send_message_async(to_number=tel, body=sms_body, channel="sms", dedup_key=f"{cle}:court")
 
 
 def send_enrollment_confirmation(eleve: Eleve, paiement: Optional[Paiement] = None) -> None:
@@ -146,14 +149,15 @@ def send_enrollment_confirmation(eleve: Eleve, paiement: Optional[Paiement] = No
     if not tel:
         return
     body = build_enrollment_receipt_message(eleve, paiement=paiement)
-    send_payment_confirmation_async(to_number=tel, body=body)
+    cle = f"inscription:{eleve.pk}:{paiement.pk}" if paiement is not None else None
+    send_payment_confirmation_async(to_number=tel, body=body, dedup_key=cle)
     registration_label = (
         "Réinscription"
         if paiement is not None and registration_kind_for_type(paiement.type_paiement) == "reinscription"
         else "Inscription"
     )
     sms_body = f"{registration_label} confirmée pour {eleve.nom_complet}. Bienvenue!"
-    send_message_async(to_number=tel, body=sms_body, channel="sms")
+    send_message_async(to_number=tel, body=sms_body, channel="sms", dedup_key=cle and f"{cle}:court")
 
 
 def send_relance_notification(relance: Relance, to_number: Optional[str] = None) -> None:
@@ -167,7 +171,7 @@ def send_relance_notification(relance: Relance, to_number: Optional[str] = None)
     if canal not in {"sms", "whatsapp"}:
         canal = os.getenv("TWILIO_CHANNEL", "whatsapp").lower()
         canal = "whatsapp" if canal == "whatsapp" else "sms"
-    send_message_async(to_number=tel, body=body, channel=canal)
+    send_message_async(to_number=tel, body=body, channel=canal, dedup_key=f"relance:{relance.pk}", relance=relance)
 
 
 def send_retard_notification(eleve: Eleve, solde_restant) -> None:
@@ -175,8 +179,10 @@ def send_retard_notification(eleve: Eleve, solde_restant) -> None:
     if not tel:
         return
     body = build_retard_message(eleve, solde_restant)
+    # Au plus une alerte par jour, même si la campagne est relancée
+    cle = f"retard:{eleve.pk}:{timezone.localdate().isoformat()}"
     # Par défaut WhatsApp
-    send_payment_confirmation_async(to_number=tel, body=body)
+    send_payment_confirmation_async(to_number=tel, body=body, dedup_key=cle)
     # SMS bref
     sms_body = f"Retard de paiement: {eleve.nom_complet}, solde {_format_amount(solde_restant)}"
-    send_message_async(to_number=tel, body=sms_body, channel="sms")
+    send_message_async(to_number=tel, body=sms_body, channel="sms", dedup_key=f"{cle}:court")
@@ -12,6 +12,7 @@ from datetime import datetime, timedelta
 import logging
 
 from .models import EcheancierPaiement, Relance, ConfigurationPaiement
+from .notifications import send_relance_notification
 from eleves.models import Eleve
 
 logger = logging.getLogger(__name__)
@@ -297,7 +298,22 @@ Contactez-nous IMMÉDIATEMENT pour éviter toute interruption de la scolarité.
         logger.info(f"Rappel créé pour {eleve.nom_complet} via {canal}")
         return relance
     
-    def generer_rappels_automatiques(self, canal='SMS', utilisateur=None, limite=50):
+    def envoyer_rappel(self, relance):
+        """
+        Met un rappel SMS/WhatsApp dans la file d'envoi (paiements.file_messages)
+        
+        Le statut de la relance passe à ENVOYEE ou ECHEC selon le résultat
+        de l'envoi ; un rappel déjà en file n'est pas envoyé une seconde fois.
+        
+        Returns:
+            bool: True si le rappel a été mis en file
+        """
+        if relance.canal not in ('SMS', 'WHATSAPP'):
+            return False
+        send_relance_notification(relance)
+        return relance.messages.exists()
+    
+    def generer_rappels_automatiques(self, canal='SMS', utilisateur=None, limite=50, envoyer=False):
         """
         Génère automatiquement les rappels pour tous les élèves en retard
         
@@ -305,6 +321,7 @@ Contactez-nous IMMÉDIATEMENT pour éviter toute interruption de la scolarité.
             canal: Canal de communication
             utilisateur: Utilisateur qui lance la génération
             limite: Nombre maximum de rappels à créer
+            envoyer: Mettre aussi les rappels SMS/WhatsApp en file d'envoi
         
         Returns:
             dict: Statistiques de génération
@@ -312,6 +329,7 @@ Contactez-nous IMMÉDIATEMENT pour éviter toute interruption de la scolarité.
         stats = {
             'total_eleves_retard': 0,
             'rappels_crees': 0,
+            'rappels_en_file': 0,
             'erreurs': 0,
             'eleves_traites': []
         }
@@ -342,6 +360,8 @@ Contactez-nous IMMÉDIATEMENT pour éviter toute interruption de la scolarité.
                 
                 if relance:
                     stats['rappels_crees'] += 1
+                    if envoyer and self.envoyer_rappel(relance):
+                        stats['rappels_en_file'] += 1
                     stats['eleves_traites'].append({
                         'eleve': eleve.nom_complet,
                         'solde': echeancier.solde_restant,
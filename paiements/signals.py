@@ -0,0 +1,95 @@
+"""
+Signals maintenant les soldes des échéanciers (paiements.soldes) à jour
+lorsqu'un paiement ou une remise est validé, annulé ou supprimé, et l'index
+des arriérés (paiements.arrieres) à chaque écriture d'un échéancier.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from synchronisation.bulk import post_bulk_save
+
+from .arrieres import actualiser_arrieres, noter_relance
+from .models import EcheancierPaiement, Paiement, PaiementRemise, Relance
+from .soldes import actualiser_soldes_echeanciers
+
+
+def _etat_paiement(paiement):
+    return (paiement.eleve_id, paiement.annee_scolaire, paiement.statut)
+
+
+@receiver(pre_save, sender=Paiement)
+def memoriser_etat_paiement(sender, instance, **kwargs):
+    """Élève, année et statut en base avant l'écriture (None si inconnus)."""
+    avant = instance.__dict__.get('_etat_soldes_enregistre')
+    if avant is None and not instance._state.adding:
+        valeurs = instance.valeurs_chargees()
+        if valeurs:
+            avant = (valeurs.get('eleve_id'), valeurs.get('annee_scolaire'), valeurs.get('statut'))
+    instance._etat_soldes_avant = avant
+
+
+@receiver(post_save, sender=Paiement)
+def actualiser_soldes_apres_paiement(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    avant = instance.__dict__.pop('_etat_soldes_avant', None)
+    apres = instance._etat_soldes_enregistre = _etat_paiement(instance)
+    # Un nouveau paiement n'a pas encore de remise
+    if created or avant == apres:
+        return
+    paires = {apres[:2]}
+    if avant is not None:
+        paires.add(avant[:2])
+    actualiser_soldes_echeanciers(paires)
+
+
+@receiver(post_delete, sender=Paiement)
+def actualiser_soldes_apres_suppression_paiement(sender, instance, **kwargs):
+    if instance.statut == 'VALIDE':
+        actualiser_soldes_echeanciers({(instance.eleve_id, instance.annee_scolaire)})
+
+
+@receiver(post_save, sender=PaiementRemise)
+@receiver(post_delete, sender=PaiementRemise)
+def actualiser_soldes_apres_remise(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    paiement = Paiement.objects.filter(pk=instance.paiement_id, statut='VALIDE').first()
+    if paiement is not None:
+        actualiser_soldes_echeanciers({(paiement.eleve_id, paiement.annee_scolaire)})
+
+
+@receiver(post_bulk_save, sender=Paiement)
+def actualiser_soldes_apres_lot_paiements(sender, instances, created, **kwargs):
+    if not created:
+        actualiser_soldes_echeanciers({(p.eleve_id, p.annee_scolaire) for p in instances})
+
+
+@receiver(post_bulk_save, sender=PaiementRemise)
+def actualiser_soldes_apres_lot_remises(sender, instances, **kwargs):
+    paires = (
+        Paiement.objects
+        .filter(pk__in={r.paiement_id for r in instances}, statut='VALIDE')
+        .values_list('eleve_id', 'annee_scolaire')
+    )
+    actualiser_soldes_echeanciers(set(paires))
+
+
+@receiver(post_save, sender=EcheancierPaiement)
+def actualiser_arriere_echeancier(sender, instance, **kwargs):
+    if not kwargs.get('raw'):
+        actualiser_arrieres([instance])
+
+
+@receiver(post_bulk_save, sender=EcheancierPaiement)
+def actualiser_arrieres_apres_lot(sender, instances, created, **kwargs):
+    if created:
+        # Les objets d'un bulk_create n'ont pas forcément leur clé : relecture
+        instances = EcheancierPaiement.objects.filter(sync_uuid__in=[e.sync_uuid for e in instances])
+    actualiser_arrieres(instances)
+
+
+@receiver(post_save, sender=Relance)
+def noter_relance_arriere(sender, instance, created, **kwargs):
+    if created and not kwargs.get('raw'):
+        noter_relance([instance.eleve_id], instance.date_creation)
@@ -0,0 +1,99 @@
+"""Soldes des échéanciers tenus à jour en base.
+
+``EcheancierPaiement`` porte trois colonnes dérivées : ``remises_validees``
+(remises des paiements validés de l'année), ``montant_paye`` et ``solde_du``.
+Les deux dernières sont recalculées à chaque ``save()`` de l'échéancier ; la
+première dépend des paiements et de leurs remises et est actualisée ici, dans
+la transaction de l'écriture, par les signaux de ``paiements.signals``.
+
+``ecarts_soldes`` compare les colonnes au calcul de référence
+(commande ``verifier_soldes_echeanciers``).
+"""
+
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import EcheancierPaiement, PaiementRemise
+
+CHAMPS_SOLDES = ['remises_validees', 'montant_paye', 'solde_du', 'sync_updated_at']
+
+
+def _remises_par_eleve_annee(eleve_ids, annees):
+    """{(eleve_id, annee_scolaire): total des remises des paiements validés}."""
+    lignes = (
+        PaiementRemise.objects
+        .filter(
+            paiement__eleve_id__in=eleve_ids,
+            paiement__annee_scolaire__in=annees,
+            paiement__statut='VALIDE',
+        )
+        .order_by()
+        .values('paiement__eleve_id', 'paiement__annee_scolaire')
+        .annotate(total=Sum('montant_remise'))
+    )
+    return {
+        (l['paiement__eleve_id'], l['paiement__annee_scolaire']): Decimal(str(l['total'] or 0))
+        for l in lignes
+    }
+
+
+def _recalculer(echeanciers):
+    """Met à jour en mémoire les colonnes dérivées ; retourne les échéanciers modifiés."""
+    echeanciers = list(echeanciers)
+    if not echeanciers:
+        return []
+    remises = _remises_par_eleve_annee(
+        {e.eleve_id for e in echeanciers}, {e.annee_scolaire for e in echeanciers},
+    )
+    modifies = []
+    for echeancier in echeanciers:
+        avant = (echeancier.remises_validees, echeancier.montant_paye, echeancier.solde_du)
+        echeancier.remises_validees = remises.get((echeancier.eleve_id, echeancier.annee_scolaire), Decimal('0'))
+        echeancier.actualiser_soldes()
+        if (echeancier.remises_validees, echeancier.montant_paye, echeancier.solde_du) != avant:
+            modifies.append(echeancier)
+    return modifies
+
+
+def actualiser_soldes_echeanciers(paires):
+    """Recalcule les soldes des échéanciers ``(eleve_id, annee_scolaire)`` donnés.
+
+    Deux lectures quel que soit le nombre d'échéanciers, puis un
+    ``bulk_update_tracked`` des seuls échéanciers modifiés (journal et
+    synchronisation par lot). Retourne le nombre d'échéanciers modifiés.
+    """
+    paires = {(eleve_id, annee) for eleve_id, annee in paires if eleve_id and annee}
+    if not paires:
+        return 0
+    echeanciers = [
+        e for e in EcheancierPaiement.objects.filter(
+            eleve_id__in={eleve_id for eleve_id, _ in paires},
+            annee_scolaire__in={annee for _, annee in paires},
+        )
+        if (e.eleve_id, e.annee_scolaire) in paires
+    ]
+    modifies = _recalculer(echeanciers)
+    maintenant = timezone.now()
+    for echeancier in modifies:
+        echeancier.sync_updated_at = maintenant
+    EcheancierPaiement.objects.bulk_update_tracked(modifies, CHAMPS_SOLDES, batch_size=500)
+    return len(modifies)
+
+
+def ecarts_soldes(queryset=None, taille_lot=500):
+    """Itère sur les échéanciers dont les colonnes de solde ont dérivé.
+
+    Produit des couples (échéancier recalculé en mémoire, valeurs stockées).
+    """
+    queryset = EcheancierPaiement.objects.all() if queryset is None else queryset
+    dernier_id = 0
+    while True:
+        lot = list(queryset.filter(pk__gt=dernier_id).order_by('pk')[:taille_lot])
+        if not lot:
+            return
+        dernier_id = lot[-1].pk
+        stockees = {e.pk: (e.remises_validees, e.montant_paye, e.solde_du) for e in lot}
+        for echeancier in _recalculer(lot):
+            yield echeancier, stockees[echeancier.pk]
@@ -0,0 +1,167 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from eleves.models import Classe, Ecole, Eleve
+from paiements.arrieres import arrieres_en_retard, page_arrieres, reconstruire_arrieres
+from paiements.models import (
+    ArriereEcheancier,
+    EcheancierPaiement,
+    ModePaiement,
+    Paiement,
+    PaiementRemise,
+    Relance,
+    RemiseReduction,
+    TypePaiement,
+)
+from paiements.tests.support import MIDDLEWARE_SANS_LICENCE
+
+
+class IndexArrieresTests(TestCase):
+    def setUp(self):
+        self.ecole = Ecole.objects.create(
+            nom='Ecole arrieres',
+            adresse='Conakry',
+            telephone='+224620000020',
+            directeur='Direction test',
+        )
+        self.classe = Classe.objects.create(
+            ecole=self.ecole, nom='Classe arrieres', niveau='COLLEGE_8', annee_scolaire='2025-2026',
+        )
+        self.aujourd_hui = timezone.localdate()
+
+    def _echeancier(self, nom='Kaba', **montants):
+        eleve = Eleve.objects.create(prenom='Alpha', nom=nom, sexe='M', classe=self.classe, statut='ACTIF')
+        valeurs = {
+            'frais_inscription_du': Decimal('100000'),
+            'tranche_1_due': Decimal('300000'),
+            'tranche_2_due': Decimal('300000'),
+            'date_echeance_inscription': self.aujourd_hui - timedelta(days=40),
+            'date_echeance_tranche_1': self.aujourd_hui - timedelta(days=10),
+            'date_echeance_tranche_2': self.aujourd_hui + timedelta(days=30),
+            'date_echeance_tranche_3': self.aujourd_hui + timedelta(days=90),
+        }
+        valeurs.update(montants)
+        return EcheancierPaiement.objects.create(eleve=eleve, annee_scolaire='2025-2026', **valeurs)
+
+    def test_ligne_calculee_a_l_enregistrement_de_l_echeancier(self):
+        echeancier = self._echeancier(frais_inscription_paye=Decimal('100000'), tranche_1_payee=Decimal('50000'))
+        arriere = ArriereEcheancier.objects.get(echeancier=echeancier)
+        self.assertEqual(arriere.montant_exigible, Decimal('400000'))
+        self.assertEqual(arriere.montant_retard, Decimal('250000'))
+        self.assertEqual(arriere.jours_retard, 10)
+        self.assertEqual(arriere.ecole_id, self.ecole.id)
+
+        echeancier.tranche_1_payee = Decimal('300000')
+        echeancier.save()
+        arriere.refresh_from_db()
+        self.assertEqual((arriere.montant_retard, arriere.jours_retard), (Decimal('0'), 0))
+
+    def test_remise_validee_reduit_le_retard(self):
+        echeancier = self._echeancier()
+        paiement = Paiement.objects.create(
+            eleve=echeancier.eleve,
+            type_paiement=TypePaiement.objects.create(nom='Scolarite arrieres'),
+            mode_paiement=ModePaiement.objects.create(nom='Especes arrieres'),
+            montant=Decimal('100000'),
+            annee_scolaire='2025-2026',
+            date_paiement=self.aujourd_hui,
+            statut='VALIDE',
+        )
+        remise = RemiseReduction.objects.create(
+            nom='Remise arrieres', type_remise='MONTANT_FIXE', valeur=Decimal('50000'),
+            motif='SOCIALE', date_debut=date(2025, 1, 1), date_fin=date(2030, 12, 31),
+        )
+        PaiementRemise.objects.create(paiement=paiement, remise=remise, montant_remise=Decimal('50000'))
+        self.assertEqual(
+            ArriereEcheancier.objects.get(echeancier=echeancier).montant_retard, Decimal('350000'),
+        )
+
+    def test_recalcul_nocturne_des_echeances_arrivees_a_terme(self):
+        echeancier = self._echeancier(frais_inscription_paye=Decimal('100000'), tranche_1_payee=Decimal('300000'))
+        self.assertEqual(ArriereEcheancier.objects.get(echeancier=echeancier).montant_retard, Decimal('0'))
+
+        reconstruire_arrieres(aujourd_hui=self.aujourd_hui + timedelta(days=35))
+        arriere = ArriereEcheancier.objects.get(echeancier=echeancier)
+        self.assertEqual((arriere.montant_retard, arriere.jours_retard), (Decimal('300000'), 5))
+
+    def test_lignes_perimees_ou_absentes_recalculees_a_la_lecture(self):
+        a_jour = self._echeancier(nom='A jour', frais_inscription_paye=Decimal('100000'),
+                                  tranche_1_payee=Decimal('300000'))
+        absent = self._echeancier(nom='Sans ligne')
+        ArriereEcheancier.objects.filter(echeancier=absent).delete()
+        # Ligne calculée il y a 40 jours, avant l'échéance de la tranche 2
+        ArriereEcheancier.objects.filter(echeancier=a_jour).update(
+            date_calcul=self.aujourd_hui - timedelta(days=40), montant_retard=Decimal('0'),
+        )
+        a_jour.date_echeance_tranche_2 = self.aujourd_hui - timedelta(days=3)
+        EcheancierPaiement.objects.filter(pk=a_jour.pk).update(date_echeance_tranche_2=a_jour.date_echeance_tranche_2)
+
+        lignes = {a.echeancier_id: a for a in arrieres_en_retard(annee_scolaire='2025-2026')}
+        self.assertEqual(lignes[absent.pk].montant_retard, Decimal('400000'))
+        self.assertEqual((lignes[a_jour.pk].montant_retard, lignes[a_jour.pk].jours_retard), (Decimal('300000'), 3))
+
+        with self.assertNumQueries(2):  # index à jour : contrôle puis lecture
+            list(arrieres_en_retard(annee_scolaire='2025-2026'))
+
+    def test_migration_remplit_l_index(self):
+        from importlib import import_module
+
+        from django.db import connection
+        from django.db.migrations.executor import MigrationExecutor
+
+        echeancier = self._echeancier(frais_inscription_paye=Decimal('100000'))
+        ArriereEcheancier.objects.all().delete()
+        etat = MigrationExecutor(connection).loader.project_state(('paiements', '0015_message_sortant'))
+        import_module('paiements.migrations.0016_remplir_arrieres').remplir_arrieres(etat.apps, None)
+        arriere = ArriereEcheancier.objects.get(echeancier=echeancier)
+        self.assertEqual((arriere.montant_retard, arriere.ecole_id), (Decimal('300000'), self.ecole.id))
+
+    def test_relance_reportee_sur_l_index(self):
+        echeancier = self._echeancier()
+        relance = Relance.objects.create(eleve=echeancier.eleve, message='Rappel')
+        arriere = ArriereEcheancier.objects.get(echeancier=echeancier)
+        self.assertEqual(arriere.derniere_relance, relance.date_creation)
+
+        echeancier.save()
+        arriere.refresh_from_db()
+        self.assertEqual(arriere.derniere_relance, relance.date_creation)
+
+    def test_pagination_par_cle_sans_doublon_ni_oubli(self):
+        for i, paye in enumerate(['0', '0', '0', '100000', '200000', '400000']):
+            self._echeancier(nom=f'Eleve {i}', frais_inscription_paye=Decimal(paye))
+        qs = arrieres_en_retard(annee_scolaire='2025-2026')
+
+        vus, curseur = [], None
+        while True:
+            lignes, curseur = page_arrieres(qs, curseur, taille=2)
+            vus.extend(lignes)
+            if curseur is None:
+                break
+        self.assertEqual([a.pk for a in vus], list(qs.values_list('pk', flat=True)))
+        self.assertEqual(len(vus), 5)  # le dernier n'est pas en retard
+        montants = [a.montant_retard for a in vus]
+        self.assertEqual(montants, sorted(montants, reverse=True))
+
+    @override_settings(MIDDLEWARE=MIDDLEWARE_SANS_LICENCE)
+    def test_vues_lisent_l_index(self):
+        for i in range(3):
+            self._echeancier(nom=f'Eleve {i}')
+        self.client.force_login(get_user_model().objects.create_superuser(
+            username='admin-arrieres', email='admin-arrieres@example.com', password='pass1234',
+        ))
+
+        reponse = self.client.get(reverse('paiements:rapport_retards'))
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(len(reponse.context['items']), 3)
+        self.assertIsNone(reponse.context['curseur_suivant'])
+
+        with patch('paiements.views.send_retard_notification') as envoi:
+            self.client.post(reverse('paiements:envoyer_notifs_retards'))
+        self.assertEqual(envoi.call_count, 3)
+        self.assertFalse(ArriereEcheancier.objects.filter(derniere_relance__isnull=True).exists())
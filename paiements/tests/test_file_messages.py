@@ -0,0 +1,189 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+import os
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from eleves.models import Classe, Ecole, Eleve, Responsable
+from paiements.file_messages import (
+    LimiteurDebit,
+    TransportFactice,
+    enregistrer_statut_livraison,
+    mettre_en_file,
+    relancer_messages_abandonnes,
+    traiter_file,
+)
+from paiements.models import MessageSortant, ModePaiement, Paiement, Relance, TypePaiement
+from paiements.notifications import send_payment_receipt, send_retard_notification
+from paiements.rappels import gestionnaire_rappels
+
+
+@override_settings(
+    NOTIFICATIONS_TRANSPORT='paiements.file_messages.TransportFactice',
+    NOTIFICATIONS_WORKER_INTEGRE=False,
+    NOTIFICATIONS_DEBIT={'sms': 1000, 'whatsapp': 1000},
+)
+class FileMessagesTests(TestCase):
+    def setUp(self):
+        TransportFactice.reinitialiser()
+        self.addCleanup(TransportFactice.reinitialiser)
+        ecole = Ecole.objects.create(
+            nom='Ecole messages', adresse='Conakry', telephone='+224620000030', directeur='Direction test',
+        )
+        classe = Classe.objects.create(
+            ecole=ecole, nom='Classe messages', niveau='COLLEGE_8', annee_scolaire='2025-2026',
+        )
+        responsable = Responsable.objects.create(
+            prenom='Mamadou', nom='Bah', relation='PERE', telephone='+224621000030', adresse='Ratoma',
+        )
+        self.eleve = Eleve.objects.create(
+            prenom='Aissatou', nom='Bah', sexe='F', classe=classe, statut='ACTIF',
+            responsable_principal=responsable,
+        )
+
+    def _en_retard(self, message):
+        MessageSortant.objects.filter(pk=message.pk).update(prochain_essai=timezone.now() - timedelta(seconds=1))
+
+    def test_recu_deduplique_par_paiement_et_statut(self):
+        paiement = Paiement.objects.create(
+            eleve=self.eleve,
+            type_paiement=TypePaiement.objects.create(nom='Scolarite messages'),
+            mode_paiement=ModePaiement.objects.create(nom='Especes messages'),
+            montant=Decimal('150000'),
+            annee_scolaire='2025-2026',
+            date_paiement=timezone.localdate(),
+        )
+        send_payment_receipt(self.eleve, paiement)
+        send_payment_receipt(self.eleve, paiement)  # double clic
+        self.assertEqual(
+            sorted(MessageSortant.objects.values_list('canal', flat=True)), ['sms', 'whatsapp'],
+        )
+
+        paiement.statut = 'VALIDE'
+        send_payment_receipt(self.eleve, paiement)
+        self.assertEqual(MessageSortant.objects.count(), 4)
+
+        self.assertEqual(traiter_file(), 4)
+        self.assertEqual(len(TransportFactice.envoyes), 4)
+        self.assertFalse(MessageSortant.objects.exclude(statut='ENVOYE').exists())
+
+    def test_recu_et_sms_court_distincts_sur_le_canal_sms(self):
+        paiement = Paiement.objects.create(
+            eleve=self.eleve,
+            type_paiement=TypePaiement.objects.create(nom='Scolarite SMS'),
+            mode_paiement=ModePaiement.objects.create(nom='Especes SMS'),
+            montant=Decimal('150000'),
+            annee_scolaire='2025-2026',
+            date_paiement=timezone.localdate(),
+        )
+        with patch.dict(os.environ, {'TWILIO_CHANNEL': 'sms'}):
+            send_payment_receipt(self.eleve, paiement)
+            send_retard_notification(self.eleve, Decimal('50000'))
+        self.assertEqual(list(MessageSortant.objects.values_list('canal', flat=True)), ['sms'] * 4)
+
+    def test_echec_temporaire_retente_avec_delai_exponentiel(self):
+        message, _ = mettre_en_file('+224621000030', 'Bonjour')
+        TransportFactice.reponses.extend([(False, 'HTTP 503'), (False, 'HTTP 503')])
+
+        avant = timezone.now()
+        self.assertEqual(traiter_file(), 1)
+        message.refresh_from_db()
+        self.assertEqual((message.statut, message.tentatives), ('EN_ATTENTE', 1))
+        self.assertGreaterEqual(message.prochain_essai, avant + timedelta(seconds=30))
+        self.assertEqual(traiter_file(), 0)  # pas encore dû
+
+        self._en_retard(message)
+        traiter_file()
+        message.refresh_from_db()
+        self.assertEqual(message.tentatives, 2)
+        self.assertGreaterEqual(message.prochain_essai, avant + timedelta(seconds=60))
+
+        self._en_retard(message)
+        traiter_file()
+        message.refresh_from_db()
+        self.assertEqual((message.statut, message.message_sid, message.derniere_erreur), ('ENVOYE', 'FAKE1', ''))
+
+    def test_nouvelle_demande_apres_echec_definitif(self):
+        premier, _ = mettre_en_file('+224621000030', 'Reçu', cle_dedup='recu:1:VALIDE')
+        TransportFactice.reponses.append((False, 'NUMERO_INVALIDE'))
+        traiter_file()
+        premier.refresh_from_db()
+        self.assertEqual(premier.statut, 'ECHEC')
+
+        second, cree = mettre_en_file('+224621000030', 'Reçu', cle_dedup='recu:1:VALIDE')
+        self.assertTrue(cree)
+        self.assertNotEqual(second.pk, premier.pk)
+        self.assertEqual(mettre_en_file('+224621000030', 'Reçu', cle_dedup='recu:1:VALIDE'), (second, False))
+        self.assertEqual(traiter_file(), 1)
+        premier.refresh_from_db()
+        self.assertEqual((premier.statut, premier.cle_dedup), ('ECHEC', None))
+
+    def test_statut_de_la_relance_suit_l_envoi(self):
+        relance_ok = Relance.objects.create(eleve=self.eleve, canal='SMS', message='Merci de régulariser')
+        relance_ko = Relance.objects.create(eleve=self.eleve, canal='WHATSAPP', message='Dernier rappel')
+        appel = Relance.objects.create(eleve=self.eleve, canal='APPEL', message='Appel')
+        self.assertTrue(gestionnaire_rappels.envoyer_rappel(relance_ok))
+        self.assertTrue(gestionnaire_rappels.envoyer_rappel(relance_ko))
+        self.assertFalse(gestionnaire_rappels.envoyer_rappel(appel))
+
+        TransportFactice.reponses.extend([(True, ''), (False, 'NUMERO_INVALIDE')])
+        traiter_file()
+        relance_ok.refresh_from_db()
+        relance_ko.refresh_from_db()
+        self.assertEqual(relance_ok.statut, 'ENVOYEE')
+        self.assertIsNotNone(relance_ok.date_envoi)
+        # Erreur définitive : pas de nouvel essai
+        self.assertEqual(relance_ko.statut, 'ECHEC')
+        self.assertEqual(relance_ko.messages.get().tentatives, 1)
+
+    def test_statut_de_livraison_et_messages_interrompus(self):
+        message, _ = mettre_en_file('+224621000030', 'Bonjour', canal='whatsapp')
+        traiter_file()
+        message.refresh_from_db()
+        enregistrer_statut_livraison(message.message_sid, 'delivered')
+        message.refresh_from_db()
+        self.assertEqual(message.statut_livraison, 'delivered')
+
+        bloque, _ = mettre_en_file('+224621000031', 'Bonjour')
+        MessageSortant.objects.filter(pk=bloque.pk).update(
+            statut='EN_COURS', date_debut=timezone.now() - timedelta(hours=1),
+        )
+        self.assertEqual(relancer_messages_abandonnes(), 1)
+        sortie = StringIO()
+        call_command('envoyer_messages', '--une-fois', stdout=sortie)
+        self.assertIn('1 message(s) traité(s)', sortie.getvalue())
+
+    @override_settings(NOTIFICATIONS_WORKER_INTEGRE=True)
+    def test_pool_reveille_apres_commit(self):
+        with patch('paiements.file_messages.reveiller') as reveiller:
+            with self.captureOnCommitCallbacks(execute=True):
+                mettre_en_file('+224621000030', 'Bonjour', cle_dedup='test')
+                mettre_en_file('+224621000030', 'Bonjour', cle_dedup='test')
+                self.assertFalse(reveiller.called)
+        self.assertEqual(reveiller.call_count, 1)
+
+    def test_pool_traite_un_lot_puis_se_rearme(self):
+        from paiements import file_messages
+
+        with patch.object(file_messages, '_actifs', 1), \
+                patch.object(file_messages, 'reveiller') as reveiller, \
+                patch.object(file_messages, 'traiter_file', side_effect=[file_messages.TAILLE_LOT, 3]) as traiter:
+            file_messages._vider()
+            self.assertEqual(traiter.call_args.kwargs, {'max_messages': file_messages.TAILLE_LOT})
+            self.assertEqual(reveiller.call_count, 1)
+            file_messages._actifs = 1
+            file_messages._vider()  # lot incomplet : la file est vide
+            self.assertEqual(reveiller.call_count, 1)
+            self.assertEqual(file_messages._actifs, 0)
+
+    def test_limiteur_espace_les_envois(self):
+        limiteur = LimiteurDebit(2)
+        with patch('paiements.file_messages.time.sleep') as attente:
+            limiteur.attendre()
+            limiteur.attendre()
+        self.assertEqual(attente.call_count, 1)
+        self.assertAlmostEqual(attente.call_args[0][0], 0.5, places=1)
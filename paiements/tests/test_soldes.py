@@ -0,0 +1,140 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from eleves.models import Classe, Ecole, Eleve
+from paiements.models import (
+    EcheancierPaiement,
+    ModePaiement,
+    Paiement,
+    PaiementRemise,
+    RemiseReduction,
+    TypePaiement,
+)
+
+
+class SoldesEcheancierTests(TestCase):
+    def setUp(self):
+        ecole = Ecole.objects.create(
+            nom='Ecole soldes',
+            adresse='Conakry',
+            telephone='+224620000010',
+            directeur='Direction test',
+        )
+        classe = Classe.objects.create(
+            ecole=ecole, nom='Classe soldes', niveau='COLLEGE_8', annee_scolaire='2025-2026',
+        )
+        self.eleve = Eleve.objects.create(
+            prenom='Fatoumata', nom='Diallo', sexe='F', classe=classe, statut='ACTIF',
+        )
+        self.type_paiement = TypePaiement.objects.create(nom='Scolarite soldes')
+        self.mode = ModePaiement.objects.create(nom='Especes soldes')
+        self.remise = RemiseReduction.objects.create(
+            nom='Remise soldes',
+            type_remise='MONTANT_FIXE',
+            valeur=Decimal('100000'),
+            motif='SOCIALE',
+            date_debut=date(2025, 1, 1),
+            date_fin=date(2026, 12, 31),
+        )
+        self.echeancier = EcheancierPaiement.objects.create(
+            eleve=self.eleve,
+            annee_scolaire='2025-2026',
+            tranche_1_due=Decimal('1000000'),
+            tranche_1_payee=Decimal('300000'),
+            date_echeance_inscription=date(2025, 9, 30),
+            date_echeance_tranche_1=date(2026, 1, 10),
+            date_echeance_tranche_2=date(2026, 3, 5),
+            date_echeance_tranche_3=date(2026, 5, 5),
+        )
+
+    def _paiement(self, statut='VALIDE', annee='2025-2026'):
+        return Paiement.objects.create(
+            eleve=self.eleve,
+            type_paiement=self.type_paiement,
+            mode_paiement=self.mode,
+            montant=Decimal('300000'),
+            annee_scolaire=annee,
+            date_paiement=date(2025, 10, 1),
+            statut=statut,
+        )
+
+    def _soldes(self):
+        self.echeancier.refresh_from_db()
+        return (self.echeancier.remises_validees, self.echeancier.montant_paye, self.echeancier.solde_du)
+
+    def test_colonnes_renseignees_a_l_enregistrement(self):
+        self.assertEqual(self._soldes(), (Decimal('0'), Decimal('300000'), Decimal('700000')))
+        self.echeancier.tranche_2_due = Decimal('500000')
+        self.echeancier.save(update_fields=['tranche_2_due'])
+        self.assertEqual(self._soldes()[2], Decimal('1200000'))
+
+    def test_remise_suivie_de_la_validation_a_la_suppression(self):
+        paiement = self._paiement(statut='EN_ATTENTE')
+        remise = PaiementRemise.objects.create(
+            paiement=paiement, remise=self.remise, montant_remise=Decimal('100000'),
+        )
+        self.assertEqual(self._soldes()[0], Decimal('0'))
+
+        paiement.statut = 'VALIDE'
+        paiement.save()
+        self.assertEqual(self._soldes(), (Decimal('100000'), Decimal('300000'), Decimal('600000')))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.echeancier.solde_restant, Decimal('600000'))
+            self.assertEqual(self.echeancier.pourcentage_paye, Decimal('40'))
+
+        paiement.statut = 'REJETE'
+        paiement.save()
+        self.assertEqual(self._soldes()[0], Decimal('0'))
+
+        paiement.statut = 'VALIDE'
+        paiement.save()
+        remise.montant_remise = Decimal('150000')
+        remise.save()
+        self.assertEqual(self._soldes()[0], Decimal('150000'))
+
+        paiement.delete()
+        self.assertEqual(self._soldes(), (Decimal('0'), Decimal('300000'), Decimal('700000')))
+
+    def test_remises_d_une_autre_annee_ignorees(self):
+        paiement = self._paiement(annee='2024-2025')
+        PaiementRemise.objects.create(paiement=paiement, remise=self.remise, montant_remise=Decimal('100000'))
+        self.assertEqual(self._soldes()[0], Decimal('0'))
+
+    def test_echeancier_cree_apres_les_remises(self):
+        paiement = self._paiement(annee='2026-2027')
+        PaiementRemise.objects.create(paiement=paiement, remise=self.remise, montant_remise=Decimal('100000'))
+        echeancier = EcheancierPaiement.objects.create(
+            eleve=self.eleve,
+            annee_scolaire='2026-2027',
+            tranche_1_due=Decimal('1000000'),
+            date_echeance_inscription=date(2026, 9, 30),
+            date_echeance_tranche_1=date(2027, 1, 10),
+            date_echeance_tranche_2=date(2027, 3, 5),
+            date_echeance_tranche_3=date(2027, 5, 5),
+        )
+        self.assertEqual(echeancier.remises_validees, Decimal('100000'))
+        self.assertEqual(echeancier.solde_du, Decimal('900000'))
+
+    def test_verification_detecte_et_corrige_les_ecarts(self):
+        paiement = self._paiement()
+        PaiementRemise.objects.create(paiement=paiement, remise=self.remise, montant_remise=Decimal('100000'))
+        # Écriture hors ORM : les colonnes dérivent
+        EcheancierPaiement.objects.filter(pk=self.echeancier.pk).update(
+            remises_validees=Decimal('0'), solde_du=Decimal('700000'),
+        )
+
+        sortie = StringIO()
+        call_command('verifier_soldes_echeanciers', stdout=sortie)
+        self.assertIn('1 échéancier(s) en écart', sortie.getvalue())
+        self.assertEqual(self._soldes()[0], Decimal('0'))
+
+        call_command('verifier_soldes_echeanciers', '--corriger', stdout=StringIO())
+        self.assertEqual(self._soldes(), (Decimal('100000'), Decimal('300000'), Decimal('600000')))
+        sortie = StringIO()
+        call_command('verifier_soldes_echeanciers', stdout=sortie)
+        self.assertIn('Aucun écart', sortie.getvalue())
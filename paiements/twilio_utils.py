@@ -15,7 +15,12 @@ Channel = Literal["sms", "whatsapp"]
 logger = logging.getLogger(__name__)
 
 
+_clients: dict = {}
+_clients_lock = threading.Lock()
+
+
 def _get_client() -> Optional[Client]:
+    """Return a Twilio client, shared by all sends using the same credentials."""
     account_sid = os.getenv("TWILIO_ACCOUNT_SID")
     auth_token = os.getenv("TWILIO_AUTH_TOKEN")
     if not account_sid or not auth_token:
@@ -29,7 +34,11 @@ def _get_client() -> Optional[Client]:
         logger.debug("Twilio SDK not installed; Client is None")
         return None
     try:
-        return Client(account_sid, auth_token)
+        with _clients_lock:
+            key = (account_sid, auth_token)
+            if key not in _clients:
+                _clients[key] = Client(account_sid, auth_token)
+            return _clients[key]
     except Exception as e:
         logger.warning(
             "Failed to instantiate Twilio Client (SID=%s): %s",
@@ -121,17 +130,24 @@ def send_message_async(
     body: str,
     channel: Channel = "sms",
     status_callback: Optional[str] = None,
-) -> None:
-    """Fire-and-forget async send to avoid blocking the request cycle."""
-
-    def _worker():
-        try:
-            send_message(to_number, body, channel=channel, status_callback=status_callback)
-        except Exception:
-            pass
+    dedup_key: Optional[str] = None,
+    relance=None,
+):
+    """Queue the message in the outbox (paiements.file_messages) without blocking.
+
+    ``dedup_key`` identifies the business event (receipt, reminder...) so a
+    retried request does not message the parent twice.
+    Returns the MessageSortant, or None when there is no recipient.
+    """
+    if not to_number:
+        return None
+    from .file_messages import mettre_en_file
 
-    t = threading.Thread(target=_worker, daemon=True)
-    t.start()
+    message, _ = mettre_en_file(
+        to_number, body, canal=channel, cle_dedup=dedup_key,
+        relance=relance, url_callback=status_callback,
+    )
+    return message
 
 
 def send_payment_confirmation_async(
@@ -139,10 +155,14 @@ def send_payment_confirmation_async(
     body: str,
     channel_env: Optional[str] = None,
     status_callback: Optional[str] = None,
-) -> None:
+    dedup_key: Optional[str] = None,
+):
     """Helper tailored for payments: chooses channel from env if not provided and no-ops if no number."""
     if not to_number:
-        return
+        return None
     channel_value = (channel_env or os.getenv("TWILIO_CHANNEL", "whatsapp")).strip().lower()
     channel: Channel = "whatsapp" if channel_value == "whatsapp" else "sms"
-    send_message_async(to_number=to_number, body=body, channel=channel, status_callback=status_callback)
+    return send_message_async(
+        to_number=to_number, body=body, channel=channel,
+        status_callback=status_callback, dedup_key=dedup_key,
+    )
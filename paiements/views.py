@@ -46,10 +46,13 @@ from .allocation import (
     registration_kind_for_type,
     reste_par_tranche_avec_couverture,
 )
+from .arrieres import arrieres_en_retard, noter_relance, page_arrieres
+from .file_messages import enregistrer_statut_livraison
 from eleves.models import Eleve, GrilleTarifaire, Classe
 from eleves.utils_annee import get_annee_active
 from .forms import PaiementForm, EcheancierForm, ModifierPaiementForm, RechercheForm
 from .remise_forms import PaiementRemiseForm, CalculateurRemiseForm
+from utilisateurs.contexte import contexte_de
 from utilisateurs.utils import user_is_admin, user_is_superadmin, filter_by_user_school, user_school
 from utilisateurs.permissions import has_permission, get_user_permissions, can_add_payments, can_modify_payments, can_delete_payments, can_validate_payments, can_view_reports, can_apply_discounts
 from .notifications import (
@@ -1045,6 +1048,7 @@ def twilio_status_callback(request):
             except Exception:
                 obj.raw_data = data
             obj.save()
+            enregistrer_statut_livraison(message_sid, status, error_message or '')
     except Exception:
         logging.getLogger(__name__).exception("Erreur lors de l'enregistrement du status callback Twilio")
     return JsonResponse({"status": "ok"})
@@ -1059,16 +1063,9 @@ def _echeanciers_a_relancer(user):
 
     Cette requête est la source commune du compteur « élèves à relancer » et
     de la liste détaillée, afin d'éviter qu'un compteur positif ouvre une page
-    vide. Les remises validées sont déduites du solde restant.
-
-    Le total des remises est calculé via une sous-requête corrélée (même
-    logique que EcheancierPaiement.total_remises_valides) plutôt que par un
-    Sum() direct sur la jointure eleve->paiements->remises: cette jointure
-    multiplie les lignes (un élève peut avoir plusieurs paiements, chacun
-    avec plusieurs remises) et impose un GROUP BY, dans lequel Greatest()
-    renvoie NULL dès qu'un des termes est NULL sur MySQL/SQLite (au lieu
-    d'ignorer le NULL comme sur PostgreSQL) — ce qui provoquait une erreur
-    serveur (500) sur la page des relances en production (MySQL).
+    vide. Le solde (remises validées déduites) est la colonne ``solde_du``
+    tenue à jour par paiements.soldes : filtre et tri se font sur l'index
+    (annee_scolaire, solde_du), sans sous-requête sur les remises.
     """
     montant_field = DecimalField(max_digits=12, decimal_places=0)
     zero = Value(0, output_field=montant_field)
@@ -1079,46 +1076,17 @@ def _echeanciers_a_relancer(user):
         + Coalesce(F('tranche_3_due'), zero),
         output_field=montant_field,
     )
-    total_paye_expr = ExpressionWrapper(
-        Coalesce(F('frais_inscription_paye'), zero)
-        + Coalesce(F('tranche_1_payee'), zero)
-        + Coalesce(F('tranche_2_payee'), zero)
-        + Coalesce(F('tranche_3_payee'), zero),
-        output_field=montant_field,
-    )
-    remises_subquery = (
-        PaiementRemise.objects
-        .filter(paiement__eleve_id=OuterRef('eleve_id'), paiement__statut='VALIDE')
-        .order_by()
-        .values('paiement__eleve_id')
-        .annotate(total=Sum('montant_remise'))
-        .values('total')
-    )
-    remises_expr = Coalesce(
-        Subquery(remises_subquery, output_field=montant_field),
-        zero,
-        output_field=montant_field,
-    )
 
     qs = (
         EcheancierPaiement.objects
         .select_related('eleve', 'eleve__classe', 'eleve__classe__ecole')
-        .filter(eleve__statut='ACTIF')
+        .filter(eleve__statut='ACTIF', solde_du__gt=0)
         .annotate(
             total_du_calc=total_du_expr,
-            total_paye_calc=total_paye_expr,
-            total_remises_calc=remises_expr,
-        )
-        .annotate(
-            solde_a_relancer=Greatest(
-                ExpressionWrapper(
-                    F('total_du_calc') - F('total_paye_calc') - F('total_remises_calc'),
-                    output_field=montant_field,
-                ),
-                zero,
-            )
+            total_paye_calc=F('montant_paye'),
+            total_remises_calc=F('remises_validees'),
+            solde_a_relancer=F('solde_du'),
         )
-        .filter(solde_a_relancer__gt=0)
     )
     return filter_by_user_school(qs, user, 'eleve__classe__ecole')
 
@@ -1433,7 +1401,7 @@ def tableau_bord_paiements(request):
 @login_required
 def liste_paiements(request):
     """Liste des paiements optimisée avec cache intelligent et requêtes optimisées"""
-    from ecole_moderne.performance_config import get_cached_or_set, CACHE_TTL, OptimizedQueryMixin
+    from ecole_moderne.performance_config import OptimizedQueryMixin
     
     titre_page = "Liste des paiements"
     q = (request.GET.get('q') or '').strip()
@@ -1441,24 +1409,18 @@ def liste_paiements(request):
     annee_filtre = (request.GET.get('annee') or '').strip()
     page = request.GET.get('page') or 1
 
-    # Cache de l'école utilisateur
-    user_school_cache_key = f'user_school_{request.user.id}'
-    user_school_obj = cache.get(user_school_cache_key)
-    if user_school_obj is None and not user_is_admin(request.user):
-        from utilisateurs.utils import user_school
-        user_school_obj = user_school(request.user)
-        if user_school_obj:
-            cache.set(user_school_cache_key, user_school_obj, CACHE_TTL['user_school'])
+    # École et année active : contexte de la requête (calculé une fois)
+    contexte = contexte_de(request)
+    user_school_obj = None if contexte.is_admin else contexte.ecole
 
     # Année scolaire active (utilisée par défaut si pas de filtre explicite)
-    ecole_for_annee = user_school_obj or user_school(request.user) if not user_is_admin(request.user) else None
-    annee_active = get_annee_active(request, ecole_for_annee) if ecole_for_annee else None
+    annee_active = contexte.annee_active if user_school_obj else None
 
     # Queryset optimisé avec prefetch
     qs = OptimizedQueryMixin.get_optimized_paiements_queryset(user_school_obj)
 
     # Restreindre par école de l'utilisateur (sauf admin)
-    if not user_is_admin(request.user) and user_school_obj:
+    if user_school_obj:
         qs = qs.filter(eleve__classe__ecole=user_school_obj)
 
     # Filtre par année scolaire (via la classe de l'élève)
@@ -2943,70 +2905,19 @@ def envoyer_notifs_retards(request):
     if not (user_is_admin(request.user) or can_view_reports(request.user)):
         return HttpResponse(status=403)
 
-    # Annoter montant de retard au niveau DB: (exigible - (payé + remises))
-    try:
-        from django.utils import timezone as _tz
-        today = _tz.localdate() if hasattr(_tz, 'localdate') else date.today()
-    except Exception:
-        today = date.today()
-
-    exigible_expr = (
-        Case(
-            When(date_echeance_inscription__lte=today, then=F('frais_inscription_du')),
-            default=Value(0),
-            output_field=DecimalField(max_digits=10, decimal_places=0),
-        )
-        + Case(
-            When(date_echeance_tranche_1__lte=today, then=F('tranche_1_due')),
-            default=Value(0),
-            output_field=DecimalField(max_digits=10, decimal_places=0),
-        )
-        + Case(
-            When(date_echeance_tranche_2__lte=today, then=F('tranche_2_due')),
-            default=Value(0),
-            output_field=DecimalField(max_digits=10, decimal_places=0),
-        )
-        + Case(
-            When(date_echeance_tranche_3__lte=today, then=F('tranche_3_due')),
-            default=Value(0),
-            output_field=DecimalField(max_digits=10, decimal_places=0),
-        )
-    )
-    remises_expr = Coalesce(
-        Sum(
-            'eleve__paiements__remises__montant_remise',
-            filter=Q(
-                eleve__paiements__statut='VALIDE',
-                eleve__paiements__annee_scolaire=F('annee_scolaire'),
-            ),
-        ),
-        Value(0),
-        output_field=DecimalField(max_digits=10, decimal_places=0),
-    )
-    # Limiter l'effet des remises au montant actuellement exigible
-    remises_applicables = Least(remises_expr, exigible_expr)
-    paye_effectif_expr = (
-        F('frais_inscription_paye') + F('tranche_1_payee') + F('tranche_2_payee') + F('tranche_3_payee')
-        + remises_applicables
-    )
-    retard_expr = ExpressionWrapper(exigible_expr - paye_effectif_expr, output_field=DecimalField(max_digits=10, decimal_places=0))
-    qs = (
-        EcheancierPaiement.objects.select_related('eleve', 'eleve__classe')
-        .annotate(retard=retard_expr)
-        .filter(
-            retard__gt=0,
-            annee_scolaire=F('eleve__classe__annee_scolaire'),
-        )
-    )
-    qs = filter_by_user_school(qs, request.user, 'eleve__classe__ecole')
-    envoyes = 0
-    for ech in qs[:500]:  # sécurité: batch max 500
+    # Index des arriérés : montant exigible à date moins payé et remises imputables
+    qs = arrieres_en_retard(request.user)
+    lignes, _ = page_arrieres(qs, taille=500)  # sécurité: batch max 500
+    notifies = []
+    for arriere in lignes:
         try:
-            send_retard_notification(ech.eleve, ech.retard)
-            envoyes += 1
+            send_retard_notification(arriere.eleve, arriere.montant_retard)
+            notifies.append(arriere.eleve_id)
         except Exception:
-            logging.getLogger(__name__).exception("Échec envoi retard pour %s", getattr(ech.eleve, 'nom_complet', 'eleve'))
+            logging.getLogger(__name__).exception("Échec envoi retard pour %s", getattr(arriere.eleve, 'nom_complet', 'eleve'))
             continue
+    noter_relance(notifies)
+    envoyes = len(notifies)
     messages.info(request, f"Notifications de retard envoyées: {envoyes} (sur {qs.count()} éligibles)")
     # Rediriger vers relances ou tableau de bord
     return redirect('paiements:liste_relances')
@@ -4993,56 +4904,18 @@ def export_paiements_periode_excel(request):
 @login_required
 def rapport_retards(request):
     """Rapport des élèves en retard de paiement (montant exigible > payé+remises).
-    Filtres: ?classe_id=&ecole_id=&du=&au=
+    Filtres: ?classe_id=&ecole_id= ; pagination par clé: ?apres=<curseur>
     """
-    from django.utils import timezone as _tz
-    today = _tz.localdate() if hasattr(_tz, 'localdate') else date.today()
+    def _entier(nom):
+        valeur = (request.GET.get(nom) or '').strip()
+        return int(valeur) if valeur.isdigit() else None
 
-    exigible_expr = (
-        Case(
-            When(date_echeance_inscription__lte=today, then=F('frais_inscription_du')),
-            default=Value(0), output_field=DecimalField(max_digits=12, decimal_places=0),
-        )
-        + Case(
-            When(date_echeance_tranche_1__lte=today, then=F('tranche_1_due')),
-            default=Value(0), output_field=DecimalField(max_digits=12, decimal_places=0),
-        )
-        + Case(
-            When(date_echeance_tranche_2__lte=today, then=F('tranche_2_due')),
-            default=Value(0), output_field=DecimalField(max_digits=12, decimal_places=0),
-        )
-        + Case(
-            When(date_echeance_tranche_3__lte=today, then=F('tranche_3_due')),
-            default=Value(0), output_field=DecimalField(max_digits=12, decimal_places=0),
-        )
+    qs = arrieres_en_retard(
+        request.user, ecole_id=_entier('ecole_id'), classe_id=_entier('classe_id'),
     )
-    remises_expr = Coalesce(
-        Sum(
-            'eleve__paiements__remises__montant_remise',
-            filter=Q(
-                eleve__paiements__statut='VALIDE',
-                eleve__paiements__annee_scolaire=F('annee_scolaire'),
-            ),
-        ),
-        Value(0), output_field=DecimalField(max_digits=12, decimal_places=0),
-    )
-    remises_applicables = Least(remises_expr, exigible_expr)
-    paye_effectif_expr = (
-        F('frais_inscription_paye') + F('tranche_1_payee') + F('tranche_2_payee') + F('tranche_3_payee') + remises_applicables
-    )
-    retard_expr = ExpressionWrapper(exigible_expr - paye_effectif_expr, output_field=DecimalField(max_digits=12, decimal_places=0))
-
-    qs = (EcheancierPaiement.objects
-          .select_related('eleve', 'eleve__classe', 'eleve__classe__ecole')
-          .annotate(retard=retard_expr))
-    # Sécurité: restreindre aux échéanciers de l'école de l'utilisateur
-    qs = filter_by_user_school(qs, request.user, 'eleve__classe__ecole')
-    qs = qs.filter(
-        retard__gt=0,
-        annee_scolaire=F('eleve__classe__annee_scolaire'),
-    ).order_by('-retard')
+    items, curseur_suivant = page_arrieres(qs, request.GET.get('apres'))
 
-    context = {'titre_page': 'Rapport des retards', 'items': qs}
+    context = {'titre_page': 'Rapport des retards', 'items': items, 'curseur_suivant': curseur_suivant}
     if _template_exists('rapports/liste_rapports.html'):
         return render(request, 'rapports/liste_rapports.html', context)
     return HttpResponse(f"Retards: {qs.count()} élèves en retard")
@@ -0,0 +1,124 @@
+"""Tests du pointage journalier (presence)."""
+
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from eleves.models import Classe, Ecole, Eleve
+
+from .models import PresenceJournaliere
+from .views import _absences_consecutives, enregistrer_pointage
+
+JOUR = date(2025, 10, 13)
+
+
+class EnregistrerPointageTests(TestCase):
+
+    def setUp(self):
+        self.ecole = Ecole.objects.create(
+            nom="École Pointage", adresse="Conakry",
+            telephone="+224622000001", directeur="Directeur",
+        )
+        self.classe = Classe.objects.create(
+            ecole=self.ecole, nom="5ème A", niveau="PRIMAIRE_5", annee_scolaire="2025-2026",
+        )
+        self.utilisateur = User.objects.create_user('surveillant', password='x')
+
+    def _eleves(self, nombre, classe=None):
+        return [
+            Eleve.objects.create(
+                prenom="Mariama", nom=f"Bah {i}", sexe="F",
+                classe=classe or self.classe, statut="ACTIF",
+            )
+            for i in range(nombre)
+        ]
+
+    def _existantes(self):
+        return {p.eleve_id: p for p in PresenceJournaliere.objects.filter(classe=self.classe, date=JOUR)}
+
+    def _requetes(self, saisies):
+        existantes = self._existantes()
+        with CaptureQueriesContext(connection) as requetes:
+            enregistrer_pointage(self.classe, JOUR, saisies, existantes, self.utilisateur)
+        return len(requetes)
+
+    def test_seules_les_lignes_modifiees_sont_ecrites(self):
+        eleves = self._eleves(3)
+        saisies = {e.id: ('PRESENT', '') for e in eleves}
+        self.assertEqual(enregistrer_pointage(self.classe, JOUR, saisies, {}, self.utilisateur), (3, 0))
+        avant = {p.eleve_id: p.date_modification for p in PresenceJournaliere.objects.all()}
+
+        saisies[eleves[1].id] = ('ABSENT', 'Malade')
+        self.assertEqual(
+            enregistrer_pointage(self.classe, JOUR, saisies, self._existantes(), self.utilisateur), (0, 1),
+        )
+        apres = {p.eleve_id: p for p in PresenceJournaliere.objects.all()}
+        self.assertEqual(apres[eleves[1].id].statut, 'ABSENT')
+        self.assertEqual(apres[eleves[1].id].motif, 'Malade')
+        self.assertGreater(apres[eleves[1].id].date_modification, avant[eleves[1].id])
+        self.assertEqual(apres[eleves[0].id].date_modification, avant[eleves[0].id])
+
+    def test_nombre_de_requetes_independant_de_l_effectif(self):
+        petite = {e.id: ('PRESENT', '') for e in self._eleves(2)}
+        grande = {e.id: ('PRESENT', '') for e in self._eleves(25)}
+        self.assertEqual(self._requetes(petite), self._requetes(grande))
+
+        petite = {eleve_id: ('ABSENT', '') for eleve_id in petite}
+        grande = {eleve_id: ('RETARD', '') for eleve_id in grande}
+        self.assertEqual(self._requetes(petite), self._requetes(grande))
+
+    def test_eleve_deja_pointe_dans_une_autre_classe(self):
+        ancienne = Classe.objects.create(
+            ecole=self.ecole, nom="5ème B", niveau="PRIMAIRE_5", annee_scolaire="2025-2026",
+        )
+        eleve, = self._eleves(1, classe=ancienne)
+        enregistrer_pointage(ancienne, JOUR, {eleve.id: ('ABSENT', '')}, {})
+        presence = PresenceJournaliere.objects.get()
+
+        self.assertEqual(
+            enregistrer_pointage(self.classe, JOUR, {eleve.id: ('PRESENT', '')}, {}, self.utilisateur), (0, 1),
+        )
+        reprise = PresenceJournaliere.objects.get()
+        self.assertEqual((reprise.pk, reprise.sync_uuid), (presence.pk, presence.sync_uuid))
+        self.assertEqual((reprise.classe_id, reprise.statut), (self.classe.id, 'PRESENT'))
+
+
+class AbsencesConsecutivesTests(TestCase):
+
+    def setUp(self):
+        ecole = Ecole.objects.create(
+            nom="École Absences", adresse="Conakry",
+            telephone="+224622000002", directeur="Directeur",
+        )
+        self.classe = Classe.objects.create(
+            ecole=ecole, nom="4ème A", niveau="PRIMAIRE_4", annee_scolaire="2025-2026",
+        )
+
+    def _eleve_avec_historique(self, statuts):
+        """Élève pointé un jour sur deux jusqu'à JOUR, ``statuts`` du plus ancien au plus récent."""
+        eleve = Eleve.objects.create(prenom="Ibrahima", nom="Sow", sexe="M", classe=self.classe, statut="ACTIF")
+        debut = JOUR - timedelta(days=2 * (len(statuts) - 1))
+        PresenceJournaliere.objects.bulk_create([
+            PresenceJournaliere(eleve=eleve, classe=self.classe, date=debut + timedelta(days=2 * i), statut=statut)
+            for i, statut in enumerate(statuts)
+        ])
+        return eleve
+
+    def test_series_de_toute_la_classe_en_une_requete(self):
+        jamais_present = self._eleve_avec_historique(['ABSENT', 'ABSENT'])
+        serie_en_cours = self._eleve_avec_historique(['ABSENT', 'PRESENT', 'ABSENT', 'ABSENT', 'ABSENT'])
+        revenu = self._eleve_avec_historique(['ABSENT', 'ABSENT', 'RETARD'])
+        justifie = self._eleve_avec_historique(['ABSENT', 'JUSTIFIE', 'ABSENT'])
+        ids = [jamais_present.id, serie_en_cours.id, revenu.id, justifie.id]
+
+        with self.assertNumQueries(1):
+            series = _absences_consecutives(ids, JOUR)
+        self.assertEqual(series, {jamais_present.id: 2, serie_en_cours.id: 3, justifie.id: 1})
+
+    def test_serie_arretee_a_la_date_demandee(self):
+        eleve = self._eleve_avec_historique(['PRESENT', 'ABSENT', 'ABSENT', 'PRESENT'])
+        self.assertEqual(_absences_consecutives([eleve.id], JOUR), {})
+        self.assertEqual(_absences_consecutives([eleve.id], JOUR - timedelta(days=2)), {eleve.id: 2})
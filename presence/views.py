@@ -7,9 +7,11 @@ from datetime import date, datetime, timedelta
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Q
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
 from django.http import HttpResponse
 from django.shortcuts import render, redirect
+from django.utils import timezone
 
 from eleves.models import Classe, Eleve
 from utilisateurs.utils import filter_by_user_school
@@ -32,6 +34,56 @@ def _parse_date(val, defaut=None):
         return defaut
 
 
+CHAMPS_POINTAGE = ['classe', 'statut', 'motif', 'cree_par', 'date_modification', 'sync_updated_at']
+
+
+def enregistrer_pointage(classe, jour, saisies, existantes, utilisateur=None):
+    """Enregistre le pointage d'une classe en quelques requêtes, quel que soit l'effectif.
+
+    ``saisies`` : {eleve_id: (statut, motif)} ; ``existantes`` : {eleve_id:
+    PresenceJournaliere} déjà chargées pour la classe et le jour. Seules les
+    lignes nouvelles ou modifiées sont écrites, en un bulk_create et un
+    bulk_update suivis (signaux par lot) dans une même transaction.
+    Retourne (nombre créé, nombre modifié).
+    """
+    existantes = dict(existantes)
+    nouveaux = [eleve_id for eleve_id in saisies if eleve_id not in existantes]
+    if nouveaux:
+        # Élève pointé ce jour-là dans une autre classe (changement de classe) :
+        # la ligne existante est reprise (même clé, même sync_uuid)
+        existantes.update(
+            (p.eleve_id, p) for p in PresenceJournaliere.objects.filter(eleve_id__in=nouveaux, date=jour)
+        )
+
+    maintenant = timezone.now()
+    a_creer, a_modifier = [], []
+    for eleve_id, (statut, motif) in saisies.items():
+        presence = existantes.get(eleve_id)
+        if presence is None:
+            a_creer.append(PresenceJournaliere(
+                eleve_id=eleve_id, classe=classe, date=jour,
+                statut=statut, motif=motif, cree_par=utilisateur,
+            ))
+        elif (presence.classe_id, presence.statut, presence.motif) != (classe.id, statut, motif):
+            presence.classe = classe
+            presence.statut = statut
+            presence.motif = motif
+            presence.cree_par = utilisateur
+            # bulk_update n'applique pas auto_now
+            presence.date_modification = presence.sync_updated_at = maintenant
+            a_modifier.append(presence)
+
+    # Double envoi du formulaire : la ligne créée entre-temps est mise à jour
+    options = {'update_conflicts': True, 'update_fields': CHAMPS_POINTAGE}
+    # MySQL ne permet pas de désigner la contrainte visée
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['eleve', 'date']
+    with transaction.atomic():
+        PresenceJournaliere.objects.bulk_create_tracked(a_creer, batch_size=500, **options)
+        PresenceJournaliere.objects.bulk_update_tracked(a_modifier, CHAMPS_POINTAGE, batch_size=500)
+    return len(a_creer), len(a_modifier)
+
+
 @login_required
 def pointage(request):
     """Sélection classe + date, puis pointage de tous les élèves."""
@@ -53,19 +105,15 @@ def pointage(request):
         }
 
     if request.method == 'POST' and classe:
-        cree = 0
+        saisies = {}
         for eleve in eleves:
             statut = (request.POST.get(f'statut_{eleve.id}') or 'PRESENT').strip()
             motif = (request.POST.get(f'motif_{eleve.id}') or '').strip()
             if statut not in dict(PresenceJournaliere.STATUT_CHOICES):
                 statut = 'PRESENT'
-            PresenceJournaliere.objects.update_or_create(
-                eleve=eleve, date=jour,
-                defaults={'classe': classe, 'statut': statut, 'motif': motif,
-                          'cree_par': request.user},
-            )
-            cree += 1
-        messages.success(request, f"Pointage enregistré pour {cree} élève(s) — {classe.nom} le {jour.strftime('%d/%m/%Y')}.")
+            saisies[eleve.id] = (statut, motif)
+        enregistrer_pointage(classe, jour, saisies, presences_existantes, request.user)
+        messages.success(request, f"Pointage enregistré pour {len(saisies)} élève(s) — {classe.nom} le {jour.strftime('%d/%m/%Y')}.")
         return redirect(f"{request.path}?classe_id={classe.id}&date={jour.isoformat()}")
 
     # Pré-remplir le statut courant pour l'affichage
@@ -91,20 +139,28 @@ def pointage(request):
     return render(request, 'presence/pointage.html', context)
 
 
-def _calculer_absences_consecutives(eleve_id, jusqua=None):
-    """Nombre d'absences consécutives (statut ABSENT) les plus récentes."""
+def _absences_consecutives(eleve_ids, jusqua=None):
+    """{eleve_id: nombre d'absences consécutives les plus récentes}, en une requête.
+
+    La série d'un élève est faite de ses absences postérieures à son dernier
+    pointage non absent (jusqu'à ``jusqua``) ; les élèves sans absence en
+    cours sont absents du dictionnaire.
+    """
     jusqua = jusqua or date.today()
-    qs = (PresenceJournaliere.objects
-          .filter(eleve_id=eleve_id, date__lte=jusqua)
-          .order_by('-date')
-          .values_list('statut', flat=True))
-    streak = 0
-    for statut in qs:
-        if statut == 'ABSENT':
-            streak += 1
-        else:
-            break
-    return streak
+    dernier_non_absent = (PresenceJournaliere.objects
+                          .filter(eleve_id=OuterRef('eleve_id'), date__lte=jusqua)
+                          .exclude(statut__in=PresenceJournaliere.STATUTS_ABSENCE)
+                          .order_by('-date')
+                          .values('date')[:1])
+    series = (PresenceJournaliere.objects
+              .filter(eleve_id__in=eleve_ids, date__lte=jusqua,
+                      statut__in=PresenceJournaliere.STATUTS_ABSENCE)
+              .annotate(dernier_non_absent=Subquery(dernier_non_absent))
+              .filter(Q(dernier_non_absent__isnull=True) | Q(date__gt=F('dernier_non_absent')))
+              .order_by()
+              .values('eleve_id')
+              .annotate(n=Count('id')))
+    return {s['eleve_id']: s['n'] for s in series}
 
 
 def _collecter_rapport(request):
@@ -138,12 +194,13 @@ def _collecter_rapport(request):
                    total=Count('id'),
                ))
         agg_map = {a['eleve_id']: a for a in agg}
+        series = _absences_consecutives([e.id for e in eleves], au)
         for eleve in eleves:
             a = agg_map.get(eleve.id, {})
             total = a.get('total', 0)
             absent = a.get('absent', 0)
             taux_abs = (absent / total * 100) if total else 0
-            consecutives = _calculer_absences_consecutives(eleve.id, au)
+            consecutives = series.get(eleve.id, 0)
             lignes.append({
                 'eleve': eleve,
                 'present': a.get('present', 0),
@@ -186,18 +243,18 @@ def alertes_absences(request):
         seuil = SEUIL_ABSENCES_CONSECUTIVES
     aujourdhui = date.today()
 
-    # Ne considérer que les élèves absents à leur dernier pointage (optimisation)
+    # Ne considérer que les élèves ayant au moins une absence dans ces classes
     classe_ids = [c.id for c in classes]
-    derniers_absents = (PresenceJournaliere.objects
-                        .filter(classe_id__in=classe_ids, statut='ABSENT')
-                        .values_list('eleve_id', flat=True)
-                        .distinct())
-    alertes = []
-    for eleve in (Eleve.objects.filter(id__in=list(derniers_absents), statut='ACTIF')
-                  .select_related('classe')):
-        n = _calculer_absences_consecutives(eleve.id, aujourdhui)
-        if n >= seuil:
-            alertes.append({'eleve': eleve, 'consecutives': n})
+    absents = (PresenceJournaliere.objects
+               .filter(classe_id__in=classe_ids, statut__in=PresenceJournaliere.STATUTS_ABSENCE)
+               .values('eleve_id'))
+    series = {
+        eleve_id: n for eleve_id, n in _absences_consecutives(absents, aujourdhui).items() if n >= seuil
+    }
+    alertes = [
+        {'eleve': eleve, 'consecutives': series[eleve.id]}
+        for eleve in Eleve.objects.filter(id__in=list(series), statut='ACTIF').select_related('classe')
+    ]
     alertes.sort(key=lambda x: x['consecutives'], reverse=True)
 
     return render(request, 'presence/alertes.html', {
@@ -0,0 +1,50 @@
+"""
+Worker des exports en arrière-plan (PDF de classe, gros exports Excel).
+
+À lancer comme tâche permanente sur le serveur (ex: « Always-on task »
+PythonAnywhere) avec TACHES_EXPORT_WORKER_INTEGRE=false ; le poste desktop
+utilise le thread intégré et n'en a pas besoin.
+
+Usage:
+    python manage.py executer_exports
+    python manage.py executer_exports --une-fois     # vide la file puis s'arrête
+    python manage.py executer_exports --intervalle 5
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from rapports.taches_export import purger_taches_expirees, relancer_taches_abandonnees, traiter_file
+
+
+class Command(BaseCommand):
+    help = 'Exécute les exports mis en file (rapports.TacheExport)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true', help='Traiter la file puis quitter')
+        parser.add_argument('--intervalle', type=int, default=3, help='Secondes entre deux passages (défaut: 3)')
+
+    def handle(self, *args, **options):
+        relancees = relancer_taches_abandonnees()
+        purgees = purger_taches_expirees()
+        if relancees or purgees:
+            self.stdout.write(f'{relancees} tâche(s) relancée(s), {purgees} tâche(s) expirée(s) supprimée(s)')
+
+        if options['une_fois']:
+            traitees = traiter_file()
+            self.stdout.write(self.style.SUCCESS(f'{traitees} export(s) traité(s).'))
+            return
+
+        self.stdout.write('Worker des exports démarré (Ctrl+C pour arrêter).')
+        dernier_menage = time.monotonic()
+        while True:
+            close_old_connections()
+            traitees = traiter_file()
+            if traitees:
+                self.stdout.write(f'{traitees} export(s) traité(s).')
+            if time.monotonic() - dernier_menage > 3600:
+                relancer_taches_abandonnees()
+                purger_taches_expirees()
+                dernier_menage = time.monotonic()
+            time.sleep(options['intervalle'])
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:22
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rapports', '0002_add_sync_tracking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TacheExport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('libelle', models.CharField(max_length=200, verbose_name='Libellé')),
+                ('chemin', models.CharField(max_length=500, verbose_name="Chemin de l'export")),
+                ('parametres', models.TextField(blank=True, default='', verbose_name='Paramètres (query string)')),
+                ('origine', models.CharField(blank=True, default='', max_length=200, verbose_name='Origine (schéma et hôte)')),
+                ('cle_unicite', models.CharField(db_index=True, max_length=64, verbose_name='Clé de déduplication')),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('EN_COURS', 'En cours de génération'), ('TERMINE', 'Terminé'), ('ERREUR', 'Erreur')], default='EN_ATTENTE', max_length=20, verbose_name='Statut')),
+                ('tentatives', models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')),
+                ('message_erreur', models.TextField(blank=True, default='', verbose_name="Message d'erreur")),
+                ('fichier_chemin', models.CharField(blank=True, default='', max_length=500, verbose_name='Fichier généré')),
+                ('fichier_nom', models.CharField(blank=True, default='', max_length=255, verbose_name='Nom du fichier')),
+                ('type_contenu', models.CharField(blank=True, default='', max_length=100, verbose_name='Type de contenu')),
+                ('taille_fichier', models.PositiveIntegerField(default=0, verbose_name='Taille du fichier (bytes)')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True, verbose_name='Début de génération')),
+                ('date_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin de génération')),
+                ('utilisateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='taches_export', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': "Tâche d'export",
+                'verbose_name_plural': "Tâches d'export",
+                'ordering': ['date_creation'],
+                'indexes': [models.Index(fields=['statut', 'date_creation'], name='tache_export_file_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('statut__in', ['EN_ATTENTE', 'EN_COURS'])), fields=('cle_unicite',), name='tache_export_active_unique')],
+            },
+        ),
+    ]
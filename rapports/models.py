@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from decimal import Decimal
@@ -221,3 +223,65 @@ class ExportProgramme(SyncTrackedModel):
     
     def __str__(self):
         return f"{self.nom} - {self.get_frequence_display()}"
+
+
+class TacheExport(models.Model):
+    """Export lourd (PDF de classe, Excel) exécuté hors requête par le worker.
+
+    Donnée locale et temporaire : non synchronisée, purgée après
+    DUREE_CONSERVATION (voir rapports.taches_export).
+    """
+    STATUT_CHOICES = [
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours de génération'),
+        ('TERMINE', 'Terminé'),
+        ('ERREUR', 'Erreur'),
+    ]
+    STATUTS_ACTIFS = ('EN_ATTENTE', 'EN_COURS')
+
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    utilisateur = models.ForeignKey(User, on_delete=models.CASCADE, related_name='taches_export')
+    libelle = models.CharField(max_length=200, verbose_name="Libellé")
+
+    # Requête rejouée par le worker (chemin de la vue d'export + paramètres GET)
+    chemin = models.CharField(max_length=500, verbose_name="Chemin de l'export")
+    parametres = models.TextField(blank=True, default='', verbose_name="Paramètres (query string)")
+    origine = models.CharField(max_length=200, blank=True, default='', verbose_name="Origine (schéma et hôte)")
+    cle_unicite = models.CharField(max_length=64, db_index=True, verbose_name="Clé de déduplication")
+
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE', verbose_name="Statut")
+    tentatives = models.PositiveSmallIntegerField(default=0, verbose_name="Tentatives")
+    message_erreur = models.TextField(blank=True, default='', verbose_name="Message d'erreur")
+
+    # Résultat (stocké hors MEDIA_ROOT : servi uniquement au demandeur)
+    fichier_chemin = models.CharField(max_length=500, blank=True, default='', verbose_name="Fichier généré")
+    fichier_nom = models.CharField(max_length=255, blank=True, default='', verbose_name="Nom du fichier")
+    type_contenu = models.CharField(max_length=100, blank=True, default='', verbose_name="Type de contenu")
+    taille_fichier = models.PositiveIntegerField(default=0, verbose_name="Taille du fichier (bytes)")
+
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True, verbose_name="Début de génération")
+    date_fin = models.DateTimeField(null=True, blank=True, verbose_name="Fin de génération")
+
+    class Meta:
+        verbose_name = "Tâche d'export"
+        verbose_name_plural = "Tâches d'export"
+        ordering = ['date_creation']
+        indexes = [
+            models.Index(fields=['statut', 'date_creation'], name='tache_export_file_idx'),
+        ]
+        constraints = [
+            # Un même export ne peut être qu'une fois en file ou en cours
+            models.UniqueConstraint(
+                fields=['cle_unicite'],
+                condition=models.Q(statut__in=['EN_ATTENTE', 'EN_COURS']),
+                name='tache_export_active_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.libelle} ({self.get_statut_display()})"
+
+    @property
+    def est_active(self):
+        return self.statut in self.STATUTS_ACTIFS
@@ -0,0 +1,339 @@
+"""
+File d'attente locale (en base) pour les exports lourds.
+
+Les PDF de classe et les gros exports Excel prenaient plusieurs dizaines de
+secondes dans le thread de la requête, bloquant un worker web. Ils sont
+désormais mis en file (TacheExport) puis exécutés par un worker :
+
+- ``python manage.py executer_exports`` (serveur : tâche permanente) ;
+- ou un thread démarré dans le processus (poste desktop, développement),
+  voir demarrer_worker() et le réglage TACHES_EXPORT_WORKER_INTEGRE.
+
+Le worker rejoue la vue d'export existante avec l'utilisateur demandeur :
+les contrôles d'accès et la génération restent ceux de la vue. Seules les
+vues listées dans EXPORTS_ARRIERE_PLAN peuvent être mises en file.
+"""
+from datetime import timedelta
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.messages.storage import default_storage
+from django.contrib.sessions.backends.base import SessionBase
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from utilisateurs.contexte import ContexteUtilisateur
+
+from .models import TacheExport
+
+logger = logging.getLogger(__name__)
+
+# Vues d'export autorisées en arrière-plan : nom d'URL -> libellé
+EXPORTS_ARRIERE_PLAN = {
+    'notes:bulletins_classe_pdf': 'Bulletins de la classe (PDF)',
+    'notes:livret_scolaire_classe_pdf': 'Livrets scolaires de la classe (PDF)',
+    'notes:exporter_conseils_pdf': 'Conseils et décisions (PDF)',
+    'notes:exporter_resultats_excel': 'Résultats de la classe (Excel)',
+    'notes:exporter_notes_complet_excel': 'Notes complètes (Excel)',
+    'eleves:cartes_scolaires_classe_pdf': 'Cartes scolaires de la classe (PDF)',
+    'eleves:export_tous_eleves_excel': 'Liste de tous les élèves (Excel)',
+    'paiements:generer_toutes_notes_rappel_pdf': 'Notes de rappel des impayés (PDF)',
+    'paiements:export_liste_paiements_excel': 'Liste des paiements (Excel)',
+}
+
+DUREE_CONSERVATION = timedelta(hours=24)
+# Au-delà, une tâche « en cours » est considérée abandonnée (worker arrêté)
+DELAI_ABANDON = timedelta(minutes=30)
+TENTATIVES_MAX = 2
+
+_EXTENSIONS = {
+    'application/pdf': '.pdf',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': '.xlsx',
+    'application/vnd.ms-excel': '.xls',
+    'text/csv': '.csv',
+}
+
+
+def dossier_exports():
+    """Dossier des fichiers générés (hors MEDIA_ROOT, jamais servi directement)."""
+    dossier = str(getattr(settings, 'TACHES_EXPORT_DIR', os.path.join(settings.BASE_DIR, 'exports_temp')))
+    os.makedirs(dossier, exist_ok=True)
+    return dossier
+
+
+class _SessionEphemere(SessionBase):
+    """Session en mémoire pour la requête rejouée (rien n'est enregistré)."""
+
+    def exists(self, session_key):
+        return False
+
+    def create(self):
+        self._session_key = None
+
+    def save(self, must_create=False):
+        pass
+
+    def delete(self, session_key=None):
+        pass
+
+    def load(self):
+        return {}
+
+
+class _RequeteInterne(HttpRequest):
+    """Requête GET construite par le worker, hors de toute pile WSGI."""
+
+    def __init__(self, scheme):
+        super().__init__()
+        self._scheme = scheme
+
+    def _get_scheme(self):
+        return self._scheme
+
+
+def _requete_pour(tache, match):
+    """Construit la requête rejouée : utilisateur, session et contexte explicites.
+
+    Les middlewares ne passent pas : tout ce que les vues d'export lisent sur
+    la requête est renseigné ici.
+    """
+    origine = urlsplit(tache.origine)
+    request = _RequeteInterne('https' if origine.scheme == 'https' else 'http')
+    request.method = 'GET'
+    request.path = request.path_info = tache.chemin
+    request.GET = QueryDict(tache.parametres)
+    request.META = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': tache.chemin,
+        'QUERY_STRING': tache.parametres,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '443' if origine.scheme == 'https' else '80',
+        'REMOTE_ADDR': '127.0.0.1',
+    }
+    if origine.netloc:
+        request.META['HTTP_HOST'] = origine.netloc
+    request.resolver_match = match
+    request.user = tache.utilisateur
+    request.session = _SessionEphemere()
+    request.contexte = ContexteUtilisateur(request)
+    request._messages = default_storage(request)
+    return request
+
+
+def export_autorise(chemin):
+    """Retourne le ResolverMatch si ``chemin`` désigne une vue d'export autorisée."""
+    if not chemin or not chemin.startswith('/'):
+        return None
+    try:
+        match = resolve(chemin)
+    except Resolver404:
+        return None
+    return match if match.view_name in EXPORTS_ARRIERE_PLAN else None
+
+
+def demander_export(utilisateur, url, origine=''):
+    """Met un export en file, ou retourne la tâche identique déjà en file/en cours.
+
+    Args:
+        utilisateur: Demandeur (la vue sera rejouée avec ses droits)
+        url: URL de la vue d'export, paramètres GET compris
+        origine: Schéma et hôte de la requête initiale (ex: https://ecole.gn),
+            pour les liens absolus générés par la vue
+
+    Returns:
+        (tache, creee) ; ValueError si la vue n'est pas exportable en arrière-plan
+    """
+    morceaux = urlsplit(url)
+    match = export_autorise(morceaux.path)
+    if match is None:
+        raise ValueError("Cet export ne peut pas être exécuté en arrière-plan.")
+
+    parametres = QueryDict(morceaux.query).urlencode()
+    cle = hashlib.sha256(
+        f"{utilisateur.pk}|{morceaux.path}|{parametres}".encode('utf-8')
+    ).hexdigest()
+
+    tache = TacheExport.objects.filter(
+        cle_unicite=cle, statut__in=TacheExport.STATUTS_ACTIFS,
+    ).first()
+    if tache:
+        return tache, False
+    try:
+        with transaction.atomic():
+            tache = TacheExport.objects.create(
+                utilisateur=utilisateur,
+                libelle=EXPORTS_ARRIERE_PLAN[match.view_name],
+                chemin=morceaux.path,
+                parametres=parametres,
+                origine=origine,
+                cle_unicite=cle,
+            )
+    except IntegrityError:
+        # Double clic simultané : l'autre requête a créé la tâche
+        return TacheExport.objects.get(cle_unicite=cle, statut__in=TacheExport.STATUTS_ACTIFS), False
+
+    if getattr(settings, 'TACHES_EXPORT_WORKER_INTEGRE', True):
+        demarrer_worker()
+        _reveil.set()
+    return tache, True
+
+
+def position_dans_file(tache):
+    """Nombre de tâches à traiter avant celle-ci (0 si en cours ou terminée)."""
+    if tache.statut != 'EN_ATTENTE':
+        return 0
+    return TacheExport.objects.filter(statut='EN_ATTENTE', date_creation__lt=tache.date_creation).count()
+
+
+def prendre_tache_suivante():
+    """Réserve la plus ancienne tâche en attente (sûr entre plusieurs workers)."""
+    candidates = TacheExport.objects.filter(statut='EN_ATTENTE').order_by('date_creation')
+    for tache in candidates.only('id')[:5]:
+        reservee = TacheExport.objects.filter(pk=tache.pk, statut='EN_ATTENTE').update(
+            statut='EN_COURS', date_debut=timezone.now(), tentatives=F('tentatives') + 1,
+        )
+        if reservee:
+            return TacheExport.objects.select_related('utilisateur').get(pk=tache.pk)
+    return None
+
+
+def _nom_fichier(response, tache):
+    disposition = response.get('Content-Disposition', '')
+    trouve = re.search(r'filename\*?=(?:UTF-8\'\')?"?([^";]+)"?', disposition)
+    if trouve:
+        return os.path.basename(trouve.group(1).strip())
+    type_contenu = response.get('Content-Type', '').split(';')[0].strip()
+    return f"export_{tache.pk}{_EXTENSIONS.get(type_contenu, '')}"
+
+
+def _messages_de(request):
+    try:
+        return ' '.join(str(m) for m in request._messages)
+    except Exception:
+        return ''
+
+
+def executer_tache(tache):
+    """Rejoue la vue d'export pour la tâche et enregistre le fichier produit."""
+    try:
+        match = export_autorise(tache.chemin)
+        if match is None:
+            raise ValueError("Export non autorisé en arrière-plan.")
+
+        request = _requete_pour(tache, match)
+        response = match.func(request, *match.args, **match.kwargs)
+
+        if response.status_code != 200:
+            detail = _messages_de(request)
+            if not detail and not response.streaming and len(response.content) < 500:
+                detail = response.content.decode('utf-8', errors='ignore').strip()
+            raise ValueError(detail or f"La génération a échoué (code {response.status_code}).")
+        if response.get('Content-Type', '').startswith('text/html'):
+            raise ValueError("La vue a renvoyé une page au lieu d'un fichier.")
+
+        dossier = os.path.join(dossier_exports(), str(tache.uuid))
+        os.makedirs(dossier, exist_ok=True)
+        nom = _nom_fichier(response, tache)
+        chemin_fichier = os.path.join(dossier, nom)
+        with open(chemin_fichier, 'wb') as fichier:
+            if response.streaming:
+                for bloc in response.streaming_content:
+                    fichier.write(bloc)
+            else:
+                fichier.write(response.content)
+        response.close()
+
+        tache.fichier_chemin = chemin_fichier
+        tache.fichier_nom = nom
+        tache.type_contenu = response.get('Content-Type', 'application/octet-stream')
+        tache.taille_fichier = os.path.getsize(chemin_fichier)
+        tache.statut = 'TERMINE'
+        tache.message_erreur = ''
+    except Exception as e:
+        logger.exception(f"Échec de l'export {tache.pk} ({tache.chemin})")
+        tache.statut = 'ERREUR'
+        tache.message_erreur = str(e)[:1000]
+    tache.date_fin = timezone.now()
+    tache.save()
+    return tache
+
+
+def relancer_taches_abandonnees():
+    """Remet en file les tâches restées « en cours » après l'arrêt d'un worker."""
+    limite = timezone.now() - DELAI_ABANDON
+    abandonnees = TacheExport.objects.filter(statut='EN_COURS', date_debut__lt=limite)
+    relancees = abandonnees.filter(tentatives__lt=TENTATIVES_MAX).update(statut='EN_ATTENTE', date_debut=None)
+    abandonnees.update(
+        statut='ERREUR', date_fin=timezone.now(),
+        message_erreur="La génération a été interrompue.",
+    )
+    return relancees
+
+
+def purger_taches_expirees():
+    """Supprime les tâches terminées depuis plus de DUREE_CONSERVATION et leurs fichiers."""
+    limite = timezone.now() - DUREE_CONSERVATION
+    expirees = TacheExport.objects.filter(statut__in=['TERMINE', 'ERREUR'], date_creation__lt=limite)
+    for tache in expirees.only('uuid'):
+        shutil.rmtree(os.path.join(dossier_exports(), str(tache.uuid)), ignore_errors=True)
+    return expirees.delete()[0]
+
+
+def traiter_file(max_taches=None):
+    """Exécute les tâches en attente ; retourne le nombre de tâches traitées."""
+    traitees = 0
+    while max_taches is None or traitees < max_taches:
+        tache = prendre_tache_suivante()
+        if tache is None:
+            break
+        executer_tache(tache)
+        traitees += 1
+    return traitees
+
+
+# ─── Worker intégré (desktop, développement) ─────────────────────────────────
+_lock_worker = threading.Lock()
+_worker_demarre = False
+_reveil = threading.Event()  # levé à chaque mise en file
+
+
+def _boucle(intervalle):
+    derniere_purge = 0
+    while True:
+        try:
+            close_old_connections()
+            if time.monotonic() - derniere_purge > 3600:
+                relancer_taches_abandonnees()
+                purger_taches_expirees()
+                derniere_purge = time.monotonic()
+            traiter_file()
+        except Exception:
+            logger.exception("Erreur du worker d'exports")
+        finally:
+            close_old_connections()
+        _reveil.wait(intervalle)
+        _reveil.clear()
+
+
+def demarrer_worker(intervalle=30):
+    """Démarre le worker d'exports en tâche de fond (idempotent)."""
+    global _worker_demarre
+    with _lock_worker:
+        if _worker_demarre:
+            return False
+        _worker_demarre = True
+    threading.Thread(
+        target=_boucle, args=(intervalle,),
+        name='exports-arriere-plan', daemon=True,
+    ).start()
+    return True
@@ -1,3 +1,104 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from notes.tests import ClasseAvecNotesMixin
+
+from .models import TacheExport
+from .taches_export import (
+    _requete_pour, demander_export, export_autorise, relancer_taches_abandonnees, traiter_file,
+)
+
+
+class ExportsArrierePlanTests(ClasseAvecNotesMixin, TestCase):
+    """File des exports lourds : mise en file, exécution par le worker, téléchargement."""
+
+    def setUp(self):
+        super().setUp()
+        self.dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dossier, ignore_errors=True)
+        reglages = override_settings(TACHES_EXPORT_DIR=self.dossier, TACHES_EXPORT_WORKER_INTEGRE=False)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.utilisateur = User.objects.create_user('direction_exports', password='x')
+        self.url = reverse('notes:bulletins_classe_pdf', args=[self.classe_note.id, 'TRIMESTRE_1'])
+
+    def test_double_demande_reutilise_la_tache_active(self):
+        tache, creee = demander_export(self.utilisateur, self.url)
+        meme, recreee = demander_export(self.utilisateur, self.url)
+        self.assertTrue(creee)
+        self.assertFalse(recreee)
+        self.assertEqual(meme.pk, tache.pk)
+
+        traiter_file()
+        _, nouvelle = demander_export(self.utilisateur, self.url)
+        self.assertTrue(nouvelle)
+
+    def test_vue_hors_liste_refusee(self):
+        self.client.force_login(self.utilisateur)
+        response = self.client.post(reverse('rapports:lancer_export'), {'url': reverse('rapports:tableau_bord')})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(TacheExport.objects.exists())
+
+    def test_export_execute_puis_telecharge(self):
+        self.client.force_login(self.utilisateur)
+        response = self.client.post(reverse('rapports:lancer_export'), {'url': self.url})
+        self.assertEqual(response.status_code, 202)
+        etat = response.json()
+        self.assertEqual(etat['statut'], 'EN_ATTENTE')
+        self.assertEqual(etat['position'], 0)
+
+        self.assertEqual(traiter_file(), 1)
+        etat = self.client.get(etat['url_statut']).json()
+        self.assertEqual(etat['statut'], 'TERMINE')
+        tache = TacheExport.objects.get(uuid=etat['uuid'])
+        self.assertTrue(tache.fichier_chemin.startswith(self.dossier))
+        self.assertEqual(tache.tentatives, 1)
+
+        response = self.client.get(etat['url_telechargement'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        response.close()
+
+    def test_fichier_reserve_au_demandeur(self):
+        tache, _ = demander_export(self.utilisateur, self.url)
+        traiter_file()
+        self.client.force_login(User.objects.create_user('autre_utilisateur', password='x'))
+        self.assertEqual(self.client.get(reverse('rapports:statut_export', args=[tache.uuid])).status_code, 404)
+        self.assertEqual(
+            self.client.get(reverse('rapports:telecharger_export', args=[tache.uuid])).status_code, 404,
+        )
+
+    def test_echec_de_la_vue_enregistre_en_erreur(self):
+        url = reverse('notes:bulletins_classe_pdf', args=[999999, 'TRIMESTRE_1'])
+        tache, _ = demander_export(self.utilisateur, url)
+        traiter_file()
+        tache.refresh_from_db()
+        self.assertEqual(tache.statut, 'ERREUR')
+        self.assertTrue(tache.message_erreur)
+        self.assertFalse(os.path.exists(os.path.join(self.dossier, str(tache.uuid))))
+
+    def test_requete_rejouee_porte_utilisateur_et_origine(self):
+        tache, _ = demander_export(self.utilisateur, self.url + '?format=a4', origine='https://ecole.gn')
+        request = _requete_pour(tache, export_autorise(tache.chemin))
+        self.assertEqual(request.user, self.utilisateur)
+        self.assertIs(request.contexte.user, self.utilisateur)
+        self.assertEqual(request.GET['format'], 'a4')
+        self.assertTrue(request.is_secure())
+        self.assertEqual(request.build_absolute_uri('/media/x.png'), 'https://ecole.gn/media/x.png')
+
+    def test_tache_abandonnee_remise_en_file(self):
+        from django.utils import timezone
+
+        tache, _ = demander_export(self.utilisateur, self.url)
+        TacheExport.objects.filter(pk=tache.pk).update(
+            statut='EN_COURS', tentatives=1, date_debut=timezone.now() - timezone.timedelta(hours=1),
+        )
+        self.assertEqual(relancer_taches_abandonnees(), 1)
+        tache.refresh_from_db()
+        self.assertEqual(tache.statut, 'EN_ATTENTE')
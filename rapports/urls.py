@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, views_taches
 
 app_name = 'rapports'
 
@@ -16,4 +16,8 @@ urlpatterns = [
     path('liste/', views.liste_rapports, name='liste_rapports'),
     path('remises/', views.rapport_remises_detaille, name='rapport_remises'),
     path('transport/', views.rapport_transport_scolaire, name='rapport_transport'),
+    # Exports lourds exécutés en arrière-plan
+    path('exports/lancer/', views_taches.lancer_export, name='lancer_export'),
+    path('exports/<uuid:uuid>/', views_taches.statut_export, name='statut_export'),
+    path('exports/<uuid:uuid>/telecharger/', views_taches.telecharger_export, name='telecharger_export'),
 ]
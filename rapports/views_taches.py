@@ -0,0 +1,68 @@
+"""
+Points d'entrée des exports en arrière-plan : mise en file, suivi, téléchargement.
+
+Le navigateur (static/js/exports-arriere-plan.js) envoie l'URL de l'export
+à ``lancer_export``, interroge ``statut_export`` puis télécharge le fichier.
+"""
+import os
+
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
+
+from .models import TacheExport
+from .taches_export import demander_export, position_dans_file
+
+
+def _etat_tache(tache):
+    etat = {
+        'uuid': str(tache.uuid),
+        'libelle': tache.libelle,
+        'statut': tache.statut,
+        'statut_libelle': tache.get_statut_display(),
+        'position': position_dans_file(tache),
+        'url_statut': reverse('rapports:statut_export', args=[tache.uuid]),
+    }
+    if tache.statut == 'TERMINE':
+        etat['url_telechargement'] = reverse('rapports:telecharger_export', args=[tache.uuid])
+        etat['fichier'] = tache.fichier_nom
+    elif tache.statut == 'ERREUR':
+        etat['message'] = tache.message_erreur
+    return etat
+
+
+@login_required
+@require_POST
+def lancer_export(request):
+    """Met en file l'export désigné par ``url`` (ou renvoie la tâche déjà en cours)."""
+    url = request.POST.get('url', '').strip()
+    try:
+        tache, creee = demander_export(
+            request.user, url, origine=f"{request.scheme}://{request.get_host()}",
+        )
+    except ValueError as e:
+        return JsonResponse({'erreur': str(e)}, status=400)
+    return JsonResponse(_etat_tache(tache), status=202 if creee else 200)
+
+
+@login_required
+@require_GET
+def statut_export(request, uuid):
+    tache = get_object_or_404(TacheExport, uuid=uuid, utilisateur=request.user)
+    return JsonResponse(_etat_tache(tache))
+
+
+@login_required
+@require_GET
+def telecharger_export(request, uuid):
+    tache = get_object_or_404(TacheExport, uuid=uuid, utilisateur=request.user, statut='TERMINE')
+    if not tache.fichier_chemin or not os.path.exists(tache.fichier_chemin):
+        raise Http404("Fichier expiré : relancez l'export.")
+    return FileResponse(
+        open(tache.fichier_chemin, 'rb'),
+        as_attachment=True,
+        filename=tache.fichier_nom,
+        content_type=tache.type_contenu or 'application/octet-stream',
+    )
@@ -9,6 +9,7 @@ Ce script lance le serveur Django en mode autonome (offline).
 Conçu pour être compilé en .exe avec PyInstaller.
 """
 import os
+import queue
 import sys
 import threading
 import time
@@ -129,7 +130,9 @@ else:
 
 # ─── Variables d'environnement Django ─────────────────────────────────────────
 os.environ['DJANGO_SETTINGS_MODULE'] = 'ecole_moderne.settings'
-os.environ['DJANGO_DEBUG'] = 'true'
+# DEBUG désactivé : serveur embarqué (waitress), statiques hachés servis par
+# whitenoise, pas de journal des requêtes SQL conservé en mémoire.
+os.environ['DJANGO_DEBUG'] = 'false'
 os.environ['DJANGO_SECRET_KEY'] = _secret_key
 os.environ['OFFLINE_MODE'] = '1'
 os.environ['TWILIO_DISABLED'] = '1'
@@ -407,57 +410,77 @@ def _guard_check():
 
 
 # ─── Vérification d'intégrité ──────────────────────────────────────────────────
-def check_integrity():
-    """Vérifie que les fichiers critiques n'ont pas été modifiés."""
+def _hacher_integrite(resultats):
+    """Hache les fichiers critiques (thread de fond) et dépose le résultat dans la file.
+
+    Aucune fenêtre ici : tkinter n'est utilisé que depuis le thread principal,
+    voir check_integrity().
+    """
     try:
         import integrity_check
-        result = integrity_check.verify()
-        if not result['valid']:
-            print("")
-            print("!" * 60)
-            print("   ALERTE : Fichiers de l'application modifiés !")
-            print("!" * 60)
-            print(f"   {result['reason']}")
-            print("")
-            print("   L'application a été corrompue ou modifiée.")
-            print("   Veuillez réinstaller depuis le programme officiel.")
-            print("   Contact : GS Hadja Kanfing Dian")
-            print("!" * 60)
-            print("")
-            try:
-                import tkinter as tk
-                from tkinter import messagebox
-                root = tk.Tk()
-                root.withdraw()
-                messagebox.showerror(
-                    "MySchoolGN — Intégrité compromise",
-                    "Des fichiers de l'application ont été modifiés.\n\n"
-                    "L'application ne peut pas démarrer.\n\n"
-                    "Veuillez réinstaller MySchoolGN depuis le programme\n"
-                    "officiel ou contactez GS Hadja Kanfing Dian."
-                )
-                root.destroy()
-            except Exception:
-                pass
-            os._exit(1)
-        else:
-            if result.get('reason') != 'dev_mode':
-                print("  [Intégrité] ✓ Vérification OK")
+        resultats.put(integrity_check.verify())
     except ImportError:
-        pass  # Mode développement, integrity_check non disponible
+        resultats.put(None)  # Mode développement, integrity_check non disponible
     except Exception as e:
-        print(f"  [Intégrité] Avertissement : {e}")
+        resultats.put(e)
+
+
+def check_integrity(resultats):
+    """Vérifie que les fichiers critiques n'ont pas été modifiés (thread principal).
+
+    Attend le résultat de _hacher_integrite() ; en cas d'altération, affiche
+    l'alerte et arrête le processus avant que le serveur ne démarre.
+    """
+    result = resultats.get()
+    if result is None:
+        return
+    if isinstance(result, Exception):
+        print(f"  [Intégrité] Avertissement : {result}")
+        return
+    if not result['valid']:
+        print("")
+        print("!" * 60)
+        print("   ALERTE : Fichiers de l'application modifiés !")
+        print("!" * 60)
+        print(f"   {result['reason']}")
+        print("")
+        print("   L'application a été corrompue ou modifiée.")
+        print("   Veuillez réinstaller depuis le programme officiel.")
+        print("   Contact : GS Hadja Kanfing Dian")
+        print("!" * 60)
+        print("")
+        try:
+            import tkinter as tk
+            from tkinter import messagebox
+            root = tk.Tk()
+            root.withdraw()
+            messagebox.showerror(
+                "MySchoolGN — Intégrité compromise",
+                "Des fichiers de l'application ont été modifiés.\n\n"
+                "L'application ne peut pas démarrer.\n\n"
+                "Veuillez réinstaller MySchoolGN depuis le programme\n"
+                "officiel ou contactez GS Hadja Kanfing Dian."
+            )
+            root.destroy()
+        except Exception:
+            pass
+        os._exit(1)
+    elif result.get('reason') != 'dev_mode':
+        print("  [Intégrité] ✓ Vérification OK")
 
 
 # ─── Vérification de la licence ────────────────────────────────────────────────
 def check_license():
-    """Vérifie la licence au démarrage. Affiche une fenêtre si activation requise."""
+    """Vérifie la licence au démarrage. Affiche une fenêtre si activation requise.
+
+    Renvoie le statut de licence (None si le module est absent).
+    """
     try:
         import license_manager
         status = license_manager.check_license_or_trial()
     except Exception as e:
         print(f"[Licence] Avertissement vérification : {e}")
-        return True  # Continuer si le module est absent (dev mode)
+        return None  # Continuer si le module est absent (dev mode)
 
     mid = ''
     try:
@@ -501,7 +524,113 @@ def check_license():
         if not can_start:
             os._exit(0)   # Fermeture totale sans laisser Django démarrer
 
-    return True
+    return status
+
+
+# ─── Chronométrage du démarrage ───────────────────────────────────────────────
+_PHASES_DEMARRAGE = []
+
+
+class _phase:
+    """Mesure une étape du démarrage : ``with _phase('migrations'): ...``"""
+
+    def __init__(self, nom):
+        self.nom = nom
+
+    def __enter__(self):
+        self.debut = time.perf_counter()
+        return self
+
+    def __exit__(self, *_exc):
+        duree = time.perf_counter() - self.debut
+        _PHASES_DEMARRAGE.append((self.nom, duree))
+        print(f"  [Démarrage] {self.nom} : {duree:.2f} s")
+        return False
+
+
+def _journaliser_demarrage():
+    """Une ligne par lancement dans logs/demarrage.log (diagnostic des postes lents)."""
+    total = sum(duree for _nom, duree in _PHASES_DEMARRAGE)
+    detail = ', '.join(f'{nom}={duree:.2f}s' for nom, duree in _PHASES_DEMARRAGE)
+    print(f"[MySchoolGN] Prêt en {total:.1f} s")
+    try:
+        dossier = os.path.join(BASE_DIR, 'logs')
+        os.makedirs(dossier, exist_ok=True)
+        with open(os.path.join(dossier, 'demarrage.log'), 'a', encoding='utf-8') as f:
+            f.write(
+                f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] "
+                f"total={total:.2f}s {detail}\n"
+            )
+    except Exception:
+        pass
+
+
+# ─── Empreinte de démarrage (démarrage rapide) ────────────────────────────────
+# Si ni le programme, ni les migrations appliquées, ni les fichiers statiques
+# collectés n'ont changé depuis le dernier démarrage réussi, la copie de la
+# base, `migrate` et `collectstatic` sont inutiles.
+_FICHIER_EMPREINTE = '.empreinte_demarrage.json'
+
+
+def _identifiant_build():
+    """Identifie la version installée : l'exe en mode build, les migrations en dev."""
+    empreinte = hashlib.sha256()
+    if getattr(sys, 'frozen', False):
+        stat = os.stat(sys.executable)
+        empreinte.update(f'{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    else:
+        import glob
+        motifs = (os.path.join(BASE_DIR, '*', 'migrations', '*.py'), os.path.join(BASE_DIR, 'static', '**', '*'))
+        for chemin in sorted(c for motif in motifs for c in glob.glob(motif, recursive=True) if os.path.isfile(c)):
+            stat = os.stat(chemin)
+            empreinte.update(f'{os.path.relpath(chemin, BASE_DIR)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return empreinte.hexdigest()
+
+
+def _empreinte_migrations():
+    """Ensemble des migrations appliquées (une requête sur django_migrations)."""
+    from django.db import connection
+    from django.db.migrations.recorder import MigrationRecorder
+    recorder = MigrationRecorder(connection)
+    if not recorder.has_table():
+        return ''
+    appliquees = sorted(recorder.migration_qs.values_list('app', 'name'))
+    return hashlib.sha256(_json_mod.dumps(appliquees).encode()).hexdigest()
+
+
+def _empreinte_statiques():
+    """Manifeste des fichiers collectés (nombre, taille totale, plus récent)."""
+    from django.conf import settings
+    racine = str(settings.STATIC_ROOT)
+    nombre = taille = recent = 0
+    for dossier, _sous_dossiers, fichiers in os.walk(racine):
+        for nom in fichiers:
+            try:
+                stat = os.stat(os.path.join(dossier, nom))
+            except OSError:
+                continue
+            nombre += 1
+            taille += stat.st_size
+            recent = max(recent, stat.st_mtime_ns)
+    return f'{nombre}:{taille}:{recent}' if nombre else ''
+
+
+def _lire_empreinte_demarrage():
+    try:
+        with open(os.path.join(BASE_DIR, _FICHIER_EMPREINTE), 'r', encoding='utf-8') as f:
+            return _json_mod.load(f)
+    except Exception:
+        return {}
+
+
+def _enregistrer_empreinte_demarrage(empreinte):
+    chemin = os.path.join(BASE_DIR, _FICHIER_EMPREINTE)
+    try:
+        with open(chemin + '.tmp', 'w', encoding='utf-8') as f:
+            _json_mod.dump(empreinte, f, indent=2)
+        os.replace(chemin + '.tmp', chemin)
+    except Exception as e:
+        print(f"[MySchoolGN] Avertissement empreinte de démarrage : {e}")
 
 
 # ─── Utilitaires ──────────────────────────────────────────────────────────────
@@ -519,33 +648,61 @@ def find_free_port(start_port=8000, max_port=8100):
 
 def setup_database():
     """Initialise / migre la base de données SQLite.
-    
+
     En cas de mise à jour, sauvegarde automatiquement la DB avant migration.
+    Rien n'est fait (ni copie, ni migrate, ni collectstatic) si l'empreinte de
+    démarrage est identique à celle du dernier démarrage réussi.
     """
-    import django
-    django.setup()
-    from django.core.management import call_command
+    with _phase('django.setup'):
+        import django
+        django.setup()
+        from django.core.management import call_command
 
     db_path = os.path.join(BASE_DIR, 'db.sqlite3')
     is_new_db = not os.path.exists(db_path) or os.path.getsize(db_path) == 0
 
-    # Sauvegarder la DB existante avant migration (protection des données client)
-    if not is_new_db:
-        backup_dir = os.path.join(BASE_DIR, 'backups')
-        os.makedirs(backup_dir, exist_ok=True)
-        import shutil
-        backup_name = f"db_avant_migration_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.sqlite3"
-        backup_path = os.path.join(backup_dir, backup_name)
-        try:
-            shutil.copy2(db_path, backup_path)
-            print(f"[MySchoolGN] Sauvegarde DB → {backup_name}")
-            # Garder seulement les 5 dernières sauvegardes automatiques
-            _cleanup_old_backups(backup_dir, prefix='db_avant_migration_', keep=5)
-        except Exception as e:
-            print(f"[MySchoolGN] Avertissement sauvegarde DB : {e}")
+    precedente = _lire_empreinte_demarrage()
+    with _phase('empreinte'):
+        empreinte = {
+            'build': _identifiant_build(),
+            'migrations': '' if is_new_db else _empreinte_migrations(),
+            'statiques': _empreinte_statiques(),
+        }
+    meme_build = bool(precedente) and precedente.get('build') == empreinte['build']
+    migrations_a_jour = (
+        meme_build and bool(empreinte['migrations'])
+        and precedente.get('migrations') == empreinte['migrations']
+    )
+    statiques_a_jour = (
+        meme_build and bool(empreinte['statiques'])
+        and precedente.get('statiques') == empreinte['statiques']
+    )
 
-    print("[MySchoolGN] Migration de la base de données...")
-    call_command('migrate', '--run-syncdb', verbosity=0)
+    if migrations_a_jour:
+        print("[MySchoolGN] Base à jour : migration ignorée.")
+    else:
+        # Sauvegarder la DB existante avant migration (protection des données client)
+        if not is_new_db:
+            with _phase('copie avant migration'):
+                backup_dir = os.path.join(BASE_DIR, 'backups')
+                os.makedirs(backup_dir, exist_ok=True)
+                backup_name = f"db_avant_migration_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.sqlite3"
+                backup_path = os.path.join(backup_dir, backup_name)
+                try:
+                    # Copie cohérente via l'API de sauvegarde SQLite : avec le
+                    # journal WAL, le fichier seul ne contient pas tout.
+                    from ecole_moderne.sauvegarde import _instantane_sqlite
+                    _instantane_sqlite(db_path, backup_path)
+                    print(f"[MySchoolGN] Sauvegarde DB → {backup_name}")
+                    # Garder seulement les 5 dernières sauvegardes automatiques
+                    _cleanup_old_backups(backup_dir, prefix='db_avant_migration_', keep=5)
+                except Exception as e:
+                    print(f"[MySchoolGN] Avertissement sauvegarde DB : {e}")
+
+        print("[MySchoolGN] Migration de la base de données...")
+        with _phase('migrations'):
+            call_command('migrate', '--run-syncdb', verbosity=0)
+        empreinte['migrations'] = _empreinte_migrations()
 
     if is_new_db:
         print("[MySchoolGN] Nouvelle installation détectée.")
@@ -562,11 +719,18 @@ def setup_database():
         except Exception as e:
             print(f"[MySchoolGN] Avertissement création admin : {e}")
 
-    print("[MySchoolGN] Préparation des fichiers statiques...")
-    try:
-        call_command('collectstatic', '--noinput', verbosity=0)
-    except Exception:
-        pass
+    if statiques_a_jour:
+        print("[MySchoolGN] Fichiers statiques à jour : collectstatic ignoré.")
+    else:
+        print("[MySchoolGN] Préparation des fichiers statiques...")
+        with _phase('collectstatic'):
+            try:
+                call_command('collectstatic', '--noinput', verbosity=0)
+                empreinte['statiques'] = _empreinte_statiques()
+            except Exception:
+                empreinte['statiques'] = ''
+
+    _enregistrer_empreinte_demarrage(empreinte)
 
 
 def _cleanup_old_backups(backup_dir, prefix='db_avant_migration_', keep=5):
@@ -740,26 +904,27 @@ def main():
     print(f"   Répertoire : {BASE_DIR}")
 
     # Vérification anti-modification (garde)
-    _guard_check()
+    with _phase('garde'):
+        _guard_check()
 
-    # Vérification d'intégrité (anti-modification)
-    check_integrity()
+    # Vérification d'intégrité (anti-modification) : le hachage des fichiers
+    # critiques (dont l'exe) tourne en tâche de fond pendant la licence et les
+    # migrations ; le résultat est lu par le thread principal avant le démarrage
+    # du serveur (voir check_integrity()).
+    _integrite = queue.Queue(maxsize=1)
+    threading.Thread(target=_hacher_integrite, args=(_integrite,), name='integrite', daemon=True).start()
 
-    # Vérification de la licence
-    license_status = None
-    try:
-        import license_manager
-        license_status = license_manager.check_license_or_trial()
-    except Exception:
-        pass
-    check_license()
+    # Vérification de la licence (une seule fois : le statut sert aussi à la bannière)
+    with _phase('licence'):
+        license_status = check_license()
 
     # Une restauration demandée depuis l'interface s'applique avant que Django
     # n'ouvre la base. La base active n'est jamais remplacée pendant que le
     # serveur est en cours d'exécution.
     try:
         from ecole_moderne import sauvegarde as _sauvegarde
-        _restauration = _sauvegarde.appliquer_restauration_si_demandee(BASE_DIR)
+        with _phase('restauration'):
+            _restauration = _sauvegarde.appliquer_restauration_si_demandee(BASE_DIR)
         if _restauration:
             print(f"[Sauvegarde] {_restauration['message']}")
             if not _restauration['ok']:
@@ -813,6 +978,19 @@ def main():
     except Exception as _sauvegarde_err:
         print(f"[Sauvegarde] Sauvegarde automatique non démarrée : {_sauvegarde_err}")
 
+    # Exports lourds (PDF de classe, Excel) : reprend aussi ceux laissés en file
+    try:
+        from rapports.taches_export import demarrer_worker as _demarrer_worker_exports
+        _demarrer_worker_exports()
+    except Exception as _exports_err:
+        print(f"[Exports] Worker des exports non démarré : {_exports_err}")
+
+    _journaliser_demarrage()
+
+    # Fichiers altérés : l'alerte s'affiche ici et le serveur ne démarre pas
+    with _phase('integrite'):
+        check_integrity(_integrite)
+
     # Ouvrir le navigateur en arrière-plan
     browser_thread = threading.Thread(
         target=open_browser, args=(port,), daemon=True
@@ -828,8 +1006,8 @@ def main():
         # l'erreur "populate() isn't reentrant" qui masquerait la vraie cause.
         if not _apps.ready:
             django.setup()
-        from django.core.management import call_command
-        call_command('runserver', f'127.0.0.1:{port}', '--noreload')
+        from ecole_moderne.serveur_embarque import servir
+        servir(port)
     except KeyboardInterrupt:
         print("\n[MySchoolGN] Arrêt du serveur...")
         print("[MySchoolGN] Au revoir !")
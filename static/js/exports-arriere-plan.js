@@ -0,0 +1,93 @@
+/*
+ * Exports lourds en arrière-plan (rapports.taches_export).
+ *
+ * Un lien portant l'attribut data-export-arriere-plan n'ouvre plus l'export
+ * directement : l'URL est mise en file côté serveur, l'avancement est suivi
+ * puis le fichier est téléchargé quand il est prêt. Un second clic sur le
+ * même export reprend la tâche déjà en cours.
+ *
+ * Depuis du JavaScript : window.lancerExportArrierePlan(url)
+ * Si la mise en file est refusée, on retombe sur l'ouverture directe.
+ */
+(function () {
+    'use strict';
+
+    var script = document.currentScript;
+    var URL_LANCER = script ? script.getAttribute('data-url-lancer') : null;
+    var INTERVALLE_MS = 1500;
+
+    function bandeau() {
+        var el = document.getElementById('export-arriere-plan-bandeau');
+        if (!el) {
+            el = document.createElement('div');
+            el.id = 'export-arriere-plan-bandeau';
+            el.className = 'alert alert-info shadow';
+            el.setAttribute('role', 'status');
+            el.style.cssText = 'position:fixed;bottom:1rem;right:1rem;z-index:1080;max-width:360px;margin:0;';
+            document.body.appendChild(el);
+        }
+        return el;
+    }
+
+    function afficher(texte, classe) {
+        var el = bandeau();
+        el.className = 'alert shadow alert-' + (classe || 'info');
+        el.textContent = texte;
+        el.style.display = 'block';
+    }
+
+    function masquer(delaiMs) {
+        setTimeout(function () {
+            var el = document.getElementById('export-arriere-plan-bandeau');
+            if (el) { el.style.display = 'none'; }
+        }, delaiMs || 0);
+    }
+
+    function suivre(etat) {
+        if (etat.statut === 'TERMINE') {
+            afficher(etat.libelle + ' : prêt, téléchargement…', 'success');
+            window.location.href = etat.url_telechargement;
+            masquer(4000);
+            return;
+        }
+        if (etat.statut === 'ERREUR') {
+            afficher(etat.libelle + ' : ' + (etat.message || 'échec de la génération.'), 'danger');
+            masquer(10000);
+            return;
+        }
+        var texte = etat.libelle + ' : ' + etat.statut_libelle.toLowerCase();
+        if (etat.position > 0) { texte += ' (' + etat.position + ' avant vous)'; }
+        afficher(texte + '…', 'info');
+        setTimeout(function () {
+            fetch(etat.url_statut, { credentials: 'same-origin' })
+                .then(function (r) { return r.json(); })
+                .then(suivre)
+                .catch(function () { afficher('Suivi de l\'export interrompu.', 'warning'); });
+        }, INTERVALLE_MS);
+    }
+
+    function lancer(url) {
+        if (!URL_LANCER || !window.csrfFetch) {
+            window.location.href = url;
+            return;
+        }
+        var corps = new FormData();
+        corps.append('url', url);
+        window.csrfFetch(URL_LANCER, { method: 'POST', body: corps, credentials: 'same-origin' })
+            .then(function (r) {
+                if (!r.ok) { throw new Error('refus'); }
+                return r.json();
+            })
+            .then(suivre)
+            .catch(function () { window.location.href = url; });
+    }
+
+    window.lancerExportArrierePlan = lancer;
+
+    document.addEventListener('click', function (e) {
+        var lien = e.target.closest ? e.target.closest('a[data-export-arriere-plan]') : null;
+        if (!lien || e.ctrlKey || e.metaKey || e.shiftKey) { return; }
+        e.preventDefault();
+        lancer(lien.getAttribute('href'));
+    });
+})();
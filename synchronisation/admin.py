@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import SyncChange, SyncDevice
+from .models import SyncChange, SyncDevice, SyncWatermark
 
 
 @admin.register(SyncDevice)
@@ -17,3 +17,9 @@ class SyncChangeAdmin(admin.ModelAdmin):
     list_filter = ('operation', 'statut', 'ecole', 'model_label')
     search_fields = ('model_label', 'object_uuid', 'device__nom', 'ecole__nom')
     readonly_fields = ('date_creation', 'date_application')
+
+
+@admin.register(SyncWatermark)
+class SyncWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('ecole', 'model_label', 'last_change_id', 'date_modification')
+    list_filter = ('ecole',)
@@ -0,0 +1,52 @@
+"""Ecritures en lot qui restent visibles pour la synchronisation et le journal.
+
+bulk_create/bulk_update n'envoient ni pre_save ni post_save : les objets
+importes ainsi n'atteignaient jamais les postes hors ligne ni la corbeille
+memoire. Les methodes ``bulk_create_tracked``/``bulk_update_tracked`` du
+manager par defaut des modeles synchronises font la meme ecriture groupee,
+puis emettent un signal par lot :
+
+- ``pre_bulk_update`` avant la mise a jour (lecture de l'etat precedent) ;
+- ``post_bulk_save`` apres l'ecriture, avec tous les objets concernes.
+
+Les recepteurs (synchronisation.signals, administration.audit_signals)
+journalisent le lot en quelques requetes.
+"""
+from django.db import models
+from django.dispatch import Signal
+
+
+# Arguments : sender (modele), instances, fields, using
+pre_bulk_update = Signal()
+# Arguments : sender (modele), instances, created, fields (None a la creation), using
+post_bulk_save = Signal()
+
+
+class TrackedQuerySet(models.QuerySet):
+
+    def bulk_create_tracked(self, objs, batch_size=None, **kwargs):
+        """bulk_create suivi d'un seul post_bulk_save pour tout le lot.
+
+        Les objets non inseres (ignore_conflicts) sont ecartes par les
+        recepteurs, qui relisent le lot par sync_uuid.
+        """
+        objs = list(objs)
+        if not objs:
+            return objs
+        created = self.bulk_create(objs, batch_size=batch_size, **kwargs)
+        post_bulk_save.send(sender=self.model, instances=created, created=True, fields=None, using=self.db)
+        return created
+
+    def bulk_update_tracked(self, objs, fields, batch_size=None):
+        """bulk_update encadre par pre_bulk_update et post_bulk_save."""
+        objs = list(objs)
+        if not objs:
+            return 0
+        fields = list(fields)
+        pre_bulk_update.send(sender=self.model, instances=objs, fields=fields, using=self.db)
+        updated = self.bulk_update(objs, fields, batch_size=batch_size)
+        post_bulk_save.send(sender=self.model, instances=objs, created=False, fields=fields, using=self.db)
+        return updated
+
+
+TrackedManager = models.Manager.from_queryset(TrackedQuerySet)
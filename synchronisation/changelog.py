@@ -0,0 +1,202 @@
+"""Journal des changements synchronises, tamponne par transaction.
+
+Dans un bloc atomic, les enregistrements et suppressions des modeles
+synchronises ne creent plus une ligne SyncChange chacun : ils sont notes dans
+un tampon (un par transaction, connexion et thread) ou les operations successives sur
+un meme objet sont fusionnees. Au commit, le tampon est vide en une seule
+insertion groupee ; les objets sont alors relus en lot pour serialiser leur
+etat valide, ce qui ecarte aussi ce qu'un savepoint annule a laisse dans le
+tampon.
+
+Hors transaction, le changement est ecrit immediatement, comme avant.
+Les ecritures en lot (synchronisation.bulk) passent par record_changes().
+"""
+import logging
+import threading
+import weakref
+
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+from .engine import (
+    BATCH_CHUNK_SIZE,
+    default_ecole_id,
+    ecole_id_for_instance,
+    ecole_paths_for_model,
+    get_model,
+    model_label_for,
+    serialization_queryset,
+    serialize_instance,
+)
+from .models import SyncChange
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+
+
+def _merge_operations(previous, operation):
+    """Operation resultante de deux operations successives ; None si elles s'annulent."""
+    if previous is None:
+        return operation
+    if operation == SyncChange.OPERATION_DELETE:
+        return None if previous == SyncChange.OPERATION_CREATE else operation
+    if previous == SyncChange.OPERATION_DELETE:
+        return SyncChange.OPERATION_UPDATE
+    return previous if previous == SyncChange.OPERATION_CREATE else operation
+
+
+class ChangeBuffer:
+    """Changements d'une transaction, fusionnes objet par objet."""
+
+    def __init__(self, using):
+        self.using = using
+        # (label, sync_uuid) -> {'operation', 'ecole_id'} dans l'ordre de premiere apparition
+        self.entries = {}
+        self.flushed = False
+
+    def add(self, instance, operation):
+        self.add_many(model_label_for(instance), [instance], operation)
+
+    def add_many(self, label, instances, operation):
+        for instance in instances:
+            key = (label, instance.sync_uuid)
+            previous = self.entries.get(key)
+            merged = _merge_operations(previous['operation'] if previous else None, operation)
+            if merged is None:
+                self.entries.pop(key, None)
+                continue
+            entry = self.entries.setdefault(key, {'operation': merged, 'ecole_id': None})
+            entry['operation'] = merged
+            if merged == SyncChange.OPERATION_DELETE:
+                # Apres la suppression, l'ecole ne pourra plus etre relue
+                entry['ecole_id'] = ecole_id_for_instance(instance)
+
+    def flush(self):
+        """Ecrit le tampon ; en cas d'echec il est conserve et l'erreur remonte."""
+        self.flushed = True
+        if not self.entries:
+            return
+        try:
+            SyncChange.objects.using(self.using).bulk_create(
+                self._build_changes(self.entries), batch_size=BATCH_CHUNK_SIZE,
+            )
+        except Exception:
+            logger.exception(
+                "Ecriture du journal de synchronisation impossible (%s changement(s))", len(self.entries),
+            )
+            raise
+        self.entries = {}
+
+    def _build_changes(self, entries):
+        uuids_by_label = {}
+        for label, sync_uuid in entries:
+            uuids_by_label.setdefault(label, []).append(sync_uuid)
+
+        objects = {}
+        for label, uuids in uuids_by_label.items():
+            model = get_model(label)
+            queryset = serialization_queryset(model, model.objects.using(self.using))
+            paths = ecole_paths_for_model(model)
+            if label == 'eleves.Ecole':
+                queryset = queryset.annotate(_sync_ecole_id=F('pk'))
+            elif len(paths) == 1:
+                queryset = queryset.annotate(_sync_ecole_id=F(paths[0]))
+            elif paths:
+                queryset = queryset.annotate(_sync_ecole_id=Coalesce(*(F(path) for path in paths)))
+            for start in range(0, len(uuids), BATCH_CHUNK_SIZE):
+                for obj in queryset.filter(sync_uuid__in=uuids[start:start + BATCH_CHUNK_SIZE]):
+                    objects[(label, obj.sync_uuid)] = obj
+
+        fallback_ecole_id = None
+        changes = []
+        for key, entry in entries.items():
+            label, sync_uuid = key
+            obj = objects.get(key)
+            if entry['operation'] == SyncChange.OPERATION_DELETE:
+                if obj is not None or not entry['ecole_id']:
+                    continue  # suppression annulee
+                ecole_id, payload = entry['ecole_id'], {'sync_uuid': str(sync_uuid)}
+            else:
+                if obj is None:
+                    continue  # creation annulee ou objet supprime depuis
+                ecole_id = getattr(obj, '_sync_ecole_id', None)
+                if not ecole_id:
+                    fallback_ecole_id = fallback_ecole_id or default_ecole_id()
+                    ecole_id = fallback_ecole_id
+                if not ecole_id:
+                    continue
+                payload = serialize_instance(obj)
+            changes.append(SyncChange(
+                ecole_id=ecole_id,
+                model_label=label,
+                object_uuid=sync_uuid,
+                operation=entry['operation'],
+                payload=payload,
+            ))
+        return changes
+
+
+class _Inscription:
+    """Vidage d'un tampon, inscrit une fois par transaction avec on_commit.
+
+    Django oublie les fonctions on_commit d'une transaction (ou d'un
+    savepoint) annulee : l'inscription disparait alors avec son tampon, et
+    la reference faible gardee par _buffer() ne renvoie plus rien.
+    """
+    __slots__ = ('buffer', '__weakref__')
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def __call__(self):
+        self.buffer.flush()
+
+
+def _buffer(using):
+    """Tampon de la transaction en cours sur ``using`` (par thread)."""
+    inscriptions = getattr(_state, 'inscriptions', None)
+    if inscriptions is None:
+        inscriptions = _state.inscriptions = {}
+    inscription = inscriptions[using]() if using in inscriptions else None
+    if inscription is None or inscription.buffer.flushed:
+        inscription = _Inscription(ChangeBuffer(using))
+        transaction.on_commit(inscription, using=using)
+        inscriptions[using] = weakref.ref(inscription)
+    return inscription.buffer
+
+
+def record_change(instance, operation, using='default'):
+    """Journalise l'operation : tamponnee dans une transaction, ecrite tout de suite sinon."""
+    if connections[using].in_atomic_block:
+        _buffer(using).add(instance, operation)
+        return
+
+    ecole_id = ecole_id_for_instance(instance)
+    if not ecole_id:
+        return
+    SyncChange.objects.using(using).create(
+        ecole_id=ecole_id,
+        model_label=model_label_for(instance),
+        object_uuid=instance.sync_uuid,
+        operation=operation,
+        payload=(
+            {'sync_uuid': str(instance.sync_uuid)}
+            if operation == SyncChange.OPERATION_DELETE
+            else serialize_instance(instance)
+        ),
+    )
+
+
+def record_changes(model, instances, operation, using='default'):
+    """Journalise une ecriture en lot : tamponnee dans une transaction, videe aussitot sinon."""
+    label = model_label_for(model)
+    if connections[using].in_atomic_block:
+        _buffer(using).add_many(label, instances, operation)
+        return
+
+    buffer = ChangeBuffer(using)
+    for instance in instances:
+        buffer.entries[(label, instance.sync_uuid)] = {'operation': operation, 'ecole_id': None}
+    buffer.flush()
@@ -1,9 +1,11 @@
 from decimal import Decimal
+from functools import lru_cache
 from uuid import UUID
 
 from django.apps import apps
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models, transaction
 from django.utils import timezone
 
 from eleves.models import Ecole
@@ -55,12 +57,12 @@ def serialize_instance(instance):
     for field in instance._meta.concrete_fields:
         if field.name == 'id' or field.name in SYNC_FIELD_NAMES:
             continue
-        value = getattr(instance, field.name)
         if isinstance(field, models.ForeignKey) or isinstance(field, models.OneToOneField):
-            related = value
-            if related is None or field.remote_field.model == get_user_model():
+            # Ne charger l'objet lie que s'il est reellement serialise
+            if getattr(instance, field.attname) is None or field.remote_field.model == get_user_model():
                 payload[field.name] = None
             else:
+                related = getattr(instance, field.name)
                 payload[field.name] = {
                     'model': model_label_for(related),
                     'sync_uuid': str(getattr(related, 'sync_uuid', '') or ''),
@@ -68,9 +70,10 @@ def serialize_instance(instance):
                     'text': str(related),
                 }
         elif isinstance(field, models.FileField):
+            value = getattr(instance, field.name)
             payload[field.name] = value.name if value else ''
         else:
-            payload[field.name] = serialize_value(value)
+            payload[field.name] = serialize_value(getattr(instance, field.name))
     return payload
 
 
@@ -101,26 +104,54 @@ def deserialize_field(field, raw_value):
     return raw_value
 
 
-def ecole_for_instance(instance):
+def _foreign_model(model, name):
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    return field.remote_field.model if field.many_to_one else None
+
+
+@lru_cache(maxsize=None)
+def ecole_paths_for_model(model):
+    """Chemins ORM menant a l'ecole d'un modele, par ordre de priorite.
+
+    Calcules une fois par modele ; le premier chemin non nul donne l'ecole.
+    """
+    paths = []
+    if _foreign_model(model, 'ecole') is Ecole:
+        paths.append('ecole')
+    classe = _foreign_model(model, 'classe')
+    if classe and _foreign_model(classe, 'ecole') is Ecole:
+        paths.append('classe__ecole')
+    eleve = _foreign_model(model, 'eleve')
+    if eleve and _foreign_model(eleve, 'classe'):
+        paths.append('eleve__classe__ecole')
+    paiement = _foreign_model(model, 'paiement')
+    if paiement and _foreign_model(paiement, 'eleve'):
+        paths.append('paiement__eleve__classe__ecole')
+    return tuple(paths)
+
+
+def default_ecole_id():
+    return Ecole.objects.order_by('id').values_list('id', flat=True).first()
+
+
+def ecole_id_for_instance(instance):
+    """Id de l'ecole d'un objet synchronise, en suivant les chemins de son modele."""
     if isinstance(instance, Ecole):
-        return instance
-    if hasattr(instance, 'ecole_id') and getattr(instance, 'ecole_id'):
-        return instance.ecole
-    if hasattr(instance, 'classe') and getattr(instance, 'classe_id', None):
-        classe = instance.classe
-        if hasattr(classe, 'ecole_id'):
-            return classe.ecole
-    if hasattr(instance, 'eleve') and getattr(instance, 'eleve_id', None):
-        eleve = instance.eleve
-        if getattr(eleve, 'classe_id', None):
-            return eleve.classe.ecole
-    if hasattr(instance, 'paiement') and getattr(instance, 'paiement_id', None):
-        paiement = instance.paiement
-        if getattr(paiement, 'eleve_id', None) and getattr(paiement.eleve, 'classe_id', None):
-            return paiement.eleve.classe.ecole
-    if hasattr(instance, 'depense') and getattr(instance, 'depense_id', None):
-        return Ecole.objects.order_by('id').first()
-    return Ecole.objects.order_by('id').first()
+        return instance.pk
+    for path in ecole_paths_for_model(type(instance)):
+        obj = instance
+        for part in path.split('__')[:-1]:
+            if getattr(obj, f'{part}_id', None) is None:
+                obj = None
+                break
+            obj = getattr(obj, part)
+        ecole_id = getattr(obj, 'ecole_id', None) if obj is not None else None
+        if ecole_id:
+            return ecole_id
+    return default_ecole_id()
 
 
 def apply_sync_change(change):
@@ -170,6 +201,361 @@ def apply_sync_change(change):
         return obj
 
 
+BATCH_CHUNK_SIZE = 500
+
+# Modeles dont le post_save a des effets de bord metier : appliques un par un
+PER_OBJECT_MODEL_LABELS = {'eleves.Ecole'}
+
+# Notes appliquees en lot : chemin vers la ClasseNote dont les rangs sont a invalider
+RANK_INVALIDATION_PATHS = {
+    'notes.NoteMensuelle': 'matiere__classe',
+    'notes.CompositionNote': 'matiere__classe',
+    'notes.NoteEleve': 'evaluation__matiere__classe',
+    'notes.MatiereNote': 'classe',
+}
+
+
+def _chunks(values, size=BATCH_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+@lru_cache(maxsize=1)
+def sync_models_in_dependency_order():
+    """Labels synchronises tries pour que chaque modele suive ceux qu'il reference.
+
+    L'ordre du registre departage les ex aequo ; un cycle eventuel est rompu
+    en prenant le premier modele restant dans cet ordre.
+    """
+    dependencies = {}
+    for label in SYNC_MODEL_LABELS:
+        model = get_model(label)
+        if not model:
+            continue
+        dependencies[label] = {
+            model_label_for(field.remote_field.model)
+            for field in model._meta.concrete_fields
+            if field.is_relation and field.remote_field.model is not model
+        } & SYNC_MODEL_SET
+
+    ordered = []
+    remaining = [label for label in SYNC_MODEL_LABELS if label in dependencies]
+    while remaining:
+        placed = set(ordered)
+        ready = next(
+            (label for label in remaining if dependencies[label] <= placed | {label}),
+            remaining[0],
+        )
+        ordered.append(ready)
+        remaining.remove(ready)
+    return ordered
+
+
+class RelatedResolver:
+    """Resout les references {'sync_uuid', 'pk'} d'un lot en requetes IN groupees.
+
+    Les identifiants deja resolus sont gardes pour tout le lot : un objet cree
+    par un groupe precedent est retrouve sans nouvelle requete par la suite.
+    """
+
+    def __init__(self):
+        self.by_uuid = {}
+        self.by_pk = {}
+
+    def prefetch(self, model, raw_values):
+        if model == get_user_model():
+            return
+        known_uuids = self.by_uuid.setdefault(model, {})
+        known_pks = self.by_pk.setdefault(model, set())
+        uuids, pks = set(), set()
+        for raw_value in raw_values:
+            if not isinstance(raw_value, dict):
+                continue
+            sync_uuid = raw_value.get('sync_uuid')
+            if sync_uuid and hasattr(model, 'sync_uuid'):
+                try:
+                    sync_uuid = UUID(str(sync_uuid))
+                except ValueError:
+                    sync_uuid = None
+                if sync_uuid and sync_uuid not in known_uuids:
+                    uuids.add(sync_uuid)
+            if raw_value.get('pk'):
+                pks.add(raw_value['pk'])
+
+        for chunk in _chunks(uuids):
+            known_uuids.update(model.objects.filter(sync_uuid__in=chunk).values_list('sync_uuid', 'pk'))
+        for chunk in _chunks(pks - known_pks):
+            known_pks.update(model.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+
+    def resolve(self, field, raw_value):
+        """Equivalent de resolve_related() : retourne la cle primaire ou None."""
+        if not raw_value or not isinstance(raw_value, dict):
+            return None
+        model = field.remote_field.model
+        if model == get_user_model():
+            return None
+        sync_uuid = raw_value.get('sync_uuid')
+        if sync_uuid and hasattr(model, 'sync_uuid'):
+            try:
+                pk = self.by_uuid.get(model, {}).get(UUID(str(sync_uuid)))
+            except ValueError:
+                pk = None
+            if pk:
+                return pk
+        pk = raw_value.get('pk')
+        if pk and pk in self.by_pk.get(model, set()):
+            return pk
+        return None
+
+
+def _mark_applied(change, now):
+    change.statut = change.STATUT_APPLIED
+    change.date_application = now
+    change.erreur = ''
+
+
+def _mark_failed(change, error):
+    change.statut = change.STATUT_FAILED
+    change.erreur = str(error)
+
+
+def _apply_one_by_one(changes):
+    for change in changes:
+        try:
+            with transaction.atomic():
+                apply_sync_change(change)
+        except Exception as exc:
+            _mark_failed(change, exc)
+
+
+def _apply_model_group(model, states, resolver, now):
+    """Applique les etats finaux d'un modele : suppressions, puis insertions et mises a jour en lot."""
+    to_delete = [uuid for uuid, state in states.items() if state['deleted']]
+    to_save = {uuid: state for uuid, state in states.items() if not state['deleted']}
+
+    existing = {}
+    for chunk in _chunks(to_save):
+        existing.update(model.objects.in_bulk(chunk, field_name='sync_uuid'))
+
+    fields = [
+        field for field in model._meta.concrete_fields
+        if field.name != 'id' and field.name not in SYNC_FIELD_NAMES
+    ]
+    for field in fields:
+        if field.is_relation:
+            resolver.prefetch(
+                field.remote_field.model,
+                [state['payload'].get(field.name) for state in to_save.values()],
+            )
+    auto_now_fields = [field for field in fields if getattr(field, 'auto_now', False)]
+
+    created, updated, updated_fields = [], [], {'is_synced', 'sync_version', 'sync_updated_at'}
+    for object_uuid, state in to_save.items():
+        obj = existing.get(object_uuid) or model(sync_uuid=object_uuid)
+        try:
+            for field in fields:
+                if field.name not in state['payload']:
+                    continue
+                raw_value = state['payload'][field.name]
+                if field.is_relation:
+                    value = resolver.resolve(field, raw_value)
+                    if value is None and not field.null and not field.blank:
+                        raise ValueError(f"Relation introuvable pour {field.name}.")
+                    setattr(obj, field.attname, value)
+                else:
+                    setattr(obj, field.name, deserialize_field(field, raw_value))
+                updated_fields.add(field.name)
+        except ValueError as exc:
+            for change in state['changes']:
+                _mark_failed(change, exc)
+            continue
+        obj.is_synced = True
+        obj.sync_version = getattr(obj, 'sync_version', 1) + 1
+        if obj.pk:
+            obj.sync_updated_at = now
+            for field in auto_now_fields:
+                setattr(obj, field.attname, now)
+                updated_fields.add(field.name)
+            updated.append((obj, state))
+        else:
+            created.append((obj, state))
+
+    if to_delete:
+        for chunk in _chunks(to_delete):
+            model.objects.filter(sync_uuid__in=chunk).delete()
+    if created:
+        model.objects.bulk_create_tracked([obj for obj, _ in created], batch_size=BATCH_CHUNK_SIZE)
+    if updated:
+        model.objects.bulk_update_tracked(
+            [obj for obj, _ in updated], sorted(updated_fields), batch_size=BATCH_CHUNK_SIZE,
+        )
+
+    for uuid in to_delete:
+        for change in states[uuid]['changes']:
+            _mark_applied(change, now)
+    for _, state in created + updated:
+        for change in state['changes']:
+            _mark_applied(change, now)
+    return [obj.sync_uuid for obj, _ in created + updated]
+
+
+def _invalidate_ranks(saved_uuids_by_label):
+    from notes.models import ClasseNote
+    from notes.utils_rangs import invalider_cache_rangs
+
+    classe_ids = set()
+    for label, path in RANK_INVALIDATION_PATHS.items():
+        model = get_model(label)
+        for chunk in _chunks(saved_uuids_by_label.get(label, ())):
+            classe_ids.update(model.objects.filter(sync_uuid__in=chunk).values_list(path, flat=True))
+    for classe in ClasseNote.objects.filter(pk__in=classe_ids - {None}):
+        invalider_cache_rangs(classe)
+
+
+def _invalidate_school_years(classe_uuids):
+    from eleves.models import Classe
+    from eleves.utils_annee import invalider_annees
+
+    ecole_ids = set()
+    for chunk in _chunks(classe_uuids):
+        ecole_ids.update(Classe.objects.filter(sync_uuid__in=chunk).values_list('ecole_id', flat=True))
+    invalider_annees(*ecole_ids)
+
+
+def insert_sync_changes(changes):
+    """Enregistre des SyncChange neufs, en une insertion groupee si la base renvoie les id."""
+    from django.db import connection
+    from .models import SyncChange
+
+    if connection.features.can_return_rows_from_bulk_insert:
+        return SyncChange.objects.bulk_create(changes, batch_size=BATCH_CHUNK_SIZE)
+    # MySQL ne renvoie pas les id d'une insertion groupee
+    for change in changes:
+        change.save()
+    return changes
+
+
+def apply_sync_changes_batch(changes):
+    """Applique un lot de SyncChange deja enregistres, en une transaction.
+
+    Contrairement a apply_sync_change() appele en boucle :
+    - les changements successifs d'un meme objet sont fusionnes (le dernier gagne) ;
+    - les modeles sont traites dans l'ordre des dependances, les relations
+      resolues par requetes IN groupees (RelatedResolver) ;
+    - les objets sont ecrits par bulk_create_tracked/bulk_update_tracked,
+      sans signaux par objet (le journal des modifications les recoit par
+      lot) ; les rangs des classes touchees sont invalides une seule fois.
+
+    Un groupe qui echoue en lot (contrainte d'unicite...) est rejoue objet par
+    objet pour isoler le changement fautif. Les statuts des changements sont
+    mis a jour sur place et enregistres ; rien n'est leve pour un changement
+    rejete.
+    """
+    now = timezone.now()
+    states_by_label = {}
+    for change in changes:
+        model = get_model(change.model_label)
+        if not model or change.model_label not in SYNC_MODEL_SET:
+            _mark_failed(change, f'Modele non synchronisable: {change.model_label}')
+            continue
+        object_uuid = change.object_uuid
+        if not object_uuid:
+            raw_uuid = (change.payload or {}).get('sync_uuid')
+            try:
+                object_uuid = UUID(str(raw_uuid)) if raw_uuid else None
+            except ValueError:
+                object_uuid = None
+        if not object_uuid:
+            _mark_failed(change, 'sync_uuid manquant.')
+            continue
+
+        state = states_by_label.setdefault(change.model_label, {}).setdefault(
+            object_uuid, {'deleted': False, 'payload': {}, 'changes': []},
+        )
+        state['changes'].append(change)
+        if change.operation == change.OPERATION_DELETE:
+            state['deleted'] = True
+            state['payload'] = {}
+        else:
+            state['deleted'] = False
+            state['payload'].update(change.payload or {})
+
+    resolver = RelatedResolver()
+    saved_uuids_by_label = {}
+    with transaction.atomic(), mute_sync():
+        for label in sync_models_in_dependency_order():
+            states = states_by_label.get(label)
+            if not states:
+                continue
+            group_changes = [change for state in states.values() for change in state['changes']]
+            if label in PER_OBJECT_MODEL_LABELS:
+                _apply_one_by_one(group_changes)
+                continue
+            try:
+                with transaction.atomic():
+                    saved_uuids_by_label[label] = _apply_model_group(get_model(label), states, resolver, now)
+            except Exception:
+                for change in group_changes:
+                    change.statut = change.STATUT_PENDING
+                _apply_one_by_one(group_changes)
+
+        if saved_uuids_by_label.keys() & RANK_INVALIDATION_PATHS.keys():
+            _invalidate_ranks(saved_uuids_by_label)
+        if saved_uuids_by_label.get('eleves.Classe'):
+            _invalidate_school_years(saved_uuids_by_label['eleves.Classe'])
+
+        from .models import SyncChange
+        SyncChange.objects.bulk_update(
+            [change for change in changes if change.pk],
+            ['statut', 'date_application', 'erreur'],
+            batch_size=BATCH_CHUNK_SIZE,
+        )
+    return changes
+
+
+def latest_change_ids(changes, limit):
+    """Id du dernier changement de chaque objet de ``changes``, par id croissant.
+
+    Les modifications successives d'un meme objet se resument a son dernier
+    etat (le payload est complet) ; les changements sans object_uuid restent
+    individuels. Retourne au plus ``limit`` id.
+    """
+    grouped = (
+        changes.exclude(object_uuid=None)
+        .values('model_label', 'object_uuid')
+        .annotate(last_id=models.Max('id'))
+        .order_by('last_id')
+        .values_list('last_id', flat=True)[:limit]
+    )
+    singles = changes.filter(object_uuid=None).order_by('id').values_list('id', flat=True)[:limit]
+    return sorted([*grouped, *singles])[:limit]
+
+
+def dependency_ordered_change_ids(changes, limit):
+    """Comme latest_change_ids, mais modele par modele, parents d'abord.
+
+    Un objet modifie apres la creation de ses enfants a un dernier id plus
+    grand qu'eux : trie par id, il pourrait arriver apres eux dans une autre
+    page. Ici chaque modele suit ceux qu'il reference
+    (sync_models_in_dependency_order), par id croissant a l'interieur.
+
+    Retourne (ids, labels) : au plus ``limit`` id, et les modeles presents
+    dans ``changes`` dans l'ordre de livraison.
+    """
+    rank = {label: index for index, label in enumerate(sync_models_in_dependency_order())}
+    labels = sorted(
+        set(changes.order_by().values_list('model_label', flat=True).distinct()),
+        key=lambda label: (rank.get(label, len(rank)), label),
+    )
+    ids = []
+    for label in labels:
+        if len(ids) >= limit:
+            break
+        ids.extend(latest_change_ids(changes.filter(model_label=label), limit - len(ids)))
+    return ids, labels
+
+
 def queryset_for_ecole(model, ecole):
     label = model_label_for(model)
     if label == 'eleves.Ecole':
@@ -236,22 +622,85 @@ def queryset_for_ecole(model, ecole):
     return model.objects.none()
 
 
-def snapshot_changes_for_ecole(ecole):
-    snapshot = []
-    for label in SYNC_MODEL_LABELS:
+SNAPSHOT_PAGE_SIZE = 500
+
+
+def encode_snapshot_cursor(label, pk):
+    return f'{label}:{pk}'
+
+
+def decode_snapshot_cursor(cursor):
+    """'app.Modele:pk' -> (label, pk) ; ValueError si le curseur est invalide."""
+    label, _, pk = (cursor or '').rpartition(':')
+    if label not in SYNC_MODEL_SET:
+        raise ValueError('Curseur de snapshot invalide.')
+    return label, int(pk)
+
+
+def serialization_queryset(model, queryset=None):
+    """Queryset dont les relations serialisees sont chargees par jointure."""
+    user_model = get_user_model()
+    related = [
+        field.name for field in model._meta.concrete_fields
+        if field.is_relation and field.remote_field.model is not user_model
+    ]
+    return (queryset if queryset is not None else model.objects.all()).select_related(*related)
+
+
+def snapshot_queryset(model, ecole):
+    """Lignes d'un modele pour le snapshot, ordonnees par pk."""
+    return serialization_queryset(model, queryset_for_ecole(model, ecole)).order_by('pk')
+
+
+def snapshot_item(label, obj, generated_at):
+    return {
+        'id': None,
+        'model': label,
+        'model_label': label,
+        'object_uuid': str(obj.sync_uuid),
+        'operation': 'UPDATE',
+        'payload': {**serialize_instance(obj), 'sync_uuid': str(obj.sync_uuid)},
+        'device_id': None,
+        'device_name': 'Snapshot initial',
+        'date_creation': generated_at,
+        'cursor': encode_snapshot_cursor(label, obj.pk),
+    }
+
+
+def iter_snapshot_for_ecole(ecole, cursor=None, page_size=SNAPSHOT_PAGE_SIZE):
+    """Parcourt tout le snapshot d'une ecole, page par page, a partir d'un curseur.
+
+    Les modeles suivent l'ordre des dependances, les lignes l'ordre des pk
+    (pagination par cle : aucune troncature, memoire bornee a une page).
+    Chaque element porte le curseur permettant de reprendre juste apres lui.
+    """
+    start_label, last_pk = decode_snapshot_cursor(cursor) if cursor else (None, 0)
+    generated_at = timezone.now().isoformat()
+    labels = sync_models_in_dependency_order()
+    if start_label:
+        labels = labels[labels.index(start_label):]
+
+    for label in labels:
         model = get_model(label)
         if not model:
             continue
-        for obj in queryset_for_ecole(model, ecole).order_by('pk')[:5000]:
-            snapshot.append({
-                'id': None,
-                'model': label,
-                'model_label': label,
-                'object_uuid': str(obj.sync_uuid),
-                'operation': 'UPDATE',
-                'payload': {**serialize_instance(obj), 'sync_uuid': str(obj.sync_uuid)},
-                'device_id': None,
-                'device_name': 'Snapshot initial',
-                'date_creation': timezone.now().isoformat(),
-            })
-    return snapshot
+        queryset = snapshot_queryset(model, ecole)
+        after_pk = last_pk if label == start_label else None
+        while True:
+            page = queryset.filter(pk__gt=after_pk) if after_pk is not None else queryset
+            page = list(page[:page_size])
+            for obj in page:
+                yield snapshot_item(label, obj, generated_at)
+            if len(page) < page_size:
+                break
+            after_pk = page[-1].pk
+
+
+def snapshot_page_for_ecole(ecole, cursor=None, limit=SNAPSHOT_PAGE_SIZE):
+    """Une page du snapshot : (elements, curseur suivant ou None si termine)."""
+    items = []
+    for item in iter_snapshot_for_ecole(ecole, cursor, page_size=limit + 1):
+        if len(items) == limit:
+            return items, items[-1]['cursor']
+        items.append(item)
+    return items, None
@@ -1,14 +1,25 @@
+import gzip
 import json
+import time
 from urllib import parse, request as urlrequest
 from urllib.error import HTTPError, URLError
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 from django.utils import timezone
 
 from eleves.models import Ecole
-from synchronisation.engine import apply_sync_change
-from synchronisation.models import SyncChange
+from synchronisation.engine import apply_sync_changes_batch, insert_sync_changes
+from synchronisation.models import SyncChange, SyncWatermark
+
+
+PUSH_BATCH_SIZE = 500
+PULL_INITIAL_LIMIT = 500
+PULL_MIN_LIMIT = 100
+PULL_MAX_LIMIT = 5000
+PULL_FAST_SECONDS = 3
+PULL_SLOW_SECONDS = 15
 
 
 class Command(BaseCommand):
@@ -21,6 +32,7 @@ class Command(BaseCommand):
         parser.add_argument('--ecole-id', default=getattr(settings, 'MYSCHOOL_SYNC_ECOLE_ID', ''))
         parser.add_argument('--since-id', default='')
         parser.add_argument('--initial', action='store_true')
+        parser.add_argument('--cursor', default='', help="Reprendre un snapshot initial interrompu apres ce curseur")
         parser.add_argument('--pull-only', action='store_true')
         parser.add_argument('--push-only', action='store_true')
 
@@ -45,7 +57,10 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS(f'{pushed} changement(s) envoye(s).'))
 
         if not options['push_only']:
-            pulled = self._pull_changes(server_url, device_id, token, ecole, options['since_id'], options['initial'])
+            if options['initial'] or options['cursor']:
+                pulled = self._pull_snapshot(server_url, device_id, token, ecole, options['cursor'])
+            else:
+                pulled = self._pull_changes(server_url, device_id, token, ecole, options['since_id'])
             self.stdout.write(self.style.SUCCESS(f'{pulled} changement(s) recu(s).'))
 
     def _request_json(self, url, device_id, token, payload=None, method='POST'):
@@ -55,6 +70,7 @@ class Command(BaseCommand):
             data=body,
             headers={
                 'Content-Type': 'application/json',
+                'Accept-Encoding': 'gzip',
                 'X-Sync-Device': device_id,
                 'X-Sync-Token': token,
             },
@@ -62,7 +78,10 @@ class Command(BaseCommand):
         )
         try:
             with urlrequest.urlopen(req, timeout=45) as response:
-                return json.loads(response.read().decode('utf-8'))
+                body = response.read()
+                if response.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                return json.loads(body.decode('utf-8'))
         except HTTPError as exc:
             detail = exc.read().decode('utf-8', errors='replace')
             raise CommandError(f"Erreur serveur {exc.code}: {detail}") from exc
@@ -70,91 +89,205 @@ class Command(BaseCommand):
             raise CommandError(f"Serveur de synchronisation inaccessible: {exc}") from exc
 
     def _push_pending(self, server_url, device_id, token, ecole):
-        pending = list(
-            SyncChange.objects
-            .filter(ecole=ecole, statut=SyncChange.STATUT_PENDING)
-            .order_by('id')[:200]
-        )
-        if not pending:
-            return 0
+        """Envoie les changements en attente par lots de PUSH_BATCH_SIZE (le serveur les applique en bloc)."""
+        updated = 0
+        last_id = 0
+        while True:
+            pending = list(
+                SyncChange.objects
+                .filter(ecole=ecole, statut=SyncChange.STATUT_PENDING, id__gt=last_id)
+                .order_by('id')[:PUSH_BATCH_SIZE]
+            )
+            if not pending:
+                return updated
+            last_id = pending[-1].id
+
+            response = self._request_json(
+                f'{server_url}/api/v1/sync/push/',
+                device_id,
+                token,
+                {
+                    'changes': [
+                        {
+                            'model': change.model_label,
+                            'object_uuid': str(change.object_uuid) if change.object_uuid else None,
+                            'operation': change.operation,
+                            'payload': change.payload,
+                        }
+                        for change in pending
+                    ]
+                },
+            )
+            if not response.get('ok'):
+                raise CommandError(response.get('error') or 'Push refuse.')
+
+            accepted_indexes = {item['index'] for item in response.get('accepted', [])}
+            applied = [change for index, change in enumerate(pending) if index in accepted_indexes]
+            SyncChange.objects.filter(pk__in=[change.pk for change in applied]).update(
+                statut=SyncChange.STATUT_APPLIED,
+                date_application=timezone.now(),
+            )
+            updated += len(applied)
+
+    def _pull_snapshot(self, server_url, device_id, token, ecole, cursor=''):
+        """Recoit le snapshot initial en flux NDJSON compresse et l'applique par lots.
 
-        response = self._request_json(
-            f'{server_url}/api/v1/sync/push/',
-            device_id,
-            token,
-            {
-                'changes': [
-                    {
-                        'model': change.model_label,
-                        'object_uuid': str(change.object_uuid) if change.object_uuid else None,
-                        'operation': change.operation,
-                        'payload': change.payload,
-                    }
-                    for change in pending
-                ]
+        En cas de coupure, la commande indique le curseur a passer a --cursor
+        pour reprendre sans tout retelecharger.
+        """
+        query = {'initial': '1', 'format': 'ndjson'}
+        if cursor:
+            query['cursor'] = cursor
+        req = urlrequest.Request(
+            f'{server_url}/api/v1/sync/pull/?{parse.urlencode(query)}',
+            headers={
+                'Accept': 'application/x-ndjson',
+                'Accept-Encoding': 'gzip',
+                'X-Sync-Device': device_id,
+                'X-Sync-Token': token,
             },
+            method='GET',
         )
-        if not response.get('ok'):
-            raise CommandError(response.get('error') or 'Push refuse.')
 
-        accepted_indexes = {item['index'] for item in response.get('accepted', [])}
-        now = timezone.now()
-        updated = 0
-        for index, change in enumerate(pending):
-            if index in accepted_indexes:
-                change.statut = SyncChange.STATUT_APPLIED
-                change.date_application = now
-                change.save(update_fields=['statut', 'date_application'])
-                updated += 1
-        return updated
-
-    def _pull_changes(self, server_url, device_id, token, ecole, since_id, initial=False):
-        query = {}
+        applied = 0
+        batch = []
+        complete = False
+        try:
+            with urlrequest.urlopen(req, timeout=120) as response:
+                if not cursor and response.headers.get('X-Sync-Latest-Change-Id'):
+                    # Nouveau snapshot : les pulls suivants repartent de l'etat du serveur a cet instant
+                    self._save_watermarks(ecole, int(response.headers['X-Sync-Latest-Change-Id']), {})
+                    SyncWatermark.objects.filter(ecole=ecole).exclude(model_label='').delete()
+                stream = gzip.GzipFile(fileobj=response) if response.headers.get('Content-Encoding') == 'gzip' else response
+                for line in stream:
+                    item = json.loads(line)
+                    if item.get('done'):
+                        complete = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= PUSH_BATCH_SIZE:
+                        applied += self._apply_pulled(ecole, batch)
+                        cursor = batch[-1]['cursor']
+                        batch = []
+            if batch:
+                applied += self._apply_pulled(ecole, batch)
+                cursor = batch[-1]['cursor']
+        except HTTPError as exc:
+            detail = exc.read().decode('utf-8', errors='replace')
+            raise CommandError(f"Erreur serveur {exc.code}: {detail}") from exc
+        except (URLError, OSError, EOFError, ValueError) as exc:
+            raise CommandError(
+                f"Snapshot interrompu apres {applied} changement(s): {exc}. "
+                f"Reprendre avec --cursor {cursor}" if cursor else f"Snapshot interrompu: {exc}"
+            ) from exc
+
+        if not complete:
+            raise CommandError(f"Snapshot incomplet. Reprendre avec --cursor {cursor}")
+        return applied
+
+    def _load_watermarks(self, ecole):
+        watermarks = dict(SyncWatermark.objects.filter(ecole=ecole).values_list('model_label', 'last_change_id'))
+        return watermarks.pop('', 0), watermarks
+
+    def _save_watermarks(self, ecole, since_id, watermarks):
+        rows = [
+            SyncWatermark(ecole=ecole, model_label=label, last_change_id=last_id)
+            for label, last_id in {**watermarks, '': since_id}.items()
+        ]
+        options = {'update_conflicts': True, 'update_fields': ['last_change_id', 'date_modification']}
+        if connection.features.supports_update_conflicts_with_target:
+            options['unique_fields'] = ['ecole', 'model_label']
+        SyncWatermark.objects.bulk_create(rows, **options)
+
+    def _pull_changes(self, server_url, device_id, token, ecole, since_id=''):
+        """Recoit les changements des autres postes, page apres page, jusqu'a rattraper le serveur.
+
+        Les reperes (global et par modele) sont conserves dans SyncWatermark ;
+        --since-id les remplace. La taille des pages s'adapte au temps de
+        reponse : elle double sur une liaison rapide, diminue de moitie sur une
+        liaison lente.
+        """
         if since_id:
-            query['since_id'] = since_id
-        if initial:
-            query['initial'] = '1'
-        suffix = f"?{parse.urlencode(query)}" if query else ''
-        response = self._request_json(
-            f'{server_url}/api/v1/sync/pull/{suffix}',
-            device_id,
-            token,
-            payload=None,
-            method='GET',
-        )
-        if not response.get('ok'):
-            raise CommandError(response.get('error') or 'Pull refuse.')
+            base_id, watermarks = int(since_id), {}
+        else:
+            base_id, watermarks = self._load_watermarks(ecole)
 
+        limit = PULL_INITIAL_LIMIT
         created = 0
-        for item in response.get('changes', []):
+        # Premier id non applique par modele : le repere enregistre reste
+        # en deca pour que le changement soit redemande au prochain pull
+        echecs = {}
+        while True:
+            started = time.monotonic()
+            response = self._request_json(
+                f'{server_url}/api/v1/sync/pull/',
+                device_id,
+                token,
+                {'since_id': base_id, 'watermarks': watermarks, 'limit': limit},
+            )
+            elapsed = time.monotonic() - started
+            if not response.get('ok'):
+                raise CommandError(response.get('error') or 'Pull refuse.')
+
+            created += self._apply_pulled(ecole, response.get('changes', []), echecs)
+            base_id = response.get('next_since_id') or base_id
+            watermarks = response.get('watermarks') or watermarks
+            self._save_watermarks(ecole, base_id, {
+                **watermarks,
+                **{
+                    label: min(watermarks.get(label, base_id), premier_echec - 1)
+                    for label, premier_echec in echecs.items()
+                },
+            })
+
+            if not response.get('has_more'):
+                break
+            if elapsed < PULL_FAST_SECONDS:
+                limit = min(limit * 2, PULL_MAX_LIMIT)
+            elif elapsed > PULL_SLOW_SECONDS:
+                limit = max(limit // 2, PULL_MIN_LIMIT)
+
+        self.stdout.write(f'Dernier changement serveur: {base_id}')
+        if echecs:
+            self.stderr.write(f'{len(echecs)} modele(s) avec des changements a reprendre au prochain pull')
+        return created
+
+    def _apply_pulled(self, ecole, items, echecs=None):
+        """Applique les changements recus ; ``echecs`` recoit le premier id en echec par modele."""
+        server_ids = [item['id'] for item in items if item.get('id')]
+        recus = SyncChange.objects.filter(ecole=ecole, payload__server_change_id__in=server_ids)
+        already = set(
+            recus.exclude(statut=SyncChange.STATUT_FAILED).values_list('payload__server_change_id', flat=True)
+        ) if server_ids else set()
+
+        changes = []
+        for item in items:
             server_change_id = item.get('id')
-            if server_change_id and SyncChange.objects.filter(
-                ecole=ecole,
-                payload__server_change_id=server_change_id,
-            ).exists():
+            if server_change_id and server_change_id in already:
                 continue
-
             payload = item.get('payload') or {}
             if server_change_id:
                 payload = {**payload, 'server_change_id': server_change_id}
-
-            change = SyncChange.objects.create(
+            changes.append(SyncChange(
                 ecole=ecole,
                 model_label=item['model_label'],
                 object_uuid=item.get('object_uuid') or None,
                 operation=item['operation'],
                 payload=payload,
-            )
-            try:
-                apply_sync_change(change)
-                created += 1
-            except Exception as exc:
-                change.statut = SyncChange.STATUT_FAILED
-                change.erreur = str(exc)
-                change.save(update_fields=['statut', 'erreur'])
-                self.stderr.write(f"Changement {server_change_id} non applique: {exc}")
-
-        latest_id = response.get('latest_change_id')
-        if latest_id:
-            self.stdout.write(f'Dernier changement serveur: {latest_id}')
-        return created
+            ))
+        if not changes:
+            return 0
+
+        with transaction.atomic():
+            if server_ids:
+                # Nouvel essai d'un changement deja recu en echec : il remplace l'ancien
+                recus.filter(statut=SyncChange.STATUT_FAILED).delete()
+            insert_sync_changes(changes)
+            apply_sync_changes_batch(changes)
+        for change in changes:
+            if change.statut == SyncChange.STATUT_FAILED:
+                server_change_id = change.payload.get('server_change_id')
+                self.stderr.write(f"Changement {server_change_id} non applique: {change.erreur}")
+                if echecs is not None and server_change_id:
+                    echecs[change.model_label] = min(echecs.get(change.model_label, server_change_id), server_change_id)
+        return sum(1 for change in changes if change.statut == SyncChange.STATUT_APPLIED)
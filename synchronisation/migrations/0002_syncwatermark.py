@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eleves', '0017_alter_classe_niveau_alter_grilletarifaire_niveau'),
+        ('synchronisation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(blank=True, max_length=120)),
+                ('last_change_id', models.BigIntegerField(default=0)),
+                ('date_modification', models.DateTimeField(auto_now=True)),
+                ('ecole', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_watermarks', to='eleves.ecole')),
+            ],
+            options={
+                'verbose_name': 'Repere de synchronisation',
+                'verbose_name_plural': 'Reperes de synchronisation',
+                'constraints': [models.UniqueConstraint(fields=('ecole', 'model_label'), name='sync_watermark_unique')],
+            },
+        ),
+    ]
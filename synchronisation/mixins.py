@@ -2,6 +2,8 @@ import uuid
 
 from django.db import models
 
+from .bulk import TrackedManager
+
 
 class SyncTrackedModel(models.Model):
     sync_uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False, db_index=True)
@@ -11,5 +13,29 @@ class SyncTrackedModel(models.Model):
     sync_version = models.PositiveIntegerField(default=1)
     is_synced = models.BooleanField(default=False, db_index=True)
 
+    objects = TrackedManager()
+
     class Meta:
         abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # État tel que lu en base : l'audit compare avec lui au lieu de relire la ligne.
+        instance._valeurs_chargees = (field_names, values)
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        self.__dict__.pop('_valeurs_chargees', None)
+        super().refresh_from_db(*args, **kwargs)
+
+    def valeurs_chargees(self):
+        """{attname: valeur} lus en base, ou None si l'instance n'en vient pas
+        (ou si des champs ont été différés)."""
+        charge = self.__dict__.get('_valeurs_chargees')
+        if charge is None:
+            return None
+        field_names, values = charge
+        if len(field_names) != len(self._meta.concrete_fields):
+            return None
+        return dict(zip(field_names, values))
@@ -80,3 +80,26 @@ class SyncChange(models.Model):
 
     def __str__(self):
         return f'{self.operation} {self.model_label} ({self.statut})'
+
+
+class SyncWatermark(models.Model):
+    """Dernier changement serveur recu par ce poste, par modele.
+
+    Cote poste hors ligne : ``model_label`` vide pour le repere global,
+    renseigne pour les modeles qui ont leur propre repere.
+    """
+
+    ecole = models.ForeignKey(Ecole, on_delete=models.CASCADE, related_name='sync_watermarks')
+    model_label = models.CharField(max_length=120, blank=True)
+    last_change_id = models.BigIntegerField(default=0)
+    date_modification = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Repere de synchronisation'
+        verbose_name_plural = 'Reperes de synchronisation'
+        constraints = [
+            models.UniqueConstraint(fields=['ecole', 'model_label'], name='sync_watermark_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.model_label or "global"} > {self.last_change_id}'
@@ -2,8 +2,10 @@ from django.db.models.signals import post_save, pre_delete
 from django.dispatch import receiver
 from django.apps import apps as django_apps
 
+from .bulk import post_bulk_save
+from .changelog import record_change, record_changes
 from .context import sync_is_muted
-from .engine import ecole_for_instance, is_sync_model, model_label_for, serialize_instance
+from .engine import is_sync_model
 from .models import SyncChange
 
 
@@ -17,16 +19,10 @@ def create_sync_change_on_save(sender, instance, created, **kwargs):
     if kwargs.get('raw') or sync_is_muted() or _is_historical_model(sender) or not is_sync_model(instance):
         return
 
-    ecole = ecole_for_instance(instance)
-    if not ecole or not getattr(ecole, 'pk', None):
-        return
-
-    SyncChange.objects.create(
-        ecole_id=ecole.pk,
-        model_label=model_label_for(instance),
-        object_uuid=instance.sync_uuid,
-        operation=SyncChange.OPERATION_CREATE if created else SyncChange.OPERATION_UPDATE,
-        payload=serialize_instance(instance),
+    record_change(
+        instance,
+        SyncChange.OPERATION_CREATE if created else SyncChange.OPERATION_UPDATE,
+        using=kwargs.get('using') or 'default',
     )
 
 
@@ -35,14 +31,17 @@ def create_sync_change_on_delete(sender, instance, **kwargs):
     if sync_is_muted() or _is_historical_model(sender) or not is_sync_model(instance):
         return
 
-    ecole = ecole_for_instance(instance)
-    if not ecole or not getattr(ecole, 'pk', None):
+    record_change(instance, SyncChange.OPERATION_DELETE, using=kwargs.get('using') or 'default')
+
+
+@receiver(post_bulk_save)
+def create_sync_changes_on_bulk_save(sender, instances, created, **kwargs):
+    if sync_is_muted() or _is_historical_model(sender) or not is_sync_model(sender):
         return
 
-    SyncChange.objects.create(
-        ecole_id=ecole.pk,
-        model_label=model_label_for(instance),
-        object_uuid=instance.sync_uuid,
-        operation=SyncChange.OPERATION_DELETE,
-        payload={'sync_uuid': str(instance.sync_uuid)},
+    record_changes(
+        sender,
+        instances,
+        SyncChange.OPERATION_CREATE if created else SyncChange.OPERATION_UPDATE,
+        using=kwargs.get('using') or 'default',
     )
@@ -1,4 +1,5 @@
 import json
+import uuid
 
 from django.contrib.auth.models import User
 from django.test import Client, TestCase
@@ -7,6 +8,8 @@ from django.urls import reverse
 from eleves.models import Ecole
 from utilisateurs.models import Profil
 
+from .models import SyncChange
+
 
 class SynchronisationApiTests(TestCase):
     def setUp(self):
@@ -120,3 +123,576 @@ class SynchronisationApiTests(TestCase):
         )
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.json()['changes']), 1)
+
+
+class PushEnLotTests(TestCase):
+    """Push d'un lot : journal insere en bloc, relations resolues en IN, application en une transaction."""
+
+    def setUp(self):
+        from synchronisation.models import SyncDevice
+
+        self.ecole = Ecole.objects.create(
+            nom='Ecole Lot', adresse='Kindia', telephone='+224600000001', directeur='Direction',
+        )
+        self.device = SyncDevice(ecole=self.ecole, nom='Poste hors ligne')
+        self.device.definir_token('jeton-lot')
+        self.device.save()
+
+    def _payloads_hors_ligne(self, nb_eleves):
+        """Serialise une classe et ses eleves crees « sur le poste », puis les retire de la base."""
+        from eleves.models import Classe, Eleve
+        from synchronisation.context import mute_sync
+        from synchronisation.engine import serialize_instance
+
+        with mute_sync():
+            classe = Classe.objects.create(
+                ecole=self.ecole, nom='CM2 A', niveau='PRIMAIRE_6', annee_scolaire='2025-2026',
+            )
+            eleves = [
+                Eleve.objects.create(
+                    matricule=f'LOT-{i:03d}', prenom=f'Eleve {i}', nom='Diallo',
+                    sexe='M', classe=classe, statut='ACTIF',
+                )
+                for i in range(nb_eleves)
+            ]
+            changes = [
+                {'model': 'eleves.Classe', 'object_uuid': str(classe.sync_uuid), 'operation': 'CREATE',
+                 'payload': serialize_instance(classe)},
+            ] + [
+                {'model': 'eleves.Eleve', 'object_uuid': str(eleve.sync_uuid), 'operation': 'CREATE',
+                 'payload': serialize_instance(eleve)}
+                for eleve in eleves
+            ]
+            Eleve.objects.filter(classe=classe).delete()
+            classe.delete()
+        # Les eleves arrivent avant leur classe : l'ordre des dependances doit les remettre en place
+        return changes[1:] + changes[:1]
+
+    def _push(self, changes):
+        return self.client.post(
+            reverse('synchronisation:push'),
+            data=json.dumps({'changes': changes}),
+            content_type='application/json',
+            HTTP_X_SYNC_DEVICE=str(self.device.device_id),
+            HTTP_X_SYNC_TOKEN='jeton-lot',
+        )
+
+    def test_lot_applique_avec_relations_creees_dans_le_meme_lot(self):
+        from eleves.models import Eleve
+
+        response = self._push(self._payloads_hors_ligne(4))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['accepted_count'], 5)
+        self.assertEqual(Eleve.objects.filter(classe__nom='CM2 A', classe__ecole=self.ecole).count(), 4)
+        self.assertFalse(SyncChange.objects.filter(device=self.device).exclude(statut=SyncChange.STATUT_APPLIED).exists())
+
+    def test_nombre_de_requetes_independant_de_la_taille_du_lot(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        petit = self._payloads_hors_ligne(2)
+        with CaptureQueriesContext(connection) as requetes_petit:
+            self._push(petit)
+        SyncChange.objects.all().delete()
+        from eleves.models import Classe
+        Classe.objects.all().delete()
+
+        grand = self._payloads_hors_ligne(40)
+        with CaptureQueriesContext(connection) as requetes_grand:
+            response = self._push(grand)
+        self.assertEqual(response.json()['accepted_count'], 41)
+        self.assertEqual(len(requetes_grand), len(requetes_petit))
+
+    def test_changements_successifs_et_rejet_isole(self):
+        from eleves.models import Eleve
+
+        changes = self._payloads_hors_ligne(2)
+        eleve = changes[0]
+        modifie = {**eleve, 'operation': 'UPDATE', 'payload': {**eleve['payload'], 'prenom': 'MODIFIE'}}
+        orphelin = {**changes[1], 'object_uuid': str(uuid.uuid4()),
+                    'payload': {**changes[1]['payload'],
+                                'classe': {'model': 'eleves.Classe', 'sync_uuid': str(uuid.uuid4())},
+                                'matricule': 'LOT-999'}}
+
+        response = self._push(changes + [modifie, orphelin])
+        data = response.json()
+        self.assertEqual(data['accepted_count'], 4)
+        self.assertEqual([item['index'] for item in data['rejected']], [4])
+        self.assertIn('classe', data['rejected'][0]['error'])
+        self.assertEqual(Eleve.objects.get(sync_uuid=eleve['object_uuid']).prenom, 'MODIFIE')
+
+    def test_conflit_d_unicite_isole_par_rejeu_objet_par_objet(self):
+        from eleves.models import Eleve
+
+        changes = self._payloads_hors_ligne(3)
+        doublon = {**changes[1], 'object_uuid': str(uuid.uuid4())}
+
+        data = self._push(changes + [doublon]).json()
+        self.assertEqual(data['accepted_count'], 4)
+        self.assertEqual([item['index'] for item in data['rejected']], [4])
+        self.assertEqual(Eleve.objects.filter(classe__nom='CM2 A').count(), 3)
+
+
+class SnapshotInitialTests(TestCase):
+    """Snapshot initial pagine par curseur et diffuse en NDJSON compresse."""
+
+    def setUp(self):
+        from eleves.models import Classe, Eleve
+        from synchronisation.models import SyncDevice
+
+        self.ecole = Ecole.objects.create(
+            nom='Ecole Snapshot', adresse='Labe', telephone='+224600000002', directeur='Direction',
+        )
+        classe = Classe.objects.create(
+            ecole=self.ecole, nom='6eme A', niveau='PRIMAIRE_6', annee_scolaire='2025-2026',
+        )
+        for i in range(7):
+            Eleve.objects.create(
+                matricule=f'SNAP-{i:03d}', prenom=f'Eleve {i}', nom='Bah',
+                sexe='F', classe=classe, statut='ACTIF',
+            )
+        self.device = SyncDevice(ecole=self.ecole, nom='Nouveau poste')
+        self.device.definir_token('jeton-snapshot')
+        self.device.save()
+        self.headers = {
+            'HTTP_X_SYNC_DEVICE': str(self.device.device_id),
+            'HTTP_X_SYNC_TOKEN': 'jeton-snapshot',
+        }
+
+    def test_pages_successives_sans_doublon_ni_troncature(self):
+        from synchronisation.engine import iter_snapshot_for_ecole
+
+        attendus = [item['object_uuid'] for item in iter_snapshot_for_ecole(self.ecole)]
+        recus, cursor, pages = [], None, 0
+        while True:
+            params = {'initial': '1', 'limit': '3', **({'cursor': cursor} if cursor else {})}
+            data = self.client.get(reverse('synchronisation:pull'), params, **self.headers).json()
+            recus.extend(item['object_uuid'] for item in data['changes'])
+            pages += 1
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(recus, attendus)
+        self.assertGreaterEqual(len(recus), 9)
+        self.assertEqual(pages, -(-len(attendus) // 3))
+
+    def test_ancien_client_recoit_le_snapshot_complet(self):
+        from synchronisation.engine import iter_snapshot_for_ecole
+
+        attendus = [item['object_uuid'] for item in iter_snapshot_for_ecole(self.ecole)]
+        response = self.client.get(reverse('synchronisation:pull'), {'initial': '1'}, **self.headers)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertTrue(data['ok'])
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual([item['object_uuid'] for item in data['changes']], attendus)
+        self.assertGreaterEqual(len(attendus), 9)
+
+    def test_flux_ndjson_compresse(self):
+        import gzip
+
+        response = self.client.get(
+            reverse('synchronisation:pull'), {'initial': '1', 'format': 'ndjson'},
+            HTTP_ACCEPT_ENCODING='gzip', **self.headers,
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lignes = [json.loads(ligne) for ligne in gzip.decompress(b''.join(response.streaming_content)).splitlines()]
+        self.assertEqual(lignes[-1], {'done': True, 'count': len(lignes) - 1})
+        eleves = [ligne for ligne in lignes[:-1] if ligne['model'] == 'eleves.Eleve']
+        self.assertEqual(len(eleves), 7)
+        self.assertEqual(eleves[0]['payload']['classe']['text'], '6EME A - Primaire 6ème (2025-2026)')
+
+    def test_requetes_independantes_du_nombre_d_eleves(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from eleves.models import Eleve
+        from synchronisation.engine import iter_snapshot_for_ecole
+
+        with CaptureQueriesContext(connection) as avant:
+            list(iter_snapshot_for_ecole(self.ecole))
+        classe = Eleve.objects.first().classe
+        for i in range(7, 20):
+            Eleve.objects.create(
+                matricule=f'SNAP-{i:03d}', prenom=f'Eleve {i}', nom='Bah',
+                sexe='M', classe=classe, statut='ACTIF',
+            )
+        with CaptureQueriesContext(connection) as apres:
+            list(iter_snapshot_for_ecole(self.ecole))
+        self.assertEqual(len(apres), len(avant))
+
+
+class JournalTamponneTests(TestCase):
+    """Journal de synchronisation fusionne par transaction et ecrit en une insertion au commit."""
+
+    def setUp(self):
+        from eleves.models import Classe
+
+        # Commit simule : le journal des donnees de depart est vide avant chaque test
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ecole = Ecole.objects.create(
+                nom='Ecole Journal', adresse='Boke', telephone='+224600000003', directeur='Direction',
+            )
+            self.classe = Classe.objects.create(
+                ecole=self.ecole, nom='5eme B', niveau='COLLEGE_7', annee_scolaire='2025-2026',
+            )
+
+    def _journal(self, label):
+        return SyncChange.objects.filter(model_label=label).order_by('id')
+
+    def test_modifications_successives_fusionnees_en_une_insertion(self):
+        from django.db import connection, transaction
+        from django.test.utils import CaptureQueriesContext
+
+        from eleves.models import Eleve
+
+        with CaptureQueriesContext(connection) as requetes:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    eleve = Eleve.objects.create(
+                        matricule='JRN-001', prenom='Awa', nom='Sylla', sexe='F',
+                        classe=self.classe, statut='ACTIF',
+                    )
+                    for prenom in ('Aicha', 'Aminata', 'Mariama'):
+                        eleve.prenom = prenom
+                        eleve.save()
+
+        journal = list(self._journal('eleves.Eleve'))
+        self.assertEqual(len(journal), 1)
+        self.assertEqual(journal[0].operation, SyncChange.OPERATION_CREATE)
+        self.assertEqual(journal[0].payload['prenom'], 'MARIAMA')
+        self.assertEqual(journal[0].ecole_id, self.ecole.id)
+        insertions = [q for q in requetes.captured_queries if q['sql'].startswith('INSERT INTO "synchronisation_syncchange"')]
+        self.assertEqual(len(insertions), 1)
+
+    def test_savepoint_annule_et_creation_supprimee_non_journalises(self):
+        from django.db import IntegrityError, transaction
+
+        from eleves.models import Eleve
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        Eleve.objects.create(
+                            matricule='JRN-002', prenom='Ibrahima', nom='Barry', sexe='M',
+                            classe=self.classe, statut='ACTIF',
+                        )
+                        raise IntegrityError('annulation')
+                except IntegrityError:
+                    pass
+                ephemere = Eleve.objects.create(
+                    matricule='JRN-003', prenom='Ousmane', nom='Barry', sexe='M',
+                    classe=self.classe, statut='ACTIF',
+                )
+                ephemere.delete()
+
+        self.assertFalse(self._journal('eleves.Eleve').exists())
+
+    def test_un_seul_vidage_inscrit_par_transaction(self):
+        from django.db import IntegrityError, transaction
+
+        from eleves.models import Eleve
+        from synchronisation.changelog import _Inscription
+
+        with self.captureOnCommitCallbacks(execute=True) as rappels:
+            with transaction.atomic():
+                eleve = Eleve.objects.create(
+                    matricule='JRN-004', prenom='Fanta', nom='Conte', sexe='F',
+                    classe=self.classe, statut='ACTIF',
+                )
+                # Savepoint annule apres l'inscription : le vidage reste du
+                try:
+                    with transaction.atomic():
+                        eleve.prenom = 'Kadiatou'
+                        eleve.save()
+                        raise IntegrityError('annulation')
+                except IntegrityError:
+                    pass
+                for i in range(20):
+                    eleve.nom = f'Conte {i}'
+                    eleve.save()
+
+        vidages = [rappel for rappel in rappels if isinstance(rappel, _Inscription)]
+        self.assertEqual(len(vidages), 1)
+        journal = list(self._journal('eleves.Eleve'))
+        self.assertEqual(len(journal), 1)
+        self.assertEqual(journal[0].payload['nom'], 'CONTE 19')
+
+    def test_transaction_annulee_puis_suivante_journalisee(self):
+        from django.db import IntegrityError, transaction
+
+        from eleves.models import Eleve
+
+        try:
+            with transaction.atomic():
+                Eleve.objects.create(
+                    matricule='JRN-005', prenom='Sekou', nom='Toure', sexe='M',
+                    classe=self.classe, statut='ACTIF',
+                )
+                raise IntegrityError('annulation')
+        except IntegrityError:
+            pass
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Eleve.objects.create(
+                    matricule='JRN-006', prenom='Nene', nom='Toure', sexe='F',
+                    classe=self.classe, statut='ACTIF',
+                )
+
+        self.assertEqual(
+            [change.payload['matricule'] for change in self._journal('eleves.Eleve')], ['JRN-006'],
+        )
+
+    def test_echec_d_ecriture_signale_sans_perdre_le_tampon(self):
+        from unittest import mock
+
+        from django.db import DatabaseError, transaction
+
+        from eleves.models import Eleve
+        from synchronisation.changelog import _buffer
+
+        with transaction.atomic():
+            Eleve.objects.create(
+                matricule='JRN-007', prenom='Mariama', nom='Kaba', sexe='F',
+                classe=self.classe, statut='ACTIF',
+            )
+            tampon = _buffer('default')
+        with mock.patch('django.db.models.query.QuerySet.bulk_create', side_effect=DatabaseError('disque plein')):
+            with self.assertLogs('synchronisation.changelog', 'ERROR'), self.assertRaises(DatabaseError):
+                tampon.flush()
+        self.assertEqual(len(tampon.entries), 1)
+        tampon.flush()
+        self.assertEqual(self._journal('eleves.Eleve').count(), 1)
+
+    def test_suppression_journalisee_avec_son_ecole(self):
+        from eleves.models import Classe
+        from synchronisation.context import mute_sync
+
+        # Classe deja synchronisee : sa creation n'est pas dans le tampon de la transaction
+        with mute_sync():
+            classe = Classe.objects.create(
+                ecole=self.ecole, nom='4eme C', niveau='COLLEGE_8', annee_scolaire='2025-2026',
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            classe.delete()
+
+        journal = list(self._journal('eleves.Classe').filter(object_uuid=classe.sync_uuid))
+        self.assertEqual([change.operation for change in journal], [SyncChange.OPERATION_DELETE])
+        self.assertEqual(journal[0].ecole_id, self.ecole.id)
+        self.assertEqual(journal[0].payload, {'sync_uuid': str(classe.sync_uuid)})
+
+
+class EcrituresEnLotTests(TestCase):
+    """bulk_create_tracked/bulk_update_tracked : journal de synchronisation et corbeille memoire par lot."""
+
+    def setUp(self):
+        from eleves.models import Classe
+
+        # Commit simule : le journal des donnees de depart est vide avant chaque test
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ecole = Ecole.objects.create(
+                nom='Ecole Import', adresse='Mamou', telephone='+224600000004', directeur='Direction',
+            )
+            self.classe = Classe.objects.create(
+                ecole=self.ecole, nom='3eme A', niveau='COLLEGE_10', annee_scolaire='2025-2026',
+            )
+
+    def _eleves(self, nb, prefixe='IMP'):
+        from eleves.models import Eleve
+
+        return [
+            Eleve(matricule=f'{prefixe}-{i:03d}', prenom=f'ELEVE {i}', nom='KEITA', sexe='M',
+                  classe=self.classe, statut='ACTIF')
+            for i in range(nb)
+        ]
+
+    def test_creation_en_lot_journalisee(self):
+        from administration.models import JournalModification
+        from eleves.models import Eleve
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Eleve.objects.bulk_create_tracked(self._eleves(3))
+
+        journal = SyncChange.objects.filter(model_label='eleves.Eleve')
+        self.assertEqual(journal.count(), 3)
+        self.assertEqual(set(journal.values_list('operation', flat=True)), {SyncChange.OPERATION_CREATE})
+        self.assertEqual(set(journal.values_list('ecole_id', flat=True)), {self.ecole.id})
+        self.assertEqual(
+            JournalModification.objects.filter(
+                model_name='Eleve', action=JournalModification.ACTION_CREATION,
+            ).count(),
+            3,
+        )
+
+    def test_modification_en_lot_journalisee_avec_les_champs_modifies(self):
+        from administration.models import JournalModification
+        from eleves.models import Eleve
+        from synchronisation.context import mute_sync
+
+        with mute_sync():
+            Eleve.objects.bulk_create(self._eleves(2))
+        eleves = list(Eleve.objects.filter(classe=self.classe).order_by('matricule'))
+        eleves[0].prenom = 'MODIFIE'
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Eleve.objects.bulk_update_tracked(eleves, ['prenom'])
+
+        journal = SyncChange.objects.filter(model_label='eleves.Eleve')
+        self.assertEqual(journal.count(), 2)
+        self.assertEqual(journal.get(object_uuid=eleves[0].sync_uuid).payload['prenom'], 'MODIFIE')
+        modifications = JournalModification.objects.filter(
+            model_name='Eleve', action=JournalModification.ACTION_MODIFICATION,
+        )
+        self.assertEqual(
+            [m.changements for m in modifications],
+            [{'prenom': {'avant': 'ELEVE 0', 'apres': 'MODIFIE'}}],
+        )
+
+    def test_lignes_ignorees_non_journalisees(self):
+        from eleves.models import Eleve
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Eleve.objects.bulk_create_tracked(self._eleves(2))
+        with self.captureOnCommitCallbacks(execute=True):
+            Eleve.objects.bulk_create_tracked(self._eleves(3), ignore_conflicts=True)
+
+        self.assertEqual(Eleve.objects.filter(classe=self.classe).count(), 3)
+        self.assertEqual(SyncChange.objects.filter(model_label='eleves.Eleve').count(), 3)
+
+
+class PullRepereParModeleTests(TestCase):
+    """Pull par reperes : dernier etat de chaque objet, pages adaptees au volume."""
+
+    def setUp(self):
+        from synchronisation.models import SyncDevice
+
+        self.ecole = Ecole.objects.create(
+            nom='Ecole Pull', adresse='Faranah', telephone='+224600000005', directeur='Direction',
+        )
+        self.source = SyncDevice(ecole=self.ecole, nom='Poste source')
+        self.source.definir_token('source')
+        self.source.save()
+        self.device = SyncDevice(ecole=self.ecole, nom='Poste rural')
+        self.device.definir_token('rural')
+        self.device.save()
+        self.classe_uuid, self.eleve_uuid = uuid.uuid4(), uuid.uuid4()
+
+    def _changement(self, label, object_uuid, **payload):
+        return SyncChange.objects.create(
+            ecole=self.ecole, device=self.source, model_label=label, object_uuid=object_uuid,
+            operation=SyncChange.OPERATION_UPDATE, payload=payload, statut=SyncChange.STATUT_APPLIED,
+        )
+
+    def _pull(self, **corps):
+        return self.client.post(
+            reverse('synchronisation:pull'), data=json.dumps(corps), content_type='application/json',
+            HTTP_X_SYNC_DEVICE=str(self.device.device_id), HTTP_X_SYNC_TOKEN='rural',
+        ).json()
+
+    def test_modifications_successives_resumees_au_dernier_etat(self):
+        for nom in ('A', 'B', 'C'):
+            self._changement('eleves.Classe', self.classe_uuid, nom=nom)
+        dernier = self._changement('eleves.Eleve', self.eleve_uuid, prenom='AWA')
+
+        data = self._pull()
+        self.assertEqual([c['payload'] for c in data['changes']], [{'nom': 'C'}, {'prenom': 'AWA'}])
+        self.assertEqual(data['changes'][1]['device_name'], 'Poste source')
+        self.assertFalse(data['has_more'])
+        self.assertEqual(data['next_since_id'], dernier.id)
+        self.assertEqual(data['watermarks'], {'eleves.Classe': dernier.id, 'eleves.Eleve': dernier.id})
+
+    def test_pages_successives_et_repere_par_modele(self):
+        classe = self._changement('eleves.Classe', self.classe_uuid, nom='A')
+        for i in range(4):
+            self._changement('eleves.Eleve', uuid.uuid4(), prenom=f'E{i}')
+        self._changement('eleves.Classe', uuid.uuid4(), nom='B')
+
+        recus, since_id, watermarks = [], 0, {}
+        while True:
+            data = self._pull(since_id=since_id, watermarks=watermarks, limit=2)
+            recus.extend(c['id'] for c in data['changes'])
+            since_id, watermarks = data['next_since_id'], data['watermarks']
+            if not data['has_more']:
+                break
+        self.assertEqual(len(recus), 6)
+        self.assertEqual(len(set(recus)), 6)
+
+        # Repere propre a un modele : seuls ses changements posterieurs sont renvoyes
+        data = self._pull(since_id=since_id, watermarks={'eleves.Classe': classe.id})
+        self.assertEqual([c['payload'] for c in data['changes']], [{'nom': 'B'}])
+
+    def test_page_limitee_par_le_volume(self):
+        for i in range(3):
+            self._changement('eleves.Eleve', uuid.uuid4(), prenom='X' * 50)
+        data = self._pull(max_bytes=10)
+        self.assertEqual(len(data['changes']), 1)
+        self.assertTrue(data['has_more'])
+
+    def test_parents_livres_avant_les_enfants(self):
+        eleve = self._changement('eleves.Eleve', self.eleve_uuid, prenom='AWA')
+        # Classe modifiee apres la creation de l'eleve : son dernier id est plus grand
+        classe = self._changement('eleves.Classe', self.classe_uuid, nom='A')
+
+        data = self._pull(watermarks={}, limit=1)
+        self.assertEqual([c['id'] for c in data['changes']], [classe.id])
+        self.assertTrue(data['has_more'])
+        self.assertEqual(data['watermarks'], {'eleves.Classe': classe.id, 'eleves.Eleve': 0})
+
+        data = self._pull(since_id=data['next_since_id'], watermarks=data['watermarks'], limit=1)
+        self.assertEqual([c['id'] for c in data['changes']], [eleve.id])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(data['watermarks'], {'eleves.Classe': classe.id, 'eleves.Eleve': eleve.id})
+
+
+class PullRepriseEchecsTests(TestCase):
+    """Un changement recu mais non applique est redemande au pull suivant."""
+
+    def setUp(self):
+        from eleves.models import Classe, Eleve
+        from synchronisation.context import mute_sync
+        from synchronisation.engine import serialize_instance
+
+        self.ecole = Ecole.objects.create(
+            nom='Ecole Reprise', adresse='Labe', telephone='+224600000006', directeur='Direction',
+        )
+        with mute_sync():
+            classe = Classe.objects.create(
+                ecole=self.ecole, nom='CE1 A', niveau='PRIMAIRE_2', annee_scolaire='2025-2026',
+            )
+            eleve = Eleve.objects.create(
+                matricule='REP-001', prenom='Binta', nom='Sow', sexe='F', classe=classe, statut='ACTIF',
+            )
+            self.classe = {'id': 11, 'model_label': 'eleves.Classe', 'object_uuid': str(classe.sync_uuid),
+                           'operation': 'CREATE', 'payload': serialize_instance(classe)}
+            self.eleve = {'id': 10, 'model_label': 'eleves.Eleve', 'object_uuid': str(eleve.sync_uuid),
+                          'operation': 'CREATE', 'payload': serialize_instance(eleve)}
+            eleve.delete()
+            classe.delete()
+
+    def _pull(self, *pages):
+        from io import StringIO
+        from unittest.mock import patch
+
+        from synchronisation.management.commands.sync_offline import Command
+
+        commande = Command(stdout=StringIO(), stderr=StringIO())
+        with patch.object(Command, '_request_json', side_effect=list(pages)):
+            commande._pull_changes('http://serveur', 'poste', 'jeton', self.ecole)
+        from synchronisation.models import SyncWatermark
+        return dict(SyncWatermark.objects.filter(ecole=self.ecole).values_list('model_label', 'last_change_id'))
+
+    def test_repere_retenu_puis_changement_rejoue(self):
+        from eleves.models import Eleve
+
+        # L'eleve arrive sans sa classe : echec, le repere reste avant lui
+        reperes = self._pull({'ok': True, 'changes': [self.eleve], 'next_since_id': 10,
+                              'watermarks': {'eleves.Eleve': 10}, 'has_more': False})
+        self.assertEqual(reperes['eleves.Eleve'], 9)
+        self.assertFalse(Eleve.objects.filter(matricule='REP-001').exists())
+
+        reperes = self._pull({'ok': True, 'changes': [self.classe, self.eleve], 'next_since_id': 11,
+                              'watermarks': {'eleves.Classe': 11, 'eleves.Eleve': 11}, 'has_more': False})
+        self.assertEqual(reperes['eleves.Eleve'], 11)
+        self.assertTrue(Eleve.objects.filter(matricule='REP-001', classe__nom='CE1 A').exists())
+        self.assertEqual(SyncChange.objects.filter(payload__server_change_id=10).count(), 1)
@@ -1,11 +1,15 @@
 import json
 import secrets
+import zlib
 from uuid import UUID
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max, Q
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.utils.dateparse import parse_datetime
 from django.utils import timezone
@@ -15,10 +19,27 @@ from django.views.decorators.http import require_GET, require_POST, require_http
 from eleves.models import Ecole
 from utilisateurs.utils import user_is_admin, user_school
 
-from .engine import apply_sync_change, snapshot_changes_for_ecole
+from .engine import (
+    SNAPSHOT_PAGE_SIZE,
+    apply_sync_changes_batch,
+    decode_snapshot_cursor,
+    insert_sync_changes,
+    iter_snapshot_for_ecole,
+    dependency_ordered_change_ids,
+    latest_change_ids,
+    snapshot_page_for_ecole,
+    sync_models_in_dependency_order,
+)
 from .models import SyncChange, SyncDevice
 
 
+SNAPSHOT_MAX_PAGE_SIZE = 5000
+PULL_DEFAULT_LIMIT = 1000
+PULL_MAX_LIMIT = 5000
+# Volume indicatif des payloads d'une page de pull (avant compression gzip)
+PULL_MAX_BYTES = 2 * 1024 * 1024
+
+
 def _json_body(request):
     if not request.body:
         return {}
@@ -171,6 +192,7 @@ def push(request):
 
     accepted = []
     rejected = []
+    pending = []
     valid_operations = {choice[0] for choice in SyncChange.OPERATION_CHOICES}
 
     for index, change in enumerate(changes):
@@ -204,22 +226,27 @@ def push(request):
         if object_uuid and 'sync_uuid' not in payload:
             payload = {**payload, 'sync_uuid': str(object_uuid)}
 
-        sync_change = SyncChange.objects.create(
+        pending.append((index, SyncChange(
             ecole=device.ecole,
             device=device,
             model_label=model_label[:120],
             object_uuid=object_uuid,
             operation=operation,
             payload=payload,
-        )
-        try:
-            apply_sync_change(sync_change)
+        )))
+
+    if pending:
+        sync_changes = [sync_change for _, sync_change in pending]
+        with transaction.atomic():
+            insert_sync_changes(sync_changes)
+            apply_sync_changes_batch(sync_changes)
+
+    for index, sync_change in pending:
+        if sync_change.statut == SyncChange.STATUT_APPLIED:
             accepted.append({'index': index, 'change_id': sync_change.id})
-        except Exception as exc:
-            sync_change.statut = SyncChange.STATUT_FAILED
-            sync_change.erreur = str(exc)
-            sync_change.save(update_fields=['statut', 'erreur'])
-            rejected.append({'index': index, 'change_id': sync_change.id, 'error': str(exc)})
+        else:
+            rejected.append({'index': index, 'change_id': sync_change.id, 'error': sync_change.erreur})
+    rejected.sort(key=lambda item: item['index'])
 
     return JsonResponse({
         'ok': True,
@@ -231,6 +258,113 @@ def push(request):
     })
 
 
+def _parse_watermarks(raw):
+    """{'app.Modele': dernier_id} ; accepte aussi le JSON encode d'un GET."""
+    if not raw:
+        return {}
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+    if not isinstance(raw, dict):
+        raise ValueError('watermarks doit etre un objet.')
+    return {str(label)[:120]: int(last_id) for label, last_id in raw.items() if label}
+
+
+def _gzip_ndjson(lines):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for line in lines:
+        chunk = compressor.compress(line)
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def _snapshot_lines(ecole, cursor):
+    count = 0
+    for item in iter_snapshot_for_ecole(ecole, cursor):
+        count += 1
+        yield json.dumps(item, cls=DjangoJSONEncoder).encode('utf-8') + b'\n'
+    # Ligne finale : le client distingue un snapshot complet d'une connexion coupee
+    yield json.dumps({'done': True, 'count': count}).encode('utf-8') + b'\n'
+
+
+def _snapshot_document(head, ecole):
+    # Document JSON complet ecrit element par element : {..., "changes": [...]}
+    encoder = DjangoJSONEncoder()
+    debut = encoder.encode({**head, 'changes': []})
+    yield debut[:-len('[]}')].encode('utf-8') + b'['
+    separateur = b''
+    for item in iter_snapshot_for_ecole(ecole):
+        yield separateur + encoder.encode(item).encode('utf-8')
+        separateur = b','
+    yield b']}'
+
+
+def _streaming_snapshot(request, lines, content_type, latest_change_id):
+    gzip_ok = 'gzip' in request.headers.get('Accept-Encoding', '')
+    response = StreamingHttpResponse(
+        _gzip_ndjson(lines) if gzip_ok else lines,
+        content_type=content_type,
+    )
+    if gzip_ok:
+        response['Content-Encoding'] = 'gzip'
+    response['Cache-Control'] = 'no-store'
+    response['X-Sync-Latest-Change-Id'] = str(latest_change_id)
+    return response
+
+
+def _snapshot_response(request, device, since, since_id, cursor, limit, stream):
+    """Snapshot initial, repris apres ``cursor`` : une page JSON, ou tout le reste en NDJSON.
+
+    Sans curseur ni limite (anciens clients), le snapshot complet est renvoye
+    dans un seul document JSON, diffuse pour ne pas le garder en memoire.
+    """
+    paged = bool(cursor or limit)
+    try:
+        if cursor:
+            decode_snapshot_cursor(cursor)
+        limit = min(int(limit or SNAPSHOT_PAGE_SIZE), SNAPSHOT_MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return JsonResponse({'ok': False, 'error': 'Curseur ou limite invalide.'}, status=400)
+
+    # Repere a reprendre pour les pulls suivants : les changements posterieurs au snapshot
+    latest_change_id = SyncChange.objects.filter(ecole=device.ecole).aggregate(latest=Max('id'))['latest'] or 0
+
+    if stream:
+        lines = _snapshot_lines(device.ecole, cursor)
+        return _streaming_snapshot(request, lines, 'application/x-ndjson', latest_change_id)
+
+    if not paged:
+        head = {
+            'ok': True,
+            'device_id': str(device.device_id),
+            'ecole_id': device.ecole_id,
+            'since': since,
+            'since_id': since_id,
+            'initial': True,
+            'cursor': None,
+            'next_cursor': None,
+            'latest_change_id': latest_change_id,
+            'server_time': timezone.now().isoformat(),
+        }
+        lines = _snapshot_document(head, device.ecole)
+        return _streaming_snapshot(request, lines, 'application/json', latest_change_id)
+
+    items, next_cursor = snapshot_page_for_ecole(device.ecole, cursor, max(limit, 1))
+    return JsonResponse({
+        'ok': True,
+        'device_id': str(device.device_id),
+        'ecole_id': device.ecole_id,
+        'since': since,
+        'since_id': since_id,
+        'initial': True,
+        'changes': items,
+        'cursor': cursor,
+        'next_cursor': next_cursor,
+        'latest_change_id': latest_change_id,
+        'server_time': timezone.now().isoformat(),
+    })
+
+
 @csrf_exempt
 @require_http_methods(['GET', 'POST'])
 def pull(request):
@@ -241,6 +375,11 @@ def pull(request):
     since = request.GET.get('since')
     since_id = request.GET.get('since_id')
     initial = request.GET.get('initial') in {'1', 'true', 'yes'}
+    cursor = request.GET.get('cursor')
+    limit = request.GET.get('limit')
+    max_bytes = request.GET.get('max_bytes')
+    watermarks = request.GET.get('watermarks')
+    stream = request.GET.get('format') == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', '')
     if request.method == 'POST':
         data = _json_body(request)
         if data is None:
@@ -248,27 +387,36 @@ def pull(request):
         since = data.get('since') or since
         since_id = data.get('since_id') or since_id
         initial = data.get('initial') in {True, '1', 'true', 'yes'}
+        cursor = data.get('cursor') or cursor
+        limit = data.get('limit') or limit
+        max_bytes = data.get('max_bytes') or max_bytes
+        watermarks = data.get('watermarks', watermarks)
 
     if initial:
-        serialized_changes = snapshot_changes_for_ecole(device.ecole)
-        return JsonResponse({
-            'ok': True,
-            'device_id': str(device.device_id),
-            'ecole_id': device.ecole_id,
-            'since': since,
-            'since_id': since_id,
-            'initial': True,
-            'changes': serialized_changes,
-            'latest_change_id': since_id,
-            'server_time': timezone.now().isoformat(),
-        })
+        return _snapshot_response(request, device, since, since_id, cursor, limit, stream)
+
+    try:
+        base_id = int(since_id or 0)
+    except (TypeError, ValueError):
+        return JsonResponse({'ok': False, 'error': 'since_id invalide.'}, status=400)
+    # Un client qui envoie des reperes (meme vides) les suit modele par modele ;
+    # les anciens clients n'avancent qu'avec next_since_id.
+    per_model = watermarks is not None
+    try:
+        watermarks = _parse_watermarks(watermarks)
+        limit = max(1, min(int(limit or PULL_DEFAULT_LIMIT), PULL_MAX_LIMIT))
+        max_bytes = max(1, int(max_bytes or PULL_MAX_BYTES))
+    except (TypeError, ValueError):
+        return JsonResponse({'ok': False, 'error': 'watermarks, limit ou max_bytes invalide.'}, status=400)
 
     changes = SyncChange.objects.filter(ecole=device.ecole, statut=SyncChange.STATUT_APPLIED).exclude(device=device)
-    if since_id:
-        try:
-            changes = changes.filter(id__gt=int(since_id))
-        except (TypeError, ValueError):
-            return JsonResponse({'ok': False, 'error': 'since_id invalide.'}, status=400)
+    if watermarks:
+        window = Q(id__gt=base_id) & ~Q(model_label__in=list(watermarks))
+        for label, last_id in watermarks.items():
+            window |= Q(model_label=label, id__gt=last_id)
+        changes = changes.filter(window)
+    elif since_id:
+        changes = changes.filter(id__gt=base_id)
     elif since:
         parsed_since = parse_datetime(str(since))
         if not parsed_since:
@@ -277,21 +425,74 @@ def pull(request):
             parsed_since = timezone.make_aware(parsed_since, timezone.get_current_timezone())
         changes = changes.filter(date_creation__gt=parsed_since)
 
-    changes = changes.order_by('id')[:200]
-    serialized_changes = [
-        {
-            'id': change.id,
-            'model': change.model_label,
-            'model_label': change.model_label,
-            'object_uuid': str(change.object_uuid) if change.object_uuid else None,
-            'operation': change.operation,
-            'payload': change.payload,
-            'device_id': str(change.device.device_id) if change.device else None,
-            'device_name': change.device.nom if change.device else None,
-            'date_creation': change.date_creation.isoformat(),
-        }
-        for change in changes
-    ]
+    labels = []
+    window_end = None
+    if per_model:
+        # Fenetre figee : les modeles entierement livres avancent jusqu'a window_end
+        window_end = changes.aggregate(last=Max('id'))['last']
+        changes = changes.filter(id__lte=window_end or 0)
+        ids, labels = dependency_ordered_change_ids(changes, limit + 1)
+    else:
+        ids = latest_change_ids(changes, limit + 1)
+    has_more = len(ids) > limit
+    ids = ids[:limit]
+    rows = {
+        row['id']: row
+        for row in SyncChange.objects.filter(id__in=ids).values(
+            'id', 'model_label', 'object_uuid', 'operation', 'payload',
+            'date_creation', 'device__device_id', 'device__nom',
+        )
+    }
+    if not per_model:
+        # Page contigue par id : au moins les parents de la page passent d'abord
+        rank = {label: index for index, label in enumerate(sync_models_in_dependency_order())}
+        ids = sorted(ids, key=lambda change_id: (rank.get(rows[change_id]['model_label'], len(rank)), change_id))
+
+    serialized_changes = []
+    size = 0
+    for change_id in ids:
+        row = rows[change_id]
+        # Page adaptee au volume : on s'arrete au budget d'octets, le reste suivra
+        size += len(json.dumps(row['payload'], cls=DjangoJSONEncoder))
+        if serialized_changes and size > max_bytes:
+            has_more = True
+            break
+        serialized_changes.append({
+            'id': row['id'],
+            'model': row['model_label'],
+            'model_label': row['model_label'],
+            'object_uuid': str(row['object_uuid']) if row['object_uuid'] else None,
+            'operation': row['operation'],
+            'payload': row['payload'],
+            'device_id': str(row['device__device_id']) if row['device__device_id'] else None,
+            'device_name': row['device__nom'],
+            'date_creation': row['date_creation'].isoformat(),
+        })
+
+    cutoff = None
+    next_since_id = base_id
+    next_watermarks = dict(watermarks)
+    if per_model and serialized_changes:
+        cutoff = serialized_changes[-1]['id']
+        partial = serialized_changes[-1]['model_label'] if has_more else None
+        reached = labels[:labels.index(partial)] if partial else labels
+        # Modeles livres (ou sans changement) : jusqu'a la fin de la fenetre ;
+        # modele en cours : jusqu'au dernier id livre ; suivants : inchanges.
+        for label in {*next_watermarks, *labels}:
+            if label == partial:
+                next_watermarks[label] = cutoff
+            elif label in reached or label not in labels:
+                next_watermarks[label] = max(next_watermarks.get(label, base_id), window_end)
+            else:
+                next_watermarks.setdefault(label, base_id)
+        next_since_id = max(base_id, window_end)
+    elif serialized_changes:
+        # Tout changement d'id <= cutoff est livre, ou remplace par un etat plus recent a venir
+        cutoff = max(item['id'] for item in serialized_changes)
+        for item in serialized_changes:
+            next_watermarks.setdefault(item['model_label'], base_id)
+        next_watermarks = {label: max(last_id, cutoff) for label, last_id in next_watermarks.items()}
+        next_since_id = max(base_id, cutoff)
 
     return JsonResponse({
         'ok': True,
@@ -300,6 +501,9 @@ def pull(request):
         'since': since,
         'since_id': since_id,
         'changes': serialized_changes,
-        'latest_change_id': serialized_changes[-1]['id'] if serialized_changes else since_id,
+        'latest_change_id': cutoff or since_id,
+        'next_since_id': next_since_id,
+        'watermarks': next_watermarks,
+        'has_more': has_more,
         'server_time': timezone.now().isoformat(),
     })
@@ -1,10 +1,10 @@
 import os
-from .models import Profil
-from .permissions import get_user_permissions, check_comptable_restrictions
+from .contexte import contexte_de
 
 def user_context(request):
     """
     Ajoute des informations utilisateur au contexte global
+    (lues dans request.contexte, calculé une fois par requête)
     """
     context = {
         'user_profil': None,
@@ -22,30 +22,24 @@ def user_context(request):
     }
 
     if request.user.is_authenticated:
-        try:
-            profil = request.user.profil
+        contexte = contexte_de(request)
+        context.update({
+            'user_permissions': contexte.permissions,
+            'user_restrictions': contexte.restrictions,
+        })
+        profil = contexte.profil
+        if profil is not None:
             context.update({
                 'user_profil': profil,
                 'user_role': profil.role,
-                'user_ecole': profil.ecole,
-                'is_admin': request.user.is_superuser or profil.role == 'ADMIN',
-                'is_account_principal': request.user.is_superuser or profil.est_compte_principal,
-                'menu_restricted': bool(profil.compte_principal_id),
-                'user_permissions': get_user_permissions(request.user),
-                'user_restrictions': check_comptable_restrictions(request.user),
+                'user_ecole': contexte.ecole,
+                'is_admin': contexte.is_admin,
+                'is_account_principal': contexte.is_account_principal,
+                'menu_restricted': contexte.menu_restricted,
             })
             # Ajouter l'année scolaire active au contexte global
-            if profil.ecole:
-                from eleves.utils_annee import (
-                    get_annee_active,
-                    get_statut_creation_nouvelle_annee,
-                )
-                context['annee_active'] = get_annee_active(request, profil.ecole)
-                context['nouvelle_annee_status'] = get_statut_creation_nouvelle_annee(profil.ecole)
-        except Profil.DoesNotExist:
-            context.update({
-                'user_permissions': get_user_permissions(request.user),
-                'user_restrictions': check_comptable_restrictions(request.user),
-            })
+            if contexte.ecole:
+                context['annee_active'] = contexte.annee_active
+                context['nouvelle_annee_status'] = contexte.nouvelle_annee_status
 
     return context
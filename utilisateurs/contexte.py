@@ -0,0 +1,85 @@
+"""
+Contexte utilisateur de la requête (école, rôle, année active, permissions).
+
+Attaché une seule fois par ContexteUtilisateurMiddleware sous ``request.contexte``
+et calculé paresseusement : une vue qui ne lit que ``ecole`` ne paie pas le
+calcul de l'année active. Le processeur de contexte des gabarits et
+``get_annee_active`` lisent le même objet, chaque valeur n'est donc évaluée
+qu'une fois par requête. La liste des années de l'école est en plus gardée
+en session (voir eleves.utils_annee.annees_scolaires).
+"""
+from functools import cached_property
+
+from .permissions import check_comptable_restrictions, get_user_permissions
+
+
+class ContexteUtilisateur:
+    def __init__(self, request):
+        self.request = request
+        self.user = request.user
+
+    @cached_property
+    def profil(self):
+        if not self.user.is_authenticated:
+            return None
+        return getattr(self.user, 'profil', None)
+
+    @cached_property
+    def ecole(self):
+        return self.profil.ecole if self.profil else None
+
+    @property
+    def ecole_id(self):
+        return self.profil.ecole_id if self.profil else None
+
+    @property
+    def role(self):
+        return self.profil.role if self.profil else None
+
+    @cached_property
+    def is_admin(self):
+        return self.user.is_superuser or (self.profil is not None and self.profil.role == 'ADMIN')
+
+    @cached_property
+    def is_account_principal(self):
+        return self.user.is_superuser or bool(self.profil and self.profil.est_compte_principal)
+
+    @property
+    def menu_restricted(self):
+        return bool(self.profil and self.profil.compte_principal_id)
+
+    @cached_property
+    def permissions(self):
+        return get_user_permissions(self.user)
+
+    @cached_property
+    def restrictions(self):
+        return check_comptable_restrictions(self.user)
+
+    @cached_property
+    def annees(self):
+        from eleves.utils_annee import annees_scolaires
+
+        return annees_scolaires(self.ecole, self.request)
+
+    @cached_property
+    def annee_active(self):
+        from eleves.utils_annee import choisir_annee_active
+
+        return choisir_annee_active(self.request, self.annees) if self.ecole else None
+
+    @cached_property
+    def nouvelle_annee_status(self):
+        from eleves.utils_annee import get_statut_creation_nouvelle_annee
+
+        if not self.ecole:
+            return {'due': False}
+        return get_statut_creation_nouvelle_annee(self.ecole, annees=self.annees)
+
+
+def contexte_de(request):
+    """Le contexte de la requête, créé à la volée si le middleware n'est pas passé."""
+    contexte = getattr(request, 'contexte', None)
+    if contexte is None:
+        contexte = request.contexte = ContexteUtilisateur(request)
+    return contexte
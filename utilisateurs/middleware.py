@@ -178,6 +178,19 @@ class SchoolAccessMixin:
         return obj
 
 
+class ContexteUtilisateurMiddleware:
+    """Attache ``request.contexte`` (utilisateurs.contexte), évalué à la demande."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from .contexte import ContexteUtilisateur
+
+        request.contexte = ContexteUtilisateur(request)
+        return self.get_response(request)
+
+
 class MenuPermissionMiddleware:
     """Empêche un sous-utilisateur d'ouvrir directement un module non autorisé.
 
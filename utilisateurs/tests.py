@@ -345,3 +345,52 @@ class ComptesPrincipauxTests(TestCase):
         self.assertTrue(principal.peut_gerer_classes)
         self.assertEqual(agent.compte_principal, principal)
         self.assertEqual(set(agent.allowed_menus), set(principal.allowed_menus))
+
+
+class ContexteUtilisateurTests(TestCase):
+    """Contexte de requête : années de l'école gardées en session, invalidées par les classes."""
+
+    def setUp(self):
+        self.ecole = Ecole.objects.create(
+            nom='École contexte', adresse='Conakry', telephone='+224622000010',
+            directeur='Direction', etat='VALIDE',
+        )
+        Classe.objects.create(ecole=self.ecole, nom='7ème Année', niveau='COLLEGE_7', annee_scolaire='2025-2026')
+        self.user = User.objects.create_user(username='secretaire_contexte', password='ContexteSolide2026!')
+        profil = self.user.profil
+        profil.ecole = self.ecole
+        profil.role = 'SECRETAIRE'
+        profil.is_validated = True
+        profil.save()
+
+    def _requete(self, session):
+        from django.test import RequestFactory
+
+        from .contexte import contexte_de
+
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(pk=self.user.pk)
+        request.session = session
+        return request, contexte_de(request)
+
+    def test_annees_relues_seulement_apres_un_changement_de_classe(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from eleves.utils_annee import get_annee_active
+
+        session = {}
+        request, contexte = self._requete(session)
+        self.assertEqual(contexte.annee_active, '2025-2026')
+
+        request, contexte = self._requete(session)
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertEqual(contexte.annee_active, '2025-2026')
+            self.assertEqual(get_annee_active(request, contexte.ecole), '2025-2026')
+            self.assertFalse(contexte.nouvelle_annee_status['nouvelle_existe'])
+        self.assertFalse(any('annee_scolaire' in q['sql'] for q in requetes.captured_queries))
+
+        Classe.objects.create(ecole=self.ecole, nom='7ème Année', niveau='COLLEGE_7', annee_scolaire='2026-2027')
+        request, contexte = self._requete(session)
+        self.assertEqual(contexte.annee_active, '2026-2027')
+        self.assertEqual(contexte.annees, ['2026-2027', '2025-2026'])